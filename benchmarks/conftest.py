@@ -0,0 +1,41 @@
+"""Synthetic objects shared by the benchmarks, written once per run.
+
+DCMQTREEPY_BENCH_SCALE multiplies the size of every object (default 1).  Compare runs made at the same
+scale only; the scale is recorded with each result.
+"""
+
+import os
+
+import pytest
+from synthetic_objects import (
+    enhanced_multiframe,
+    rt_ion_plan,
+    rt_structure_set,
+    write_synthetic,
+)
+
+BENCH_SCALE = float(os.environ.get("DCMQTREEPY_BENCH_SCALE", "1"))
+
+
+def scaled(count: int) -> int:
+    return max(1, round(count * BENCH_SCALE))
+
+
+@pytest.fixture(scope="session")
+def synthetic_files(tmp_path_factory):
+    """Paths of the synthetic RT Ion Plan, RT Structure Set and Enhanced CT, by name."""
+    directory = tmp_path_factory.mktemp("synthetic")
+    return {
+        "rt_ion_plan": write_synthetic(rt_ion_plan(beams=4, control_points=scaled(100)), directory / "rt_ion_plan.dcm"),
+        "rt_structure_set": write_synthetic(rt_structure_set(rois=scaled(20)), directory / "rt_structure_set.dcm"),
+        "enhanced_multiframe": write_synthetic(enhanced_multiframe(frames=scaled(200)), directory / "enhanced_ct.dcm"),
+    }
+
+
+@pytest.fixture(params=["rt_ion_plan", "rt_structure_set", "enhanced_multiframe"])
+def synthetic_file(request, synthetic_files, benchmark):
+    """Each synthetic file in turn, with its size and the scale recorded in the benchmark results."""
+    path = synthetic_files[request.param]
+    benchmark.extra_info["bytes"] = path.stat().st_size
+    benchmark.extra_info["scale"] = BENCH_SCALE
+    return path
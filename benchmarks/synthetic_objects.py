@@ -0,0 +1,152 @@
+"""Synthetic DICOM objects, sized like the large objects dcmQTreePy is used on, for the benchmarks.
+
+The content is deterministic, so a benchmark run on one commit parses, searches and writes exactly the
+same bytes as a run on another.
+"""
+
+import random
+from pathlib import Path
+from typing import List
+
+from pydicom import Dataset, Sequence, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+
+RT_ION_PLAN_STORAGE = "1.2.840.10008.5.1.4.1.1.481.8"
+RT_STRUCTURE_SET_STORAGE = "1.2.840.10008.5.1.4.1.1.481.3"
+ENHANCED_CT_IMAGE_STORAGE = "1.2.840.10008.5.1.4.1.1.2.1"
+
+IMPAC_CREATOR = "IMPAC"
+
+
+def _base_dataset(sop_class_uid: str, modality: str, seed: int) -> Dataset:
+    rng = random.Random(seed)
+    ds = Dataset()
+    ds.SOPClassUID = sop_class_uid
+    ds.SOPInstanceUID = generate_uid(entropy_srcs=[sop_class_uid, str(seed)])
+    ds.StudyInstanceUID = generate_uid(entropy_srcs=["study", str(seed)])
+    ds.SeriesInstanceUID = generate_uid(entropy_srcs=["series", modality, str(seed)])
+    ds.Modality = modality
+    ds.PatientName = "Synthetic^Patient"
+    ds.PatientID = f"SYN{rng.randrange(100000):05d}"
+    ds.StudyDate = "20240101"
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_implicit_VR = False
+    ds.is_little_endian = True
+    return ds
+
+
+def _floats(rng: random.Random, count: int, low: float, high: float) -> List[float]:
+    return [round(rng.uniform(low, high), 3) for _ in range(count)]
+
+
+def rt_ion_plan(beams: int = 4, control_points: int = 100, spots: int = 400, seed: int = 0) -> Dataset:
+    """An RT Ion Plan with beams x control_points, each with spots scan spots and IMPAC line scan arrays."""
+    rng = random.Random(seed)
+    ds = _base_dataset(RT_ION_PLAN_STORAGE, "RTPLAN", seed)
+    ds.RTPlanLabel = "Synthetic"
+    ds.IonBeamSequence = Sequence()
+    for beam_number in range(1, beams + 1):
+        beam = Dataset()
+        beam.BeamNumber = beam_number
+        beam.BeamName = f"Beam {beam_number}"
+        beam.RadiationType = "PROTON"
+        beam.ScanMode = "MODULATED"
+        beam.NumberOfControlPoints = control_points
+        beam.IonControlPointSequence = Sequence()
+        for index in range(control_points):
+            control_point = Dataset()
+            control_point.ControlPointIndex = index
+            control_point.NominalBeamEnergy = round(70 + index * 0.5, 1)
+            control_point.GantryAngle = float(beam_number * 45 % 360)
+            control_point.CumulativeMetersetWeight = round(index / control_points, 6)
+            control_point.ScanSpotTuneID = "3.0"
+            control_point.NumberOfScanSpotPositions = spots
+            control_point.ScanSpotPositionMap = _floats(rng, 2 * spots, -100.0, 100.0)
+            control_point.ScanSpotMetersetWeights = _floats(rng, spots, 0.0, 1.0)
+            block = control_point.private_block(0x300B, IMPAC_CREATOR, create=True)
+            block.add_new(0x92, "IS", spots)
+            block.add_new(0x94, "FL", _floats(rng, 2 * spots, -100.0, 100.0))
+            block.add_new(0x96, "FL", _floats(rng, spots, 0.0, 1.0))
+            beam.IonControlPointSequence.append(control_point)
+        ds.IonBeamSequence.append(beam)
+    return ds
+
+
+def rt_structure_set(rois: int = 20, contours: int = 100, points: int = 200, seed: int = 0) -> Dataset:
+    """An RT Structure Set with rois ROIs of contours planar contours of points points each."""
+    rng = random.Random(seed)
+    ds = _base_dataset(RT_STRUCTURE_SET_STORAGE, "RTSTRUCT", seed)
+    ds.StructureSetLabel = "Synthetic"
+    ds.StructureSetROISequence = Sequence()
+    ds.ROIContourSequence = Sequence()
+    for roi_number in range(1, rois + 1):
+        roi = Dataset()
+        roi.ROINumber = roi_number
+        roi.ROIName = f"ROI {roi_number}"
+        ds.StructureSetROISequence.append(roi)
+        roi_contour = Dataset()
+        roi_contour.ReferencedROINumber = roi_number
+        roi_contour.ROIDisplayColor = [rng.randrange(256) for _ in range(3)]
+        roi_contour.ContourSequence = Sequence()
+        for index in range(contours):
+            contour = Dataset()
+            contour.ContourGeometricType = "CLOSED_PLANAR"
+            contour.NumberOfContourPoints = points
+            z = round(-100 + index * 2.5, 2)
+            data = []
+            for _ in range(points):
+                data.extend([round(rng.uniform(-200, 200), 2), round(rng.uniform(-200, 200), 2), z])
+            contour.ContourData = data
+            roi_contour.ContourSequence.append(contour)
+        ds.ROIContourSequence.append(roi_contour)
+    return ds
+
+
+def enhanced_multiframe(frames: int = 200, rows: int = 128, columns: int = 128, seed: int = 0) -> Dataset:
+    """An Enhanced CT image of frames frames, with a full Per-frame Functional Groups Sequence."""
+    rng = random.Random(seed)
+    ds = _base_dataset(ENHANCED_CT_IMAGE_STORAGE, "CT", seed)
+    ds.NumberOfFrames = frames
+    ds.Rows = rows
+    ds.Columns = columns
+    ds.SamplesPerPixel = 1
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.BitsAllocated = 16
+    ds.BitsStored = 12
+    ds.HighBit = 11
+    ds.PixelRepresentation = 0
+    shared = Dataset()
+    pixel_measures = Dataset()
+    pixel_measures.PixelSpacing = [0.98, 0.98]
+    pixel_measures.SliceThickness = 1.25
+    shared.PixelMeasuresSequence = Sequence([pixel_measures])
+    orientation = Dataset()
+    orientation.ImageOrientationPatient = [1, 0, 0, 0, 1, 0]
+    shared.PlaneOrientationSequence = Sequence([orientation])
+    ds.SharedFunctionalGroupsSequence = Sequence([shared])
+    ds.PerFrameFunctionalGroupsSequence = Sequence()
+    for index in range(frames):
+        frame = Dataset()
+        content = Dataset()
+        content.FrameAcquisitionNumber = index
+        content.DimensionIndexValues = [1, index + 1]
+        frame.FrameContentSequence = Sequence([content])
+        position = Dataset()
+        position.ImagePositionPatient = [-125.0, -125.0, round(index * 1.25, 2)]
+        frame.PlanePositionSequence = Sequence([position])
+        voi = Dataset()
+        voi.WindowCenter = 40
+        voi.WindowWidth = 400
+        frame.FrameVOILUTSequence = Sequence([voi])
+        ds.PerFrameFunctionalGroupsSequence.append(frame)
+    ds.PixelData = rng.randbytes(frames * rows * columns * 2)
+    return ds
+
+
+def write_synthetic(ds: Dataset, path: Path) -> Path:
+    dcmwrite(path, ds, write_like_original=False)
+    return path
@@ -0,0 +1,29 @@
+"""Benchmarks for reading the synthetic objects."""
+
+import pytest
+from pydicom import dcmread
+
+
+@pytest.mark.benchmark(group="parse")
+def test_dcmread(benchmark, synthetic_file):
+    """Read a file, leaving values in their raw form (as opening a file in the editor starts with)."""
+    benchmark(dcmread, synthetic_file)
+
+
+@pytest.mark.benchmark(group="parse")
+def test_dcmread_stop_before_pixels(benchmark, synthetic_file):
+    """Read the header of a file, as when indexing a folder."""
+    benchmark(dcmread, synthetic_file, stop_before_pixels=True)
+
+
+@pytest.mark.benchmark(group="parse")
+def test_dcmread_and_convert_every_value(benchmark, synthetic_file):
+    """Read a file and convert every value, as showing every element in the tree does."""
+
+    def read_all():
+        ds = dcmread(synthetic_file)
+        for elem in ds.iterall():
+            elem.value
+        return ds
+
+    benchmark(read_all)
@@ -0,0 +1,40 @@
+"""Benchmarks for loading the private dictionaries."""
+
+from pathlib import Path
+
+import pydicom.datadict
+import pytest
+
+from dcmqtreepy.import_hex_legible_private_element_lists import (
+    pydicom_private_dicts_from_json,
+)
+from dcmqtreepy.new_privates import new_private_dictionaries
+
+SAMPLE_PRIVATES = Path(__file__).parent.parent / "sample_privates.json"
+
+
+@pytest.mark.benchmark(group="private dictionaries")
+def test_register_known_private_dictionaries(benchmark):
+    """Register the private dictionaries that ship with dcmQTreePy, as starting the editor does."""
+
+    def register():
+        for creator, private_dict in new_private_dictionaries.items():
+            pydicom.datadict.add_private_dict_entries(creator, private_dict)
+
+    benchmark(register)
+
+
+@pytest.mark.benchmark(group="private dictionaries")
+def test_private_dictionaries_from_json(benchmark):
+    """Read private dictionaries from a hex legible JSON list."""
+    dictionaries = benchmark(pydicom_private_dicts_from_json, SAMPLE_PRIVATES)
+    assert dictionaries
+
+
+@pytest.mark.benchmark(group="private dictionaries")
+def test_private_tag_lookup(benchmark):
+    """Look up the description of every registered private tag."""
+    entries = [(creator, tag) for creator, private_dict in new_private_dictionaries.items() for tag in private_dict]
+    for creator, private_dict in new_private_dictionaries.items():
+        pydicom.datadict.add_private_dict_entries(creator, private_dict)
+    benchmark(lambda: [pydicom.datadict.get_private_entry(tag, creator) for creator, tag in entries])
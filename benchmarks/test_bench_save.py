@@ -0,0 +1,49 @@
+"""Benchmarks for saving edits to the synthetic objects."""
+
+import copy
+import shutil
+from io import BytesIO
+
+import pytest
+from pydicom import dcmread, dcmwrite
+
+from dcmqtreepy.in_place_patch import patch_in_place
+from dcmqtreepy.preserving_writer import write_preserving_encoding
+
+
+def edited_copy(ds):
+    """ds with a one tag edit, keeping the length of the value, sharing the unchanged elements."""
+    modified = copy.copy(ds)
+    modified.PatientName = "Synthetic^Changed"  # as long as Synthetic^Patient
+    return modified
+
+
+@pytest.mark.benchmark(group="save")
+def test_dcmwrite(benchmark, synthetic_file):
+    """Encode every element, as a plain save does."""
+    ds = dcmread(synthetic_file)
+    benchmark(lambda: dcmwrite(BytesIO(), ds, write_like_original=False))
+
+
+@pytest.mark.benchmark(group="save")
+def test_write_preserving_encoding(benchmark, synthetic_file, tmp_path):
+    """Copy the unchanged elements and encode the edited one."""
+    original = dcmread(synthetic_file)
+    modified = edited_copy(original)
+    destination = tmp_path / "saved.dcm"
+    benchmark(write_preserving_encoding, synthetic_file, original, modified, destination)
+
+
+@pytest.mark.benchmark(group="save")
+def test_patch_in_place(benchmark, synthetic_file, tmp_path):
+    """Overwrite the bytes of a same length edit in a copy of the file."""
+    original = dcmread(synthetic_file)
+    modified = edited_copy(original)
+    target = tmp_path / "patched.dcm"
+
+    def copy_file():
+        shutil.copyfile(synthetic_file, target)
+        return (target, original, modified), {"backup": False}
+
+    patched = benchmark.pedantic(patch_in_place, setup=copy_file, rounds=10)
+    assert patched
@@ -0,0 +1,83 @@
+"""Benchmarks for finding elements in the synthetic objects."""
+
+import pytest
+from pydicom import dcmread
+
+from dcmqtreepy.dataset_paths import build_node_index, resolve_path
+from dcmqtreepy.element_offsets import (
+    index_element_locations,
+    read_dataset_start,
+    scan_top_level_elements,
+)
+
+
+@pytest.fixture(scope="module")
+def plan(synthetic_files):
+    ds = dcmread(synthetic_files["rt_ion_plan"])
+    for elem in ds.iterall():
+        elem.value
+    return ds
+
+
+@pytest.mark.benchmark(group="search")
+def test_find_keyword_in_nested_sequences(benchmark, plan):
+    """Collect every Gantry Angle, walking all the nested items of the plan."""
+    angles = benchmark(lambda: [elem.value for elem in plan.iterall() if elem.keyword == "GantryAngle"])
+    assert len(angles) == sum(len(beam.IonControlPointSequence) for beam in plan.IonBeamSequence)
+
+
+@pytest.mark.benchmark(group="search")
+def test_find_private_elements(benchmark, plan):
+    """Collect every IMPAC Line Scan Position Map, as a private element search does."""
+
+    def find_line_scan_maps():
+        found = []
+        for beam in plan.IonBeamSequence:
+            for control_point in beam.IonControlPointSequence:
+                block = control_point.private_block(0x300B, "IMPAC")
+                found.append(block[0x94].value)
+        return found
+
+    benchmark(find_line_scan_maps)
+
+
+@pytest.mark.benchmark(group="search")
+def test_build_node_index(benchmark, plan):
+    """Index every node of the plan by path, as the web viewer does after each edit."""
+    index = benchmark(build_node_index, plan)
+    assert len(index) > 1
+
+
+@pytest.mark.benchmark(group="search")
+def test_resolve_deep_paths(benchmark, plan):
+    """Resolve the path of every control point's Gantry Angle without an index."""
+    paths = [
+        (0x300A03A2, beam_index, 0x300A03A8, cp_index, 0x300A011E)
+        for beam_index, beam in enumerate(plan.IonBeamSequence)
+        for cp_index in range(len(beam.IonControlPointSequence))
+    ]
+    benchmark(lambda: [resolve_path(plan, path) for path in paths])
+
+
+@pytest.mark.benchmark(group="search")
+def test_scan_element_offsets(benchmark, synthetic_file):
+    """Find the byte range of each top level element, as saving with the original encoding does."""
+
+    def scan():
+        with open(synthetic_file, "rb") as fp:
+            read_dataset_start(fp)
+            return scan_top_level_elements(fp, False, True)
+
+    benchmark(scan)
+
+
+@pytest.mark.benchmark(group="search")
+def test_index_nested_element_offsets(benchmark, synthetic_files):
+    """Find the byte offset of every element of the plan, as patching a value in place does."""
+
+    def index():
+        with open(synthetic_files["rt_ion_plan"], "rb") as fp:
+            read_dataset_start(fp)
+            return index_element_locations(fp, False, True)
+
+    benchmark(index)
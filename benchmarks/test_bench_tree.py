@@ -0,0 +1,35 @@
+"""Benchmarks for showing the synthetic objects in the editor's tree (needs the GUI dependencies)."""
+
+import os
+
+import pytest
+from pydicom import dcmread
+
+pytest.importorskip("dcm_mini_viewer")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+from dcmqtreepy.dcmQTree import DCMQtreePy  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def window():
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+    editor = DCMQtreePy()
+    yield editor
+    editor.close()
+    app.processEvents()
+
+
+@pytest.mark.benchmark(group="tree")
+def test_populate_tree(benchmark, window, synthetic_file):
+    """Build the tree items for every element."""
+    ds = dcmread(synthetic_file)
+    benchmark(window.populate_tree_widget_from_dataset, ds)
+
+
+@pytest.mark.benchmark(group="tree")
+def test_dataset_from_tree(benchmark, window, synthetic_file):
+    """Rebuild the dataset from the tree, as every save does."""
+    window.populate_tree_widget_from_file(synthetic_file)
+    benchmark(window._dataset_from_tree)
@@ -0,0 +1,216 @@
+"""A table editor for large numeric values (see numeric_array), a page of rows at a time."""
+
+import logging
+
+import numpy as np
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtWidgets import (
+    QComboBox,
+    QDialog,
+    QDialogButtonBox,
+    QDoubleSpinBox,
+    QHBoxLayout,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QTableView,
+    QVBoxLayout,
+)
+
+from dcmqtreepy.numeric_array import OPERATION_PARAMETERS, OPERATIONS, apply_operation
+
+logger = logging.getLogger(__name__)
+
+# rows shown at a time
+PAGE_ROWS = 1000
+COLUMN_NAMES = ["x", "y", "z"]
+
+
+class ArrayTableModel(QAbstractTableModel):
+    """One page of a one dimensional array, shown as rows of width values."""
+
+    def __init__(self, array: np.ndarray, width: int = 1, parent=None):
+        super().__init__(parent)
+        self.array = array
+        self.width = width
+        self.page = 0
+
+    def set_array(self, array: np.ndarray):
+        self.beginResetModel()
+        self.array = array
+        self.page = min(self.page, max(self.page_count() - 1, 0))
+        self.endResetModel()
+
+    def set_width(self, width: int):
+        self.beginResetModel()
+        self.width = width
+        self.page = 0
+        self.endResetModel()
+
+    def set_page(self, page: int):
+        self.beginResetModel()
+        self.page = page
+        self.endResetModel()
+
+    def total_rows(self) -> int:
+        return -(-len(self.array) // self.width)
+
+    def page_count(self) -> int:
+        return -(-self.total_rows() // PAGE_ROWS)
+
+    def _value_index(self, index: QModelIndex) -> int:
+        return (self.page * PAGE_ROWS + index.row()) * self.width + index.column()
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return max(min(PAGE_ROWS, self.total_rows() - self.page * PAGE_ROWS), 0)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.width
+
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Vertical:
+            return str(self.page * PAGE_ROWS + section + 1)
+        return COLUMN_NAMES[section] if self.width <= len(COLUMN_NAMES) else str(section + 1)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole) or not index.isValid():
+            return None
+        value_index = self._value_index(index)
+        if value_index >= len(self.array):
+            return None
+        return str(self.array[value_index])
+
+    def flags(self, index: QModelIndex):
+        if self._value_index(index) >= len(self.array):
+            return Qt.ItemFlag.NoItemFlags
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEditable
+
+    def setData(self, index: QModelIndex, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or not index.isValid():
+            return False
+        try:
+            number = float(value)
+        except ValueError:
+            return False
+        if not self.array.flags.writeable:
+            # a view of the bytes as read, copied on the first edit
+            self.array = self.array.copy()
+        self.array[self._value_index(index)] = number
+        self.dataChanged.emit(index, index)
+        return True
+
+
+class ArrayEditorDialog(QDialog):
+    """Edit the values of one element as a table, with operations on all values or on one column.
+
+    The edited values are in array once the dialog is accepted (changed tells if they differ).
+    """
+
+    def __init__(self, title: str, array: np.ndarray, width: int = 1, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.original = array
+        self.model = ArrayTableModel(array, width if len(array) % width == 0 else 1, self)
+        self.table = QTableView()
+        self.table.setModel(self.model)
+
+        self.width_combo = QComboBox()
+        for choice in (1, 2, 3):
+            if len(array) % choice == 0:
+                self.width_combo.addItem(f"{choice} per row", choice)
+        self.width_combo.setCurrentIndex(max(self.width_combo.findData(self.model.width), 0))
+        self.width_combo.currentIndexChanged.connect(self.handle_width_changed)
+        self.page_spin = QSpinBox()
+        self.page_spin.setPrefix("Page ")
+        self.page_spin.valueChanged.connect(lambda page: self.model.set_page(page - 1))
+        self.page_label = QLabel()
+        paging = QHBoxLayout()
+        paging.addWidget(QLabel(f"{len(array)} {array.dtype} values,"))
+        paging.addWidget(self.width_combo)
+        paging.addStretch()
+        paging.addWidget(self.page_spin)
+        paging.addWidget(self.page_label)
+
+        self.operation_combo = QComboBox()
+        self.operation_combo.addItems(list(OPERATIONS))
+        self.operation_combo.currentTextChanged.connect(self.handle_operation_changed)
+        self.column_combo = QComboBox()
+        self.parameter_spins = [QDoubleSpinBox() for _ in range(2)]
+        for spin in self.parameter_spins:
+            spin.setRange(-1e12, 1e12)
+            spin.setDecimals(6)
+        self.apply_button = QPushButton("Apply")
+        self.apply_button.clicked.connect(self.on_apply)
+        operations = QHBoxLayout()
+        operations.addWidget(self.operation_combo)
+        operations.addWidget(self.column_combo)
+        for spin in self.parameter_spins:
+            operations.addWidget(spin)
+        operations.addWidget(self.apply_button)
+        self.status_label = QLabel()
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addLayout(paging)
+        layout.addWidget(self.table)
+        layout.addLayout(operations)
+        layout.addWidget(self.status_label)
+        layout.addWidget(buttons)
+        self.resize(600, 700)
+        self.update_paging()
+        self.handle_operation_changed(self.operation_combo.currentText())
+
+    @property
+    def array(self) -> np.ndarray:
+        return self.model.array
+
+    @property
+    def changed(self) -> bool:
+        return self.model.array is not self.original and not np.array_equal(self.model.array, self.original)
+
+    def update_paging(self):
+        pages = max(self.model.page_count(), 1)
+        self.page_spin.setRange(1, pages)
+        self.page_label.setText(f"of {pages}")
+        self.column_combo.clear()
+        self.column_combo.addItem("All values", None)
+        if self.model.width > 1:
+            for column in range(self.model.width):
+                self.column_combo.addItem(f"{COLUMN_NAMES[column]} only", column)
+
+    def handle_width_changed(self, _):
+        self.model.set_width(self.width_combo.currentData())
+        self.page_spin.setValue(1)
+        self.update_paging()
+
+    def handle_operation_changed(self, operation: str):
+        names = OPERATION_PARAMETERS[operation]
+        for spin, name in zip(self.parameter_spins, names + [None] * len(self.parameter_spins)):
+            spin.setVisible(name is not None)
+            spin.setPrefix(f"{name} " if name else "")
+        defaults = {"Scale": [1.0], "Offset": [0.0], "Round": [2.0], "Clip": [float(np.min(self.array, initial=0)), 0.0]}
+        if operation == "Clip":
+            defaults["Clip"][1] = float(np.max(self.array, initial=0))
+        for spin, default in zip(self.parameter_spins, defaults[operation]):
+            spin.setValue(default)
+
+    def on_apply(self):
+        operation = self.operation_combo.currentText()
+        parameters = [spin.value() for spin in self.parameter_spins[: len(OPERATION_PARAMETERS[operation])]]
+        column = self.column_combo.currentData()
+        try:
+            result = apply_operation(self.array, operation, *parameters, column=column, width=self.model.width)
+        except ValueError as operation_exc:
+            self.status_label.setText(str(operation_exc))
+            return
+        self.model.set_array(result)
+        target = "all values" if column is None else f"{COLUMN_NAMES[column]} values"
+        self.status_label.setText(f"{operation} {', '.join(f'{p:g}' for p in parameters)} applied to {target}")
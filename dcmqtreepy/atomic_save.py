@@ -0,0 +1,100 @@
+"""Crash safe file writes.
+
+Files are written to a temporary file in the destination's directory, flushed and fsynced, and then
+renamed over the destination, so a crash or a full disk part way through leaves either the old file or
+the new one, never a truncated one.  Writes to the same path from different threads are serialized, and a
+thread holding a path's lock (see path_locks) may write it again.
+"""
+
+import logging
+import os
+import shutil
+import threading
+import uuid
+from contextlib import ExitStack, contextmanager
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# ProgressFile reports at most once per this many bytes written
+PROGRESS_INTERVAL_BYTES = 4 * 1024 * 1024
+
+_path_locks: Dict[Path, threading.RLock] = {}
+_path_locks_guard = threading.Lock()
+
+
+def path_lock(path: Path | str) -> threading.RLock:
+    """The lock that serializes writes to path."""
+    key = Path(path).resolve()
+    with _path_locks_guard:
+        return _path_locks.setdefault(key, threading.RLock())
+
+
+@contextmanager
+def path_locks(*paths: Path | str) -> Iterator[None]:
+    """Hold the locks of every path, e.g. while reading one file and writing another from what was read.
+
+    The locks are always taken in the same order, so two threads doing this with the same files can't deadlock.
+    """
+    with ExitStack() as stack:
+        for key in sorted({Path(path).resolve() for path in paths}):
+            stack.enter_context(path_lock(key))
+        yield
+
+
+def _fsync_directory(directory: Path) -> None:
+    """Make a rename in directory durable; not possible (nor needed) on every platform."""
+    try:
+        directory_fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(directory_fd)
+    except OSError:
+        pass
+    finally:
+        os.close(directory_fd)
+
+
+@contextmanager
+def atomic_write(path: Path | str) -> Iterator[BinaryIO]:
+    """Open a temporary file next to path for writing; on success it replaces path, on error it is removed."""
+    path = Path(path)
+    with path_lock(path):
+        partial_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.partial")
+        try:
+            with open(partial_path, "xb") as partial:
+                yield partial
+                partial.flush()
+                os.fsync(partial.fileno())
+            if path.exists():
+                shutil.copymode(path, partial_path)
+            os.replace(partial_path, path)
+        except BaseException:
+            partial_path.unlink(missing_ok=True)
+            raise
+        _fsync_directory(path.parent)
+    logger.debug(f"Wrote {path}")
+
+
+class ProgressFile:
+    """Wrap a writable binary file, calling progress(bytes_written) as data is written."""
+
+    def __init__(self, fileobj: BinaryIO, progress: Optional[Callable[[int], None]] = None):
+        self.fileobj = fileobj
+        self.progress = progress
+        self.bytes_written = 0
+        self._last_report = 0
+
+    def write(self, data) -> int:
+        written = self.fileobj.write(data)
+        self.bytes_written += len(data)
+        if self.progress is not None and self.bytes_written - self._last_report >= PROGRESS_INTERVAL_BYTES:
+            self._last_report = self.bytes_written
+            self.progress(self.bytes_written)
+        return written
+
+    def __getattr__(self, name):
+        # tell, seek, flush, fileno, ... go to the wrapped file
+        return getattr(self.fileobj, name)
@@ -0,0 +1,192 @@
+"""Apply the same edit to many DICOM files.
+
+Files are parsed, edited and re-encoded on a thread pool; results are yielded as they complete so that a
+caller can report progress and write each result out (e.g. into a zip) without holding the whole batch.
+"""
+
+import logging
+import zipfile
+from dataclasses import dataclass
+from io import BytesIO
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from pydicom import Dataset, datadict, dcmread, dcmwrite
+from pydicom.uid import (
+    ExplicitVRBigEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+)
+from pydicom.valuerep import VR
+
+from dcmqtreepy.bounded_pool import run_bounded
+
+logger = logging.getLogger(__name__)
+
+# Transfer syntaxes that can be written without compressing or decompressing the pixel data
+UNCOMPRESSED_TRANSFER_SYNTAXES = {
+    ImplicitVRLittleEndian: (True, True),  # (is_implicit_VR, is_little_endian)
+    ExplicitVRLittleEndian: (False, True),
+    ExplicitVRBigEndian: (False, False),
+}
+
+
+def cast_text_to_vr_value(text: str, vr: str):
+    """Convert text (multiple values separated by backslash) to the Python value(s) expected for vr."""
+    if len(text) == 0:
+        return None
+    values = text.split("\\")
+    if vr in [VR.IS, VR.SS, VR.US, VR.SL, VR.UL, VR.SV, VR.UV]:
+        cast_values = [int(value) for value in values]
+    elif vr in [VR.FL, VR.FD]:
+        cast_values = [float(value) for value in values]
+    else:
+        return text
+    return cast_values[0] if len(cast_values) == 1 else cast_values
+
+
+@dataclass
+class SetElement:
+    """Set the value of a top level element, adding it (with its dictionary VR unless vr is given) if missing."""
+
+    tag: int
+    value: str
+    vr: Optional[str] = None
+
+    def apply(self, ds: Dataset) -> None:
+        if self.tag in ds:
+            elem = ds[self.tag]
+            elem.value = cast_text_to_vr_value(self.value, elem.VR)
+        else:
+            vr = self.vr or datadict.dictionary_VR(self.tag)
+            ds.add_new(self.tag, vr, cast_text_to_vr_value(self.value, vr))
+
+
+@dataclass
+class DeleteElement:
+    """Delete a top level element if present."""
+
+    tag: int
+
+    def apply(self, ds: Dataset) -> None:
+        if self.tag in ds:
+            del ds[self.tag]
+
+
+@dataclass
+class AddPrivateElement:
+    """Add (or replace) an element of a private block, taking its VR from the registered private dictionaries."""
+
+    group: int
+    private_creator: str
+    element_offset: int
+    value: str
+
+    def apply(self, ds: Dataset) -> None:
+        vr = datadict.get_private_entry((self.group, 0x1000 | self.element_offset), self.private_creator)[0]
+        block = ds.private_block(self.group, self.private_creator, create=True)
+        block.add_new(self.element_offset, vr, cast_text_to_vr_value(self.value, vr))
+
+
+@dataclass
+class ChangeTransferSyntax:
+    """Re-encode with another uncompressed transfer syntax."""
+
+    transfer_syntax_uid: str
+
+    def apply(self, ds: Dataset) -> None:
+        if self.transfer_syntax_uid not in UNCOMPRESSED_TRANSFER_SYNTAXES:
+            raise ValueError(f"Can only change to an uncompressed transfer syntax, not {self.transfer_syntax_uid}")
+        ds.ensure_file_meta()
+        current = ds.file_meta.get("TransferSyntaxUID")
+        if current is not None and current.is_compressed:
+            raise ValueError(f"Pixel data is compressed ({current.name}), it can not be re-encoded here")
+        ds.is_implicit_VR, ds.is_little_endian = UNCOMPRESSED_TRANSFER_SYNTAXES[self.transfer_syntax_uid]
+        ds.file_meta.TransferSyntaxUID = self.transfer_syntax_uid
+
+
+class ArchiveSizeError(Exception):
+    """The results outgrew the size the archive was allowed."""
+
+
+@dataclass
+class BatchResult:
+    """The outcome for one file of a batch: the edited file's bytes or the error that stopped it."""
+
+    name: str
+    data: Optional[bytes] = None
+    error: Optional[str] = None
+
+
+def apply_edits(name: str, data: bytes, edits: List) -> BatchResult:
+    """Parse one file from its bytes, apply edits in order and encode it again."""
+    try:
+        ds = dcmread(BytesIO(data), force=True)
+        for edit in edits:
+            edit.apply(ds)
+        changes_encoding = any(isinstance(edit, ChangeTransferSyntax) for edit in edits)
+        buffer = BytesIO()
+        dcmwrite(buffer, ds, write_like_original=not changes_encoding)
+        return BatchResult(name=name, data=buffer.getvalue())
+    except Exception as batch_exc:
+        logger.error(f"Batch edit of {name} failed: {batch_exc}")
+        return BatchResult(name=name, error=str(batch_exc))
+
+
+def read_and_apply_edits(name: str, read_bytes: Callable[[], bytes], edits: List) -> BatchResult:
+    try:
+        data = read_bytes()
+    except OSError as read_exc:
+        return BatchResult(name=name, error=str(read_exc))
+    return apply_edits(name, data, edits)
+
+
+def apply_batch(
+    sources: Iterable[Tuple[str, Callable[[], bytes]]], edits: List, max_workers: int = 4
+) -> Iterator[BatchResult]:
+    """Apply edits to each (name, read_bytes) source on a thread pool, yielding results as they complete.
+
+    At most 2 * max_workers files are read or in flight at any time, so the batch never needs to hold all
+    of its inputs and outputs in memory.
+    """
+
+    def apply(source: Tuple[str, Callable[[], bytes]]) -> BatchResult:
+        return read_and_apply_edits(*source, edits)
+
+    yield from run_bounded(apply, sources, max_workers, 2 * max_workers)
+
+
+def write_results_zip(
+    results: Iterable[BatchResult], fileobj: IO[bytes], max_bytes: Optional[int] = None
+) -> Iterator[BatchResult]:
+    """Stream results into a zip archive in fileobj as they arrive, passing each result on (e.g. for progress).
+
+    Failed files are listed in errors.txt inside the archive.  ArchiveSizeError is raised once the archive
+    is larger than max_bytes (if given), leaving the files written so far in it.
+    """
+    names_used = set()
+    errors = []
+    with zipfile.ZipFile(fileobj, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for result in results:
+            if result.error is None:
+                archive.writestr(unique_name(result.name, names_used), result.data)
+                if max_bytes is not None and fileobj.tell() > max_bytes:
+                    raise ArchiveSizeError(f"The results are larger than the {max_bytes} bytes allowed")
+            else:
+                errors.append(f"{result.name}: {result.error}")
+            yield result
+        if errors:
+            archive.writestr("errors.txt", "\n".join(errors) + "\n")
+
+
+def unique_name(name: str, names_used: set) -> str:
+    """name, or name with a counter inserted before the extension if it was already used."""
+    candidate = name
+    stem, dot, suffix = name.rpartition(".")
+    if not dot:
+        stem, suffix = name, ""
+    counter = 1
+    while candidate in names_used:
+        candidate = f"{stem}_{counter}{dot}{suffix}"
+        counter += 1
+    names_used.add(candidate)
+    return candidate
@@ -0,0 +1,41 @@
+"""Run a function over many items on a thread pool, never holding more than a few of them at once.
+
+Items are taken from their iterable only as earlier ones complete, so a long (or lazily read) batch of
+files needs no more memory than max_in_flight of them, and results are yielded as each one completes.
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+Item = TypeVar("Item")
+Result = TypeVar("Result")
+
+
+def run_bounded(
+    function: Callable[[Item], Result], items: Iterable[Item], max_workers: int, max_in_flight: Optional[int] = None
+) -> Iterator[Result]:
+    """Call function on each item with max_workers threads, yielding the results as they complete.
+
+    At most max_in_flight items (max_workers by default) are submitted and not yet yielded at any time.
+    """
+    items = iter(items)
+    max_in_flight = max_in_flight or max_workers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+
+        def submit_next() -> bool:
+            try:
+                item = next(items)
+            except StopIteration:
+                return False
+            in_flight.add(executor.submit(function, item))
+            return True
+
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.remove(future)
+                submit_next()
+                yield future.result()
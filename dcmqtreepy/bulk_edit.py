@@ -0,0 +1,388 @@
+"""Edit one element in every item of (nested) sequences with an expression, e.g. offset every Gantry Angle.
+
+An element path names the sequences to walk and the element to edit, separated by dots::
+
+    IonBeamSequence[*].IonControlPointSequence[*].GantryAngle
+    BeamSequence[0].ControlPointSequence[1:].CumulativeMetersetWeight
+    IonBeamSequence[*].(300B,IMPAC,92)
+
+Each part is a keyword, a tag as 8 hex digits, or a private element as (group,creator,offset).  Sequences
+take an index: * for every item, a number, or a slice.  The expression computes the new value from x, the
+current value, using numbers, strings, + - * / // % ** (only + for strings, powers up to MAX_EXPONENT), and
+round, abs, min, max, int, float and str, e.g. ``x + 10`` or ``round(x * 1.02, 4)``.  An expression without x
+sets every match to the same value.
+
+The expression is evaluated once over all matching values as a NumPy array when they are numbers (or lists of
+numbers of the same length), otherwise once per value.  Empty values (e.g. of Type 2 elements) are left as
+they are by expressions of x.  Every new value is computed and checked before any is set, so an edit that
+fails changes nothing.  BulkEdit has the apply(ds) of the batch edits, so the same edit runs on one dataset
+in the editor or on many files with batch_edit.apply_batch.
+"""
+
+import ast
+import logging
+import operator
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from pydicom import DataElement, Dataset, config, datadict
+from pydicom.multival import MultiValue
+from pydicom.tag import BaseTag, Tag
+from pydicom.valuerep import VR, DSfloat
+
+logger = logging.getLogger(__name__)
+
+_SEGMENT = re.compile(
+    r"""^(?:(?P<keyword>[A-Za-z][A-Za-z0-9]*)
+        |(?P<tag>(?:0x)?[0-9A-Fa-f]{8})
+        |\((?P<group>[0-9A-Fa-f]{4}),(?P<creator>[^,()]+),(?P<offset>[0-9A-Fa-f]{2})\))
+        (?:\[(?P<index>\*|-?\d+|-?\d*:-?\d*)\])?$""",
+    re.VERBOSE,
+)
+
+INTEGER_VRS = [VR.IS, VR.SS, VR.US, VR.SL, VR.UL, VR.SV, VR.UV]
+FLOAT_VRS = [VR.FL, VR.FD]
+NUMBER_VRS = INTEGER_VRS + FLOAT_VRS + [VR.DS]
+
+# the largest power an expression may raise to, so that one like 9**9**9 fails rather than runs for ever
+MAX_EXPONENT = 1024
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float, np.ndarray, np.number)) and not isinstance(value, bool)
+
+
+def _numbers_only(function: Callable) -> Callable:
+    """function of two numbers, refusing strings (so no "x" * 10**9 or "%s" % x)."""
+
+    def checked(left, right):
+        if not (_is_number(left) and _is_number(right)):
+            raise BulkEditError(f"{left!r} and {right!r} must both be numbers")
+        return function(left, right)
+
+    return checked
+
+
+@_numbers_only
+def _power(base, exponent):
+    if np.any(np.abs(exponent) > MAX_EXPONENT):
+        raise BulkEditError(f"Powers above {MAX_EXPONENT} are not supported")
+    return np.power(np.asarray(base, dtype=np.float64), np.asarray(exponent, dtype=np.float64))
+
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: _numbers_only(operator.sub),
+    ast.Mult: _numbers_only(operator.mul),
+    ast.Div: _numbers_only(operator.truediv),
+    ast.FloorDiv: _numbers_only(operator.floordiv),
+    ast.Mod: _numbers_only(operator.mod),
+    ast.Pow: _power,
+}
+_UNARY_OPERATORS = {ast.USub: operator.neg, ast.UAdd: operator.pos}
+# functions an expression may call; the NumPy ones work on a single value or on an array of them
+_FUNCTIONS: Dict[str, Callable] = {
+    "round": np.round,
+    "abs": np.abs,
+    "min": np.minimum,
+    "max": np.maximum,
+    "int": lambda value: np.trunc(value).astype(np.int64) if isinstance(value, np.ndarray) else int(value),
+    "float": lambda value: np.asarray(value, dtype=np.float64) if isinstance(value, np.ndarray) else float(value),
+    "str": str,
+}
+
+
+class BulkEditError(ValueError):
+    """The element path or the expression can't be used."""
+
+
+@dataclass(frozen=True)
+class PathSegment:
+    """One part of an element path: a public tag, or a private element by creator and offset, and an item index."""
+
+    tag: Optional[int] = None
+    group: Optional[int] = None
+    private_creator: Optional[str] = None
+    offset: Optional[int] = None
+    # None (no index), "*", an int, or a slice
+    index: Any = None
+
+    def resolve_tag(self, ds: Dataset, create: bool = False) -> Optional[BaseTag]:
+        """The tag of this part in ds; for a private element None if ds has no block of the creator (unless create)."""
+        if self.tag is not None:
+            return Tag(self.tag)
+        try:
+            block = ds.private_block(self.group, self.private_creator, create=create)
+        except KeyError:
+            return None
+        return Tag(block.get_tag(self.offset))
+
+    def vr(self) -> str:
+        if self.tag is not None:
+            return datadict.dictionary_VR(self.tag)
+        return datadict.get_private_entry((self.group, 0x1000 | self.offset), self.private_creator)[0]
+
+    def describe(self) -> str:
+        if self.tag is not None:
+            name = datadict.keyword_for_tag(self.tag) or f"{self.tag:08X}"
+        else:
+            name = f"({self.group:04X},{self.private_creator},{self.offset:02X})"
+        if self.index is None:
+            return name
+        if isinstance(self.index, slice):
+            start = "" if self.index.start is None else self.index.start
+            stop = "" if self.index.stop is None else self.index.stop
+            return f"{name}[{start}:{stop}]"
+        return f"{name}[{self.index}]"
+
+
+def parse_element_path(text: str) -> List[PathSegment]:
+    """The segments of an element path; raises BulkEditError if it isn't valid."""
+    segments = []
+    parts = [part.strip() for part in re.split(r"\.(?![^()]*\))", text.strip())]
+    for position, part in enumerate(parts):
+        match = _SEGMENT.match(part)
+        if match is None:
+            raise BulkEditError(f"{part!r} is not a keyword, tag or (group,creator,offset)")
+        index = match.group("index")
+        if index is not None and index != "*":
+            if ":" in index:
+                start, stop = index.split(":")
+                index = slice(int(start) if start else None, int(stop) if stop else None)
+            else:
+                index = int(index)
+        is_last = position == len(parts) - 1
+        if is_last == (index is not None):
+            raise BulkEditError(
+                f"{part}: the last part names the element to edit, without an index"
+                if is_last
+                else f"{part}: sequences need an item index, e.g. [*]"
+            )
+        if match.group("keyword"):
+            tag = datadict.tag_for_keyword(match.group("keyword"))
+            if tag is None:
+                raise BulkEditError(f"{match.group('keyword')} is not a DICOM keyword")
+            segments.append(PathSegment(tag=tag, index=index))
+        elif match.group("tag"):
+            segments.append(PathSegment(tag=int(match.group("tag"), 16), index=index))
+        else:
+            group = int(match.group("group"), 16)
+            if group % 2 == 0:
+                raise BulkEditError(f"{part}: private elements have an odd group")
+            segments.append(
+                PathSegment(
+                    group=group,
+                    private_creator=match.group("creator").strip(),
+                    offset=int(match.group("offset"), 16),
+                    index=index,
+                )
+            )
+    return segments
+
+
+def format_element_path(segments: List[PathSegment]) -> str:
+    return ".".join(segment.describe() for segment in segments)
+
+
+def find_matches(ds: Dataset, segments: List[PathSegment], create: bool = False) -> List[Tuple[Dataset, Optional[BaseTag]]]:
+    """(dataset, tag) of every element the path addresses in ds, which is not changed.
+
+    Items without the element are skipped, or with create included, with a tag of None if the private block
+    the element would go in is not there yet.
+    """
+    parents = [ds]
+    for segment in segments[:-1]:
+        items = []
+        for parent in parents:
+            tag = segment.resolve_tag(parent)
+            if tag is None or tag not in parent:
+                continue
+            sequence = parent[tag].value
+            if parent[tag].VR != VR.SQ:
+                raise BulkEditError(f"{segment.describe()} is not a sequence")
+            if segment.index == "*":
+                items.extend(sequence)
+            elif isinstance(segment.index, slice):
+                items.extend(sequence[segment.index])
+            elif -len(sequence) <= segment.index < len(sequence):
+                items.append(sequence[segment.index])
+        parents = items
+    matches = []
+    for parent in parents:
+        tag = segments[-1].resolve_tag(parent)
+        if create or (tag is not None and tag in parent):
+            matches.append((parent, tag))
+    return matches
+
+
+def _present(parent: Dataset, tag: Optional[BaseTag]) -> bool:
+    return tag is not None and tag in parent
+
+
+class _Evaluator(ast.NodeVisitor):
+    def __init__(self, x):
+        self.x = x
+
+    def visit_Expression(self, node):
+        return self.visit(node.body)
+
+    def visit_Constant(self, node):
+        if not isinstance(node.value, (int, float, str)):
+            raise BulkEditError(f"{node.value!r} can't be used in an expression")
+        return node.value
+
+    def visit_Name(self, node):
+        if node.id != "x":
+            raise BulkEditError(f"Unknown name {node.id}, use x for the current value")
+        return self.x
+
+    def visit_BinOp(self, node):
+        if type(node.op) not in _BINARY_OPERATORS:
+            raise BulkEditError(f"{type(node.op).__name__} is not supported")
+        return _BINARY_OPERATORS[type(node.op)](self.visit(node.left), self.visit(node.right))
+
+    def visit_UnaryOp(self, node):
+        if type(node.op) not in _UNARY_OPERATORS:
+            raise BulkEditError(f"{type(node.op).__name__} is not supported")
+        return _UNARY_OPERATORS[type(node.op)](self.visit(node.operand))
+
+    @staticmethod
+    def check_call(node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in _FUNCTIONS or node.keywords:
+            raise BulkEditError(f"Only {', '.join(_FUNCTIONS)} can be called")
+
+    def visit_Call(self, node):
+        self.check_call(node)
+        return _FUNCTIONS[node.func.id](*[self.visit(arg) for arg in node.args])
+
+    def generic_visit(self, node):
+        raise BulkEditError(f"{type(node).__name__} is not allowed in an expression")
+
+
+def compile_expression(expression: str) -> ast.Expression:
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as syntax_exc:
+        raise BulkEditError(f"{expression!r} is not a valid expression: {syntax_exc.msg}") from syntax_exc
+    # reject what isn't allowed before anything is changed
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.operator, ast.unaryop, ast.expr_context, ast.Expression)):
+            continue
+        if not isinstance(node, (ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant)):
+            raise BulkEditError(f"{type(node).__name__} is not allowed in an expression")
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Call):
+            _Evaluator.check_call(node)
+        elif isinstance(node, ast.Name) and node.id != "x" and node.id not in _FUNCTIONS:
+            raise BulkEditError(f"Unknown name {node.id}, use x for the current value")
+        elif isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, str)):
+            raise BulkEditError(f"{node.value!r} can't be used in an expression")
+    return tree
+
+
+def evaluate(tree: ast.Expression, x):
+    """The value of the compiled expression for x (a value, or an array of them)."""
+    with np.errstate(all="raise"):
+        try:
+            return _Evaluator(x).visit(tree)
+        except (ArithmeticError, FloatingPointError, TypeError, ValueError) as evaluate_exc:
+            if isinstance(evaluate_exc, BulkEditError):
+                raise
+            raise BulkEditError(f"Unable to evaluate the expression: {evaluate_exc}") from evaluate_exc
+
+
+def _as_number_array(values: List[Any]) -> Optional[np.ndarray]:
+    """values as one float array (2D for lists of the same length), or None if they aren't all numbers."""
+    try:
+        rows = [list(value) if isinstance(value, (list, MultiValue)) else value for value in values]
+        array = np.array(rows, dtype=np.float64)
+    except (TypeError, ValueError):
+        return None
+    return array if array.dtype == np.float64 else None
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or (isinstance(value, (list, MultiValue)) and not len(value))
+
+
+def cast_to_vr(value: Any, vr: str) -> Any:
+    """value as the Python type pydicom expects for vr, lists for multiple values."""
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [cast_to_vr(item, vr) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if vr in INTEGER_VRS:
+        return int(round(float(value)))
+    if vr in FLOAT_VRS:
+        return float(value)
+    if vr == VR.DS:
+        return DSfloat(float(value), auto_format=True)
+    return str(value)
+
+
+@dataclass
+class BulkEdit:
+    """Set the element at path (see the module docstring) in every item it addresses to expression of x.
+
+    With create, items lacking the element get it, computed from x = None (so use an expression without x).
+    """
+
+    path: str
+    expression: str
+    create: bool = False
+    segments: List[PathSegment] = field(init=False, repr=False)
+    tree: ast.Expression = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.segments = parse_element_path(self.path)
+        self.tree = compile_expression(self.expression)
+        self.uses_x = any(isinstance(node, ast.Name) and node.id == "x" for node in ast.walk(self.tree))
+
+    def matches(self, ds: Dataset) -> List[Tuple[Dataset, BaseTag]]:
+        return find_matches(ds, self.segments, create=False)
+
+    def apply(self, ds: Dataset) -> int:
+        """Edit ds, returning how many elements were set."""
+        matches = find_matches(ds, self.segments, create=self.create)
+        if self.uses_x:
+            # there is no x to compute from
+            matches = [
+                (parent, tag) for parent, tag in matches if not _present(parent, tag) or not _is_empty(parent[tag].value)
+            ]
+        if not matches:
+            return 0
+        values = [parent[tag].value if _present(parent, tag) else None for parent, tag in matches]
+        numeric = all(_present(parent, tag) and parent[tag].VR in NUMBER_VRS for parent, tag in matches)
+        array = _as_number_array(values) if numeric else None
+        if array is not None:
+            results = evaluate(self.tree, array)
+            results = np.broadcast_to(results, array.shape) if np.ndim(results) else [results] * len(values)
+        else:
+            results = [evaluate(self.tree, value) for value in values]
+        # every value is checked before anything (even a private block) is added
+        elements = [self._new_element(parent, tag, result) for (parent, tag), result in zip(matches, results)]
+        for (parent, tag), elem in zip(matches, elements):
+            if _present(parent, tag):
+                parent[tag].value = elem.value
+            else:
+                tag = self.segments[-1].resolve_tag(parent, create=True)
+                parent.add_new(tag, elem.VR, elem.value)
+        logger.info(f"Bulk edit {self.path} = {self.expression} set {len(matches)} elements")
+        return len(matches)
+
+    def _new_element(self, parent: Dataset, tag: Optional[BaseTag], result: Any) -> DataElement:
+        """The element at tag in parent with the value result, which must be valid for its VR.
+
+        A private element whose block is still to be created is given a stand-in tag, for checking its value.
+        """
+        vr = parent[tag].VR if _present(parent, tag) else self.segments[-1].vr()
+        if tag is None:
+            tag = Tag(self.segments[-1].group, 0x1000 | self.segments[-1].offset)
+        try:
+            return DataElement(tag, vr, cast_to_vr(result, vr), validation_mode=config.RAISE)
+        except (ArithmeticError, TypeError, ValueError) as cast_exc:
+            raise BulkEditError(f"{result!r} can't be a {vr} value: {cast_exc}") from cast_exc
@@ -0,0 +1,74 @@
+"""Tell when files that have appeared or changed in watched folders are complete, and which have gone.
+
+A file being written (exported by a planning system, or copied into a drop folder) is seen several times,
+growing.  ChangeDebouncer is given what a folder scan finds (see header_index.scan_folder) each time
+one is made, and reports a file only once its size and modification time have stayed the same for
+settle_seconds.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+# seconds a file's size and modification time have to stay the same before it is taken to be written
+SETTLE_SECONDS = 2.0
+
+Signature = Tuple[int, int]
+
+
+@dataclass
+class SettledChanges:
+    """Files that are new or changed, and written since; files that have gone."""
+
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.changed or self.removed)
+
+
+class ChangeDebouncer:
+    """Compare scans of the watched folders with the files as they were when watching started."""
+
+    def __init__(self, settle_seconds: float = SETTLE_SECONDS, clock: Callable[[], float] = time.monotonic):
+        self.settle_seconds = settle_seconds
+        self.clock = clock
+        # (size, mtime_ns) of the files as last reported (or as first seen)
+        self.known: Dict[str, Signature] = {}
+        # path -> (size, mtime_ns), when first seen so
+        self.pending: Dict[str, Tuple[Signature, float]] = {}
+
+    def start(self, found: Dict[str, Signature]):
+        """Take the files found as they are, and report only what changes from now on."""
+        self.known.update(found)
+
+    def observe(self, found: Dict[str, Signature]) -> SettledChanges:
+        """Note the files a scan of every watched folder found, and return those settled since and those gone."""
+        now = self.clock()
+        changes = SettledChanges()
+        for path, signature in found.items():
+            if self.known.get(path) == signature:
+                self.pending.pop(path, None)
+            elif path not in self.pending or self.pending[path][0] != signature:
+                self.pending[path] = (signature, now)
+        for path in [path for path in self.known if path not in found]:
+            del self.known[path]
+            self.pending.pop(path, None)
+            changes.removed.append(path)
+        for path, (signature, since) in list(self.pending.items()):
+            if path not in found:
+                # gone again before it was complete
+                del self.pending[path]
+            elif now - since >= self.settle_seconds:
+                del self.pending[path]
+                self.known[path] = signature
+                changes.changed.append(path)
+        changes.changed.sort()
+        return changes
+
+    def next_settle_in(self) -> float | None:
+        """Seconds until the next pending file could settle, None if none is pending."""
+        if not self.pending:
+            return None
+        earliest = min(since for _, since in self.pending.values())
+        return max(0.0, earliest + self.settle_seconds - self.clock())
@@ -0,0 +1,129 @@
+"""The datasets the editor has read, kept for showing a file again, within a memory cap.
+
+The least recently shown datasets are evicted (and simply read again when next shown) once the cache,
+together with the memory the caller holds outside it (the tree, unsaved edits), exceeds the cap.  When
+eviction alone can't bring memory under the cap, files are read with large values deferred (left on disk
+until used) until memory drops well below it again.
+"""
+
+import logging
+import os
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from pydicom import Dataset, dcmread
+
+from dcmqtreepy.memory_accounting import estimate_dataset_bytes, format_bytes
+from dcmqtreepy.session_store import DEFAULT_DEFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+# used when the size of physical memory can't be found
+DEFAULT_CAP_BYTES = 2 * 1024 * 1024 * 1024
+# share of physical memory the default cap allows
+DEFAULT_CAP_FRACTION = 0.25
+# deferring large values stops once memory drops below this share of the cap
+DEFER_UNTIL_FRACTION = 0.5
+
+
+def default_cap_bytes() -> int:
+    """DCMQTREEPY_MEMORY_LIMIT_MB if set, otherwise a quarter of physical memory."""
+    limit_mb = os.environ.get("DCMQTREEPY_MEMORY_LIMIT_MB")
+    if limit_mb:
+        return int(limit_mb) * 1024 * 1024
+    try:
+        physical_bytes = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):  # no sysconf on Windows
+        return DEFAULT_CAP_BYTES
+    return int(physical_bytes * DEFAULT_CAP_FRACTION) if physical_bytes > 0 else DEFAULT_CAP_BYTES
+
+
+@dataclass
+class CachedDataset:
+    dataset: Dataset
+    size_bytes: int
+    # size and modification time of the file when it was read
+    signature: Tuple[int, int]
+
+
+def _signature(path: Path) -> Tuple[int, int]:
+    stat = path.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DatasetCache:
+    def __init__(self, cap_bytes: Optional[int] = None, defer_size: int | str = DEFAULT_DEFER_SIZE):
+        self.cap_bytes = cap_bytes if cap_bytes is not None else default_cap_bytes()
+        self.defer_size = defer_size
+        # always defer large values, whatever the memory in use
+        self.defer_values = False
+        self._over_cap = False
+        self._entries: "OrderedDict[str, CachedDataset]" = OrderedDict()
+
+    @property
+    def deferring(self) -> bool:
+        """True while files are read with their large values deferred."""
+        return self.defer_values or self._over_cap
+
+    def read(self, path: Path | str) -> Dataset:
+        """The dataset of path, from the cache unless the file changed since it was read."""
+        path = Path(path)
+        signature = _signature(path)
+        entry = self._entries.get(str(path))
+        if entry is not None and entry.signature == signature:
+            self._entries.move_to_end(str(path))
+            return entry.dataset
+        ds = dcmread(path, force=True, defer_size=self.defer_size if self.deferring else None)
+        self._entries[str(path)] = CachedDataset(ds, estimate_dataset_bytes(ds), signature)
+        self._entries.move_to_end(str(path))
+        return ds
+
+    def cached(self, path: Path | str) -> Optional[Dataset]:
+        entry = self._entries.get(str(Path(path)))
+        return entry.dataset if entry is not None else None
+
+    def size_of(self, path: Path | str) -> Optional[int]:
+        """The estimated memory held by the dataset cached for path, None if there is none."""
+        entry = self._entries.get(str(Path(path)))
+        return entry.size_bytes if entry is not None else None
+
+    def discard(self, path: Path | str) -> None:
+        self._entries.pop(str(Path(path)), None)
+
+    def paths(self) -> List[str]:
+        """The cached paths, least recently read first."""
+        return list(self._entries)
+
+    def cached_bytes(self) -> int:
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def enforce(self, other_bytes: int = 0, protected: Iterable[str] = ()) -> List[str]:
+        """Evict datasets, least recently read first, until they and other_bytes fit within the cap.
+
+        Datasets of protected paths (e.g. the file shown, files with unsaved edits) are kept.  Returns the
+        evicted paths.
+        """
+        protected = {str(Path(path)) for path in protected}
+        total = self.cached_bytes() + other_bytes
+        evicted = []
+        for path in list(self._entries):
+            if total <= self.cap_bytes:
+                break
+            if path in protected:
+                continue
+            total -= self._entries.pop(path).size_bytes
+            evicted.append(path)
+        if evicted:
+            logger.info(f"Evicted {len(evicted)} datasets to stay within {format_bytes(self.cap_bytes)}")
+        if total > self.cap_bytes and not self._over_cap:
+            logger.warning(
+                f"{format_bytes(total)} in use is over the memory limit of {format_bytes(self.cap_bytes)}, "
+                f"deferring values over {self.defer_size}"
+            )
+            self._over_cap = True
+        elif self._over_cap and total < self.cap_bytes * DEFER_UNTIL_FRACTION:
+            logger.info(f"{format_bytes(total)} in use, no longer deferring large values")
+            self._over_cap = False
+        return evicted
@@ -0,0 +1,70 @@
+"""Structured paths into a pydicom Dataset.
+
+A node path is a tuple alternating between element tags and sequence item indices, e.g.
+``(0x300A00B0, 3, 0x300A0111)`` is the Control Point Sequence inside the fourth item of the Beam Sequence.
+Paths with an odd number of parts address a data element, paths with an even number of parts address
+a sequence item (the empty path is the root dataset).
+"""
+
+from typing import Dict, Optional, Tuple, Union
+
+from pydicom import DataElement, Dataset
+from pydicom.valuerep import VR
+
+from dcmqtreepy.memory_accounting import is_deferred
+
+NodePath = Tuple[int, ...]
+Node = Union[Dataset, DataElement]
+
+
+def is_item_path(path: NodePath) -> bool:
+    """True if the path addresses a dataset (the root or a sequence item) rather than an element."""
+    return len(path) % 2 == 0
+
+
+def path_key(path: NodePath) -> str:
+    """Flat string form of a path, e.g. '300a00b0.3.300a0111', suitable for use as a widget key."""
+    return ".".join(f"{part:08x}" if index % 2 == 0 else str(part) for index, part in enumerate(path))
+
+
+def parse_path_key(key: str) -> NodePath:
+    """Inverse of path_key."""
+    if not key:
+        return ()
+    return tuple(int(part, 16) if index % 2 == 0 else int(part) for index, part in enumerate(key.split(".")))
+
+
+def build_node_index(ds: Dataset) -> Dict[NodePath, Node]:
+    """Map the path of every sequence element and sequence item in ds to the node itself.
+
+    Only the nodes that can contain other nodes are indexed, so the index stays proportional to the
+    structure of the dataset rather than to the number of elements in it.  Deferred values are not read.
+    """
+    index: Dict[NodePath, Node] = {(): ds}
+    pending = [((), ds)]
+    while pending:
+        parent_path, dataset = pending.pop()
+        for tag in dataset.keys():
+            if is_deferred(dataset, tag):
+                continue
+            elem = dataset[tag]
+            if elem.VR != VR.SQ:
+                continue
+            elem_path = parent_path + (elem.tag,)
+            index[elem_path] = elem
+            for item_index, item in enumerate(elem.value):
+                item_path = elem_path + (item_index,)
+                index[item_path] = item
+                pending.append((item_path, item))
+    return index
+
+
+def resolve_path(ds: Dataset, path: NodePath) -> Optional[Node]:
+    """Walk ds along path without an index, returning None if the path no longer exists."""
+    current: Node = ds
+    try:
+        for index, part in enumerate(path):
+            current = current[part] if index % 2 == 0 else current.value[part]
+    except (KeyError, IndexError, TypeError):
+        return None
+    return current
@@ -2,10 +2,15 @@
 # This Python file uses the following encoding: utf-8
 import atexit
 import logging
+import multiprocessing
 import os
+import shutil
+import sqlite3
 import sys
+import tempfile
 from decimal import Decimal
 from pathlib import Path
+from typing import Callable, Dict, List, Set, Tuple
 
 import platformdirs
 import pydicom.config
@@ -16,20 +21,39 @@ from dcm_mini_viewer.config.preferences_manager import (
 )
 from dcm_mini_viewer.main import MainWindow as DcmMiniViewer
 from pydicom import DataElement, Dataset, Sequence, dcmread, dcmwrite
+from pydicom.dataelem import RawDataElement
+from pydicom.dataset import FileMetaDataset
+from pydicom.errors import InvalidDicomError
+from pydicom.tag import Tag
 from pydicom.valuerep import VR
 from pynetdicom.presentation import build_context
 
 # pylint: disable=no-name-in-module
-from PySide6.QtCore import QEvent, Qt, Slot
-from PySide6.QtGui import QAction, QKeyEvent, QKeySequence, QShortcut
+from PySide6.QtCore import (
+    QEvent,
+    QModelIndex,
+    QObject,
+    Qt,
+    QThreadPool,
+    QTimer,
+    Signal,
+    Slot,
+)
+from PySide6.QtGui import QAction, QActionGroup, QKeyEvent, QKeySequence, QShortcut
 from PySide6.QtWidgets import (  # pylint: disable=no-name-in-module
+    QAbstractItemView,
     QApplication,
+    QDialog,
     QFileDialog,
-    QListWidgetItem,
+    QHeaderView,
+    QInputDialog,
+    QLabel,
     QMainWindow,
     QMenu,
     QMenuBar,
     QMessageBox,
+    QProgressBar,
+    QPushButton,
     QTreeWidget,
     QTreeWidgetItem,
     QTreeWidgetItemIterator,
@@ -38,15 +62,118 @@ from PySide6.QtWidgets import (  # pylint: disable=no-name-in-module
 
 from dcmqtreepy.add_private_element_dialog import AddPrivateElementDialog
 from dcmqtreepy.add_public_element_dialog import AddPublicElementDialog
+from dcmqtreepy.array_editor_dialog import ArrayEditorDialog
+from dcmqtreepy.atomic_save import ProgressFile, atomic_write
+from dcmqtreepy.bulk_edit import BulkEdit, BulkEditError
+from dcmqtreepy.dataset_cache import DatasetCache
+from dcmqtreepy.dataset_paths import NodePath, resolve_path
+from dcmqtreepy.dicomdir_index import DicomDirIndex, is_dicomdir
+from dcmqtreepy.file_groups import FILE
+from dcmqtreepy.file_navigator import FileFilterModel, FileNavigatorModel, NavigatorNode
+from dcmqtreepy.find_replace_dialog import FindReplaceDialog
+from dcmqtreepy.folder_watcher import FolderWatcher
+from dcmqtreepy.header_index import (
+    SORT_KEYS,
+    HeaderIndex,
+    HeaderRecord,
+    has_dicom_magic,
+    index_path,
+)
 from dcmqtreepy.import_hex_legible_private_element_lists import (
     pydicom_private_dicts_from_json,
 )
+from dcmqtreepy.in_place_patch import (
+    BACKUP_SUFFIX,
+    patch_in_place,
+    recover_interrupted_patch,
+)
+from dcmqtreepy.index_worker import IndexWorker
+from dcmqtreepy.instrumentation import (
+    add_listener,
+    configure_from_environment,
+    is_enabled,
+    is_tracing,
+    remove_listener,
+    set_enabled,
+    span,
+    trace_event_count,
+    write_chrome_trace,
+)
 from dcmqtreepy.mainwindow import Ui_MainWindow
+from dcmqtreepy.memory_accounting import (
+    BINARY_VRS,
+    estimate_dataset_bytes,
+    estimate_tree_bytes,
+    format_bytes,
+    is_deferred,
+    stored_item,
+)
 from dcmqtreepy.new_privates import new_private_dictionaries
+from dcmqtreepy.numeric_array import ArrayValue, is_large_array, values_per_row
+from dcmqtreepy.preserving_writer import (
+    can_preserve_encoding,
+    write_preserving_encoding,
+)
 from dcmqtreepy.qt_assistant_launcher import HelpAssistant
+from dcmqtreepy.query_dialog import QueryRetrieveDialog
+from dcmqtreepy.save_queue import SaveJob, copy_job
+from dcmqtreepy.save_worker import BatchSaveWorker, SaveWorker
+from dcmqtreepy.send_worker import SendWorker
+from dcmqtreepy.sequence_table import SequenceTable
+from dcmqtreepy.sequence_table_dialog import SequenceTableDialog
+from dcmqtreepy.storage_scp import DEFAULT_PORT, StorageReceiver
+from dcmqtreepy.storage_scu import (
+    SendItem,
+    destinations_path,
+    load_destinations,
+    parse_destination,
+)
+from dcmqtreepy.viewer_handoff import (
+    hand_off,
+    needs_scratch_file,
+    scratch_path,
+    write_scratch_file,
+)
 
 logger = logging.getLogger(__name__)
 
+# how often, and how many at a time, instances received by the storage receiver are added to the file list
+RECEIVE_POLL_MILLISECONDS = 250
+RECEIVE_BATCH_SIZE = 500
+
+
+def load_private_dictionaries(json_privates_file: Path | str = "local_privates.json"):
+    """Register the private dictionaries that ship with dcmQTreePy, and those in json_privates_file if it exists."""
+    with span("load private dictionaries"):
+        logging.info("Loading Known Private Dictionaries")
+        with span("known private dictionaries"):
+            for creator, private_dict in new_private_dictionaries.items():
+                try:
+                    pydicom.datadict.add_private_dict_entries(creator, private_dict)
+                    logging.warning(f"Private dictionary for {creator} has been loaded")
+                except ValueError:
+                    logging.error(f"Unable to load private dictionary for {creator}")
+
+        if Path(json_privates_file).exists():
+            logging.info(f"Loading Private Dictionaries from {json_privates_file}")
+
+            try:
+                with span("private dictionaries from json"):
+                    private_dictionaries_from_json = pydicom_private_dicts_from_json(json_privates_file)
+                    for creator, private_dict in private_dictionaries_from_json.items():
+                        try:
+                            pydicom.datadict.add_private_dict_entries(creator, private_dict)
+                            logging.warning(f"Private dictionary for {creator} has been loaded")
+                        except ValueError:
+                            logging.error(f"Unable to load private dictionary for {creator}")
+            except Exception as json_privates_exc:
+                logging.error(json_privates_exc)
+
+
+class TimingSignals(QObject):
+    # description of an operation's timing, emitted from the thread it ran on
+    operation_timed = Signal(str)
+
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -78,10 +205,24 @@ class DCMQtreePy(QMainWindow):
         # header.setStretchLastSection(False)
         # header.setSectionResizeMode(5, QHeaderView.Stretch)
         self.dcm_tree_widget.itemDoubleClicked.connect(self.on_tree_widget_item_double_clicked)
-        self.ui.listWidget.itemSelectionChanged.connect(self.on_item_selection_changed)
+        self.dcm_tree_widget.itemChanged.connect(self.on_tree_item_changed)
+        # the listed files, grouped by patient, study and series as their headers are read
+        self.file_model = FileNavigatorModel(self)
+        self.file_filter_model = FileFilterModel(self)
+        self.file_filter_model.setSourceModel(self.file_model)
+        self.ui.fileTreeView.setModel(self.file_filter_model)
+        self.ui.fileTreeView.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        file_header = self.ui.fileTreeView.header()
+        file_header.setStretchLastSection(False)
+        file_header.setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        file_header.setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
+        self.ui.fileTreeView.selectionModel().currentChanged.connect(self.on_current_file_changed)
+        self.ui.fileFilterEdit.textChanged.connect(self.on_file_filter_changed)
+        # set while the navigator regroups files, which moves the current one
+        self.changing_file_list = False
         #     self.tree_del_shortcut = QShortcut(QKeySequence.StandardKey.Delete, self.dcm_tree_widget)
         #     self.tree_del_shortcut.activated.connect(self.handle_tree_delete_pressed)
-        self.file_list_shortcut = QShortcut(QKeySequence.StandardKey.Delete, self.ui.listWidget)
+        self.file_list_shortcut = QShortcut(QKeySequence.StandardKey.Delete, self.ui.fileTreeView)
         self.file_list_shortcut.activated.connect(self.handle_file_list_delete_pressed)
         #     self.del_shortcut = QShortcut(QKeySequence.StandardKey.Delete, self)
         #     self.del_shortcut.activated.connect(lambda : QMessageBox.information(self,
@@ -89,40 +230,147 @@ class DCMQtreePy(QMainWindow):
         self.ui.actionOpen.triggered.connect(self.on_file_open)
         self.ui.actionSave.triggered.connect(self.on_file_save)
         self.ui.actionSave_As.triggered.connect(self.on_file_save_as)
+        self.action_save_all = QAction("Save All", self)
+        self.action_save_all.triggered.connect(self.on_file_save_all)
+        self.ui.menuMain_Window.insertAction(self.ui.actionSave_As, self.action_save_all)
+        self.action_export_selected = QAction("Export Selected To Folder...", self)
+        self.action_export_selected.triggered.connect(self.on_file_export_selected)
+        self.ui.menuMain_Window.insertAction(self.ui.actionSave_As, self.action_export_selected)
+        self.action_send_to = QAction("Send To...", self)
+        self.action_send_to.triggered.connect(self.on_file_send_to)
+        self.ui.menuMain_Window.insertAction(self.ui.actionSave_As, self.action_send_to)
+        self.send_worker: SendWorker | None = None
+        self.action_query_retrieve = QAction("Query/Retrieve...", self)
+        self.action_query_retrieve.triggered.connect(self.on_file_query_retrieve)
+        self.ui.menuMain_Window.insertAction(self.ui.actionSave, self.action_query_retrieve)
+        self.query_dialog: QueryRetrieveDialog | None = None
+        self.action_find_replace = QAction("Find and Replace...", self)
+        self.action_find_replace.triggered.connect(self.on_file_find_replace)
+        self.ui.menuMain_Window.insertAction(self.ui.actionSave, self.action_find_replace)
+        self.find_replace_dialog: FindReplaceDialog | None = None
+        self.action_open_folder = QAction("Open Folder...", self)
+        self.action_open_folder.triggered.connect(self.on_file_open_folder)
+        self.ui.menuMain_Window.insertAction(self.action_query_retrieve, self.action_open_folder)
+        self.action_open_dicomdir = QAction("Open DICOMDIR...", self)
+        self.action_open_dicomdir.triggered.connect(self.on_file_open_dicomdir)
+        self.ui.menuMain_Window.insertAction(self.action_query_retrieve, self.action_open_dicomdir)
+        self.action_watch_folder = QAction("Watch Folder...", self)
+        self.action_watch_folder.triggered.connect(self.on_file_watch_folder)
+        self.ui.menuMain_Window.insertAction(self.action_query_retrieve, self.action_watch_folder)
+        self.action_stop_watching = QAction("Stop Watching Folders", self)
+        self.action_stop_watching.setEnabled(False)
+        self.action_stop_watching.triggered.connect(self.on_file_stop_watching)
+        self.ui.menuMain_Window.insertAction(self.action_query_retrieve, self.action_stop_watching)
+        self.send_failures: List[str] = []
         self.ui.actionAdd_Element.triggered.connect(self.on_add_element)
         self.ui.actionAdd_Private_Element.triggered.connect(self.on_add_private_element)
         self.ui.actionDelete.triggered.connect(self.handle_file_list_delete_pressed)
         self.ui.actionDelete_Element.triggered.connect(self.handle_tree_delete_pressed)
+        self.action_table_view = QAction("Sequence As Table...", self)
+        self.action_table_view.triggered.connect(self.on_table_view)
+        self.ui.menuEdit.addAction(self.action_table_view)
+        self.action_bulk_edit = QAction("Bulk Edit...", self)
+        self.action_bulk_edit.triggered.connect(self.on_bulk_edit)
+        self.ui.menuEdit.addAction(self.action_bulk_edit)
         self.ui.actionView_Image.triggered.connect(self.on_view_image)
+        self.action_preserve_encoding = QAction("Preserve Original Encoding", self)
+        self.action_preserve_encoding.setCheckable(True)
+        self.ui.menuOptions.addAction(self.action_preserve_encoding)
+        self.action_backup_on_patch = QAction("Back Up Files Patched In Place", self)
+        self.action_backup_on_patch.setCheckable(True)
+        self.ui.menuOptions.addAction(self.action_backup_on_patch)
+        self.action_patch_copy = QAction("Patch In Place Through a Copy", self)
+        self.action_patch_copy.setCheckable(True)
+        # patching in place writes only the changed bytes, journalled, so a crash can't leave a file half patched
+        self.ui.menuOptions.addAction(self.action_patch_copy)
+        self.action_receive_dicom = QAction("Receive DICOM (Storage SCP)...", self)
+        self.action_receive_dicom.setCheckable(True)
+        self.action_receive_dicom.toggled.connect(self.on_receive_dicom_toggled)
+        self.ui.menuOptions.addAction(self.action_receive_dicom)
+        self.action_time_operations = QAction("Time Operations", self)
+        self.action_time_operations.setCheckable(True)
+        self.action_time_operations.setChecked(is_enabled())
+        self.action_time_operations.toggled.connect(self.on_time_operations_toggled)
+        self.ui.menuOptions.addAction(self.action_time_operations)
+        self.action_record_trace = QAction("Record Timing Trace", self)
+        self.action_record_trace.setCheckable(True)
+        self.action_record_trace.setChecked(is_tracing())
+        self.action_record_trace.toggled.connect(self.on_time_operations_toggled)
+        self.ui.menuOptions.addAction(self.action_record_trace)
+        self.action_export_trace = QAction("Export Timing Trace...", self)
+        self.action_export_trace.triggered.connect(self.on_export_trace)
+        self.ui.menuOptions.addAction(self.action_export_trace)
+        self.action_memory_limit = QAction("Memory Limit...", self)
+        self.action_memory_limit.triggered.connect(self.on_memory_limit)
+        self.ui.menuOptions.addAction(self.action_memory_limit)
+        self.action_defer_values = QAction("Defer Large Values", self)
+        self.action_defer_values.setCheckable(True)
+        self.action_defer_values.toggled.connect(self.on_defer_values_toggled)
+        self.ui.menuOptions.addAction(self.action_defer_values)
+        sort_menu = self.ui.menuOptions.addMenu("Sort File List By")
+        self.file_list_sort_group = QActionGroup(self)
+        for column, label in [(None, "Not Sorted")] + SORT_KEYS:
+            action = sort_menu.addAction(label)
+            action.setCheckable(True)
+            action.setChecked(column is None)
+            action.triggered.connect(lambda checked, column=column: self.on_sort_file_list(column))
+            self.file_list_sort_group.addAction(action)
+        self.timing_signals = TimingSignals(self)
+        self.timing_signals.operation_timed.connect(self.handle_operation_timed)
+        add_listener(self.report_timing)
+        self.storage_receiver: StorageReceiver | None = None
+        self.receive_port = DEFAULT_PORT
+        self.receive_timer = QTimer(self)
+        self.receive_timer.setInterval(RECEIVE_POLL_MILLISECONDS)
+        self.receive_timer.timeout.connect(self.add_received_files)
+        self.save_thread_pool = QThreadPool(self)
+        self.pending_saves: Dict[Path, List[SaveWorker]] = {}
+        self.save_progress_bar = QProgressBar()
+        self.save_progress_bar.setMaximumWidth(200)
+        self.save_progress_bar.hide()
+        self.ui.statusbar.addPermanentWidget(self.save_progress_bar)
+        # edits to files other than the one in the tree: path -> (dataset as read, dataset with the edits)
+        self.unsaved_edits: Dict[str, Tuple[Dataset, Dataset]] = {}
+        # files with unsaved edits (stashed or in the tree) that were rewritten on disk after they were read
+        self.changed_on_disk: Set[str] = set()
+        # datasets read, for showing files again, and the memory held outside the cache
+        self.dataset_cache = DatasetCache()
+        self.tree_bytes = 0
+        self.unsaved_edit_bytes: Dict[str, int] = {}
+        self.memory_report_paths: Set[str] = set()
+        self.memory_label = QLabel()
+        self.ui.statusbar.addPermanentWidget(self.memory_label)
+        # headers of the listed files (see header_index), for grouping and sorting them and their tooltips
+        self.header_index = self.open_header_index()
+        self.index_worker: IndexWorker | None = None
+        self.pending_header_paths: List[str] = []
+        self.pending_index_folders: List[Path] = []
+        self.index_progress_bar = QProgressBar()
+        self.index_progress_bar.setMaximumWidth(200)
+        self.index_progress_bar.hide()
+        self.ui.statusbar.addPermanentWidget(self.index_progress_bar)
+        self.index_cancel_button = QPushButton("Cancel")
+        self.index_cancel_button.clicked.connect(self.on_cancel_open_folder)
+        self.index_cancel_button.hide()
+        self.ui.statusbar.addPermanentWidget(self.index_cancel_button)
+        # files arriving in, or rewritten in, the folders watched are added or shown again
+        self.folder_watcher = FolderWatcher(parent=self)
+        self.folder_watcher.files_changed.connect(self.handle_watched_files_changed)
+        self.folder_watcher.files_removed.connect(self.handle_watched_files_removed)
+        # (size, mtime_ns) of the files the editor has just written, so the watcher's report of them is ignored
+        self.own_writes: Dict[str, Tuple[int, int]] = {}
+        self.batch_save_worker: BatchSaveWorker | None = None
+        self.batch_save_errors: List[str] = []
         self.previous_path = Path().home()
         self.previous_save_path = Path().home()
         self.current_list_item = None
         self.reverting_list_item = False
         self.current_dataset = Dataset()
+        # changed whenever what the tree shows changes, to tell whether a save holds the tree as it is
+        self.tree_generation = 0
         self.has_edits = False
         pydicom.config.Settings.writing_validation_mode = pydicom.config.RAISE
-        logging.info("Loading Known Private Dictionaries")
-        for creator, private_dict in new_private_dictionaries.items():
-            try:
-                pydicom.datadict.add_private_dict_entries(creator, private_dict)
-                logging.warning(f"Private dictionary for {creator} has been loaded")
-            except ValueError:
-                logging.error(f"Unable to load private dictionary for {creator}")
-
-        json_privates_file = "local_privates.json"
-        if Path(json_privates_file).exists():
-            logging.info(f"Loading Private Dictionaries from {json_privates_file}")
-
-            try:
-                private_dictionaries_from_json = pydicom_private_dicts_from_json(json_privates_file)
-                for creator, private_dict in private_dictionaries_from_json.items():
-                    try:
-                        pydicom.datadict.add_private_dict_entries(creator, private_dict)
-                        logging.warning(f"Private dictionary for {creator} has been loaded")
-                    except ValueError:
-                        logging.error(f"Unable to load private dictionary for {creator}")
-            except Exception as json_privates_exc:
-                logging.error(json_privates_exc)
+        load_private_dictionaries()
 
         # In __init__ after setting up the UI
         self.installEventFilter(self)
@@ -149,7 +397,7 @@ class DCMQtreePy(QMainWindow):
         self.ui.actionDelete_Element.setProperty("help_id", "delete_element")
 
         self.dcm_tree_widget.setProperty("help_id", "dicom_tree")
-        self.ui.listWidget.setProperty("help_id", "file_list")
+        self.ui.fileTreeView.setProperty("help_id", "file_list")
 
         # pydicom.datadict.add_private_dict_entries("IMPAC", impac_privates.impac_private_dict)
         # Track current menu context
@@ -169,6 +417,11 @@ class DCMQtreePy(QMainWindow):
         self.image_viewer_prefs = MiniViewerPrefs()
         self.image_viewer_prefs.initialize()
         self.image_viewer = DcmMiniViewer(self.image_viewer_prefs)
+        # edited datasets are written here for the viewer, which can only load files (see viewer_handoff);
+        # readable only by this user, as they may hold patient data
+        self.viewer_scratch_dir = Path(tempfile.mkdtemp(prefix="dcmQTreePy-viewer-"))
+        atexit.register(shutil.rmtree, self.viewer_scratch_dir, True)
+        self.viewer_write_worker: SaveWorker | None = None
 
     def setup_action_help(self):
         """Set up context-sensitive help for all menu actions"""
@@ -176,10 +429,43 @@ class DCMQtreePy(QMainWindow):
         self.ui.actionOpen.setWhatsThis("Opens a DICOM file")
         self.ui.actionSave.setWhatsThis("Saves the current DICOM file")
         self.ui.actionSave_As.setWhatsThis("Saves the current DICOM file with a new name")
+        self.action_save_all.setWhatsThis("Saves every file in the list that has unsaved edits (shown in bold)")
+        self.action_export_selected.setWhatsThis("Writes the selected files, with any unsaved edits, into a folder")
+        self.action_query_retrieve.setWhatsThis(
+            "Searches a DICOM archive (C-FIND) and retrieves the selected matches (C-GET or C-MOVE) into the file list"
+        )
+        self.action_send_to.setWhatsThis(
+            "Sends the selected files, with any unsaved edits, to a DICOM node (C-STORE). "
+            f"Nodes are named in {destinations_path()}, or enter AE@host:port"
+        )
         self.ui.actionAdd_Element.setWhatsThis("Adds a new public DICOM element")
         self.ui.actionAdd_Private_Element.setWhatsThis("Adds a new private DICOM element")
         self.ui.actionDelete.setWhatsThis("Deletes the selected item")
         self.ui.actionDelete_Element.setWhatsThis("Deletes the selected DICOM element")
+        self.action_preserve_encoding.setWhatsThis(
+            "Saves in the transfer syntax of the original file, copying unchanged elements (e.g. pixel data) as they are"
+        )
+        self.action_backup_on_patch.setWhatsThis(
+            "When edits keep their length and are patched directly into the original file "
+            "(Patch In Place Through a Copy unchecked), keeps a .bak copy of the whole file first.  Not needed to "
+            "recover from a crash: the bytes being patched are journalled and put back when the file is next opened"
+        )
+        self.action_patch_copy.setWhatsThis(
+            "When edits keep their length, patches a copy of the file that then replaces it, rather than writing "
+            "just the changed bytes into the file itself (slower for large files, which are copied in full)"
+        )
+        self.action_time_operations.setWhatsThis(
+            "Times opening, saving and viewing files, showing where the time went in the status bar and the log"
+        )
+        self.action_record_trace.setWhatsThis(
+            "While timing, also records every timed step, to be exported with Export Timing Trace"
+        )
+        self.action_export_trace.setWhatsThis(
+            "Writes the recorded timing steps as a Chrome trace (open with chrome://tracing or ui.perfetto.dev)"
+        )
+        self.action_receive_dicom.setWhatsThis(
+            "Accepts DICOM instances sent (C-STORE) to this computer on the chosen port, adding them to the file list"
+        )
 
         # Also map these actions to help context IDs for F1 help
         self.ui.actionOpen.setProperty("help_id", "open_file")
@@ -264,8 +550,32 @@ class DCMQtreePy(QMainWindow):
                 seq_child_item.setText(4, elem.keyword)
                 self._populate_tree_widget_item_from_dataset(seq_child_item, seq_item)
 
+    @staticmethod
+    def _element_for_tree(ds: Dataset, tag, with_value: bool = True) -> DataElement:
+        """The element for tag in ds, without converting (or reading, if deferred) a value the tree won't show."""
+        raw = stored_item(ds, tag)
+        if not isinstance(raw, RawDataElement) or (with_value and not is_deferred(ds, tag)):
+            return ds[tag]
+        try:
+            vr = raw.VR or pydicom.datadict.dictionary_VR(tag)
+        except KeyError:
+            vr = VR.UN
+        if with_value and vr not in BINARY_VRS:
+            return ds[tag]
+        elem = DataElement(tag, vr, None)
+        if elem.tag.is_private and not elem.tag.is_private_creator:
+            creator = stored_item(ds, (elem.tag.group << 16) | (elem.tag.element >> 8))
+            if creator is not None:
+                elem.private_creator = ds[creator.tag].value
+        return elem
+
     def _populate_tree_widget_item_from_dataset(self, parent: QTreeWidgetItem | QTreeWidget, ds: Dataset):
-        for elem in ds:
+        for tag in sorted(ds.keys()):
+            array_value = None
+            if is_large_array(ds, tag) and not (is_deferred(ds, tag) and stored_item(ds, tag).VR in BINARY_VRS):
+                # shown as a summary, and edited as a table (see on_tree_widget_item_double_clicked)
+                array_value = ArrayValue.from_dataset(ds, tag)
+            elem = self._element_for_tree(ds, tag, with_value=array_value is None)
             if elem.VR != VR.SQ:
                 tree_child_item = QTreeWidgetItem(parent)
                 tree_child_item.setFlags(Qt.ItemFlag.ItemIsEditable | Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled)
@@ -280,6 +590,9 @@ class DCMQtreePy(QMainWindow):
                     logging.warning("Need to stash away OB/OW type values")
                 tree_child_item.setText(3, str(elem.VR))
                 tree_child_item.setText(4, elem.keyword)
+                if array_value is not None:
+                    tree_child_item.setText(2, array_value.describe())
+                    tree_child_item.setData(2, Qt.ItemDataRole.UserRole, array_value)
             else:
                 tree_child_item = QTreeWidgetItem(parent)
                 tree_child_item.setText(0, str(elem.tag))
@@ -324,6 +637,17 @@ class DCMQtreePy(QMainWindow):
             private_block = None
         tag = tree_widget_item.text(4)  # keyword
 
+        array_value = tree_widget_item.data(2, Qt.ItemDataRole.UserRole)
+        if isinstance(array_value, ArrayValue):
+            if not is_private:
+                parent_ds[Tag(tag)] = array_value.element(Tag(tag))
+            elif private_block is not None:
+                element_tag = private_block.get_tag(private_block_byte)
+                parent_ds[element_tag] = array_value.element(element_tag)
+            else:
+                logging.error(f"No private creator for private element {group:04x},{private_block_byte:02x}, not saved")
+            return private_block
+
         if vr_as_string == "SQ":
             if value_as_string is None or value_as_string == "":
                 #    seq_elem = DataElement(tag=tag,VR=vr_as_string,value=Sequence())
@@ -445,46 +769,199 @@ class DCMQtreePy(QMainWindow):
         elem_hex_as_string = first_split.split(",")[1].split(")")[0]
         return (int(group, 16), int(elem_hex_as_string, 16))
 
+    @property
+    def has_edits(self) -> bool:
+        return self._has_edits
+
+    @has_edits.setter
+    def has_edits(self, has_edits: bool):
+        self._has_edits = has_edits
+        self.tree_generation += 1
+
     def _isEditable(self, column: int) -> bool:
         return column == 2
 
-    def on_item_selection_changed(self):
+    @Slot(QModelIndex, QModelIndex)
+    def on_current_file_changed(self, current: QModelIndex, previous: QModelIndex):
         if self.reverting_list_item:
             self.reverting_list_item = False
             return
-        prev_item = self.current_list_item
-        if self.has_edits:
-            button = self.non_native_warning_message(
-                title="Current Tree Has Edits",
-                text="Continuing will lose current edits",
-                buttons=QMessageBox.Ok | QMessageBox.Cancel,
-            )
-            if button == QMessageBox.Cancel:
-                if prev_item is not None:
-                    self.reverting_list_item = True
-                    self.ui.listWidget.setCurrentItem(prev_item)
-                return
-        current_item = self.ui.listWidget.currentItem()
+        if self.changing_file_list or not current.isValid():
+            return
+        current_item = self.file_filter_model.node(current)
+        if current_item.kind != FILE or current_item is self.current_list_item:
+            return
+        # edits to the file being left are kept, to be shown again or saved with Save All
+        self.stash_current_edits()
         self.current_list_item = current_item
-        self.populate_tree_widget_from_file(current_item.text())
+        self.show_file(self.list_item_path(current_item))
 
     def on_tree_widget_item_double_clicked(self, item: QTreeWidgetItem, column: int):
-        if self._isEditable(column):
+        array_value = item.data(2, Qt.ItemDataRole.UserRole)
+        if isinstance(array_value, ArrayValue):
+            self.edit_array_value(item, array_value)
+        elif self._isEditable(column):
             self.dcm_tree_widget.editItem(item, column)
         else:
             print(f"Column {column} is not editable")
 
+    def dataset_for_viewer(self) -> Dataset:
+        """The dataset shown in the tree, with its edits, sharing the (pixel) values of the file as read."""
+        if not self.has_edits:
+            return self.current_dataset
+        ds = self._dataset_from_tree()
+        # the viewer decodes the pixels in the transfer syntax they were read in
+        if hasattr(self.current_dataset, "file_meta"):
+            ds.file_meta = self.current_dataset.file_meta
+        ds.is_little_endian = self.current_dataset.is_little_endian
+        ds.is_implicit_VR = self.current_dataset.is_implicit_VR
+        return ds
+
+    def _private_creator_of_item(self, item: QTreeWidgetItem) -> str | None:
+        group, element = self._convert_tag_as_string_to_tuple(item.text(0))
+        if group % 2 == 0 or item.parent() is None:
+            return None
+        creator_tag = (group, element >> 8)
+        parent = item.parent()
+        for index in range(parent.childCount()):
+            sibling = parent.child(index)
+            if self._convert_tag_as_string_to_tuple(sibling.text(0)) == creator_tag:
+                return sibling.text(2)
+        return None
+
+    def edit_array_value(self, item: QTreeWidgetItem, array_value: ArrayValue):
+        """Edit a large numeric value in a table, rather than as one long line of text."""
+        tag = Tag(self._convert_tag_as_string_to_tuple(item.text(0)))
+        width = values_per_row(tag, self._private_creator_of_item(item))
+        dialog = ArrayEditorDialog(f"{item.text(1)} {item.text(0)}", array_value.array, width, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted and dialog.changed:
+            array_value.replace(dialog.array)
+            item.setText(2, array_value.describe())
+            self.has_edits = True
+
+    def _tree_item_path(self, item: QTreeWidgetItem) -> NodePath:
+        """The path (see dataset_paths) of the element or sequence item shown by item."""
+        parts = []
+        while item is not None and item.parent() is not None:  # the top item names the SOP Class
+            if item.text(3) == "SQ" and item.text(2):
+                parts.append(int(item.text(2)) - 1)  # sequence items are numbered from 1
+            else:
+                parts.append(Tag(self._convert_tag_as_string_to_tuple(item.text(0))))
+            item = item.parent()
+        return tuple(reversed(parts))
+
+    def on_table_view(self):
+        """Show the sequence holding the selected element as a table, a row per item."""
+        selected = self.dcm_tree_widget.selectedItems()
+        item = selected[0] if selected else None
+        while item is not None and not (item.text(3) == "SQ" and not item.text(2)):
+            item = item.parent()
+        if item is None:
+            self.ui.statusbar.showMessage("Select a sequence, or an element within one, to show as a table", 5000)
+            return
+        modified_ds = self._dataset_from_tree()
+        sequence = resolve_path(modified_ds, self._tree_item_path(item))
+        if sequence is None:
+            self.ui.statusbar.showMessage(f"Unable to find {item.text(1)} in the edited dataset", 5000)
+            return
+        table = SequenceTable(sequence.value)
+        dialog = SequenceTableDialog(f"{item.text(1)} {item.text(0)}", table, self)
+        if dialog.exec() == QDialog.DialogCode.Accepted and dialog.edit_count:
+            self.populate_tree_widget_from_dataset(modified_ds)
+            self.has_edits = True
+            self.ui.statusbar.showMessage(f"{dialog.edit_count} values set from the table", 5000)
+
+    def _element_path_text(self, item: QTreeWidgetItem) -> str:
+        """The bulk edit path (see bulk_edit) of the element shown by item, in every item of its sequences."""
+        parts = []
+        while item is not None and item.parent() is not None:
+            if item.text(3) == "SQ" and item.text(2):
+                # the index goes on the sequence, and every item rather than just this one is edited
+                item = item.parent()
+                parts.append(f"{self._element_path_part(item)}[*]")
+            else:
+                parts.append(self._element_path_part(item))
+            item = item.parent()
+        return ".".join(reversed(parts))
+
+    def _element_path_part(self, item: QTreeWidgetItem) -> str:
+        group, element = self._convert_tag_as_string_to_tuple(item.text(0))
+        private_creator = self._private_creator_of_item(item)
+        if private_creator:
+            return f"({group:04X},{private_creator},{element & 0xFF:02X})"
+        return pydicom.datadict.keyword_for_tag((group << 16) | element) or f"{group:04X}{element:04X}"
+
+    def on_bulk_edit(self):
+        """Set an element in every item of its sequences to an expression of its value, e.g. x + 10."""
+        selected = self.dcm_tree_widget.selectedItems()
+        suggested = ""
+        if selected and selected[0].parent() is not None and not (selected[0].text(3) == "SQ" and selected[0].text(2)):
+            suggested = self._element_path_text(selected[0])
+        path, ok = QInputDialog.getText(
+            self, "Bulk Edit", "Element path, e.g. IonBeamSequence[*].IonControlPointSequence[*].GantryAngle:", text=suggested
+        )
+        if not ok or not path.strip():
+            return
+        expression, ok = QInputDialog.getText(self, "Bulk Edit", f"New value of {path} from its value x, e.g. x + 10:")
+        if not ok or not expression.strip():
+            return
+        modified_ds = self._dataset_from_tree()
+        try:
+            with span("bulk edit", path=path):
+                count = BulkEdit(path, expression).apply(modified_ds)
+        except BulkEditError as bulk_edit_exc:
+            QMessageBox.warning(self, "Bulk Edit", str(bulk_edit_exc))
+            return
+        if not count:
+            self.ui.statusbar.showMessage(f"No {path} found", 5000)
+            return
+        self.populate_tree_widget_from_dataset(modified_ds)
+        self.has_edits = True
+        self.ui.statusbar.showMessage(f"{count} values of {path} set to {expression}", 5000)
+
     def on_view_image(self):
         if not self.current_list_item:
             return
+        file_path = self.current_list_item.path
+        dataset = self.dataset_for_viewer()
+        if not needs_scratch_file(self.image_viewer.dicom_handler, self.has_edits):
+            self.show_in_viewer(dataset, file_path)
+            return
+        if self.viewer_write_worker is not None:
+            self.ui.statusbar.showMessage("Wait for the image being prepared for the viewer", 5000)
+            return
+        # the viewer reads the edits from a file, written on the save thread pool
+        scratch_dir = self.viewer_scratch_dir
+        worker = SaveWorker(
+            scratch_path(scratch_dir, file_path), lambda progress: write_scratch_file(dataset, file_path, scratch_dir)
+        )
+        worker.signals.finished.connect(lambda scratch_file: self.handle_viewer_file_written(dataset, file_path, scratch_file))
+        worker.signals.failed.connect(self.handle_viewer_file_failed)
+        self.viewer_write_worker = worker
+        self.ui.statusbar.showMessage(f"Preparing {Path(file_path).name} for the viewer...")
+        self.save_thread_pool.start(worker)
+
+    def handle_viewer_file_written(self, dataset: Dataset, file_path: str, scratch_file: str):
+        self.viewer_write_worker = None
+        self.show_in_viewer(dataset, file_path, Path(scratch_file))
+
+    @Slot(str, str)
+    def handle_viewer_file_failed(self, path: str, message: str):
+        self.viewer_write_worker = None
+        QMessageBox.critical(self, "Error", f"Could not write the edited image for the viewer:\n{message}")
+
+    def show_in_viewer(self, dataset: Dataset, file_path: str, scratch_file: Path | None = None):
         try:
-            file_path = self.current_list_item.text()
-            self.image_viewer.dicom_handler.load_file(file_path)
-            # Display the image
-            self.image_viewer.display_dicom_image()
+            with span("view image", file=Path(file_path).name):
+                with span("load image"):
+                    hand_off(self.image_viewer.dicom_handler, dataset, file_path, scratch_file)
+                # Display the image
+                with span("display image"):
+                    self.image_viewer.display_dicom_image()
 
-            # Display metadata
-            self.image_viewer.display_metadata()
+                # Display metadata
+                with span("display metadata"):
+                    self.image_viewer.display_metadata()
 
             # Update status bar
             self.image_viewer.statusBar().showMessage(f"Loaded {file_path}")
@@ -495,20 +972,175 @@ class DCMQtreePy(QMainWindow):
 
     def on_file_open(self):
         previous_path = self.previous_path
-        file_name, ok = QFileDialog.getOpenFileName(self, "Open DICOM File", str(previous_path), "DICOM Files (*.dcm)")
+        file_names, _ = QFileDialog.getOpenFileNames(
+            self, "Open DICOM Files", str(previous_path), "DICOM Files (*.dcm *.DCM *.dicom);;All Files (*)"
+        )
+        if file_names:
+            self.add_files(file_names)
+            self.select_file(self.file_model.node_for_path(file_names[0]))
+
+    def on_time_operations_toggled(self, checked: bool):
+        set_enabled(self.action_time_operations.isChecked(), tracing=self.action_record_trace.isChecked())
+
+    def report_timing(self, timing):
+        # operations may run on the save threads, the status bar is updated on the window's
+        self.timing_signals.operation_timed.emit(timing.describe())
+
+    @Slot(str)
+    def handle_operation_timed(self, description: str):
+        self.ui.statusbar.showMessage(description, 15000)
+
+    def on_export_trace(self):
+        if trace_event_count() == 0:
+            QMessageBox.information(
+                self, "Export Timing Trace", "Nothing has been recorded, turn on Time Operations and Record Timing Trace"
+            )
+            return
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Export Timing Trace", str(self.previous_save_path / "dcmQTreePy-trace.json"), "Trace Files (*.json)"
+        )
         if file_name:
-            file_list_item = QListWidgetItem(str(file_name))
-            self.ui.listWidget.addItem(file_list_item)
-            self.populate_tree_widget_from_file(file_name)
-            self.current_list_item = file_list_item
+            count = write_chrome_trace(file_name)
+            self.ui.statusbar.showMessage(f"Wrote {count} timing events to {file_name}", 5000)
+
+    def on_memory_limit(self):
+        megabyte = 1024 * 1024
+        limit_mb, ok = QInputDialog.getInt(
+            self,
+            "Memory Limit",
+            "Evict files read earlier, then defer large values, beyond (MB):",
+            self.dataset_cache.cap_bytes // megabyte,
+            64,
+            1024 * 1024,
+        )
+        if ok:
+            self.dataset_cache.cap_bytes = limit_mb * megabyte
+            self.enforce_memory_limit()
+
+    def on_defer_values_toggled(self, checked: bool):
+        self.dataset_cache.defer_values = checked
+        self.update_memory_report()
+
+    def current_path(self) -> str | None:
+        return str(self.list_item_path(self.current_list_item)) if self.current_list_item is not None else None
+
+    def memory_in_use(self) -> Tuple[int, int]:
+        """Estimated bytes held for the files (cached datasets, tree, unsaved edits), and those not in the cache."""
+        outside_cache = self.tree_bytes + sum(self.unsaved_edit_bytes.values())
+        current_path = self.current_path()
+        if current_path is not None and self.dataset_cache.cached(current_path) is not self.current_dataset:
+            # e.g. the dataset saved into the current file
+            outside_cache += estimate_dataset_bytes(self.current_dataset)
+        return self.dataset_cache.cached_bytes() + outside_cache, outside_cache
+
+    def enforce_memory_limit(self):
+        """Evict cached datasets, or start deferring large values, to keep within the memory limit."""
+        _, outside_cache = self.memory_in_use()
+        protected = set(self.unsaved_edits)
+        if self.current_path() is not None:
+            protected.add(self.current_path())
+        self.dataset_cache.enforce(outside_cache, protected)
+        self.update_memory_report()
+
+    def memory_tooltip(self, path: str) -> str:
+        lines = ["Unsaved edits"] if path in self.unsaved_edits else []
+        if path in self.changed_on_disk:
+            lines.append("Changed on disk since it was read: saving the edits overwrites that")
+        cached_bytes = self.dataset_cache.size_of(path) or 0
+        if path == self.current_path():
+            dataset_bytes = cached_bytes
+            if self.dataset_cache.cached(path) is not self.current_dataset:
+                dataset_bytes = estimate_dataset_bytes(self.current_dataset)
+            lines.append(
+                f"≈ {format_bytes(dataset_bytes + self.tree_bytes)} in memory "
+                f"(dataset {format_bytes(dataset_bytes)}, tree {format_bytes(self.tree_bytes)})"
+            )
+        elif path in self.unsaved_edit_bytes:
+            lines.append(f"≈ {format_bytes(cached_bytes + self.unsaved_edit_bytes[path])} in memory, with the edits")
+        elif cached_bytes:
+            lines.append(f"≈ {format_bytes(cached_bytes)} in memory, cached")
+        return "\n".join(lines)
+
+    def list_item_tooltip(self, path: str) -> str:
+        node = self.file_model.node_for_path(path)
+        record = node.record if node is not None else None
+        lines = [record.describe()] if record is not None else []
+        memory = self.memory_tooltip(path)
+        return "\n".join(lines + ([memory] if memory else []))
+
+    def update_memory_report(self):
+        """Show the memory held for each file in its tooltip, and the total in the status bar."""
+        report_paths = set(self.dataset_cache.paths()) | set(self.unsaved_edits)
+        if self.current_path() is not None:
+            report_paths.add(self.current_path())
+        for path in report_paths | self.memory_report_paths:
+            node = self.file_model.node_for_path(path)
+            if node is not None:
+                self.file_model.set_tooltip(node, self.list_item_tooltip(path))
+        self.memory_report_paths = report_paths
+        total, _ = self.memory_in_use()
+        text = f"Memory ≈ {format_bytes(total)} of {format_bytes(self.dataset_cache.cap_bytes)}"
+        if self.dataset_cache.deferring:
+            text += ", deferring large values"
+        self.memory_label.setText(text)
+
+    def on_receive_dicom_toggled(self, checked: bool):
+        if not checked:
+            self.stop_receiving()
+            return
+        port, ok = QInputDialog.getInt(self, "Receive DICOM", "Listen on port:", self.receive_port, 1, 65535)
+        if not ok:
+            self.action_receive_dicom.setChecked(False)
+            return
+        self.receive_port = port
+        spool_dir = Path(platformdirs.user_cache_dir("dcmQTreePy")) / "received"
+        self.storage_receiver = StorageReceiver(spool_dir, port=port)
+        try:
+            self.storage_receiver.start()
+        except OSError as listen_exc:
+            self.storage_receiver = None
+            QMessageBox.critical(self, "Receive DICOM", f"Unable to listen on port {port}:\n{listen_exc}")
+            self.action_receive_dicom.setChecked(False)
+            return
+        self.receive_timer.start()
+        self.ui.statusbar.showMessage(f"Receiving DICOM as {self.storage_receiver.ae_title} on port {port}", 5000)
+
+    def stop_receiving(self):
+        self.receive_timer.stop()
+        if self.storage_receiver is not None:
+            self.storage_receiver.stop()
+            self.add_received_files()
+            self.storage_receiver = None
+
+    def add_received_files(self):
+        """Add what the storage receiver has written since the last call to the file list."""
+        if self.storage_receiver is None:
+            return
+        paths = self.storage_receiver.received_paths(RECEIVE_BATCH_SIZE)
+        if not paths:
+            return
+        # an instance sent again replaces the file already listed
+        self.add_files(paths)
+        self.ui.statusbar.showMessage(f"Received {len(paths)} files", 2000)
 
     def populate_tree_widget_from_file(self, file_name: str | Path):
         if file_name:
             path = Path(file_name)
             self.previous_path = path.parent
-            ds = dcmread(path, force=True)
-            # ds.remove_private_tags() # temporarily, until save as is working.
-            self.current_dataset = ds
+            with span("open", file=path.name):
+                if recover_interrupted_patch(path):
+                    self.dataset_cache.discard(path)
+                    self.ui.statusbar.showMessage(f"{path.name} was restored as it was before a save that was cut short")
+                with span("dcmread"):
+                    ds = self.dataset_cache.read(path)
+                # ds.remove_private_tags() # temporarily, until save as is working.
+                self.current_dataset = ds
+                self.populate_tree_widget_from_dataset(ds)
+            self.has_edits = False
+            self.enforce_memory_limit()
+
+    def populate_tree_widget_from_dataset(self, ds: Dataset):
+        with span("populate tree"):
             self.dcm_tree_widget.clear()
             tree_child_item = QTreeWidgetItem(self.dcm_tree_widget)
             context = build_context(ds.SOPClassUID)
@@ -516,7 +1148,101 @@ class DCMQtreePy(QMainWindow):
             tree_child_item.setText(0, abstract_syntax)
             self._populate_tree_widget_item_from_dataset(parent=tree_child_item, ds=ds)
             tree_child_item.setExpanded(True)
+        self.tree_bytes = estimate_tree_bytes(ds)
+
+    def show_file(self, path: Path):
+        """Show path in the tree, with its unsaved edits if it has any."""
+        if str(path) in self.unsaved_edits:
+            original_ds, modified_ds = self.unsaved_edits.pop(str(path))
+            self.unsaved_edit_bytes.pop(str(path), None)
+            self.previous_path = path.parent
+            self.current_dataset = original_ds
+            self.populate_tree_widget_from_dataset(modified_ds)
+            self.has_edits = True
+            self.enforce_memory_limit()
+        else:
+            self.changed_on_disk.discard(str(path))
+            self.populate_tree_widget_from_file(path)
+
+    def stash_current_edits(self):
+        """Keep the edits in the tree for the current file so they survive showing another file."""
+        if not self.has_edits or self.current_list_item is None:
+            return
+        if self._saving_tree():
+            # kept by the save, and as unsaved edits again if it fails
             self.has_edits = False
+            return
+        path = self.list_item_path(self.current_list_item)
+        modified_ds = self._dataset_from_tree()
+        self.unsaved_edits[str(path)] = (self.current_dataset, modified_ds)
+        self.unsaved_edit_bytes[str(path)] = estimate_dataset_bytes(modified_ds)
+        if self.dataset_cache.cached(path) is not self.current_dataset:
+            self.unsaved_edit_bytes[str(path)] += estimate_dataset_bytes(self.current_dataset)
+        self.has_edits = False
+        self.mark_list_item(self.current_list_item, modified=True)
+
+    @staticmethod
+    def list_item_path(item: NavigatorNode) -> Path:
+        return Path(item.path)
+
+    def list_items(self) -> List[NavigatorNode]:
+        return self.file_model.file_nodes()
+
+    def list_item_for_path(self, path: Path | str) -> NavigatorNode | None:
+        return self.file_model.node_for_path(str(path))
+
+    def mark_list_item(self, item: NavigatorNode, modified: bool):
+        self.file_model.set_modified(item, modified)
+        self.file_model.set_tooltip(item, self.list_item_tooltip(item.path))
+
+    def add_files(self, paths) -> List[NavigatorNode]:
+        """List the files not listed yet; they are grouped once their headers are read (see header_index)."""
+        added = self.file_model.add_paths(str(path) for path in paths)
+        self.read_headers([node.path for node in added])
+        return added
+
+    def select_file(self, node: NavigatorNode | None):
+        """Make node the current file in the navigator (clearing a filter that hides it), which shows it."""
+        if node is None:
+            return
+        index = self.file_filter_model.mapFromSource(self.file_model.index_for_node(node))
+        if not index.isValid() and self.ui.fileFilterEdit.text():
+            self.ui.fileFilterEdit.clear()
+            index = self.file_filter_model.mapFromSource(self.file_model.index_for_node(node))
+        self.ui.fileTreeView.setCurrentIndex(index)
+        self.ui.fileTreeView.scrollTo(index)
+
+    def selected_files(self) -> List[NavigatorNode]:
+        """The files selected in the navigator, with the files of the groups selected."""
+        selected: Dict[str, NavigatorNode] = {}
+        for index in self.ui.fileTreeView.selectionModel().selectedRows():
+            for node in self.file_model.files_under(self.file_filter_model.node(index)):
+                selected[node.path] = node
+        return list(selected.values())
+
+    def change_file_list(self, change: Callable[[], None]):
+        """Regroup or reorder the navigator with change, keeping the current file current without showing it again."""
+        self.changing_file_list = True
+        try:
+            change()
+            current = self.current_list_item
+            if current is not None and current.parent is not None:
+                if self.file_filter_model.node(self.ui.fileTreeView.currentIndex()) is not current:
+                    index = self.file_filter_model.mapFromSource(self.file_model.index_for_node(current))
+                    if index.isValid():
+                        self.ui.fileTreeView.setCurrentIndex(index)
+        finally:
+            self.changing_file_list = False
+
+    @Slot(str)
+    def on_file_filter_changed(self, text: str):
+        self.file_filter_model.set_filter_text(text)
+        if text:
+            self.ui.fileTreeView.expandAll()
+
+    def on_tree_item_changed(self, item: QTreeWidgetItem, column: int):
+        if self._isEditable(column):
+            self.has_edits = True
 
     def on_file_save_as(self):
         save_path = self.previous_save_path
@@ -525,53 +1251,625 @@ class DCMQtreePy(QMainWindow):
             return
         path = Path(file_name)
         self.previous_save_path = path.parent
-        iterator = QTreeWidgetItemIterator(self.dcm_tree_widget)
-        tree_child_item = iterator.__next__().value()
-        modified_ds = Dataset()
-
-        # modified_ds.is_little_endian = True
-
-        for child_index in range(tree_child_item.childCount()):
-            child = tree_child_item.child(child_index)
-            self._populate_dataset_from_tree_widget_item(parent_ds=modified_ds, tree_widget_item=child)
-
-        if "PixelData" in self.current_dataset:
-            modified_ds["PixelData"] = self.current_dataset["PixelData"]
-        # modified_ds.fix_meta_info(enforce_standard=False)
-        modified_ds.ensure_file_meta()
-        #
-        modified_ds.is_implicit_VR = False
-        modified_ds.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
-        # del modified_ds[0x300a0782]
-        # modified_ds.remove_private_tags() # temporary... first get save as working for public elements
-        dcmwrite(Path(file_name), modified_ds, write_like_original=False)
-        self.has_edits = False  # not quite true, but the data has been saved, so switching and losing the current edits is OK.
+        self.save_tree_to_file(path)
 
     def on_file_save(self):
-        file_name = self.current_list_item.text()
+        file_name = self.current_list_item.path
         path = Path(file_name)
+        if not self.confirm_overwriting_changes([file_name]):
+            return
         self.previous_save_path = path.parent
+        self.save_tree_to_file(path)
+
+    def _dataset_from_tree(self) -> Dataset:
         iterator = QTreeWidgetItemIterator(self.dcm_tree_widget)
         tree_child_item = iterator.__next__().value()
         modified_ds = Dataset()
 
         # modified_ds.is_little_endian = True
 
-        for child_index in range(tree_child_item.childCount()):
-            child = tree_child_item.child(child_index)
-            self._populate_dataset_from_tree_widget_item(parent_ds=modified_ds, tree_widget_item=child)
+        with span("_populate_dataset_from_tree_widget_item"):
+            for child_index in range(tree_child_item.childCount()):
+                child = tree_child_item.child(child_index)
+                self._populate_dataset_from_tree_widget_item(parent_ds=modified_ds, tree_widget_item=child)
 
+        # the tree doesn't hold binary values, so those top level elements are taken from the file as read
+        for tag in modified_ds.keys():
+            if tag in self.current_dataset and modified_ds[tag].VR in [VR.OB, VR.OW, VR.OB_OW, VR.OD, VR.OF]:
+                modified_ds[tag] = self.current_dataset[tag]
         if "PixelData" in self.current_dataset:
             modified_ds["PixelData"] = self.current_dataset["PixelData"]
-        # modified_ds.fix_meta_info(enforce_standard=False)
-        modified_ds.ensure_file_meta()
-        #
-        modified_ds.is_implicit_VR = False
-        modified_ds.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
-        # del modified_ds[0x300a0782]
-        # modified_ds.remove_private_tags() # temporary... first get save as working for public elements
-        dcmwrite(Path(file_name), modified_ds, write_like_original=False)
-        self.has_edits = False  # not quite true, but the data has been saved, so switching and losing the current edits is OK.
+        return modified_ds
+
+    def save_tree_to_file(self, path: Path):
+        """Save the tree to path on the save thread pool.
+
+        Saves involving the same file run one after another, each comparing the tree against what the file
+        will hold once the saves queued before it are done.
+        """
+        with span("save", file=path.name):
+            modified_ds = self._dataset_from_tree()
+        source_path = self.list_item_path(self.current_list_item) if self.current_list_item else None
+        queue_path = source_path if source_path is not None else path
+        queued = self.pending_saves.get(queue_path.resolve())
+        original_ds = queued[-1].file_dataset if queued else self.current_dataset
+        save, total_bytes = self.make_save(source_path, original_ds, modified_ds, path)
+        worker = SaveWorker(path, save, total_bytes)
+        worker.queue_path = queue_path.resolve()
+        worker.file_dataset = modified_ds if path == source_path else original_ds
+        if path == source_path:
+            worker.on_saved = lambda: self._adopt_saved_dataset(original_ds, modified_ds)
+        if source_path is not None:
+            worker.edited_path = str(source_path)
+            worker.edits = (original_ds, modified_ds)
+        worker.tree_generation = self.tree_generation
+        worker.signals.progress.connect(self.handle_save_progress)
+        worker.signals.finished.connect(self.handle_save_finished)
+        worker.signals.failed.connect(self.handle_save_failed)
+        self.queue_save(worker)
+        # the tree's edits are taken to be saved once the save has finished (see _edits_saved)
+
+    def make_save(
+        self, source_path: Path | None, original_ds: Dataset, modified_ds: Dataset, path: Path
+    ) -> Tuple[Callable[[Callable[[int], None]], None], int]:
+        """A function writing modified_ds to path with the current save options, and the bytes it will write.
+
+        source_path is the file original_ds was read from.  The function may be called on any thread.
+        """
+        preserve_encoding = (
+            self.action_preserve_encoding.isChecked()
+            and source_path is not None
+            and can_preserve_encoding(source_path, original_ds)
+        )
+        backup = self.action_backup_on_patch.isChecked()
+        copy_on_write = self.action_patch_copy.isChecked()
+        if preserve_encoding and path == source_path:
+            # once saved, the file holds modified_ds, with the preamble and file meta of the original
+            modified_ds.preamble = getattr(original_ds, "preamble", None)
+            modified_ds.file_meta = FileMetaDataset(getattr(original_ds, "file_meta", FileMetaDataset()))
+            modified_ds.is_implicit_VR = original_ds.is_implicit_VR
+            modified_ds.is_little_endian = original_ds.is_little_endian
+
+        def save(progress):
+            with span("write", file=path.name):
+                if preserve_encoding:
+                    # same length edits are patched into the file, anything else copies unchanged elements
+                    with span("patch in place"):
+                        patched = patch_in_place(
+                            source_path, original_ds, modified_ds, path, backup=backup, copy_on_write=copy_on_write
+                        )
+                    if not patched:
+                        with span("write preserving encoding"):
+                            write_preserving_encoding(source_path, original_ds, modified_ds, path, progress=progress)
+                else:
+                    # modified_ds.fix_meta_info(enforce_standard=False)
+                    modified_ds.ensure_file_meta()
+                    #
+                    modified_ds.is_implicit_VR = False
+                    modified_ds.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
+                    # del modified_ds[0x300a0782]
+                    # modified_ds.remove_private_tags() # temporary... first get save as working for public elements
+                    with atomic_write(path) as partial, span("dcmwrite"):
+                        dcmwrite(ProgressFile(partial, progress), modified_ds, write_like_original=False)
+
+        if preserve_encoding:
+            total_bytes = source_path.stat().st_size
+        else:
+            total_bytes = estimate_dataset_bytes(modified_ds)
+        return save, total_bytes
+
+    def queue_save(self, worker: SaveWorker):
+        queue = self.pending_saves.setdefault(worker.queue_path, [])
+        queue.append(worker)
+        if len(queue) == 1:
+            self._start_save(worker)
+        else:
+            self.ui.statusbar.showMessage(f"Save of {worker.path.name} queued behind {len(queue) - 1} other(s)")
+
+    def _start_save(self, worker: SaveWorker):
+        self.save_progress_bar.setValue(0)
+        self.save_progress_bar.show()
+        self.ui.statusbar.showMessage(f"Saving {worker.path.name}...")
+        self.save_thread_pool.start(worker)
+
+    def _save_done(self, worker: SaveWorker, start_next: bool = True) -> List[SaveWorker]:
+        """Remove the finished worker from its queue and start the next one, or return the rest if not start_next."""
+        queue = self.pending_saves.get(worker.queue_path, [])
+        if worker in queue:
+            queue.remove(worker)
+        remaining = []
+        if queue and start_next:
+            self._start_save(queue[0])
+        else:
+            remaining = self.pending_saves.pop(worker.queue_path, [])
+        if not self.pending_saves:
+            self.save_progress_bar.hide()
+        return remaining
+
+    def _running_save(self, path: str) -> SaveWorker | None:
+        for queue in self.pending_saves.values():
+            if queue and str(queue[0].path) == path:
+                return queue[0]
+        return None
+
+    @Slot(str, int)
+    def handle_save_progress(self, path: str, percent: int):
+        self.save_progress_bar.setValue(percent)
+
+    @Slot(str)
+    def handle_save_finished(self, path: str):
+        self.ui.statusbar.showMessage(f"Saved {Path(path).name}", 5000)
+        self.note_own_write(path)
+        worker = self._running_save(path)
+        if worker is None:
+            return
+        self._save_done(worker)
+        if worker.on_saved is not None:
+            worker.on_saved()
+        self._edits_saved(worker)
+
+    def _saving_tree(self) -> bool:
+        """Whether a save queued or running holds the edits in the tree as they are."""
+        return any(
+            worker.edited_path is not None and worker.tree_generation == self.tree_generation
+            for queue in self.pending_saves.values()
+            for worker in queue
+        )
+
+    def _edits_saved(self, worker: SaveWorker):
+        """The edits worker saved are no longer unsaved, unless the tree has been edited since."""
+        if worker.edited_path is None:
+            return
+        item = self.list_item_for_path(worker.edited_path)
+        if item is not None and item is self.current_list_item and self.tree_generation == worker.tree_generation:
+            self.has_edits = False
+        if Path(worker.path) == Path(worker.edited_path):
+            self.changed_on_disk.discard(worker.edited_path)
+        if item is not None and worker.edited_path not in self.unsaved_edits:
+            self.mark_list_item(item, modified=False)
+
+    def _keep_unsaved_edits(self, failed: SaveWorker, cancelled: List[SaveWorker]):
+        """Keep the edits of a failed save (and of the saves cancelled after it) as unsaved, so none are lost."""
+        if failed.edited_path is None:
+            return
+        path = failed.edited_path
+        # the failed save was compared against what the file holds, the last one has the latest edits
+        latest = [worker for worker in [failed] + cancelled if worker.edits is not None][-1]
+        original_ds, modified_ds = failed.edits[0], latest.edits[1]
+        item = self.list_item_for_path(path)
+        if item is not None and item is self.current_list_item:
+            if not self.has_edits:
+                # shown again from the file since
+                self.current_dataset = original_ds
+                self.populate_tree_widget_from_dataset(modified_ds)
+                self.has_edits = True
+        elif path not in self.unsaved_edits:
+            self.unsaved_edits[path] = (original_ds, modified_ds)
+            self.unsaved_edit_bytes[path] = estimate_dataset_bytes(modified_ds)
+        if item is not None:
+            self.mark_list_item(item, modified=True)
+
+    def _adopt_saved_dataset(self, original_ds: Dataset, modified_ds: Dataset):
+        """After saving into the open file, the saved dataset is what the next save is compared against."""
+        if self.current_dataset is original_ds:  # unless another file was opened while saving
+            self.current_dataset = modified_ds
+
+    @Slot(str, str)
+    def handle_save_failed(self, path: str, message: str):
+        self.ui.statusbar.showMessage(f"Saving {Path(path).name} failed", 5000)
+        worker = self._running_save(path)
+        # saves queued behind this one expected it to succeed, so they are cancelled as well
+        cancelled = self._save_done(worker, start_next=False) if worker is not None else []
+        if cancelled:
+            message += f"\n{len(cancelled)} save(s) queued after it were cancelled."
+        if worker is not None:
+            self._keep_unsaved_edits(worker, cancelled)
+        QMessageBox.critical(
+            self, "Save Failed", f"Could not save {path}:\n{message}\nThe file on disk was not changed, the edits are kept."
+        )
+
+    def on_file_save_all(self):
+        """Save every file with unsaved edits, several at a time."""
+        self.stash_current_edits()
+        if not self.unsaved_edits:
+            self.ui.statusbar.showMessage("No files have unsaved edits", 5000)
+            return
+        to_save = self.confirm_overwriting_changes(list(self.unsaved_edits))
+        if not to_save:
+            return
+        jobs = []
+        for path_name in to_save:
+            original_ds, modified_ds = self.unsaved_edits[path_name]
+            path = Path(path_name)
+            save, _ = self.make_save(path, original_ds, modified_ds, path)
+            jobs.append(SaveJob(path, save))
+        self.start_batch_save(jobs)
+
+    def confirm_overwriting_changes(self, paths: List[str]) -> List[str]:
+        """The paths to save edits into, asking first about those changed on disk since they were read."""
+        changed = [path for path in paths if path in self.changed_on_disk]
+        if not changed:
+            return paths
+        names = "\n".join(Path(path).name for path in changed[:20]) + ("\n..." if len(changed) > 20 else "")
+        buttons = QMessageBox.Yes | QMessageBox.Cancel
+        if len(changed) < len(paths):
+            buttons |= QMessageBox.No
+        button = QMessageBox.question(
+            self,
+            "Files Changed On Disk",
+            f"These files were changed on disk (by Find and Replace, say) after they were read:\n{names}\n\n"
+            "Saving their edits overwrites those changes.  Save them anyway? (No saves only the other files)",
+            buttons,
+            QMessageBox.Cancel,
+        )
+        if button == QMessageBox.Yes:
+            return paths
+        if button == QMessageBox.No:
+            return [path for path in paths if path not in self.changed_on_disk]
+        return []
+
+    def on_file_export_selected(self):
+        """Write the selected files, with their unsaved edits, into a folder."""
+        self.stash_current_edits()
+        selected = self.selected_files()
+        if not selected:
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Export Selected Files To Folder", str(self.previous_save_path))
+        if not folder:
+            return
+        self.previous_save_path = Path(folder)
+        jobs = []
+        for item in selected:
+            path = self.list_item_path(item)
+            destination = Path(folder) / path.name
+            if destination == path:
+                continue
+            if str(path) in self.unsaved_edits:
+                original_ds, modified_ds = self.unsaved_edits[str(path)]
+                save, _ = self.make_save(path, original_ds, modified_ds, destination)
+                jobs.append(SaveJob(destination, save))
+            else:
+                jobs.append(copy_job(path, destination))
+        self.start_batch_save(jobs)
+
+    def on_file_query_retrieve(self):
+        if self.query_dialog is not None and self.query_dialog.worker is not None:
+            self.query_dialog.raise_()
+            return
+        try:
+            destinations = load_destinations()
+        except (OSError, ValueError) as config_exc:
+            QMessageBox.warning(self, "Query/Retrieve", f"Unable to read {destinations_path()}:\n{config_exc}")
+            destinations = {}
+        # instances moved to us arrive through the storage receiver, so C-MOVE needs it running
+        move_destination = self.storage_receiver.ae_title if self.storage_receiver is not None else None
+        spool_dir = Path(platformdirs.user_cache_dir("dcmQTreePy")) / "retrieved"
+        self.query_dialog = QueryRetrieveDialog(destinations, spool_dir, self.save_thread_pool, move_destination, self)
+        self.query_dialog.file_retrieved.connect(self.add_retrieved_file)
+        self.query_dialog.show()
+
+    @Slot(str)
+    def add_retrieved_file(self, path: str):
+        self.add_files([path])
+
+    @staticmethod
+    def open_header_index() -> HeaderIndex | None:
+        """The header index in the user cache directory or, if that can't be used, one for this session only."""
+        for db_path in (index_path, lambda: Path(tempfile.mkdtemp(prefix="dcmQTreePy-")) / "header_index.sqlite"):
+            try:
+                return HeaderIndex(db_path())
+            except (OSError, sqlite3.Error) as index_exc:
+                logging.error(f"The header index can't be used: {index_exc}")
+        return None
+
+    def on_file_open_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Open Folder", str(self.previous_path))
+        if folder:
+            self.open_folder(Path(folder))
+
+    def open_folder(self, folder: Path):
+        """Add the DICOM files in folder and its subfolders to the navigator as their headers are read (and indexed)."""
+        if self.header_index is None:
+            QMessageBox.warning(self, "Open Folder", "The header index could not be opened, see the log")
+            return
+        self.previous_path = folder
+        # after the folder (or headers) being read
+        self.pending_index_folders.append(folder)
+        self.index_next()
+
+    def on_file_open_dicomdir(self):
+        file_name, _ = QFileDialog.getOpenFileName(
+            self, "Open DICOMDIR", str(self.previous_path), "DICOMDIR (DICOMDIR dicomdir);;All Files (*)"
+        )
+        if file_name:
+            self.open_dicomdir(Path(file_name))
+
+    def open_dicomdir(self, path: Path):
+        """List the files path (a DICOMDIR) refers to, grouped as its records say; each is opened only when selected."""
+        try:
+            with span("open DICOMDIR", file=path.name):
+                records = DicomDirIndex(path).header_records()
+        except (OSError, InvalidDicomError, ValueError) as dicomdir_exc:
+            QMessageBox.warning(self, "Open DICOMDIR", f"Unable to read {path}:\n{dicomdir_exc}")
+            return
+        self.previous_path = path.parent
+        # the records say what read_headers would find, without opening the files
+        self.file_model.add_paths(list(records), records)
+        self.ui.statusbar.showMessage(f"{len(records)} files listed from {path}", 5000)
+
+    def on_cancel_open_folder(self):
+        self.pending_index_folders.clear()
+        if self.index_worker is not None and self.index_worker.folder is not None:
+            self.index_worker.cancel()
+            self.ui.statusbar.showMessage(f"Cancelling opening {self.index_worker.folder}...")
+
+    def start_indexing(self, folder: Path | None = None, paths: List[str] | None = None):
+        if folder is not None:
+            # busy until the folder has been walked and the number of files to read is known
+            self.index_progress_bar.setRange(0, 0)
+            self.index_progress_bar.show()
+            self.index_cancel_button.show()
+        self.index_worker = IndexWorker(self.header_index, folder, paths)
+        self.index_worker.signals.progress.connect(self.handle_index_progress)
+        self.index_worker.signals.records.connect(self.handle_index_records)
+        self.index_worker.signals.finished.connect(self.handle_index_finished)
+        self.index_worker.signals.failed.connect(self.handle_index_failed)
+        self.save_thread_pool.start(self.index_worker)
+
+    @Slot(int, int)
+    def handle_index_progress(self, done: int, total: int):
+        self.ui.statusbar.showMessage(f"Indexing: {done} of {total} files read")
+        if self.index_worker is not None and self.index_worker.folder is not None:
+            self.index_progress_bar.setRange(0, total)
+            self.index_progress_bar.setValue(done)
+
+    @Slot(object)
+    def handle_index_records(self, records: List[HeaderRecord]):
+        if self.index_worker is not None and self.index_worker.folder is not None:
+            dicom_records = {record.path: record for record in records if record.is_dicom}
+            self.file_model.add_paths(sorted(dicom_records), dicom_records)
+        self.change_file_list(lambda: self.file_model.set_records(records))
+        for record in records:
+            node = self.file_model.node_for_path(record.path)
+            if node is not None:
+                self.file_model.set_tooltip(node, self.list_item_tooltip(record.path))
+
+    @Slot(object)
+    def handle_index_finished(self, update):
+        self.index_worker = None
+        self.ui.statusbar.showMessage(update.describe(), 10000)
+        self.index_next()
+
+    @Slot(str)
+    def handle_index_failed(self, message: str):
+        self.index_worker = None
+        self.ui.statusbar.showMessage(f"Indexing failed: {message}", 10000)
+        self.index_next()
+
+    def read_headers(self, paths: List[str]):
+        """Read (through the header index) the headers of paths, after those already being read."""
+        self.pending_header_paths.extend(paths)
+        self.index_next()
+
+    def index_next(self):
+        """Index the next folder chosen, or else the headers waiting to be read, unless indexing is in progress."""
+        if self.header_index is None or self.index_worker is not None:
+            return
+        self.index_progress_bar.hide()
+        self.index_cancel_button.hide()
+        if self.pending_index_folders:
+            self.start_indexing(folder=self.pending_index_folders.pop(0))
+        elif self.pending_header_paths:
+            self.start_indexing(paths=self.pending_header_paths)
+            self.pending_header_paths = []
+
+    def on_sort_file_list(self, column: str | None):
+        """Order the files of each series by the header column chosen in Options > Sort File List By."""
+        # files whose headers are still being read are put in order as they are
+        self.change_file_list(lambda: self.file_model.sort_files(column))
+
+    def on_file_find_replace(self):
+        if self.find_replace_dialog is not None and self.find_replace_dialog.worker is not None:
+            self.find_replace_dialog.raise_()
+            return
+        listed_files = [str(self.list_item_path(item)) for item in self.list_items()]
+        self.find_replace_dialog = FindReplaceDialog(listed_files, self.save_thread_pool, self)
+        self.find_replace_dialog.file_written.connect(self.note_own_write)
+        self.find_replace_dialog.file_written.connect(self.handle_file_rewritten)
+        self.find_replace_dialog.show()
+
+    def on_file_watch_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "Watch Folder", str(self.previous_path))
+        if not folder:
+            return
+        self.previous_path = Path(folder)
+        self.folder_watcher.watch(Path(folder))
+        self.action_stop_watching.setEnabled(True)
+        watched = ", ".join(str(folder) for folder in self.folder_watcher.folders)
+        self.ui.statusbar.showMessage(f"Watching {watched}: DICOM files arriving there are added", 10000)
+
+    def on_file_stop_watching(self):
+        self.folder_watcher.unwatch_all()
+        self.action_stop_watching.setEnabled(False)
+        self.ui.statusbar.showMessage("No longer watching folders", 5000)
+
+    def note_own_write(self, path: str):
+        """Remember path as the editor has just written it, so the folder watcher doesn't take it in again."""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        self.own_writes[str(Path(path))] = (stat.st_size, stat.st_mtime_ns)
+
+    def is_own_write(self, path: str) -> bool:
+        """Whether path is a backup, or a file being saved or last written by the editor (not changed since)."""
+        if path.endswith(BACKUP_SUFFIX) or Path(path).resolve() in self.pending_saves:
+            return True
+        if self.batch_save_worker is not None and any(str(job.destination) == path for job in self.batch_save_worker.jobs):
+            return True
+        signature = self.own_writes.get(path)
+        if signature is None:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if (stat.st_size, stat.st_mtime_ns) != signature:
+            return False
+        del self.own_writes[path]
+        return True
+
+    @Slot(list)
+    def handle_watched_files_changed(self, paths: List[str]):
+        """Add the DICOM files that have arrived in the watched folders, and take in those rewritten there.
+
+        Backups and the files the editor itself is saving, or has just saved, are left out.
+        """
+        arrived = []
+        for path in paths:
+            if self.is_own_write(path):
+                continue
+            if self.list_item_for_path(path) is not None:
+                self.handle_file_rewritten(path)
+            elif has_dicom_magic(path):
+                arrived.append(path)
+        if arrived:
+            self.add_files(arrived)
+            self.ui.statusbar.showMessage(f"{len(arrived)} files arrived in the watched folders", 5000)
+
+    @Slot(list)
+    def handle_watched_files_removed(self, paths: List[str]):
+        """Drop what was read of files removed from the watched folders, and list them no more unless edited."""
+        paths = [path for path in paths if not path.endswith(BACKUP_SUFFIX)]
+        for path in paths:
+            self.dataset_cache.discard(path)
+            node = self.list_item_for_path(path)
+            if node is not None and node is not self.current_list_item and path not in self.unsaved_edits:
+                self.change_file_list(lambda: self.file_model.remove(path))
+        self.read_headers(paths)
+        self.update_memory_report()
+
+    @Slot(str)
+    def handle_file_rewritten(self, path: str):
+        """A file was changed outside the editor: drop what was read of it, and show it again if it is current.
+
+        Files with unsaved edits are marked instead, and saving their edits asks before overwriting the change.
+        """
+        self.dataset_cache.discard(path)
+        self.read_headers([path])
+        path = str(Path(path))
+        item = self.list_item_for_path(path)
+        current = self.current_list_item is not None and self.list_item_path(self.current_list_item) == Path(path)
+        if path in self.unsaved_edits or (current and self.has_edits):
+            self.changed_on_disk.add(path)
+            if item is not None:
+                self.mark_list_item(item, modified=True)
+            self.ui.statusbar.showMessage(
+                f"{Path(path).name} was changed on disk, saving its edits will overwrite that", 10000
+            )
+            return
+        if current:
+            self.populate_tree_widget_from_file(path)
+
+    def on_file_send_to(self):
+        """Send the selected files, with their unsaved edits, to a DICOM node."""
+        selected = self.selected_files()
+        if not selected:
+            return
+        if self.send_worker is not None:
+            self.ui.statusbar.showMessage("Wait for the send in progress to finish", 5000)
+            return
+        try:
+            destinations = load_destinations()
+        except (OSError, ValueError) as config_exc:
+            QMessageBox.warning(self, "Send To", f"Unable to read {destinations_path()}:\n{config_exc}")
+            destinations = {}
+        text, ok = QInputDialog.getItem(
+            self, "Send To", "DICOM node, or AE@host:port:", sorted(destinations), 0, editable=True
+        )
+        if not ok or not text:
+            return
+        try:
+            destination = parse_destination(text, destinations)
+        except ValueError as destination_exc:
+            QMessageBox.warning(self, "Send To", str(destination_exc))
+            return
+        sources = []
+        for item in selected:
+            path = self.list_item_path(item)
+            if item is self.current_list_item and self.has_edits:
+                edits = (self.current_dataset, self._dataset_from_tree())
+            else:
+                edits = self.unsaved_edits.get(str(path))
+            if edits is None:
+                sources.append(path)
+                continue
+            # the edited dataset goes in the encoding of the file, which its pixel data is still in
+            original_ds, modified_ds = edits
+            file_meta = getattr(original_ds, "file_meta", None)
+            transfer_syntax_uid = file_meta.get("TransferSyntaxUID") if file_meta else None
+            sources.append(SendItem.from_dataset(modified_ds, str(path), transfer_syntax_uid))
+        self.send_failures = []
+        self.send_worker = SendWorker(destination, sources)
+        self.send_worker.signals.instance_done.connect(self.handle_instance_sent)
+        self.send_worker.signals.finished.connect(self.handle_send_finished)
+        self.ui.statusbar.showMessage(f"Sending {len(sources)} files to {destination}...")
+        self.save_thread_pool.start(self.send_worker)
+
+    @Slot(str, bool, str)
+    def handle_instance_sent(self, label: str, sent: bool, description: str):
+        if not sent:
+            self.send_failures.append(description)
+        self.ui.statusbar.showMessage(description, 2000)
+
+    @Slot(str)
+    def handle_send_finished(self, summary: str):
+        self.send_worker = None
+        self.ui.statusbar.showMessage(summary, 10000)
+        if self.send_failures:
+            QMessageBox.warning(self, "Some Files Were Not Sent", summary + "\n\n" + "\n".join(self.send_failures))
+
+    def start_batch_save(self, jobs: List[SaveJob]):
+        if self.pending_saves or self.batch_save_worker is not None:
+            self.ui.statusbar.showMessage("Wait for the saves in progress to finish", 5000)
+            return
+        self.batch_save_errors = []
+        self.batch_save_worker = BatchSaveWorker(jobs)
+        self.batch_save_worker.signals.file_done.connect(self.handle_batch_file_done)
+        self.batch_save_worker.signals.finished.connect(self.handle_batch_finished)
+        self.save_progress_bar.setValue(0)
+        self.save_progress_bar.show()
+        self.ui.statusbar.showMessage(f"Saving {len(jobs)} files...")
+        self.save_thread_pool.start(self.batch_save_worker)
+
+    @Slot(str, str, int)
+    def handle_batch_file_done(self, path: str, error: str, percent: int):
+        self.save_progress_bar.setValue(percent)
+        if error:
+            self.batch_save_errors.append(f"{path}: {error}")
+            return
+        self.note_own_write(path)
+        self.changed_on_disk.discard(path)
+        if path in self.unsaved_edits:
+            original_ds, modified_ds = self.unsaved_edits.pop(path)
+            self.unsaved_edit_bytes.pop(path, None)
+            item = self.list_item_for_path(path)
+            if item is not None:
+                self.mark_list_item(item, modified=False)
+                if item is self.current_list_item:
+                    # the current file's edits were stashed, so the tree shows them again, now saved
+                    self.current_dataset = modified_ds
+
+    @Slot(str)
+    def handle_batch_finished(self, summary: str):
+        self.batch_save_worker = None
+        self.save_progress_bar.hide()
+        self.ui.statusbar.showMessage(summary, 10000)
+        if self.current_list_item is not None and str(self.list_item_path(self.current_list_item)) in self.unsaved_edits:
+            self.show_file(self.list_item_path(self.current_list_item))
+        self.update_memory_report()
+        if self.batch_save_errors:
+            QMessageBox.warning(self, "Some Files Were Not Saved", summary + "\n\n" + "\n".join(self.batch_save_errors))
 
     def on_add_element(self):
         add_element_dialog = AddPublicElementDialog(self)
@@ -666,33 +1964,56 @@ class DCMQtreePy(QMainWindow):
 
     @Slot()
     def dragEnterEvent(self, e):
-        if e.mimeData().hasUrls():
+        if any(url.isLocalFile() for url in e.mimeData().urls()):
             e.acceptProposedAction()
             # e.accept()
 
     @Slot()
     def dropEvent(self, event):
+        """Open the folders and DICOMDIRs dropped, and add the other files dropped that are DICOM (by their preamble)."""
         mime_data = event.mimeData()
-        url_list = mime_data.urls()
-        my_file_name_list = [x.toLocalFile() for x in url_list]
-        for my_file_name in my_file_name_list:
-            file_list_item = QListWidgetItem(str(my_file_name))
-            self.ui.listWidget.addItem(file_list_item)
+        paths = [Path(url.toLocalFile()) for url in mime_data.urls() if url.isLocalFile()]
+        folders = [path for path in paths if path.is_dir()]
+        dicom_files = [path for path in paths if path.is_file() and has_dicom_magic(path)]
+        dicomdirs = [path for path in dicom_files if is_dicomdir(path)]
+        for folder in folders:
+            self.open_folder(folder)
+        for dicomdir in dicomdirs:
+            self.open_dicomdir(dicomdir)
+        self.add_files(path for path in dicom_files if path not in dicomdirs)
+        skipped = len(mime_data.urls()) - len(folders) - len(dicom_files)
+        if skipped:
+            self.ui.statusbar.showMessage(f"{skipped} of the items dropped are not DICOM files or folders", 5000)
         event.acceptProposedAction()
 
     @Slot()
     def handle_file_list_delete_pressed(self, event):
-        current_row = self.ui.listWidget.currentRow()
-        if self.has_edits:
+        current_item = self.file_filter_model.node(self.ui.fileTreeView.currentIndex())
+        if current_item.kind != FILE:
+            return
+        stashed = str(self.list_item_path(current_item)) in self.unsaved_edits
+        if stashed or (self.has_edits and current_item is self.current_list_item):
             button = self.non_native_warning_message(
-                "Current Tree Has Edits", "Continuing will lose current edits", buttons=QMessageBox.Ok | QMessageBox.Cancel
+                "File Has Edits", "Continuing will lose the edits to this file", buttons=QMessageBox.Ok | QMessageBox.Cancel
             )
             if button == QMessageBox.Cancel:
                 return
-            else:
+            self.unsaved_edits.pop(str(self.list_item_path(current_item)), None)
+            self.unsaved_edit_bytes.pop(str(self.list_item_path(current_item)), None)
+            self.changed_on_disk.discard(str(self.list_item_path(current_item)))
+            if current_item is self.current_list_item:
                 self.has_edits = False  # or at least behave as if it was
 
-        self.ui.listWidget.takeItem(current_row)
+        if current_item is not self.current_list_item:
+            self.dataset_cache.discard(self.list_item_path(current_item))
+        # the file next to it becomes current, and is shown once it is gone from the model
+        self.changing_file_list = True
+        try:
+            self.file_model.remove(current_item.path)
+        finally:
+            self.changing_file_list = False
+        self.on_current_file_changed(self.ui.fileTreeView.currentIndex(), QModelIndex())
+        self.update_memory_report()
 
     @Slot()
     def handle_tree_delete_pressed(self, event):
@@ -854,11 +2175,19 @@ class DCMQtreePy(QMainWindow):
     def closeEvent(self, event):
         # Clean up the assistant process
         self.help_assistant.cleanup()
+        self.stop_receiving()
+        self.folder_watcher.unwatch_all()
+        remove_listener(self.report_timing)
+        if self.send_worker is not None:
+            self.send_worker.cancel()
         # Call the existing closeEvent logic
         super().closeEvent(event)
 
 
 def main():
+    # find and replace starts worker processes, which a frozen (PyInstaller) build must route here
+    multiprocessing.freeze_support()
+    configure_from_environment()
     app = QApplication(sys.argv)
     widget = DCMQtreePy()
     widget.show()
@@ -0,0 +1,188 @@
+"""Open a DICOMDIR (the directory of a CD, DVD or USB stick) without opening the files it lists.
+
+The DICOMDIR's directory records are read once, indexed by their offsets in the file, and linked into the
+patient / study / series / instance hierarchy by the offsets they hold of their next and first lower level
+records (or, if those don't match the file, as the records come in order).  Each referenced file is
+listed with a header record made from its own and its ancestors' directory records, so the files
+themselves need only be opened when selected.  Records are found by SOP Instance UID through an index too.
+"""
+
+import os
+import warnings
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydicom import Dataset, dcmread
+
+from dcmqtreepy.header_index import HeaderRecord, record_from_dataset
+
+# the record types above the instances, and how deep each is
+LEVELS = {"PATIENT": 0, "STUDY": 1, "SERIES": 2}
+INSTANCE_LEVEL = len(LEVELS)
+# what an instance record calls the elements the files' headers have
+_REFERENCED_KEYWORDS = [
+    ("SOPClassUID", "ReferencedSOPClassUIDInFile"),
+    ("SOPInstanceUID", "ReferencedSOPInstanceUIDInFile"),
+]
+
+
+def is_dicomdir(path: Path) -> bool:
+    """Whether path is named as a DICOMDIR is (media file systems may have changed the case)."""
+    return Path(path).name.upper() == "DICOMDIR"
+
+
+@dataclass
+class DirectoryRecord:
+    """A directory record of a DICOMDIR, and where it is in the hierarchy (by offset)."""
+
+    offset: int
+    dataset: Dataset
+    parent: Optional[int] = None
+    children: List[int] = field(default_factory=list)
+
+    @property
+    def record_type(self) -> str:
+        return self.dataset.get("DirectoryRecordType", "")
+
+    @property
+    def in_use(self) -> bool:
+        return self.dataset.get("RecordInUseFlag", 0xFFFF) != 0
+
+    @property
+    def file_id(self) -> Tuple[str, ...]:
+        """The components of the path, from the DICOMDIR's folder, of the file the record refers to, if any."""
+        value = self.dataset.get("ReferencedFileID")
+        if not value:
+            return ()
+        return (value,) if isinstance(value, str) else tuple(value)
+
+
+class DicomDirIndex:
+    """The directory records of the DICOMDIR at path, in their hierarchy, and the files they refer to."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.folder = self.path.parent
+        with warnings.catch_warnings():
+            # pydicom 2 reads a DICOMDIR into the deprecated DicomDir; only its records are used here
+            warnings.simplefilter("ignore", DeprecationWarning)
+            ds = dcmread(self.path)
+        items = ds.get("DirectoryRecordSequence", [])
+        self.records: Dict[int, DirectoryRecord] = {}
+        for position, item in enumerate(items):
+            # offsets are missing from records not read from a file, which then keep their order
+            offset = getattr(item, "seq_item_tell", None)
+            offset = offset if offset is not None else -1 - position
+            self.records[offset] = DirectoryRecord(offset, item)
+        self.roots: List[int] = []
+        if not self._link_by_offsets(ds.get("OffsetOfTheFirstDirectoryRecordOfTheRootDirectoryEntity")):
+            self._link_in_order()
+        self.by_sop_instance_uid: Dict[str, int] = {}
+        for record in self.referenced_files():
+            uid = record.dataset.get("ReferencedSOPInstanceUIDInFile")
+            if uid:
+                self.by_sop_instance_uid[str(uid)] = record.offset
+        # folder -> {lower case name: name}, for finding files whose names' case has changed
+        self._listings: Dict[Path, Dict[str, str]] = {}
+
+    def _link_by_offsets(self, first: Optional[int]) -> bool:
+        """Link the records through the offsets they hold; False, and none linked, if those don't match the file."""
+        if not first or first not in self.records:
+            return False
+        links: List[Tuple[Optional[int], int]] = []
+        seen = set()
+        # (parent, first record of the entity)
+        entities = [(None, first)]
+        while entities:
+            parent, offset = entities.pop()
+            while offset:
+                if offset not in self.records or offset in seen:
+                    return False
+                seen.add(offset)
+                links.append((parent, offset))
+                dataset = self.records[offset].dataset
+                lower = dataset.get("OffsetOfReferencedLowerLevelDirectoryEntity")
+                if lower:
+                    entities.append((offset, lower))
+                offset = dataset.get("OffsetOfTheNextDirectoryRecord")
+        # each entity's records are linked in the order of their chain
+        for parent, offset in links:
+            self._link(parent, offset)
+        return True
+
+    def _link_in_order(self):
+        """Link the records by their types, each under the last record of a higher level before it."""
+        # the last record seen at each level
+        ancestors: List[int] = []
+        for offset, record in self.records.items():
+            depth = LEVELS.get(record.record_type, INSTANCE_LEVEL)
+            del ancestors[depth:]
+            self._link(ancestors[-1] if ancestors else None, offset)
+            if depth < INSTANCE_LEVEL:
+                ancestors.extend([offset] * (depth + 1 - len(ancestors)))
+
+    def _link(self, parent: Optional[int], offset: int):
+        self.records[offset].parent = parent
+        (self.records[parent].children if parent is not None else self.roots).append(offset)
+
+    def referenced_files(self) -> Iterator[DirectoryRecord]:
+        """The records in use that refer to a file, in the order of the hierarchy."""
+        pending = list(reversed(self.roots))
+        while pending:
+            record = self.records[pending.pop()]
+            if not record.in_use:
+                continue
+            if record.file_id:
+                yield record
+            pending.extend(reversed(record.children))
+
+    def record_for_instance(self, sop_instance_uid: str) -> Optional[DirectoryRecord]:
+        offset = self.by_sop_instance_uid.get(str(sop_instance_uid))
+        return self.records[offset] if offset is not None else None
+
+    def ancestors(self, record: DirectoryRecord) -> List[DirectoryRecord]:
+        """The records above record, the patient's first."""
+        chain = []
+        while record.parent is not None:
+            record = self.records[record.parent]
+            chain.append(record)
+        return chain[::-1]
+
+    def _name_in(self, folder: Path, name: str) -> str:
+        listing = self._listings.get(folder)
+        if listing is None:
+            try:
+                listing = {entry.lower(): entry for entry in os.listdir(folder)}
+            except OSError:
+                listing = {}
+            self._listings[folder] = listing
+        return listing.get(name.lower(), name)
+
+    def file_path(self, record: DirectoryRecord) -> Path:
+        """The file record refers to, matching names regardless of case (as media file systems may change it)."""
+        path = self.folder
+        for component in record.file_id:
+            path = path / self._name_in(path, component)
+        return path
+
+    def header_record(self, record: DirectoryRecord) -> HeaderRecord:
+        """What the directory records say of the file record refers to, as the index would hold its header.
+
+        The size and modification time are left 0, as the file isn't looked at.
+        """
+        ds = Dataset()
+        for source in self.ancestors(record) + [record]:
+            ds.update(source.dataset)
+        for keyword, referenced_keyword in _REFERENCED_KEYWORDS:
+            if referenced_keyword in record.dataset:
+                setattr(ds, keyword, record.dataset.get(referenced_keyword))
+        return record_from_dataset(ds, str(self.file_path(record)), 0, 0)
+
+    def header_records(self) -> Dict[str, HeaderRecord]:
+        """The header record of every file referred to, by path, in the order of the hierarchy."""
+        records = {}
+        for record in self.referenced_files():
+            header = self.header_record(record)
+            records.setdefault(header.path, header)
+        return records
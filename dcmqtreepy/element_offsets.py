@@ -0,0 +1,246 @@
+"""Locate data elements in an encoded DICOM file without parsing their values.
+
+Only the element headers are read; values are skipped by seeking, so the byte range of every top level
+element of a multi-gigabyte file can be found with a handful of small reads.  Values of undefined length
+(sequences and encapsulated pixel data) are walked item by item to find their end.  index_element_locations
+goes further and records where every element, nested ones included, is in the file.
+"""
+
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from pydicom.datadict import dictionary_VR
+from pydicom.uid import (
+    DeflatedExplicitVRLittleEndian,
+    ExplicitVRBigEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+)
+
+from dcmqtreepy.dataset_paths import NodePath
+
+UNDEFINED_LENGTH = 0xFFFFFFFF
+ITEM_TAG = 0xFFFEE000
+ITEM_DELIMITER_TAG = 0xFFFEE00D
+SEQUENCE_DELIMITER_TAG = 0xFFFEE0DD
+# explicit VRs that are followed by 2 reserved bytes and a 4 byte length (PS3.5 7.1.2)
+LONG_LENGTH_VRS = {"OB", "OD", "OF", "OL", "OV", "OW", "SQ", "SV", "UC", "UN", "UR", "UT", "UV"}
+FILE_META_GROUP = 0x0002
+TRANSFER_SYNTAX_UID_TAG = 0x00020010
+PIXEL_DATA_TAG = 0x7FE00010
+
+
+@dataclass(frozen=True)
+class ElementHeader:
+    """The header of one encoded data element (or item / delimiter) and where it is in the file."""
+
+    tag: int
+    vr: Optional[str]
+    length: int
+    offset: int
+    header_length: int
+
+    @property
+    def value_offset(self) -> int:
+        return self.offset + self.header_length
+
+    @property
+    def is_undefined_length(self) -> bool:
+        return self.length == UNDEFINED_LENGTH
+
+
+@dataclass(frozen=True)
+class ElementLocation:
+    """Where an element is in the file, and whether it is (or is inside) a value of undefined length."""
+
+    header: ElementHeader
+    in_undefined_length: bool
+
+
+def transfer_syntax_encoding(transfer_syntax_uid: str) -> Tuple[bool, bool]:
+    """(is_implicit_VR, is_little_endian) of the data set encoded with transfer_syntax_uid."""
+    if transfer_syntax_uid == ImplicitVRLittleEndian:
+        return True, True
+    if transfer_syntax_uid == ExplicitVRBigEndian:
+        return False, False
+    return False, True
+
+
+def transfer_syntax_for_encoding(is_implicit_VR: bool, is_little_endian: bool) -> str:
+    """The uncompressed transfer syntax matching an encoding, for files without file meta information."""
+    if is_implicit_VR:
+        return ImplicitVRLittleEndian
+    return ExplicitVRLittleEndian if is_little_endian else ExplicitVRBigEndian
+
+
+def is_seekable_encoding(transfer_syntax_uid: str) -> bool:
+    """False for transfer syntaxes (deflate) whose data set bytes can not be addressed in the file."""
+    return transfer_syntax_uid != DeflatedExplicitVRLittleEndian
+
+
+def read_element_header(fp: BinaryIO, is_implicit_VR: bool, is_little_endian: bool) -> Optional[ElementHeader]:
+    """Read the element header at the current position of fp, or return None at the end of the file.
+
+    Items and delimiters (group FFFE) never have a VR, whatever the transfer syntax.
+    """
+    offset = fp.tell()
+    header = fp.read(8)
+    if len(header) < 8:
+        return None
+    endian = "<" if is_little_endian else ">"
+    group, element = struct.unpack(f"{endian}HH", header[:4])
+    tag = group << 16 | element
+    if is_implicit_VR or group == 0xFFFE:
+        (length,) = struct.unpack(f"{endian}L", header[4:])
+        return ElementHeader(tag=tag, vr=None, length=length, offset=offset, header_length=8)
+    vr = header[4:6].decode("ascii", errors="replace")
+    if vr in LONG_LENGTH_VRS:
+        length_bytes = fp.read(4)
+        if len(length_bytes) < 4:
+            raise EOFError(f"Truncated header of element {tag:08X} at offset {offset}")
+        (length,) = struct.unpack(f"{endian}L", length_bytes)
+        return ElementHeader(tag=tag, vr=vr, length=length, offset=offset, header_length=12)
+    (length,) = struct.unpack(f"{endian}H", header[6:])
+    return ElementHeader(tag=tag, vr=vr, length=length, offset=offset, header_length=8)
+
+
+def skip_value(fp: BinaryIO, header: ElementHeader, is_implicit_VR: bool, is_little_endian: bool) -> None:
+    """Move fp past the value of the element whose header was just read."""
+    if not header.is_undefined_length:
+        fp.seek(header.value_offset + header.length)
+        return
+    if header.vr == "UN":
+        # an undefined length UN is a sequence encoded as implicit VR little endian (PS3.5 6.2.2)
+        is_implicit_VR, is_little_endian = True, True
+    # a sequence of items (dataset items, or fragments of encapsulated pixel data) ended by a delimiter
+    while True:
+        item = read_element_header(fp, is_implicit_VR, is_little_endian)
+        if item is None:
+            raise EOFError(f"Missing sequence delimiter for element {header.tag:08X} at offset {header.offset}")
+        if item.tag == SEQUENCE_DELIMITER_TAG:
+            return
+        if item.tag != ITEM_TAG:
+            raise ValueError(f"Expected an item in element {header.tag:08X}, found {item.tag:08X} at {item.offset}")
+        if not item.is_undefined_length:
+            fp.seek(item.value_offset + item.length)
+            continue
+        while True:
+            nested = read_element_header(fp, is_implicit_VR, is_little_endian)
+            if nested is None:
+                raise EOFError(f"Missing item delimiter in element {header.tag:08X} at offset {item.offset}")
+            if nested.tag == ITEM_DELIMITER_TAG:
+                break
+            skip_value(fp, nested, is_implicit_VR, is_little_endian)
+
+
+def read_dataset_start(fp: BinaryIO) -> Tuple[int, Optional[str]]:
+    """Skip the preamble and file meta information of the file in fp.
+
+    Returns the offset at which the data set starts and the Transfer Syntax UID from the file meta
+    information (None if the file has none).  fp is left at the start of the data set.
+    """
+    fp.seek(0)
+    start = 132 if fp.read(132)[128:] == b"DICM" else 0
+    fp.seek(start)
+    transfer_syntax_uid = None
+    while True:
+        header = read_element_header(fp, is_implicit_VR=False, is_little_endian=True)
+        if header is None or header.tag >> 16 != FILE_META_GROUP:
+            break
+        if header.tag == TRANSFER_SYNTAX_UID_TAG:
+            transfer_syntax_uid = fp.read(header.length).decode("ascii").strip("\0 ")
+        skip_value(fp, header, is_implicit_VR=False, is_little_endian=True)
+        start = fp.tell()
+    fp.seek(start)
+    return start, transfer_syntax_uid
+
+
+def scan_top_level_elements(fp: BinaryIO, is_implicit_VR: bool, is_little_endian: bool) -> Dict[int, Tuple[int, int]]:
+    """Map the tag of each element of the data set starting at the position of fp to its (start, end) offsets.
+
+    The range covers the whole encoded element: header, value and, for undefined length values, the
+    sequence delimiter.
+    """
+    ranges = {}
+    while True:
+        header = read_element_header(fp, is_implicit_VR, is_little_endian)
+        if header is None:
+            return ranges
+        skip_value(fp, header, is_implicit_VR, is_little_endian)
+        ranges[header.tag] = (header.offset, fp.tell())
+
+
+def is_sequence(header: ElementHeader) -> bool:
+    """True if the value of the element is a sequence of dataset items.
+
+    In implicit VR the VR comes from the dictionary; an undefined length value that isn't pixel data can only
+    be a sequence.  Sequences of undefined length encoded as UN are not walked (their items are implicit VR).
+    """
+    if header.vr is not None:
+        return header.vr == "SQ"
+    if header.is_undefined_length:
+        return header.tag != PIXEL_DATA_TAG
+    try:
+        return dictionary_VR(header.tag) == "SQ"
+    except KeyError:
+        return False
+
+
+def index_element_locations(fp: BinaryIO, is_implicit_VR: bool, is_little_endian: bool) -> Dict[NodePath, ElementLocation]:
+    """Map the path of every element of the data set starting at the position of fp to its location.
+
+    Sequences are walked into, so nested elements are indexed by their full node path, e.g.
+    (IonBeamSequence, 0, IonControlPointSequence, 3, GantryAngle).
+    """
+    locations: Dict[NodePath, ElementLocation] = {}
+    _index_dataset(fp, is_implicit_VR, is_little_endian, (), None, False, locations)
+    return locations
+
+
+def _index_dataset(
+    fp: BinaryIO,
+    is_implicit_VR: bool,
+    is_little_endian: bool,
+    parent_path: NodePath,
+    end: Optional[int],
+    in_undefined_length: bool,
+    locations: Dict[NodePath, ElementLocation],
+) -> None:
+    """Index the elements from the position of fp up to end, or up to an item delimiter (or the end of file)."""
+    while end is None or fp.tell() < end:
+        header = read_element_header(fp, is_implicit_VR, is_little_endian)
+        if header is None or header.tag == ITEM_DELIMITER_TAG:
+            return
+        path = parent_path + (header.tag,)
+        undefined = in_undefined_length or header.is_undefined_length
+        locations[path] = ElementLocation(header=header, in_undefined_length=undefined)
+        if is_sequence(header):
+            _index_sequence(fp, is_implicit_VR, is_little_endian, path, header, undefined, locations)
+        else:
+            skip_value(fp, header, is_implicit_VR, is_little_endian)
+
+
+def _index_sequence(
+    fp: BinaryIO,
+    is_implicit_VR: bool,
+    is_little_endian: bool,
+    path: NodePath,
+    header: ElementHeader,
+    in_undefined_length: bool,
+    locations: Dict[NodePath, ElementLocation],
+) -> None:
+    end = None if header.is_undefined_length else header.value_offset + header.length
+    item_index = 0
+    while end is None or fp.tell() < end:
+        item = read_element_header(fp, is_implicit_VR, is_little_endian)
+        if item is None:
+            raise EOFError(f"Sequence {header.tag:08X} at offset {header.offset} ends early")
+        if item.tag == SEQUENCE_DELIMITER_TAG:
+            return
+        if item.tag != ITEM_TAG:
+            raise ValueError(f"Expected an item in element {header.tag:08X}, found {item.tag:08X} at {item.offset}")
+        item_end = None if item.is_undefined_length else item.value_offset + item.length
+        undefined = in_undefined_length or item.is_undefined_length
+        _index_dataset(fp, is_implicit_VR, is_little_endian, path + (item_index,), item_end, undefined, locations)
+        item_index += 1
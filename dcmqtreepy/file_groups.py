@@ -0,0 +1,86 @@
+"""How the file navigator groups the listed files: by patient, then study, then series, from their header records.
+
+Files whose header hasn't been read yet are kept in a group of their own until it is, as are files that
+turn out not to be DICOM.  Everything here is plain data, the Qt model is in file_navigator.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from dcmqtreepy.header_index import HeaderRecord, sort_key
+
+PATIENT = "patient"
+STUDY = "study"
+SERIES = "series"
+FILE = "file"
+
+PENDING_LABEL = "Reading headers…"
+NOT_DICOM_LABEL = "Not DICOM"
+
+
+@dataclass(frozen=True)
+class GroupLevel:
+    """A group a file belongs to: key is unique among the groups under the same parent, order sorts them."""
+
+    kind: str
+    key: str
+    label: str
+    order: tuple
+
+
+def _patient_level(record: HeaderRecord) -> GroupLevel:
+    name = record.patient_name or ""
+    patient_id = record.patient_id or ""
+    label = f"{name or 'No Patient Name'} ({patient_id or 'no Patient ID'})"
+    return GroupLevel(PATIENT, f"{patient_id}\\{name}", label, (0, name.lower(), patient_id))
+
+
+def _study_level(record: HeaderRecord) -> GroupLevel:
+    uid = record.study_instance_uid or ""
+    label = f"{record.study_date or ''} {record.study_description or ''}".strip() or (f"Study {uid}" if uid else "")
+    return GroupLevel(STUDY, uid, label or "Unknown Study", (0, record.study_date or "", label.lower()))
+
+
+def _series_level(record: HeaderRecord) -> GroupLevel:
+    uid = record.series_instance_uid or ""
+    number = record.series_number
+    parts = [record.modality or "", f"Series {number}" if number is not None else "", record.series_description or ""]
+    label = " ".join(part for part in parts if part) or "Unknown Series"
+    return GroupLevel(SERIES, uid, label, (0 if number is not None else 1, number or 0, label.lower()))
+
+
+def group_levels(record: Optional[HeaderRecord]) -> List[GroupLevel]:
+    """The groups, outermost first, that the file with record (None if not yet read) is shown in."""
+    if record is None:
+        return [GroupLevel(PATIENT, "", PENDING_LABEL, (1, "", ""))]
+    if not record.is_dicom:
+        return [GroupLevel(PATIENT, "\\not dicom", NOT_DICOM_LABEL, (2, "", ""))]
+    return [_patient_level(record), _study_level(record), _series_level(record)]
+
+
+def file_label(path: str) -> str:
+    return Path(path).name
+
+
+def file_order(record: Optional[HeaderRecord], column: Optional[str], path: str, sequence: int) -> tuple:
+    """Where a file goes among the files of its series: in the order added, or sorted by column (see sort_key)."""
+    if column is None:
+        return (0, 0, "", "", sequence)
+    return sort_key(record, column, path) + (sequence,)
+
+
+def search_text(record: Optional[HeaderRecord], path: str) -> str:
+    """What filtering the navigator matches a file against: its path and the header values it is grouped by."""
+    values = [path]
+    if record is not None and record.is_dicom:
+        values += [
+            record.patient_name,
+            record.patient_id,
+            record.study_description,
+            record.series_description,
+            record.modality,
+            record.label,
+            record.sop_class_name,
+        ]
+    return "\n".join(value for value in values if value)
@@ -0,0 +1,366 @@
+"""The model behind the file navigator: the listed files grouped by patient, study and series (see file_groups).
+
+Files are added by path, and move into their groups as their header records arrive.  A group shows its
+first FETCH_BATCH children, and more as the view asks for them (fetchMore), so a series of thousands of
+instances costs little until it is scrolled through.  FileFilterModel filters it as the user types.
+"""
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QAbstractItemModel, QModelIndex, QSortFilterProxyModel, Qt
+from PySide6.QtGui import QFont
+
+from dcmqtreepy.file_groups import (
+    FILE,
+    file_label,
+    file_order,
+    group_levels,
+    search_text,
+)
+from dcmqtreepy.header_index import HeaderRecord
+
+# children of a group shown at a time
+FETCH_BATCH = 500
+SEARCH_ROLE = Qt.ItemDataRole.UserRole + 1
+COLUMNS = ["Name", "Files"]
+
+
+class NavigatorNode:
+    """A group, or a file (kind FILE, with path), in the navigator; children are kept in order."""
+
+    def __init__(self, kind: str, key: str, label: str, order: tuple, parent: Optional["NavigatorNode"] = None):
+        self.kind = kind
+        self.key = key
+        self.label = label
+        self.order = order
+        self.parent = parent
+        self.children: List[NavigatorNode] = []
+        self.orders: List[tuple] = []
+        # the children that are groups, by key
+        self.groups: Dict[str, NavigatorNode] = {}
+        # the first children, those the views have been told of
+        self.loaded = 0
+        self.file_count = 0
+        self.path: Optional[str] = None
+        self.record: Optional[HeaderRecord] = None
+        self.sequence = 0
+        self.modified = False
+        self.tooltip = ""
+        self.search_text = label
+
+    def row(self) -> int:
+        return bisect_left(self.parent.orders, self.order)
+
+
+class FileNavigatorModel(QAbstractItemModel):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.root = NavigatorNode("", "", "", ())
+        self.files: Dict[str, NavigatorNode] = {}
+        self.sort_column: Optional[str] = None
+        # every child shown as it is added, rather than FETCH_BATCH at a time (while filtering)
+        self.show_all = False
+        self._sequence = 0
+        # groups whose file counts have changed since the views were last told
+        self._recounted: Dict[int, NavigatorNode] = {}
+        # rows are being added or removed; the views are not to fetch more meanwhile
+        self._changing = False
+
+    # QAbstractItemModel
+
+    def node(self, index: QModelIndex) -> NavigatorNode:
+        return index.internalPointer() if index.isValid() else self.root
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self.node(parent)
+        if not 0 <= row < node.loaded or not 0 <= column < len(COLUMNS):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        parent = index.internalPointer().parent
+        if parent is None or parent is self.root:
+            return QModelIndex()
+        return self.createIndex(parent.row(), 0, parent)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return self.node(parent).loaded
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return len(COLUMNS)
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        if parent.column() > 0:
+            return False
+        return bool(self.node(parent).children)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self.node(parent)
+        return not self._changing and node.loaded < len(node.children)
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self.node(parent)
+        count = min(FETCH_BATCH, len(node.children) - node.loaded)
+        if count <= 0 or self._changing:
+            return
+        self._changing = True
+        self.beginInsertRows(parent, node.loaded, node.loaded + count - 1)
+        node.loaded += count
+        self.endInsertRows()
+        self._changing = False
+
+    def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if index.column() == 0:
+                return node.label
+            return str(node.file_count) if node.kind != FILE else None
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if node.kind == FILE:
+                return "\n".join(line for line in (node.path, node.tooltip) if line)
+            return f"{node.label}\n{node.file_count} files"
+        if role == Qt.ItemDataRole.FontRole and node.modified:
+            font = QFont()
+            font.setBold(True)
+            return font
+        if role == SEARCH_ROLE:
+            return node.search_text
+        return None
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return COLUMNS[section]
+        return None
+
+    # keeping the tree
+
+    def _is_shown(self, node: NavigatorNode) -> bool:
+        """Whether the views have been told of node (the root always is)."""
+        while node.parent is not None:
+            if node.row() >= node.parent.loaded:
+                return False
+            node = node.parent
+        return True
+
+    def _index(self, node: NavigatorNode, column: int = 0) -> QModelIndex:
+        if node is self.root:
+            return QModelIndex()
+        return self.createIndex(node.row(), column, node)
+
+    def _insert(self, parent: NavigatorNode, node: NavigatorNode):
+        position = bisect_left(parent.orders, node.order)
+        # appended children are shown straight away while the group is fully shown and small
+        fully_shown = parent.loaded == len(parent.children)
+        shown = self._is_shown(parent) and (
+            position < parent.loaded or (fully_shown and (self.show_all or parent.loaded < FETCH_BATCH))
+        )
+        if shown:
+            self._changing = True
+            self.beginInsertRows(self._index(parent), position, position)
+        node.parent = parent
+        parent.children.insert(position, node)
+        parent.orders.insert(position, node.order)
+        if shown:
+            parent.loaded += 1
+            self.endInsertRows()
+            self._changing = False
+
+    def _detach(self, node: NavigatorNode):
+        """Take node out of the tree, and the groups it leaves empty."""
+        parent = node.parent
+        position = node.row()
+        shown = self._is_shown(parent) and position < parent.loaded
+        if shown:
+            self._changing = True
+            self.beginRemoveRows(self._index(parent), position, position)
+        del parent.children[position]
+        del parent.orders[position]
+        if shown:
+            parent.loaded -= 1
+            self.endRemoveRows()
+            self._changing = False
+        node.parent = None
+        if node.kind != FILE:
+            del parent.groups[node.key]
+        if parent is not self.root and not parent.children:
+            self._detach(parent)
+
+    def _count_files(self, group: NavigatorNode, change: int):
+        while group is not self.root:
+            group.file_count += change
+            self._recounted[id(group)] = group
+            group = group.parent
+        self.root.file_count += change
+
+    def _report_counts(self):
+        for group in self._recounted.values():
+            if group.parent is not None and self._is_shown(group):
+                index = self._index(group, 1)
+                self.dataChanged.emit(index, index)
+        self._recounted.clear()
+
+    def _place(self, node: NavigatorNode):
+        """Put the file node in the groups its record calls for, making them if need be."""
+        parent = self.root
+        for level in group_levels(node.record):
+            group = parent.groups.get(level.key)
+            if group is None:
+                group = NavigatorNode(level.kind, level.key, level.label, level.order + (level.key,))
+                parent.groups[level.key] = group
+                self._insert(parent, group)
+            parent = group
+        node.order = file_order(node.record, self.sort_column, node.path, node.sequence)
+        self._insert(parent, node)
+        self._count_files(parent, 1)
+
+    def _remove(self, node: NavigatorNode):
+        self._count_files(node.parent, -1)
+        self._detach(node)
+
+    def _file_changed(self, node: NavigatorNode):
+        if self._is_shown(node):
+            self.dataChanged.emit(self._index(node), self._index(node, len(COLUMNS) - 1))
+
+    # for the window
+
+    def add_paths(self, paths: Iterable[str], records: Optional[Dict[str, HeaderRecord]] = None) -> List[NavigatorNode]:
+        """Add the files not already listed, grouped by their records if known; the nodes added are returned."""
+        added = []
+        for path in map(str, paths):
+            if path in self.files:
+                continue
+            node = NavigatorNode(FILE, path, file_label(path), ())
+            node.path = path
+            node.record = records.get(path) if records else None
+            node.search_text = search_text(node.record, path)
+            node.sequence = self._sequence
+            self._sequence += 1
+            self.files[path] = node
+            self._place(node)
+            added.append(node)
+        self._report_counts()
+        return added
+
+    def set_records(self, records: Iterable[HeaderRecord]):
+        """Regroup the listed files that records are for; records of files not listed are ignored."""
+        for record in records:
+            node = self.files.get(record.path)
+            if node is None:
+                continue
+            old_levels = [level.key for level in group_levels(node.record)]
+            node.record = record
+            node.search_text = search_text(record, node.path)
+            order = file_order(record, self.sort_column, node.path, node.sequence)
+            if [level.key for level in group_levels(record)] == old_levels and order == node.order:
+                self._file_changed(node)
+                continue
+            self._remove(node)
+            self._place(node)
+        self._report_counts()
+
+    def remove(self, path: str):
+        node = self.files.pop(str(path), None)
+        if node is not None:
+            self._remove(node)
+            self._report_counts()
+
+    def file_nodes(self) -> List[NavigatorNode]:
+        """Every listed file, in the order they were added."""
+        return list(self.files.values())
+
+    def node_for_path(self, path: str) -> Optional[NavigatorNode]:
+        return self.files.get(str(path))
+
+    def set_modified(self, node: NavigatorNode, modified: bool):
+        node.modified = modified
+        self._file_changed(node)
+
+    def set_tooltip(self, node: NavigatorNode, tooltip: str):
+        node.tooltip = tooltip
+        self._file_changed(node)
+
+    def index_for_node(self, node: NavigatorNode) -> QModelIndex:
+        """The index of node, having the groups it is in show enough of their children to include it."""
+        if node.parent is None:
+            return QModelIndex()
+        chain = []
+        while node is not self.root:
+            chain.append(node)
+            node = node.parent
+        for node in reversed(chain):
+            while node.row() >= node.parent.loaded:
+                self.fetchMore(self._index(node.parent))
+        return self._index(chain[0])
+
+    def files_under(self, node: NavigatorNode) -> List[NavigatorNode]:
+        """The files in node (a group, or a file itself), in the order shown."""
+        if node.kind == FILE:
+            return [node]
+        return [file for child in node.children for file in self.files_under(child)]
+
+    def fetch_all(self, node: Optional[NavigatorNode] = None):
+        """Show every child of node (the root by default) and of the groups in it, e.g. for filtering."""
+        node = node if node is not None else self.root
+        if node.loaded < len(node.children):
+            index = self._index(node)
+            self._changing = True
+            self.beginInsertRows(index, node.loaded, len(node.children) - 1)
+            node.loaded = len(node.children)
+            self.endInsertRows()
+            self._changing = False
+        for child in node.groups.values():
+            self.fetch_all(child)
+
+    def sort_files(self, column: Optional[str]):
+        """Order the files of each group by column (see file_groups.file_order), None for the order added."""
+        self.sort_column = column
+        self._changing = True
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        nodes = [index.internalPointer() for index in persistent]
+        groups = [self.root]
+        while groups:
+            group = groups.pop()
+            groups.extend(group.groups.values())
+            if group.groups:
+                continue
+            for child in group.children:
+                child.order = file_order(child.record, column, child.path, child.sequence)
+            group.children.sort(key=lambda child: child.order)
+            group.orders = [child.order for child in group.children]
+        moved = []
+        for index, node in zip(persistent, nodes):
+            row = node.row()
+            moved.append(self.createIndex(row, index.column(), node) if row < node.parent.loaded else QModelIndex())
+        self.changePersistentIndexList(persistent, moved)
+        self._changing = False
+        self.layoutChanged.emit()
+
+
+class FileFilterModel(QSortFilterProxyModel):
+    """Shows the groups and files whose labels, paths or headers contain the filter text, and what is in them."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setRecursiveFilteringEnabled(True)
+        self.setAutoAcceptChildRows(True)
+        self.setFilterRole(SEARCH_ROLE)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+
+    def set_filter_text(self, text: str):
+        # every file has to be in the source model to be found
+        self.sourceModel().show_all = bool(text)
+        if text:
+            self.sourceModel().fetch_all()
+        self.setFilterFixedString(text)
+
+    def node(self, index: QModelIndex) -> NavigatorNode:
+        return self.sourceModel().node(self.mapToSource(index))
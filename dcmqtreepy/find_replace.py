@@ -0,0 +1,251 @@
+"""Find and replace text values across many DICOM files, e.g. correct a station name in a whole folder.
+
+A Replacement names the element to search and a pattern to replace in its values (each value of a multi-valued
+element on its own).  The element is given as:
+
+* a keyword or a tag as 8 hex digits, e.g. StationName or 00081010,
+* creator:name for a private element, by its name in the registered private dictionaries (or its offset in
+  the block as 2 hex digits), e.g. ``SIEMENS MED SYNGO RT:Plan Type``,
+* PrivateCreator for the private creator elements themselves, to correct a misspelt creator.
+
+Elements are searched for in nested sequence items too.  Files are searched on a process pool; every worker
+registers the private dictionaries of the process that started the search (see registered_private_dictionaries),
+so creator:name means the same there as in the editor.  A dry run reports the changes without writing;
+otherwise each changed file is rewritten atomically (see atomic_save).
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pydicom import Dataset, datadict, dcmread, dcmwrite
+from pydicom.errors import InvalidDicomError
+from pydicom.multival import MultiValue
+from pydicom.valuerep import VR, PersonName
+
+from dcmqtreepy.atomic_save import atomic_write
+
+logger = logging.getLogger(__name__)
+
+PRIVATE_CREATORS = "PrivateCreator"
+# values of these VRs are searched; numbers, dates and binary values are left alone
+TEXT_VRS = [VR.AE, VR.CS, VR.LO, VR.LT, VR.PN, VR.SH, VR.ST, VR.UC, VR.UT]
+DEFAULT_MAX_WORKERS = max(1, min(8, (os.cpu_count() or 2) - 1))
+_PRIVATE_KEY = re.compile(r"([0-9A-Fa-f]{4})xx([0-9A-Fa-f]{2})", re.IGNORECASE)
+
+
+@dataclass
+class Replacement:
+    """Replace pattern (a regular expression unless not regex) with replacement in the values of target.
+
+    With whole_value the pattern must match a whole value, e.g. so that "CT1" doesn't change "CT10".
+    """
+
+    target: str
+    pattern: str
+    replacement: str
+    regex: bool = True
+    whole_value: bool = False
+
+    def compiled(self) -> re.Pattern:
+        pattern = self.pattern if self.regex else re.escape(self.pattern)
+        try:
+            return re.compile(f"\\A(?:{pattern})\\Z" if self.whole_value else pattern)
+        except re.error as pattern_exc:
+            raise ValueError(f"{self.pattern!r} is not a valid regular expression: {pattern_exc}") from pattern_exc
+
+
+@dataclass(frozen=True)
+class Change:
+    """One value changed, by where it is in the file (e.g. "IonBeamSequence[1] > Station Name")."""
+
+    location: str
+    old: str
+    new: str
+
+    def describe(self) -> str:
+        return f"{self.location}: {self.old!r} -> {self.new!r}"
+
+
+@dataclass
+class FileResult:
+    """The changes made (or, in a dry run, that would be made) to one file, or the error that stopped it."""
+
+    path: str
+    changes: List[Change] = field(default_factory=list)
+    written: bool = False
+    error: Optional[str] = None
+
+
+def registered_private_dictionaries() -> Dict[str, Dict[str, Tuple[str, str, str, str]]]:
+    """A copy of the private dictionaries registered with pydicom in this process, to register in a worker."""
+    return {creator: dict(entries) for creator, entries in datadict.private_dictionaries.items()}
+
+
+def register_private_dictionaries(private_dictionaries: Dict[str, Dict[str, Tuple[str, str, str, str]]]) -> None:
+    """Register private_dictionaries with pydicom; the initializer of the worker processes."""
+    for creator, entries in private_dictionaries.items():
+        datadict.private_dictionaries.setdefault(creator, {}).update(entries)
+
+
+def private_offsets(private_creator: str, name: str) -> List[Tuple[int, int]]:
+    """(group, offset) of the elements of private_creator named name (case and spaces ignored), or at offset name."""
+    entries = datadict.private_dictionaries.get(private_creator)
+    if entries is None:
+        raise ValueError(f"No private dictionary is registered for {private_creator}")
+
+    def _normalized(text: str) -> str:
+        return re.sub(r"\s+", "", text).lower()
+
+    # (group, offset, name) of the entries of a block, keys like "300bxx02"
+    elements = [
+        (int(match.group(1), 16), int(match.group(2), 16), entry[2])
+        for match, entry in ((_PRIVATE_KEY.fullmatch(key), entry) for key, entry in entries.items())
+        if match is not None
+    ]
+    matches = [(group, offset) for group, offset, entry_name in elements if _normalized(entry_name) == _normalized(name)]
+    if not matches and re.fullmatch(r"[0-9A-Fa-f]{2}", name):
+        matches = [(group, int(name, 16)) for group in sorted({group for group, _, _ in elements})]
+    if not matches:
+        raise ValueError(f"{private_creator} has no element named {name}")
+    return matches
+
+
+def _location(parents: Tuple[str, ...], name: str) -> str:
+    return " > ".join(parents + (name,))
+
+
+def _replace_values(elem, pattern: re.Pattern, replacement: str, location: str, changes: List[Change]) -> None:
+    values = list(elem.value) if isinstance(elem.value, (list, MultiValue)) else [elem.value]
+    new_values = []
+    for value in values:
+        old = str(value) if value is not None else ""
+        new = pattern.sub(replacement, old)
+        if new != old:
+            changes.append(Change(location, old, new))
+        new_values.append(new)
+    if new_values != [str(value) if value is not None else "" for value in values]:
+        if elem.VR == VR.PN:
+            new_values = [PersonName(value) for value in new_values]
+        elem.value = new_values if len(new_values) > 1 else new_values[0]
+
+
+def replace_in_dataset(
+    ds: Dataset, replacement: Replacement, pattern: Optional[re.Pattern] = None, parents: Tuple[str, ...] = ()
+) -> List[Change]:
+    """Apply replacement to ds and the items of its sequences, returning the changes made."""
+    pattern = pattern or replacement.compiled()
+    target = replacement.target.strip()
+    changes: List[Change] = []
+    if target == PRIVATE_CREATORS:
+        tags = [tag for tag in ds.keys() if tag.is_private_creator]
+    elif ":" in target:
+        private_creator, name = (part.strip() for part in target.split(":", 1))
+        tags = []
+        for group, offset in private_offsets(private_creator, name):
+            try:
+                tags.append(ds.private_block(group, private_creator).get_tag(offset))
+            except KeyError:
+                continue
+    else:
+        tag = int(target, 16) if re.fullmatch(r"[0-9A-Fa-f]{8}", target) else datadict.tag_for_keyword(target)
+        if tag is None:
+            raise ValueError(f"{target} is not a keyword, tag, creator:name or {PRIVATE_CREATORS}")
+        tags = [tag]
+    for tag in tags:
+        if tag in ds and ds[tag].VR in TEXT_VRS and not ds[tag].is_empty:
+            _replace_values(ds[tag], pattern, replacement.replacement, _location(parents, ds[tag].name), changes)
+    for elem in ds:
+        if elem.VR == VR.SQ:
+            for index, item in enumerate(elem.value, start=1):
+                changes.extend(replace_in_dataset(item, replacement, pattern, parents + (f"{elem.name}[{index}]",)))
+    return changes
+
+
+def find_replace_file(path: str, replacements: List[Replacement], dry_run: bool = True) -> FileResult:
+    """Apply replacements to the file at path, rewriting it unless dry_run or nothing changed."""
+    result = FileResult(path)
+    try:
+        ds = dcmread(path)
+        for replacement in replacements:
+            result.changes.extend(replace_in_dataset(ds, replacement))
+        if result.changes and not dry_run:
+            with atomic_write(path) as partial:
+                dcmwrite(partial, ds, write_like_original=True)
+            result.written = True
+    except InvalidDicomError:
+        result.error = "Not a DICOM file"
+    except Exception as find_replace_exc:
+        logger.error(f"Find and replace in {path} failed: {find_replace_exc}")
+        result.error = str(find_replace_exc)
+    return result
+
+
+def collect_files(paths: Iterable[Path | str]) -> List[str]:
+    """The files among paths, and those in folders among them (searched recursively), in order."""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(str(found) for found in sorted(path.rglob("*")) if found.is_file() and not found.name.startswith("."))
+        elif path.is_file():
+            files.append(str(path))
+    return files
+
+
+def find_replace(
+    paths: Iterable[Path | str],
+    replacements: List[Replacement],
+    dry_run: bool = True,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    cancelled: Optional[threading.Event] = None,
+) -> Iterator[FileResult]:
+    """Apply replacements to every file of paths (folders searched recursively) on a process pool.
+
+    Results are yielded as the files are done, not in order.  Raises ValueError before any file is read if
+    a replacement can't be used.  Once cancelled is set, files not yet started are skipped.
+    """
+    for replacement in replacements:
+        replacement.compiled()
+        replace_in_dataset(Dataset(), replacement)  # checks the target
+    files = collect_files(paths)
+    if not files:
+        return
+    # workers are started fresh rather than forked, as forking a process running other threads (Qt's) isn't safe
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(files)),
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=register_private_dictionaries,
+        initargs=(registered_private_dictionaries(),),
+    ) as executor:
+        futures = [executor.submit(find_replace_file, path, replacements, dry_run) for path in files]
+        for future in as_completed(futures):
+            if cancelled is not None and cancelled.is_set():
+                for pending in futures:
+                    pending.cancel()
+                if future.cancelled():
+                    continue
+            yield future.result()
+
+
+def format_report(results: List[FileResult], dry_run: bool) -> str:
+    """A summary of results: each file with changes (or an error) and its changes, then the totals."""
+    lines = []
+    changed = 0
+    for result in sorted(results, key=lambda result: result.path):
+        if result.error is not None:
+            lines.append(f"{result.path}: {result.error}")
+        elif result.changes:
+            changed += 1
+            lines.append(f"{result.path}: {len(result.changes)} change(s)")
+            lines.extend(f"    {change.describe()}" for change in result.changes)
+    failed = sum(1 for result in results if result.error is not None)
+    verb = "would change" if dry_run else "changed"
+    lines.append(f"{len(results)} files searched, {verb} {changed}, {failed} not read or written")
+    return "\n".join(lines)
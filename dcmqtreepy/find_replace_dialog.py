@@ -0,0 +1,229 @@
+"""A dialog to find and replace values in the listed files or a folder (see find_replace)."""
+
+import logging
+import threading
+from typing import List, Optional
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+from PySide6.QtWidgets import (
+    QCheckBox,
+    QComboBox,
+    QDialog,
+    QFileDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPlainTextEdit,
+    QProgressBar,
+    QPushButton,
+    QRadioButton,
+    QVBoxLayout,
+)
+
+from dcmqtreepy.find_replace import (
+    PRIVATE_CREATORS,
+    FileResult,
+    Replacement,
+    collect_files,
+    find_replace,
+    format_report,
+)
+
+logger = logging.getLogger(__name__)
+
+# offered in the element box, which also takes any keyword, tag or creator:name
+COMMON_TARGETS = [
+    "StationName",
+    "InstitutionName",
+    "InstitutionalDepartmentName",
+    "ReferringPhysicianName",
+    "PerformingPhysicianName",
+    "OperatorsName",
+    "Manufacturer",
+    "ManufacturerModelName",
+    "TreatmentMachineName",
+    PRIVATE_CREATORS,
+]
+
+
+class FindReplaceSignals(QObject):
+    # result of one file, files done, total
+    file_done = Signal(object, int, int)
+    # the report of the whole run
+    finished = Signal(str)
+    failed = Signal(str)
+
+
+class FindReplaceWorker(QRunnable):
+    """Run find_replace over files on a pool thread (the files themselves are done on a process pool)."""
+
+    def __init__(self, files: List[str], replacement: Replacement, dry_run: bool):
+        super().__init__()
+        self.files = files
+        self.replacement = replacement
+        self.dry_run = dry_run
+        self.signals = FindReplaceSignals()
+        self.cancelled = threading.Event()
+        self.setAutoDelete(False)
+
+    def run(self):
+        results: List[FileResult] = []
+        try:
+            for result in find_replace(self.files, [self.replacement], self.dry_run, cancelled=self.cancelled):
+                results.append(result)
+                self.signals.file_done.emit(result, len(results), len(self.files))
+        except ValueError as replacement_exc:
+            self.signals.failed.emit(str(replacement_exc))
+            return
+        except Exception as find_replace_exc:
+            logger.error(f"Find and replace failed: {find_replace_exc}", exc_info=True)
+            self.signals.failed.emit(str(find_replace_exc))
+            return
+        cancelled = "\nCancelled, the remaining files were not searched" if self.cancelled.is_set() else ""
+        self.signals.finished.emit(format_report(results, self.dry_run) + cancelled)
+
+
+class FindReplaceDialog(QDialog):
+    """Find and replace the values of one element in the listed files or the files of a folder.
+
+    A dry run lists what would change; Replace rewrites the files, announcing each with file_written.
+    """
+
+    file_written = Signal(str)
+
+    def __init__(self, listed_files: List[str], thread_pool: QThreadPool, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Find and Replace")
+        self.listed_files = listed_files
+        self.thread_pool = thread_pool
+        self.worker: Optional[FindReplaceWorker] = None
+
+        self.target_combo = QComboBox()
+        self.target_combo.setEditable(True)
+        self.target_combo.addItems(COMMON_TARGETS)
+        self.target_combo.setToolTip(
+            f"A keyword, a tag as 8 hex digits, creator:name for a private element, or {PRIVATE_CREATORS}"
+        )
+        self.find_edit = QLineEdit()
+        self.replace_edit = QLineEdit()
+        self.regex_check = QCheckBox("Regular expression")
+        self.whole_value_check = QCheckBox("Whole value only")
+        self.whole_value_check.setChecked(True)
+        options = QHBoxLayout()
+        options.addWidget(self.regex_check)
+        options.addWidget(self.whole_value_check)
+        self.list_radio = QRadioButton(f"The {len(listed_files)} listed files")
+        self.list_radio.setChecked(bool(listed_files))
+        self.folder_radio = QRadioButton("Folder (and its subfolders)")
+        self.folder_radio.setChecked(not listed_files)
+        self.folder_edit = QLineEdit()
+        browse_button = QPushButton("Browse...")
+        browse_button.clicked.connect(self.on_browse)
+        folder_row = QHBoxLayout()
+        folder_row.addWidget(self.folder_radio)
+        folder_row.addWidget(self.folder_edit)
+        folder_row.addWidget(browse_button)
+        form = QFormLayout()
+        form.addRow("Element", self.target_combo)
+        form.addRow("Find", self.find_edit)
+        form.addRow("Replace with", self.replace_edit)
+        form.addRow("", options)
+        form.addRow("Search", self.list_radio)
+        form.addRow("", folder_row)
+
+        self.dry_run_button = QPushButton("Dry Run")
+        self.dry_run_button.clicked.connect(lambda: self.start(dry_run=True))
+        self.replace_button = QPushButton("Replace")
+        self.replace_button.clicked.connect(lambda: self.start(dry_run=False))
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.on_cancel)
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.close)
+        buttons = QHBoxLayout()
+        for button in (self.dry_run_button, self.replace_button, self.cancel_button):
+            buttons.addWidget(button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+        self.progress_bar = QProgressBar()
+        self.status_label = QLabel()
+        self.report_edit = QPlainTextEdit()
+        self.report_edit.setReadOnly(True)
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addLayout(buttons)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.status_label)
+        layout.addWidget(self.report_edit)
+        self.resize(800, 600)
+
+    def on_browse(self):
+        folder = QFileDialog.getExistingDirectory(self, "Find and Replace in Folder", self.folder_edit.text())
+        if folder:
+            self.folder_edit.setText(folder)
+            self.folder_radio.setChecked(True)
+
+    def files(self) -> List[str]:
+        if self.list_radio.isChecked():
+            return list(self.listed_files)
+        folder = self.folder_edit.text().strip()
+        return collect_files([folder]) if folder else []
+
+    def replacement(self) -> Replacement:
+        return Replacement(
+            self.target_combo.currentText().strip(),
+            self.find_edit.text(),
+            self.replace_edit.text(),
+            regex=self.regex_check.isChecked(),
+            whole_value=self.whole_value_check.isChecked(),
+        )
+
+    def start(self, dry_run: bool):
+        if self.worker is not None:
+            return
+        if not self.find_edit.text():
+            self.status_label.setText("Enter the text to find")
+            return
+        files = self.files()
+        if not files:
+            self.status_label.setText("No files to search")
+            return
+        self.report_edit.clear()
+        self.progress_bar.setValue(0)
+        self.status_label.setText(f"{'Checking' if dry_run else 'Replacing in'} {len(files)} files")
+        self.worker = FindReplaceWorker(files, self.replacement(), dry_run)
+        self.worker.signals.file_done.connect(self.handle_file_done)
+        self.worker.signals.finished.connect(self.handle_finished)
+        self.worker.signals.failed.connect(self.handle_finished)
+        self.set_running(True)
+        self.thread_pool.start(self.worker)
+
+    def set_running(self, running: bool):
+        self.dry_run_button.setEnabled(not running)
+        self.replace_button.setEnabled(not running)
+        self.cancel_button.setEnabled(running)
+
+    def on_cancel(self):
+        if self.worker is not None:
+            self.worker.cancelled.set()
+
+    @Slot(object, int, int)
+    def handle_file_done(self, result: FileResult, done: int, total: int):
+        self.progress_bar.setValue(done * 100 // total)
+        if result.written:
+            self.file_written.emit(result.path)
+
+    @Slot(str)
+    def handle_finished(self, report: str):
+        self.worker = None
+        self.set_running(False)
+        self.progress_bar.setValue(100)
+        self.status_label.setText(report.splitlines()[-1] if report else "")
+        self.report_edit.setPlainText(report)
+
+    def closeEvent(self, event):
+        self.on_cancel()
+        super().closeEvent(event)
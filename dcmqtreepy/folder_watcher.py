@@ -0,0 +1,189 @@
+"""Watch folders (and their subfolders) for files arriving or being rewritten, e.g. a planning system's exports.
+
+Changes are noticed through QFileSystemWatcher (inotify on Linux), which watches the folders, and the files
+in them so that files rewritten in place are noticed too.  Where that isn't possible (too many files, or a
+file system that can't be watched) the folders are scanned every POLL_SECONDS instead.  Scans look only at
+the files' sizes and times, and ChangeDebouncer holds back each file until it has been completely written.
+Scans (the folder walk and the debouncing) run one at a time on a pool thread, and only their results come
+back to the GUI thread, so a large or slow (network) folder never holds up the editor.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import (
+    QFileSystemWatcher,
+    QObject,
+    QRunnable,
+    QThreadPool,
+    QTimer,
+    Signal,
+)
+
+from dcmqtreepy.change_debouncer import SETTLE_SECONDS, ChangeDebouncer, SettledChanges
+from dcmqtreepy.header_index import walk_folder
+
+logger = logging.getLogger(__name__)
+
+# a burst of changes is scanned once, this long after the first
+SCAN_DELAY_MILLISECONDS = 300
+POLL_SECONDS = 5
+# beyond this many files only the folders are watched, and the files polled
+MAX_WATCHED_FILES = 2000
+
+
+@dataclass
+class ScanResult:
+    """What a scan found: the files and folders to watch, the settled changes, and when to scan again."""
+
+    generation: int
+    files: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    folders: List[str] = field(default_factory=list)
+    changes: SettledChanges = field(default_factory=SettledChanges)
+    settle_in: Optional[float] = None
+
+
+class ScanSignals(QObject):
+    # the ScanResult
+    finished = Signal(object)
+
+
+class ScanWorker(QRunnable):
+    """Walk folders on a pool thread and give what is found to debouncer, after taking new_folders as they are."""
+
+    def __init__(self, generation: int, folders: List[Path], new_folders: List[Path], debouncer: ChangeDebouncer):
+        super().__init__()
+        self.generation = generation
+        self.folders = folders
+        self.new_folders = new_folders
+        self.debouncer = debouncer
+        self.signals = ScanSignals()
+        self.setAutoDelete(False)
+
+    def run(self):
+        result = ScanResult(self.generation)
+        try:
+            for folder in self.new_folders:
+                new_files, _ = walk_folder(folder)
+                self.debouncer.start(new_files)
+            for folder in self.folders:
+                folder_files, subfolders = walk_folder(folder)
+                result.files.update(folder_files)
+                result.folders.extend(subfolders)
+            result.changes = self.debouncer.observe(result.files)
+            result.settle_in = self.debouncer.next_settle_in()
+        except Exception as scan_exc:
+            logger.error(f"Scanning the watched folders failed: {scan_exc}", exc_info=True)
+        self.signals.finished.emit(result)
+
+
+class FolderWatcher(QObject):
+    """Reports files that appear or change in the watched folders once they are written, and files that go."""
+
+    # paths of the files new or changed
+    files_changed = Signal(list)
+    # paths of the files removed
+    files_removed = Signal(list)
+
+    def __init__(self, settle_seconds: float = SETTLE_SECONDS, parent=None):
+        super().__init__(parent)
+        self.settle_seconds = settle_seconds
+        self.folders: List[Path] = []
+        self.debouncer = ChangeDebouncer(settle_seconds)
+        # folders whose files are taken as they are by the next scan
+        self.new_folders: List[Path] = []
+        # bumped by unwatch_all, so a scan running then is ignored
+        self.generation = 0
+        self.scan_worker: ScanWorker | None = None
+        self.rescan = False
+        self.thread_pool = QThreadPool(self)
+        self.thread_pool.setMaxThreadCount(1)
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.schedule_scan)
+        self.watcher.fileChanged.connect(self.schedule_scan)
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setSingleShot(True)
+        self.scan_timer.timeout.connect(self.scan)
+        self.poll_timer = QTimer(self)
+        self.poll_timer.setInterval(POLL_SECONDS * 1000)
+        self.poll_timer.timeout.connect(self.scan)
+
+    @property
+    def polling(self) -> bool:
+        return self.poll_timer.isActive()
+
+    def watch(self, folder: Path) -> bool:
+        """Report changes in folder from now on; False if it is watched already."""
+        folder = Path(folder)
+        if folder in self.folders:
+            return False
+        self.folders.append(folder)
+        self.new_folders.append(folder)
+        # which also starts watching it
+        self.scan()
+        return True
+
+    def unwatch_all(self):
+        self.folders = []
+        self.new_folders = []
+        self.generation += 1
+        self.rescan = False
+        self.debouncer = ChangeDebouncer(self.settle_seconds)
+        self._watch_paths({}, [])
+
+    def _watch_paths(self, files: Dict[str, Tuple[int, int]], folders: List[str]):
+        """Have QFileSystemWatcher watch the folders, and the files if there aren't too many; poll if it can't."""
+        wanted: Set[str] = set(folders)
+        if len(files) <= MAX_WATCHED_FILES:
+            wanted.update(files)
+        watched = set(self.watcher.directories()) | set(self.watcher.files())
+        if watched - wanted:
+            self.watcher.removePaths(list(watched - wanted))
+        failed = self.watcher.addPaths(list(wanted - watched)) if wanted - watched else []
+        if self.folders and (failed or len(files) > MAX_WATCHED_FILES):
+            if not self.poll_timer.isActive():
+                logger.info(f"Polling the watched folders every {POLL_SECONDS} seconds ({len(failed)} paths can't be watched)")
+                self.poll_timer.start()
+        else:
+            self.poll_timer.stop()
+
+    def _scan_within(self, milliseconds: int):
+        if not self.scan_timer.isActive() or self.scan_timer.remainingTime() > milliseconds:
+            self.scan_timer.start(milliseconds)
+
+    def schedule_scan(self, path: str = ""):
+        self._scan_within(SCAN_DELAY_MILLISECONDS)
+
+    def scan(self):
+        """Start a scan of the watched folders on the pool thread, or another once the one running is done."""
+        if not self.folders:
+            return
+        if self.scan_worker is not None:
+            self.rescan = True
+            return
+        self.scan_worker = ScanWorker(self.generation, list(self.folders), self.new_folders, self.debouncer)
+        self.new_folders = []
+        self.scan_worker.signals.finished.connect(self.handle_scan_finished)
+        self.thread_pool.start(self.scan_worker)
+
+    def handle_scan_finished(self, result: ScanResult):
+        """Watch what the scan found, and report the files written since the last scan, and those gone."""
+        self.scan_worker = None
+        if result.generation != self.generation:
+            # unwatched while scanning
+            self.scan()
+            return
+        self._watch_paths(result.files, result.folders)
+        if result.changes.removed:
+            self.files_removed.emit(result.changes.removed)
+        if result.changes.changed:
+            self.files_changed.emit(result.changes.changed)
+        if self.rescan or self.new_folders:
+            self.rescan = False
+            self.scan()
+        elif result.settle_in is not None:
+            # files still being written are looked at again once they may have been completed
+            self._scan_within(int(result.settle_in * 1000) + 50)
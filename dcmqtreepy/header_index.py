@@ -0,0 +1,389 @@
+"""An index of the headers of DICOM files in SQLite, so that a folder can be browsed without opening each file.
+
+Only the header is read (up to the pixel data, and only the elements in HEADER_FIELDS), on a thread pool.  Each
+file's size and modification time are kept with its header, and re-indexing reads only files that are new
+or have changed since, and forgets files that have gone.  Files are taken to be DICOM by the "DICM" after
+their preamble, not by their names, and those that aren't are kept too (with is_dicom false), so they
+aren't read again either.
+
+The index lives in the user cache directory (see index_path) and is shared by every folder indexed.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import astuple, dataclass, fields
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import platformdirs
+from pydicom import dcmread
+from pydicom.errors import InvalidDicomError
+from pydicom.uid import UID
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+DEFAULT_MAX_WORKERS = 8
+# header records are written to the index this many at a time
+WRITE_BATCH_SIZE = 500
+# and passed to on_records (see HeaderIndex.update_folder) this many at a time
+REPORT_BATCH_SIZE = 100
+
+# column of the index, keyword of the element it holds
+HEADER_FIELDS: List[Tuple[str, str]] = [
+    ("patient_id", "PatientID"),
+    ("patient_name", "PatientName"),
+    ("study_instance_uid", "StudyInstanceUID"),
+    ("study_date", "StudyDate"),
+    ("study_description", "StudyDescription"),
+    ("series_instance_uid", "SeriesInstanceUID"),
+    ("series_number", "SeriesNumber"),
+    ("series_description", "SeriesDescription"),
+    ("modality", "Modality"),
+    ("sop_class_uid", "SOPClassUID"),
+    ("sop_instance_uid", "SOPInstanceUID"),
+    ("instance_number", "InstanceNumber"),
+    ("rt_plan_label", "RTPlanLabel"),
+    ("structure_set_label", "StructureSetLabel"),
+    ("approval_status", "ApprovalStatus"),
+]
+# read as well, as the names are decoded with it
+_READ_KEYWORDS = ["SpecificCharacterSet"] + [keyword for _, keyword in HEADER_FIELDS]
+_PREAMBLE_LENGTH = 128
+_MAGIC_END = _PREAMBLE_LENGTH + 4
+
+
+def index_path() -> Path:
+    return Path(platformdirs.user_cache_dir("dcmQTreePy")) / "header_index.sqlite"
+
+
+@dataclass
+class HeaderRecord:
+    """What the index holds for one file."""
+
+    path: str
+    size: int
+    mtime_ns: int
+    is_dicom: bool = True
+    patient_id: Optional[str] = None
+    patient_name: Optional[str] = None
+    study_instance_uid: Optional[str] = None
+    study_date: Optional[str] = None
+    study_description: Optional[str] = None
+    series_instance_uid: Optional[str] = None
+    series_number: Optional[int] = None
+    series_description: Optional[str] = None
+    modality: Optional[str] = None
+    sop_class_uid: Optional[str] = None
+    sop_instance_uid: Optional[str] = None
+    instance_number: Optional[int] = None
+    rt_plan_label: Optional[str] = None
+    structure_set_label: Optional[str] = None
+    approval_status: Optional[str] = None
+
+    @property
+    def sop_class_name(self) -> str:
+        return UID(self.sop_class_uid).name if self.sop_class_uid else ""
+
+    @property
+    def label(self) -> str:
+        """The plan or structure set label, or the series description, whichever the file has."""
+        return self.rt_plan_label or self.structure_set_label or self.series_description or ""
+
+    def describe(self) -> str:
+        """A few lines for a tooltip."""
+        if not self.is_dicom:
+            return "Not a DICOM file"
+        lines = [
+            f"{self.patient_name or ''} ({self.patient_id or 'no Patient ID'})",
+            f"{self.modality or ''} {self.sop_class_name}".strip(),
+            f"Study {self.study_date or ''} {self.study_description or ''}".rstrip(),
+        ]
+        numbers = [
+            f"{name} {number}"
+            for name, number in (("Series", self.series_number), ("Instance", self.instance_number))
+            if number is not None
+        ]
+        if numbers:
+            lines.append(", ".join(numbers))
+        if self.label:
+            lines.append(f"{self.label} {self.approval_status or ''}".rstrip())
+        return "\n".join(lines)
+
+
+_COLUMNS = [field.name for field in fields(HeaderRecord)]
+_INTEGER_COLUMNS = {"size", "mtime_ns", "is_dicom", "series_number", "instance_number"}
+
+
+def _value(ds, keyword: str, column: str):
+    value = ds.get(keyword)
+    if value is None or value == "":
+        return None
+    if column in _INTEGER_COLUMNS:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+    return str(value)
+
+
+def has_dicom_magic(path: Path | str) -> bool:
+    """Whether the file at path has the 128 byte preamble followed by "DICM" of a DICOM file, whatever its name."""
+    try:
+        with open(path, "rb") as dicom_file:
+            return dicom_file.read(_MAGIC_END)[_PREAMBLE_LENGTH:] == b"DICM"
+    except OSError:
+        return False
+
+
+def read_header(path: str, size: int, mtime_ns: int) -> HeaderRecord:
+    """The header record of the file at path, read no further than needed; is_dicom is False if it isn't DICOM."""
+    if not has_dicom_magic(path):
+        # not worth parsing, dcmread would refuse it anyway
+        return HeaderRecord(path, size, mtime_ns, is_dicom=False)
+    try:
+        ds = dcmread(path, stop_before_pixels=True, specific_tags=_READ_KEYWORDS)
+    except (InvalidDicomError, EOFError, ValueError, OSError) as header_exc:
+        logger.debug(f"{path} is not indexed as DICOM: {header_exc}")
+        return HeaderRecord(path, size, mtime_ns, is_dicom=False)
+    return record_from_dataset(ds, path, size, mtime_ns)
+
+
+def record_from_dataset(ds, path: str, size: int, mtime_ns: int) -> HeaderRecord:
+    """The header record of the file at path, from ds (its header, or what a DICOMDIR says of it)."""
+    values = {column: _value(ds, keyword, column) for column, keyword in HEADER_FIELDS}
+    return HeaderRecord(path, size, mtime_ns, **values)
+
+
+def walk_folder(
+    folder: Path | str, cancelled: Optional[threading.Event] = None
+) -> Tuple[Dict[str, Tuple[int, int]], List[str]]:
+    """(size, mtime_ns) of every file under folder, and the folders listed, hidden ones (and what is in them) left out."""
+    found = {}
+    folders = []
+    pending = [str(folder)]
+    while pending and not (cancelled is not None and cancelled.is_set()):
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                folders.append(directory)
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.is_file():
+                        try:
+                            stat = entry.stat()
+                        except FileNotFoundError:
+                            # removed since the folder was listed
+                            continue
+                        found[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as scan_exc:
+            logger.warning(f"Unable to list {scan_exc.filename}: {scan_exc.strerror}")
+    return found, folders
+
+
+def scan_folder(folder: Path | str, cancelled: Optional[threading.Event] = None) -> Dict[str, Tuple[int, int]]:
+    """(size, mtime_ns) of every file under folder, hidden ones (and those in hidden folders) left out."""
+    return walk_folder(folder, cancelled)[0]
+
+
+@dataclass
+class IndexUpdate:
+    """The outcome of indexing a folder or some files: their records, and what was read or forgotten."""
+
+    records: List[HeaderRecord]
+    read: int = 0
+    unchanged: int = 0
+    removed: int = 0
+    cancelled: bool = False
+
+    def describe(self) -> str:
+        dicom_files = sum(1 for record in self.records if record.is_dicom)
+        text = f"{dicom_files} DICOM files indexed, {self.read} read, {self.unchanged} unchanged, {self.removed} gone"
+        return text + (" (cancelled)" if self.cancelled else "")
+
+
+class HeaderIndex:
+    """The header index in the SQLite database at db_path, created if need be.
+
+    A connection is opened for each call, so an index can be used from any thread.
+    """
+
+    def __init__(self, db_path: Path | str, max_workers: int = DEFAULT_MAX_WORKERS):
+        self.db_path = Path(db_path)
+        self.max_workers = max_workers
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._write_lock = threading.Lock()
+        with closing(self._connect()) as connection, connection:
+            version = connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                # the index is only a cache of the files, so an old one is simply rebuilt
+                connection.execute("DROP TABLE IF EXISTS headers")
+            column_types = ", ".join(
+                f"{column} {'INTEGER' if column in _INTEGER_COLUMNS else 'TEXT'}" for column in _COLUMNS[1:]
+            )
+            connection.execute(f"CREATE TABLE IF NOT EXISTS headers (path TEXT PRIMARY KEY, {column_types})")
+            connection.execute("CREATE INDEX IF NOT EXISTS headers_study ON headers (study_instance_uid)")
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode = WAL")
+        return connection
+
+    @staticmethod
+    def _record(row: tuple) -> HeaderRecord:
+        record = HeaderRecord(*row)
+        record.is_dicom = bool(record.is_dicom)
+        return record
+
+    def records(self, paths: Optional[Iterable[str]] = None, folder: Path | str | None = None) -> List[HeaderRecord]:
+        """The records of paths, or of every file indexed under folder, or of every file indexed."""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM headers"
+        with closing(self._connect()) as connection:
+            if paths is not None:
+                wanted = list(paths)
+                rows = []
+                for start in range(0, len(wanted), WRITE_BATCH_SIZE):
+                    batch = wanted[start : start + WRITE_BATCH_SIZE]
+                    placeholders = ", ".join("?" * len(batch))
+                    rows.extend(connection.execute(f"{query} WHERE path IN ({placeholders})", batch).fetchall())
+            elif folder is not None:
+                prefix = os.path.join(str(folder), "")
+                rows = connection.execute(f"{query} WHERE path >= ? AND path < ?", (prefix, prefix + "\uffff")).fetchall()
+            else:
+                rows = connection.execute(query).fetchall()
+        return [self._record(row) for row in rows]
+
+    def _store(self, records: List[HeaderRecord], removed: Iterable[str] = ()) -> None:
+        placeholders = ", ".join("?" * len(_COLUMNS))
+        with self._write_lock, closing(self._connect()) as connection, connection:
+            connection.executemany(
+                f"INSERT OR REPLACE INTO headers ({', '.join(_COLUMNS)}) VALUES ({placeholders})",
+                [astuple(record) for record in records],
+            )
+            connection.executemany("DELETE FROM headers WHERE path = ?", [(path,) for path in removed])
+
+    def _update(
+        self,
+        found: Dict[str, Tuple[int, int]],
+        known: Dict[str, HeaderRecord],
+        removed: List[str],
+        progress: Optional[Callable[[int, int], None]],
+        cancelled: Optional[threading.Event],
+        on_records: Optional[Callable[[List[HeaderRecord]], None]],
+    ) -> IndexUpdate:
+        stale = [
+            path
+            for path, signature in found.items()
+            if path not in known or (known[path].size, known[path].mtime_ns) != signature
+        ]
+        stale_paths = set(stale)
+        update = IndexUpdate(
+            records=[known[path] for path in found if path not in stale_paths],
+            unchanged=len(found) - len(stale),
+            removed=len(removed),
+        )
+        self._store([], removed)
+        if on_records is not None and update.records:
+            on_records(list(update.records))
+        pending: List[HeaderRecord] = []
+        unreported: List[HeaderRecord] = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for record in executor.map(lambda path: read_header(path, *found[path]), stale):
+                pending.append(record)
+                unreported.append(record)
+                update.read += 1
+                if on_records is not None and len(unreported) == REPORT_BATCH_SIZE:
+                    on_records(unreported)
+                    unreported = []
+                if len(pending) == WRITE_BATCH_SIZE:
+                    self._store(pending)
+                    update.records.extend(pending)
+                    pending = []
+                if progress is not None:
+                    progress(update.read, len(stale))
+                if cancelled is not None and cancelled.is_set():
+                    update.cancelled = True
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    break
+        self._store(pending)
+        update.records.extend(pending)
+        if on_records is not None and unreported:
+            on_records(unreported)
+        return update
+
+    def update_folder(
+        self,
+        folder: Path | str,
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        on_records: Optional[Callable[[List[HeaderRecord]], None]] = None,
+    ) -> IndexUpdate:
+        """Index the files under folder, reading only those new or changed since they were last indexed.
+
+        progress is called with the number of files read so far and the number to read.  on_records is called
+        with the records as they become known: those unchanged first, then those read, a batch at a time.
+        """
+        found = scan_folder(folder, cancelled)
+        if cancelled is not None and cancelled.is_set():
+            # what wasn't reached mustn't be forgotten
+            return IndexUpdate(records=[], cancelled=True)
+        known = {record.path: record for record in self.records(folder=folder)}
+        removed = [path for path in known if path not in found]
+        return self._update(found, known, removed, progress, cancelled, on_records)
+
+    def update_files(
+        self,
+        paths: Iterable[Path | str],
+        progress: Optional[Callable[[int, int], None]] = None,
+        cancelled: Optional[threading.Event] = None,
+        on_records: Optional[Callable[[List[HeaderRecord]], None]] = None,
+    ) -> IndexUpdate:
+        """Index the files at paths, as update_folder does; paths that no longer exist are forgotten."""
+        found = {}
+        removed = []
+        for path in map(str, paths):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                removed.append(path)
+                continue
+            found[path] = (stat.st_size, stat.st_mtime_ns)
+        known = {record.path: record for record in self.records(paths=found)}
+        return self._update(found, known, removed, progress, cancelled, on_records)
+
+
+# column of HeaderRecord, label: the orders a list of files can be sorted in
+SORT_KEYS: List[Tuple[str, str]] = [
+    ("path", "Path"),
+    ("patient_name", "Patient"),
+    ("study_date", "Study Date"),
+    ("series_number", "Series"),
+    ("instance_number", "Instance Number"),
+    ("modality", "Modality"),
+    ("sop_class_uid", "SOP Class"),
+    ("label", "Plan or Structure Set Label"),
+    ("size", "File Size"),
+    ("mtime_ns", "Modified"),
+]
+
+
+def sort_key(record: Optional[HeaderRecord], column: str, path: str) -> tuple:
+    """A key ordering files by column, then path; files without a value (or a record) go last."""
+    value = getattr(record, column, None) if record is not None else None
+    if column == "path":
+        value = path
+    if column == "sop_class_uid" and value:
+        value = record.sop_class_name
+    if value is None or value == "":
+        return (1, 0, "", path)
+    if isinstance(value, (int, float)):
+        return (0, value, "", path)
+    return (0, 0, str(value).lower(), path)
@@ -0,0 +1,218 @@
+"""Patch edited values directly into a DICOM file when their encoded length doesn't change.
+
+Correcting a UI, a DA or a float in a private block of a very large file only needs the few bytes of the
+value rewritten.  When every edit keeps its encoded length and the structure of the dataset is unchanged,
+the new values are written at the offsets recorded by element_offsets.index_element_locations; otherwise
+nothing is written and the caller saves the whole file as usual.  Elements inside values of undefined
+length are never patched.
+
+Before a file is patched in place, the original bytes of the ranges about to be written are saved to a
+small journal next to it (hidden, see journal_path), which is removed once the patches are on disk.  If the
+editor dies part way through, recover_interrupted_patch puts those bytes back, so the file is never left
+half patched without keeping a copy of the whole file.
+"""
+
+import logging
+import os
+import shutil
+import struct
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+from pydicom import DataElement, Dataset
+from pydicom.charset import default_encoding
+from pydicom.filebase import DicomBytesIO
+from pydicom.filewriter import write_data_element
+from pydicom.valuerep import VR
+
+from dcmqtreepy.atomic_save import atomic_write, path_lock, path_locks
+from dcmqtreepy.dataset_paths import NodePath
+from dcmqtreepy.element_offsets import (
+    index_element_locations,
+    is_seekable_encoding,
+    read_element_header,
+    transfer_syntax_encoding,
+)
+from dcmqtreepy.preserving_writer import COPY_CHUNK_BYTES, source_transfer_syntax
+
+logger = logging.getLogger(__name__)
+
+BACKUP_SUFFIX = ".bak"
+JOURNAL_MAGIC = b"dcmQTreePy patch journal 1\n"
+# offset and length of each range in the journal, before its original bytes
+_RANGE_HEADER = struct.Struct("<QI")
+
+
+def journal_path(path: Path | str) -> Path:
+    """The journal of a patch of path in progress, hidden so that folder scans skip it."""
+    path = Path(path)
+    return path.with_name(f".{path.name}.patch-journal")
+
+
+def write_journal(path: Path, patched: BinaryIO, patches: List[Tuple[int, bytes]]) -> None:
+    """Save the bytes of patched (the open file at path) that patches will overwrite, durably."""
+    with atomic_write(journal_path(path)) as journal:
+        journal.write(JOURNAL_MAGIC)
+        for offset, value in patches:
+            patched.seek(offset)
+            journal.write(_RANGE_HEADER.pack(offset, len(value)))
+            journal.write(patched.read(len(value)))
+
+
+def recover_interrupted_patch(path: Path | str) -> bool:
+    """Restore the bytes of path an interrupted patch was writing, if its journal is there.
+
+    Returns whether anything was restored.  A file being written by a save in progress is left alone.
+    """
+    path = Path(path)
+    journal = journal_path(path)
+    if not journal.exists():
+        return False
+    lock = path_lock(path)
+    if not lock.acquire(blocking=False):
+        return False
+    try:
+        data = journal.read_bytes()
+        if not data.startswith(JOURNAL_MAGIC):
+            logger.warning(f"Ignoring {journal}, which is not a patch journal")
+            return False
+        ranges = []
+        position = len(JOURNAL_MAGIC)
+        while position < len(data):
+            offset, length = _RANGE_HEADER.unpack_from(data, position)
+            position += _RANGE_HEADER.size
+            ranges.append((offset, data[position : position + length]))
+            position += length
+        with open(path, "r+b") as patched:
+            write_patches(patched, ranges)
+            patched.flush()
+            os.fsync(patched.fileno())
+        journal.unlink()
+        logger.warning(f"Restored {path.name} from the journal of a patch that was interrupted")
+        return True
+    finally:
+        lock.release()
+
+
+def _writable_tags(ds: Dataset) -> set:
+    """The tags of ds that are part of the encoded data set (not file meta or retired group lengths)."""
+    return {tag for tag in ds.keys() if tag.group != 0x0002 and not (tag.element == 0 and tag.group > 6)}
+
+
+def changed_elements(
+    original: Dataset, modified: Dataset, parent_path: NodePath = ()
+) -> Optional[List[Tuple[NodePath, DataElement]]]:
+    """The (path, element) of each value that differs between original and modified.
+
+    Returns None if the structure differs: an element added or removed, a VR changed, or a sequence with a
+    different number of items.
+    """
+    if _writable_tags(original) != _writable_tags(modified):
+        return None
+    changes = []
+    for tag in sorted(_writable_tags(modified)):
+        original_elem = original[tag]
+        modified_elem = modified[tag]
+        path = parent_path + (tag,)
+        if original_elem.VR != modified_elem.VR:
+            return None
+        if original_elem.VR == VR.SQ:
+            if len(original_elem.value) != len(modified_elem.value):
+                return None
+            for item_index, (original_item, modified_item) in enumerate(zip(original_elem.value, modified_elem.value)):
+                item_changes = changed_elements(original_item, modified_item, path + (item_index,))
+                if item_changes is None:
+                    return None
+                changes.extend(item_changes)
+        elif modified_elem is not original_elem and modified_elem != original_elem:
+            changes.append((path, modified_elem))
+    return changes
+
+
+def encode_value(elem: DataElement, is_implicit_VR: bool, is_little_endian: bool, encodings) -> bytes:
+    """The encoded value of elem (without its header), padded as it would be written to a file."""
+    buffer = DicomBytesIO()
+    buffer.is_implicit_VR = is_implicit_VR
+    buffer.is_little_endian = is_little_endian
+    write_data_element(buffer, elem, encodings)
+    buffer.seek(0)
+    header = read_element_header(buffer, is_implicit_VR, is_little_endian)
+    value_start = header.header_length
+    return buffer.getvalue()[value_start:]
+
+
+def plan_patches(source_path: Path | str, original: Dataset, modified: Dataset) -> Optional[List[Tuple[int, bytes]]]:
+    """The (offset, bytes) writes that turn the file original was read from into modified.
+
+    Returns None if modified can't be reached by patching values of the same length in place.
+    """
+    changes = changed_elements(original, modified)
+    if changes is None:
+        return None
+    if any(len(elem.VR) != 2 for _, elem in changes):  # ambiguous VRs, e.g. 'US or SS'
+        return None
+    encodings = modified.get("SpecificCharacterSet", default_encoding)
+    with open(source_path, "rb") as source:
+        transfer_syntax_uid = source_transfer_syntax(source, original)
+        if not is_seekable_encoding(transfer_syntax_uid):
+            return None
+        is_implicit_VR, is_little_endian = transfer_syntax_encoding(transfer_syntax_uid)
+        locations = index_element_locations(source, is_implicit_VR, is_little_endian)
+    patches = []
+    for path, elem in changes:
+        location = locations.get(path)
+        if location is None or location.in_undefined_length:
+            return None
+        value = encode_value(elem, is_implicit_VR, is_little_endian, encodings)
+        if len(value) != location.header.length:
+            return None
+        patches.append((location.header.value_offset, value))
+    return patches
+
+
+def write_patches(fileobj: BinaryIO, patches: List[Tuple[int, bytes]]) -> None:
+    for offset, value in patches:
+        fileobj.seek(offset)
+        fileobj.write(value)
+
+
+def patch_in_place(
+    source_path: Path | str,
+    original: Dataset,
+    modified: Dataset,
+    destination_path: Path | str | None = None,
+    backup: bool = False,
+    copy_on_write: bool = False,
+) -> bool:
+    """Save modified by patching the bytes of the values that changed, if every edit keeps its length.
+
+    original is the dataset as read from source_path.  When destination_path is another file, or if
+    copy_on_write, source_path is copied to a temporary file which is patched and then atomically replaces
+    destination_path (see atomic_save).  Otherwise only the changed bytes of source_path itself are written,
+    journalled (see write_journal), after copying the whole file to a .bak file if backup.  Returns False,
+    having written nothing, if the edits can't be patched in.  Both files stay locked from locating the
+    values to writing them, so no other save can move them in between.
+    """
+    source_path = Path(source_path)
+    destination_path = Path(destination_path) if destination_path is not None else source_path
+    with path_locks(source_path, destination_path):
+        recover_interrupted_patch(source_path)
+        patches = plan_patches(source_path, original, modified)
+        if patches is None:
+            return False
+        if destination_path != source_path or copy_on_write:
+            with atomic_write(destination_path) as partial, open(source_path, "rb") as source:
+                shutil.copyfileobj(source, partial, COPY_CHUNK_BYTES)
+                write_patches(partial, patches)
+        else:
+            if backup and patches:
+                shutil.copy2(source_path, source_path.with_name(source_path.name + BACKUP_SUFFIX))
+            if patches:
+                with open(source_path, "r+b") as patched:
+                    write_journal(source_path, patched, patches)
+                    write_patches(patched, patches)
+                    patched.flush()
+                    os.fsync(patched.fileno())
+                journal_path(source_path).unlink()
+    logger.info(f"Patched {len(patches)} value(s) of {destination_path.name} in place")
+    return True
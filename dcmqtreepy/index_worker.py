@@ -0,0 +1,55 @@
+"""Index the headers of a folder or some files (see header_index) on a pool thread, reporting progress as signals."""
+
+import logging
+import threading
+from pathlib import Path
+from typing import List, Optional
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from dcmqtreepy.header_index import HeaderIndex
+
+logger = logging.getLogger(__name__)
+
+
+class IndexSignals(QObject):
+    # files read, files to read
+    progress = Signal(int, int)
+    # a list of HeaderRecords, as they become known
+    records = Signal(object)
+    # the IndexUpdate
+    finished = Signal(object)
+    failed = Signal(str)
+
+
+class IndexWorker(QRunnable):
+    """Update index with the files under folder, or with paths; cancel() stops after the files being read."""
+
+    def __init__(self, index: HeaderIndex, folder: Optional[Path] = None, paths: Optional[List[str]] = None):
+        super().__init__()
+        self.index = index
+        self.folder = folder
+        self.paths = paths
+        self.signals = IndexSignals()
+        self.cancelled = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def run(self):
+        try:
+            if self.folder is not None:
+                update = self.index.update_folder(
+                    self.folder, self.signals.progress.emit, self.cancelled, self.signals.records.emit
+                )
+            else:
+                update = self.index.update_files(
+                    self.paths or [], self.signals.progress.emit, self.cancelled, self.signals.records.emit
+                )
+        except Exception as index_exc:
+            logger.error(f"Indexing {self.folder or 'the listed files'} failed: {index_exc}", exc_info=True)
+            self.signals.failed.emit(str(index_exc))
+            return
+        self.signals.finished.emit(update)
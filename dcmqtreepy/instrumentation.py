@@ -0,0 +1,183 @@
+"""Lightweight timing of the slow paths (reading, tree population, saving, ...).
+
+Wrap work in span("name").  Spans nest per thread; when the outermost span of a thread (an operation)
+ends, its breakdown by child span is logged and passed to the listeners (the window shows it in the status
+bar).  Every span can also be kept as a Chrome trace event (chrome://tracing, Perfetto) and written out
+with write_chrome_trace.
+
+While timing is disabled, span() returns a shared do-nothing context manager, so leaving the spans in the
+hot paths costs one function call and a flag test each.  DCMQTREEPY_TIMING=1 enables timing at start up,
+and DCMQTREEPY_TRACE_FILE=path also records trace events and writes them to path on exit.
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# trace events kept, the oldest are dropped beyond this
+MAX_TRACE_EVENTS = 200_000
+
+_NULL_SPAN = nullcontext()
+_enabled = False
+_tracing = False
+_local = threading.local()
+_trace_lock = threading.Lock()
+_trace_events: List[dict] = []
+_listeners: List[Callable[["OperationTiming"], None]] = []
+_last_operation: Optional["OperationTiming"] = None
+
+
+@dataclass
+class OperationTiming:
+    """How long an operation took, and how much of that went to each kind of span within it."""
+
+    name: str
+    seconds: float
+    children: Dict[str, float] = field(default_factory=dict)
+
+    def describe(self) -> str:
+        if not self.children:
+            return f"{self.name}: {self.seconds:.3f} s"
+        parts = ", ".join(f"{name} {seconds:.3f} s" for name, seconds in self.children.items())
+        return f"{self.name}: {self.seconds:.3f} s ({parts})"
+
+
+class _Span:
+    __slots__ = ("name", "args", "start", "children")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.children: Dict[str, float] = {}
+
+    def __enter__(self):
+        stack = _stack()
+        stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        stack = _stack()
+        stack.pop()
+        seconds = (end - self.start) / 1e9
+        if _tracing:
+            _record_event(self.name, self.start, end, self.args)
+        if stack:
+            parent = stack[-1]
+            parent.children[self.name] = parent.children.get(self.name, 0.0) + seconds
+        else:
+            _finish_operation(OperationTiming(self.name, seconds, self.children))
+        return False
+
+
+def _stack() -> List[_Span]:
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _record_event(name: str, start_ns: int, end_ns: int, args: dict) -> None:
+    event = {
+        "name": name,
+        "ph": "X",
+        "ts": start_ns / 1000,
+        "dur": (end_ns - start_ns) / 1000,
+        "pid": os.getpid(),
+        "tid": threading.get_ident(),
+    }
+    if args:
+        event["args"] = {key: str(value) for key, value in args.items()}
+    with _trace_lock:
+        _trace_events.append(event)
+        if len(_trace_events) > MAX_TRACE_EVENTS:
+            del _trace_events[: len(_trace_events) - MAX_TRACE_EVENTS]
+
+
+def _finish_operation(timing: OperationTiming) -> None:
+    global _last_operation
+    _last_operation = timing
+    logger.info(f"Timing {timing.describe()}")
+    for listener in list(_listeners):
+        try:
+            listener(timing)
+        except Exception as listener_exc:
+            logger.error(f"Timing listener failed: {listener_exc}")
+
+
+def span(name: str, **args):
+    """A context manager timing the work within it as name (args are kept with the trace event)."""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, args)
+
+
+def set_enabled(enabled: bool, tracing: Optional[bool] = None) -> None:
+    """Turn timing on or off; tracing (keeping trace events) is only on while timing is."""
+    global _enabled, _tracing
+    _enabled = enabled
+    if tracing is not None:
+        _tracing = tracing
+    _tracing = _tracing and enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def is_tracing() -> bool:
+    return _tracing
+
+
+def add_listener(listener: Callable[[OperationTiming], None]) -> None:
+    """Call listener with the timing of each operation, on the thread the operation ran on."""
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[OperationTiming], None]) -> None:
+    if listener in _listeners:
+        _listeners.remove(listener)
+
+
+def last_operation() -> Optional[OperationTiming]:
+    return _last_operation
+
+
+def trace_event_count() -> int:
+    with _trace_lock:
+        return len(_trace_events)
+
+
+def clear_trace() -> None:
+    with _trace_lock:
+        _trace_events.clear()
+
+
+def write_chrome_trace(path: Path | str) -> int:
+    """Write the trace events kept so far to path in the Chrome trace event format; returns how many."""
+    with _trace_lock:
+        events = list(_trace_events)
+    with open(path, "w", encoding="utf-8") as trace_file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+    logger.info(f"Wrote {len(events)} timing events to {path}")
+    return len(events)
+
+
+def configure_from_environment() -> None:
+    """Enable timing (and tracing to a file written on exit) as DCMQTREEPY_TIMING/DCMQTREEPY_TRACE_FILE ask."""
+    trace_file = os.environ.get("DCMQTREEPY_TRACE_FILE")
+    if trace_file:
+        set_enabled(True, tracing=True)
+        atexit.register(write_chrome_trace, trace_file)
+    elif os.environ.get("DCMQTREEPY_TIMING", "") not in ("", "0"):
+        set_enabled(True)
@@ -48,14 +48,14 @@ from PySide6.QtWidgets import (
     QFormLayout,
     QGroupBox,
     QHeaderView,
-    QListWidget,
-    QListWidgetItem,
+    QLineEdit,
     QMainWindow,
     QMenu,
     QMenuBar,
     QScrollArea,
     QSizePolicy,
     QStatusBar,
+    QTreeView,
     QTreeWidget,
     QTreeWidgetItem,
     QWidget,
@@ -102,14 +102,21 @@ class Ui_MainWindow(object):
         self.scrollAreaWidgetContents.setGeometry(QRect(0, 0, 744, 213))
         self.formLayout = QFormLayout(self.scrollAreaWidgetContents)
         self.formLayout.setObjectName("formLayout")
-        self.listWidget = QListWidget(self.scrollAreaWidgetContents)
-        self.listWidget.setObjectName("listWidget")
-        self.listWidget.setAcceptDrops(True)
-        self.listWidget.setAutoFillBackground(True)
-        self.listWidget.setEditTriggers(QAbstractItemView.AllEditTriggers)
-        self.listWidget.setSelectionRectVisible(True)
+        self.fileFilterEdit = QLineEdit(self.scrollAreaWidgetContents)
+        self.fileFilterEdit.setObjectName("fileFilterEdit")
+        self.fileFilterEdit.setClearButtonEnabled(True)
 
-        self.formLayout.setWidget(0, QFormLayout.SpanningRole, self.listWidget)
+        self.formLayout.setWidget(0, QFormLayout.SpanningRole, self.fileFilterEdit)
+
+        self.fileTreeView = QTreeView(self.scrollAreaWidgetContents)
+        self.fileTreeView.setObjectName("fileTreeView")
+        self.fileTreeView.setAcceptDrops(True)
+        self.fileTreeView.setAutoFillBackground(True)
+        self.fileTreeView.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.fileTreeView.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.fileTreeView.setUniformRowHeights(True)
+
+        self.formLayout.setWidget(1, QFormLayout.SpanningRole, self.fileTreeView)
 
         self.scrollArea.setWidget(self.scrollAreaWidgetContents)
 
@@ -198,6 +205,9 @@ class Ui_MainWindow(object):
         self.actionDelete.setText(QCoreApplication.translate("MainWindow", "Delete", None))
         self.actionView_Image.setText(QCoreApplication.translate("MainWindow", "View Image", None))
         self.groupBox.setTitle(QCoreApplication.translate("MainWindow", "Files", None))
+        self.fileFilterEdit.setPlaceholderText(
+            QCoreApplication.translate("MainWindow", "Filter by patient, study, series or file name", None)
+        )
         self.groupBox_2.setTitle(QCoreApplication.translate("MainWindow", "DICOM Elements", None))
         self.menuMain_Window.setTitle(QCoreApplication.translate("MainWindow", "File", None))
         self.menuEdit.setTitle(QCoreApplication.translate("MainWindow", "Edit", None))
@@ -0,0 +1,106 @@
+"""Rough accounting of the memory held by parsed DICOM datasets.
+
+The estimates are meant for budgeting and reporting, not for exact measurement: they count the bytes of
+element values plus a fixed per-element overhead, and never force a deferred or raw value to be loaded.
+"""
+
+from typing import Any
+
+from pydicom import DataElement, Dataset
+from pydicom.dataelem import RawDataElement
+from pydicom.multival import MultiValue
+from pydicom.tag import Tag
+from pydicom.valuerep import VR
+
+# approximate cost of the DataElement object, its tag and the Dataset dict slot holding it
+ELEMENT_OVERHEAD_BYTES = 120
+# approximate cost of one Python object inside a multi-valued element
+VALUE_OVERHEAD_BYTES = 32
+
+# approximate cost of a tree widget item showing one element, with its tag, name, VR and keyword columns
+TREE_ITEM_BYTES = 600
+
+# values the tree doesn't show
+BINARY_VRS = [VR.OB, VR.OW, VR.OB_OW, VR.OD, VR.OF]
+
+UNDEFINED_LENGTH = 0xFFFFFFFF
+
+
+def stored_item(ds: Dataset, tag: int) -> DataElement | RawDataElement | None:
+    """The element for tag as stored in ds, without conversion.
+
+    Unlike Dataset.get_item this never reads a deferred value from disk.
+    """
+    return ds._dict.get(Tag(tag))
+
+
+def is_deferred(ds: Dataset, tag: int) -> bool:
+    """True if the value of tag in ds has not been read from the file yet (see dcmread defer_size)."""
+    raw = stored_item(ds, tag)
+    return isinstance(raw, RawDataElement) and raw.value is None and raw.length not in (0, UNDEFINED_LENGTH)
+
+
+def estimate_value_bytes(value: Any) -> int:
+    """Estimate the memory held by a single element value."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value)
+    if hasattr(value, "nbytes"):  # numpy arrays
+        return int(value.nbytes)
+    if isinstance(value, (list, tuple, MultiValue)):
+        return sum(estimate_value_bytes(item) + VALUE_OVERHEAD_BYTES for item in value)
+    return len(str(value))
+
+
+def estimate_element_bytes(ds: Dataset, tag: int) -> int:
+    """Estimate the memory held by one element of ds without converting or loading it."""
+    elem = stored_item(ds, tag)
+    if isinstance(elem, RawDataElement):
+        return ELEMENT_OVERHEAD_BYTES + (len(elem.value) if elem.value is not None else 0)
+    if elem.VR == VR.SQ:
+        return ELEMENT_OVERHEAD_BYTES + sum(estimate_dataset_bytes(item) for item in elem.value)
+    return ELEMENT_OVERHEAD_BYTES + estimate_value_bytes(elem.value)
+
+
+def estimate_dataset_bytes(ds: Dataset) -> int:
+    """Estimate the memory held by ds, including nested sequences and (if present) its file meta."""
+    total = sum(estimate_element_bytes(ds, tag) for tag in ds.keys())
+    file_meta = getattr(ds, "file_meta", None)
+    if file_meta is not None and file_meta is not ds:
+        total += sum(estimate_element_bytes(file_meta, tag) for tag in file_meta.keys())
+    return total
+
+
+def estimate_tree_bytes(ds: Dataset) -> int:
+    """Estimate the memory the editor's tree widget takes to show ds.
+
+    Each element and sequence item is a tree item with a handful of short column strings; values are held
+    as UTF-16 text, except binary values, which the tree doesn't show.
+    """
+    total = 0
+    for tag in ds.keys():
+        elem = stored_item(ds, tag)
+        total += TREE_ITEM_BYTES
+        if elem.VR in BINARY_VRS:
+            continue
+        if isinstance(elem, RawDataElement):
+            length = len(elem.value) if elem.value is not None else elem.length
+            total += 2 * (length if length != UNDEFINED_LENGTH else 0)
+        elif elem.VR == VR.SQ:
+            total += sum(TREE_ITEM_BYTES + estimate_tree_bytes(item) for item in elem.value)
+        else:
+            total += 2 * estimate_value_bytes(elem.value)
+    return total
+
+
+def format_bytes(size_bytes: int) -> str:
+    """size_bytes for people, e.g. 1.5 MB."""
+    if size_bytes < 1024:
+        return f"{size_bytes} bytes"
+    for unit in ("KB", "MB", "GB"):
+        size_bytes /= 1024
+        if size_bytes < 1024 or unit == "GB":
+            return f"{size_bytes:.1f} {unit}"
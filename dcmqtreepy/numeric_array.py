@@ -0,0 +1,204 @@
+"""NumPy arrays for large multi-valued numeric elements (Contour Data, scan spot maps, line scan weights...).
+
+Binary encoded values (FL, FD, OF, SL...) are viewed in the bytes they were read as, without copying or
+converting them to Python numbers, and encoded back with one tobytes().  DS and IS values are parsed from,
+and formatted to, their text in one pass.  The operations (scale, offset, round, clip) work on the whole
+array, or on one column of it when the values come in x/y or x/y/z groups.
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pydicom.datadict
+from pydicom import DataElement, Dataset
+from pydicom.dataelem import RawDataElement
+from pydicom.tag import BaseTag, Tag
+from pydicom.valuerep import VR
+
+from dcmqtreepy.memory_accounting import stored_item
+
+# item type of the binary encoded numeric VRs
+BINARY_DTYPES = {
+    VR.FL: "f4",
+    VR.FD: "f8",
+    VR.OF: "f4",
+    VR.OD: "f8",
+    VR.SS: "i2",
+    VR.US: "u2",
+    VR.SL: "i4",
+    VR.UL: "u4",
+    VR.SV: "i8",
+    VR.UV: "u8",
+    VR.OL: "u4",
+    VR.OV: "u8",
+}
+# numbers encoded as text
+TEXT_DTYPES = {VR.DS: "f8", VR.IS: "i8"}
+
+# elements with more values than this are edited as arrays rather than as text in the tree
+LARGE_ARRAY_VALUES = 256
+
+# significant digits written for DS values, the most that always fits in the 16 characters allowed
+DS_DIGITS = 9
+
+
+def is_numeric_vr(vr: str) -> bool:
+    return vr in BINARY_DTYPES or vr in TEXT_DTYPES
+
+
+def value_count(ds: Dataset, tag: int) -> int:
+    """The number of values of tag in ds, counted from the encoded value where it hasn't been converted."""
+    elem = stored_item(ds, tag)
+    if elem is None:
+        return 0
+    if isinstance(elem, RawDataElement):
+        if elem.value is None:  # deferred, see dcmread defer_size
+            if elem.VR in BINARY_DTYPES:
+                return elem.length // np.dtype(BINARY_DTYPES[elem.VR]).itemsize
+            return 0
+        if elem.VR in BINARY_DTYPES:
+            return len(elem.value) // np.dtype(BINARY_DTYPES[elem.VR]).itemsize
+        if elem.VR in TEXT_DTYPES:
+            return elem.value.count(b"\\") + 1 if elem.value.strip() else 0
+        elem = ds[tag]
+    if elem.VR in (VR.OF, VR.OD, VR.OL, VR.OV) and isinstance(elem.value, bytes):
+        return len(elem.value) // np.dtype(BINARY_DTYPES[elem.VR]).itemsize
+    return elem.VM
+
+
+def is_large_array(ds: Dataset, tag: int) -> bool:
+    """True if tag in ds is a numeric element with more than LARGE_ARRAY_VALUES values."""
+    elem = stored_item(ds, tag)
+    vr = elem.VR if elem is not None and elem.VR is not None else ds[tag].VR
+    return is_numeric_vr(vr) and value_count(ds, tag) > LARGE_ARRAY_VALUES
+
+
+def _binary_dtype(vr: str, little_endian: bool) -> np.dtype:
+    return np.dtype(BINARY_DTYPES[vr]).newbyteorder("<" if little_endian else ">")
+
+
+def _parse_text_numbers(text: bytes | str, vr: str) -> np.ndarray:
+    if isinstance(text, bytes):
+        text = text.decode("ascii")
+    values = [value for value in text.split("\\") if value.strip()]
+    if vr == VR.IS:
+        # IS may be written as 1.0, which int() refuses
+        return np.array(values, dtype=np.float64).astype(np.int64)
+    return np.array(values, dtype=np.float64)
+
+
+def element_array(ds: Dataset, tag: int) -> np.ndarray:
+    """The values of tag in ds as a one dimensional array.
+
+    For binary VRs not yet converted by pydicom, the array is a read-only view of the bytes as read.
+    """
+    elem = stored_item(ds, tag)
+    if isinstance(elem, RawDataElement) and elem.value is not None:
+        if elem.VR in BINARY_DTYPES:
+            return np.frombuffer(elem.value, dtype=_binary_dtype(elem.VR, elem.is_little_endian))
+        if elem.VR in TEXT_DTYPES:
+            return _parse_text_numbers(elem.value, elem.VR)
+    elem = ds[tag]
+    if isinstance(elem.value, bytes):  # OF, OD, OL, OV
+        return np.frombuffer(elem.value, dtype=_binary_dtype(elem.VR, ds.is_little_endian is not False))
+    dtype = BINARY_DTYPES.get(elem.VR) or TEXT_DTYPES[elem.VR]
+    if elem.value is None or elem.value == "":
+        return np.empty(0, dtype=dtype)
+    return np.atleast_1d(np.asarray(elem.value, dtype=dtype))
+
+
+def encode_array(array: np.ndarray, vr: str, little_endian: bool = True) -> bytes:
+    """The encoded value of array as an element of VR vr."""
+    if vr in BINARY_DTYPES:
+        return np.ascontiguousarray(array, dtype=_binary_dtype(vr, little_endian)).tobytes()
+    if vr == VR.IS:
+        text = "\\".join(str(value) for value in np.rint(array).astype(np.int64).tolist())
+    else:
+        text = "\\".join(format(value, f".{DS_DIGITS}g") for value in array.tolist())
+    encoded = text.encode("ascii")
+    return encoded + b" " if len(encoded) % 2 else encoded
+
+
+def array_element(tag: int, vr: str, array: np.ndarray, little_endian: bool = True) -> RawDataElement:
+    """An element holding array, encoded as read from a file so pydicom converts it only if it is accessed."""
+    value = encode_array(array, vr, little_endian)
+    return RawDataElement(Tag(tag), vr, len(value), value, 0, False, little_endian)
+
+
+def values_per_row(tag: int, private_creator: Optional[str] = None) -> int:
+    """How many values form one point (e.g. 3 for Contour Data), from the dictionary VM of tag."""
+    try:
+        if private_creator:
+            vm = pydicom.datadict.private_dictionary_VM(tag, private_creator)
+        else:
+            vm = pydicom.datadict.dictionary_VM(tag)
+    except KeyError:
+        return 1
+    match = re.fullmatch(r"(\d+)-\1n", vm)
+    return int(match.group(1)) if match else 1
+
+
+def _cast_like(values: np.ndarray, dtype: np.dtype) -> np.ndarray:
+    if np.issubdtype(dtype, np.integer):
+        limits = np.iinfo(dtype)
+        return np.clip(np.rint(values), limits.min, limits.max).astype(dtype)
+    return values.astype(dtype)
+
+
+OPERATIONS = {
+    "Scale": lambda values, factor: values * factor,
+    "Offset": lambda values, amount: values + amount,
+    "Round": lambda values, decimals: np.round(values, int(decimals)),
+    "Clip": lambda values, low, high: np.clip(values, low, high),
+}
+# the parameters each operation takes
+OPERATION_PARAMETERS = {"Scale": ["factor"], "Offset": ["amount"], "Round": ["decimals"], "Clip": ["low", "high"]}
+
+
+def apply_operation(
+    array: np.ndarray, operation: str, *parameters: float, column: Optional[int] = None, width: int = 1
+) -> np.ndarray:
+    """A new array of the same type with operation applied to array, or to one column of its rows of width values."""
+    if len(array) % width:
+        raise ValueError(f"{len(array)} values can't be split into rows of {width}")
+    result = array.astype(np.float64)
+    target = result if column is None else result.reshape(-1, width)[:, column]
+    target[...] = OPERATIONS[operation](target, *parameters)
+    return _cast_like(result, array.dtype)
+
+
+@dataclass
+class ArrayValue:
+    """A large numeric value held by the editor: its values as an array, and the element as read.
+
+    While the values are unchanged the element as read is kept, so saving writes exactly the original bytes.
+    """
+
+    vr: str
+    array: np.ndarray
+    original: Optional[DataElement | RawDataElement] = None
+    little_endian: bool = True
+
+    @classmethod
+    def from_dataset(cls, ds: Dataset, tag: int) -> "ArrayValue":
+        elem = stored_item(ds, tag)
+        little_endian = elem.is_little_endian if isinstance(elem, RawDataElement) else ds.is_little_endian is not False
+        vr = elem.VR if elem.VR is not None else ds[tag].VR
+        return cls(vr, element_array(ds, tag), stored_item(ds, tag), little_endian)
+
+    def replace(self, array: np.ndarray) -> None:
+        self.array = array
+        self.original = None
+
+    def element(self, tag: int | BaseTag) -> DataElement | RawDataElement:
+        """The element to save as tag (which may differ from the tag read, for a private block moved)."""
+        if isinstance(self.original, RawDataElement):
+            return self.original._replace(tag=Tag(tag))
+        if self.original is not None:
+            return DataElement(tag, self.original.VR, self.original.value)
+        return array_element(tag, self.vr, self.array, self.little_endian)
+
+    def describe(self) -> str:
+        return f"<{len(self.array)} {self.vr} values, double-click to edit as a table>"
@@ -0,0 +1,154 @@
+"""Save an edited dataset in the encoding of the file it was read from.
+
+Instead of re-encoding the whole dataset, the top level elements that were not modified are copied as raw
+byte ranges from the original file, and only the elements that changed are encoded.  The transfer syntax
+of the original is kept, so compressed (encapsulated) pixel data survives, and saving a large multi-frame
+object after a one-tag edit costs one sequential copy of the file rather than a decode/encode pass.
+"""
+
+import logging
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+from pydicom import Dataset
+from pydicom.charset import default_encoding
+from pydicom.dataset import FileMetaDataset
+from pydicom.filebase import DicomFileLike
+from pydicom.filewriter import (
+    correct_ambiguous_vr,
+    write_data_element,
+    write_file_meta_info,
+)
+
+from dcmqtreepy.atomic_save import ProgressFile, atomic_write
+from dcmqtreepy.element_offsets import (
+    is_seekable_encoding,
+    read_dataset_start,
+    scan_top_level_elements,
+    transfer_syntax_encoding,
+    transfer_syntax_for_encoding,
+)
+from dcmqtreepy.memory_accounting import stored_item
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK_BYTES = 1024 * 1024
+
+
+def source_transfer_syntax(source: BinaryIO, original: Dataset) -> str:
+    """The transfer syntax the data set in source is encoded with; source is left at the start of the data set."""
+    _, transfer_syntax_uid = read_dataset_start(source)
+    if transfer_syntax_uid is None:
+        transfer_syntax_uid = transfer_syntax_for_encoding(original.is_implicit_VR, original.is_little_endian)
+    return transfer_syntax_uid
+
+
+def can_preserve_encoding(source_path: Path | str, original: Dataset) -> bool:
+    """True if the file original was read from can be used as the source of a raw copy."""
+    try:
+        with open(source_path, "rb") as source:
+            return is_seekable_encoding(source_transfer_syntax(source, original))
+    except (OSError, ValueError, EOFError) as scan_exc:
+        logger.error(f"Unable to read the encoding of {source_path}: {scan_exc}")
+        return False
+
+
+def is_unchanged(original: Dataset, modified: Dataset, tag: int) -> bool:
+    """True if the element tag of modified is the element read from the original file, or equal to it."""
+    modified_elem = stored_item(modified, tag)
+    original_elem = stored_item(original, tag)
+    if original_elem is None or modified_elem is None:
+        return False
+    if modified_elem is original_elem:
+        return True
+    return modified[tag] == original[tag]
+
+
+def copy_byte_range(source: BinaryIO, destination: DicomFileLike, start: int, end: int) -> None:
+    source.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        chunk = source.read(min(COPY_CHUNK_BYTES, remaining))
+        if not chunk:
+            raise EOFError(f"Source file ended {remaining} bytes before the end of the range to copy")
+        destination.write(chunk)
+        remaining -= len(chunk)
+
+
+def build_file_meta(original: Dataset, modified: Dataset, transfer_syntax_uid: str) -> FileMetaDataset:
+    file_meta = FileMetaDataset(getattr(original, "file_meta", FileMetaDataset()))
+    file_meta.TransferSyntaxUID = transfer_syntax_uid
+    if "SOPClassUID" in modified:
+        file_meta.MediaStorageSOPClassUID = modified.SOPClassUID
+    if "SOPInstanceUID" in modified:
+        file_meta.MediaStorageSOPInstanceUID = modified.SOPInstanceUID
+    return file_meta
+
+
+def write_data_set(
+    source: BinaryIO,
+    destination: DicomFileLike,
+    original: Dataset,
+    modified: Dataset,
+    ranges: Dict[int, Tuple[int, int]],
+) -> int:
+    """Write the top level elements of modified, copying unchanged ones from source.  Returns bytes copied."""
+    encodings = modified.get("SpecificCharacterSet", default_encoding)
+    pending: Optional[Tuple[int, int]] = None  # adjacent unchanged elements are copied in one go
+    copied = 0
+    for tag in sorted(modified.keys()):
+        # file meta information is written separately, retired group lengths are not written (PS3.5 7.2)
+        if tag.group == 0x0002 or (tag.element == 0 and tag.group > 6):
+            continue
+        element_range = ranges.get(tag)
+        if element_range is not None and is_unchanged(original, modified, tag):
+            if pending is not None and pending[1] == element_range[0]:
+                pending = (pending[0], element_range[1])
+            else:
+                if pending is not None:
+                    copy_byte_range(source, destination, *pending)
+                    copied += pending[1] - pending[0]
+                pending = element_range
+            continue
+        if pending is not None:
+            copy_byte_range(source, destination, *pending)
+            copied += pending[1] - pending[0]
+            pending = None
+        write_data_element(destination, modified.get_item(tag), encodings)
+    if pending is not None:
+        copy_byte_range(source, destination, *pending)
+        copied += pending[1] - pending[0]
+    return copied
+
+
+def write_preserving_encoding(
+    source_path: Path | str,
+    original: Dataset,
+    modified: Dataset,
+    destination_path: Path | str,
+    progress: Optional[Callable[[int], None]] = None,
+) -> None:
+    """Write modified to destination_path in the transfer syntax of source_path, the file original was read from.
+
+    Unmodified top level elements are copied byte for byte from source_path.  The file is written atomically
+    (see atomic_save), so destination_path may be source_path.  progress is called with the bytes written.
+    """
+    source_path = Path(source_path)
+    destination_path = Path(destination_path)
+    # the source is closed before the new file replaces it, some platforms can't replace a file that is open
+    with atomic_write(destination_path) as partial, open(source_path, "rb") as source:
+        transfer_syntax_uid = source_transfer_syntax(source, original)
+        if not is_seekable_encoding(transfer_syntax_uid):
+            raise ValueError(f"{source_path.name} is encoded with {transfer_syntax_uid}, its elements can't be copied")
+        ranges = scan_top_level_elements(source, *transfer_syntax_encoding(transfer_syntax_uid))
+
+        modified.is_implicit_VR, modified.is_little_endian = transfer_syntax_encoding(transfer_syntax_uid)
+        correct_ambiguous_vr(modified, modified.is_little_endian)
+        destination = DicomFileLike(ProgressFile(partial, progress))
+        destination.write(getattr(original, "preamble", None) or b"\x00" * 128)
+        destination.write(b"DICM")
+        write_file_meta_info(destination, build_file_meta(original, modified, transfer_syntax_uid))
+        destination.is_implicit_VR = modified.is_implicit_VR
+        destination.is_little_endian = modified.is_little_endian
+        copied = write_data_set(source, destination, original, modified, ranges)
+    logger.info(f"Saved {destination_path.name} in {transfer_syntax_uid}, {copied} bytes copied unchanged")
@@ -0,0 +1,309 @@
+"""A dialog to query an archive and retrieve the matches into the file list (see query_retrieve)."""
+
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from pydicom import Dataset
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal, Slot
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QComboBox,
+    QDialog,
+    QFormLayout,
+    QHBoxLayout,
+    QLabel,
+    QLineEdit,
+    QPushButton,
+    QTableWidget,
+    QTableWidgetItem,
+    QVBoxLayout,
+)
+
+from dcmqtreepy.query_retrieve import (
+    QUERY_LEVELS,
+    RETURN_KEYS,
+    QueryError,
+    build_query,
+    find,
+    get,
+    move,
+    retrieve_identifier,
+)
+from dcmqtreepy.storage_scu import Destination, parse_destination
+
+logger = logging.getLogger(__name__)
+
+# keyword, label of the query fields
+QUERY_FIELDS = [
+    ("PatientID", "Patient ID"),
+    ("PatientName", "Patient Name"),
+    ("StudyDate", "Study Date"),
+    ("AccessionNumber", "Accession Number"),
+    ("StudyDescription", "Study Description"),
+]
+
+
+class QuerySignals(QObject):
+    match = Signal(object)
+    # path of an instance retrieved with C-GET
+    file_retrieved = Signal(str)
+    # instances done, total
+    progress = Signal(int, int)
+    finished = Signal(str)
+    failed = Signal(str)
+
+
+class FindWorker(QRunnable):
+    """Run a C-FIND on a pool thread, emitting each match as it arrives."""
+
+    def __init__(self, node: Destination, query: Dataset):
+        super().__init__()
+        self.node = node
+        self.query = query
+        self.signals = QuerySignals()
+        self.cancelled = threading.Event()
+        self.setAutoDelete(False)
+
+    def run(self):
+        count = 0
+        try:
+            for match in find(self.node, self.query, cancelled=self.cancelled):
+                count += 1
+                self.signals.match.emit(match)
+        except QueryError as query_exc:
+            self.signals.failed.emit(str(query_exc))
+            return
+        except Exception as query_exc:
+            logger.error(f"Query of {self.node} failed: {query_exc}", exc_info=True)
+            self.signals.failed.emit(str(query_exc))
+            return
+        cancelled = " (cancelled)" if self.cancelled.is_set() else ""
+        self.signals.finished.emit(f"{count} matches{cancelled}")
+
+
+class RetrieveWorker(QRunnable):
+    """Retrieve identifiers on a pool thread, with C-GET into spool_dir or C-MOVE to move_destination."""
+
+    def __init__(
+        self,
+        node: Destination,
+        identifiers: List[Dataset],
+        spool_dir: Path,
+        move_destination: Optional[str] = None,
+        sop_class_uids: Optional[List[str]] = None,
+    ):
+        super().__init__()
+        self.node = node
+        self.identifiers = identifiers
+        self.spool_dir = spool_dir
+        self.move_destination = move_destination
+        self.sop_class_uids = sop_class_uids
+        self.signals = QuerySignals()
+        self.cancelled = threading.Event()
+        self.setAutoDelete(False)
+
+    def run(self):
+        try:
+            if self.move_destination:
+                summary = move(
+                    self.node,
+                    self.identifiers,
+                    self.move_destination,
+                    on_progress=self.signals.progress.emit,
+                    cancelled=self.cancelled,
+                )
+            else:
+                summary = get(
+                    self.node,
+                    self.identifiers,
+                    self.spool_dir,
+                    sop_class_uids=self.sop_class_uids,
+                    on_file=lambda path: self.signals.file_retrieved.emit(str(path)),
+                    on_progress=self.signals.progress.emit,
+                    cancelled=self.cancelled,
+                )
+        except Exception as retrieve_exc:
+            logger.error(f"Retrieve from {self.node} failed: {retrieve_exc}", exc_info=True)
+            self.signals.failed.emit(str(retrieve_exc))
+            return
+        self.signals.finished.emit(summary.describe())
+
+
+class QueryRetrieveDialog(QDialog):
+    """Query a DICOM node, showing matches as they arrive, and retrieve the selected ones.
+
+    Files retrieved with C-GET are announced with file_retrieved.  C-MOVE asks the node to send to
+    move_destination (our receiver's AE title), and is only offered when that is set.
+    """
+
+    file_retrieved = Signal(str)
+
+    def __init__(
+        self,
+        destinations: Dict[str, Destination],
+        spool_dir: Path,
+        thread_pool: QThreadPool,
+        move_destination: Optional[str] = None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self.setWindowTitle("Query/Retrieve")
+        self.destinations = destinations
+        self.spool_dir = spool_dir
+        self.thread_pool = thread_pool
+        self.move_destination = move_destination
+        self.worker: Optional[FindWorker | RetrieveWorker] = None
+        self.matches: List[Dataset] = []
+
+        self.node_combo = QComboBox()
+        self.node_combo.setEditable(True)
+        self.node_combo.addItems(sorted(destinations))
+        self.node_combo.setToolTip("A DICOM node named in dicom_nodes.toml, or AE@host:port")
+        self.level_combo = QComboBox()
+        self.level_combo.addItems(QUERY_LEVELS)
+        self.level_combo.currentTextChanged.connect(self.reset_table)
+        form = QFormLayout()
+        form.addRow("Archive", self.node_combo)
+        form.addRow("Level", self.level_combo)
+        self.field_edits: Dict[str, QLineEdit] = {}
+        for keyword, label in QUERY_FIELDS:
+            self.field_edits[keyword] = QLineEdit()
+            form.addRow(label, self.field_edits[keyword])
+        self.field_edits["StudyDate"].setPlaceholderText("YYYYMMDD or YYYYMMDD-YYYYMMDD")
+        self.field_edits["PatientName"].setPlaceholderText("wildcards * and ? allowed")
+
+        self.table = QTableWidget()
+        self.table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+
+        self.find_button = QPushButton("Find")
+        self.find_button.clicked.connect(self.on_find)
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.on_cancel)
+        self.get_button = QPushButton("Retrieve (C-GET)")
+        self.get_button.clicked.connect(lambda: self.on_retrieve(use_move=False))
+        self.move_button = QPushButton("Retrieve (C-MOVE)")
+        self.move_button.clicked.connect(lambda: self.on_retrieve(use_move=True))
+        self.move_button.setEnabled(bool(move_destination))
+        if not move_destination:
+            self.move_button.setToolTip("Start receiving DICOM (Options menu) to retrieve with C-MOVE")
+        buttons = QHBoxLayout()
+        for button in (self.find_button, self.cancel_button, self.get_button, self.move_button):
+            buttons.addWidget(button)
+        self.status_label = QLabel()
+
+        layout = QVBoxLayout(self)
+        layout.addLayout(form)
+        layout.addLayout(buttons)
+        layout.addWidget(self.table)
+        layout.addWidget(self.status_label)
+        self.resize(900, 600)
+        self.reset_table()
+
+    @property
+    def level(self) -> str:
+        return self.level_combo.currentText()
+
+    def reset_table(self):
+        self.matches = []
+        keywords = RETURN_KEYS[self.level]
+        self.table.clear()
+        self.table.setRowCount(0)
+        self.table.setColumnCount(len(keywords))
+        self.table.setHorizontalHeaderLabels(keywords)
+
+    def set_busy(self, busy: bool):
+        self.find_button.setEnabled(not busy)
+        self.get_button.setEnabled(not busy)
+        self.move_button.setEnabled(not busy and bool(self.move_destination))
+        self.cancel_button.setEnabled(busy)
+
+    def selected_node(self) -> Optional[Destination]:
+        try:
+            return parse_destination(self.node_combo.currentText(), self.destinations)
+        except ValueError as destination_exc:
+            self.status_label.setText(str(destination_exc))
+            return None
+
+    def start(self, worker: FindWorker | RetrieveWorker):
+        self.worker = worker
+        worker.signals.finished.connect(self.handle_finished)
+        worker.signals.failed.connect(self.handle_failed)
+        self.set_busy(True)
+        self.thread_pool.start(worker)
+
+    def on_find(self):
+        node = self.selected_node()
+        if node is None:
+            return
+        self.reset_table()
+        filters = {keyword: edit.text().strip() for keyword, edit in self.field_edits.items()}
+        if self.level != "STUDY":
+            # study level attributes can't be matched below the study level of the Study Root model
+            filters = {keyword: filters.get(keyword) for keyword in ("PatientID",)}
+        worker = FindWorker(node, build_query(self.level, filters))
+        worker.signals.match.connect(self.handle_match)
+        self.status_label.setText(f"Querying {node}...")
+        self.start(worker)
+
+    def on_cancel(self):
+        if self.worker is not None:
+            self.worker.cancelled.set()
+            self.status_label.setText("Cancelling...")
+
+    def on_retrieve(self, use_move: bool):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        if not rows:
+            self.status_label.setText("Select the matches to retrieve")
+            return
+        node = self.selected_node()
+        if node is None:
+            return
+        selected = [self.matches[row] for row in rows]
+        identifiers = [retrieve_identifier(match, self.level) for match in selected]
+        sop_class_uids = [str(match.SOPClassUID) for match in selected if match.get("SOPClassUID")]
+        worker = RetrieveWorker(
+            node,
+            identifiers,
+            self.spool_dir,
+            move_destination=self.move_destination if use_move else None,
+            sop_class_uids=sop_class_uids if self.level == "IMAGE" else None,
+        )
+        worker.signals.file_retrieved.connect(self.file_retrieved)
+        worker.signals.progress.connect(self.handle_progress)
+        self.status_label.setText(f"Retrieving {len(identifiers)} {self.level.lower()} matches from {node}...")
+        self.start(worker)
+
+    @Slot(object)
+    def handle_match(self, match: Dataset):
+        row = self.table.rowCount()
+        self.matches.append(match)
+        self.table.insertRow(row)
+        for column, keyword in enumerate(RETURN_KEYS[self.level]):
+            self.table.setItem(row, column, QTableWidgetItem(str(match.get(keyword, ""))))
+        self.status_label.setText(f"{row + 1} matches so far...")
+
+    @Slot(int, int)
+    def handle_progress(self, done: int, total: int):
+        self.status_label.setText(f"Retrieved {done} of {total}...")
+
+    @Slot(str)
+    def handle_finished(self, summary: str):
+        self.worker = None
+        self.set_busy(False)
+        self.status_label.setText(summary)
+
+    @Slot(str)
+    def handle_failed(self, error: str):
+        self.worker = None
+        self.set_busy(False)
+        self.status_label.setText(f"Failed: {error}")
+
+    def closeEvent(self, event):
+        self.on_cancel()
+        super().closeEvent(event)
@@ -0,0 +1,299 @@
+"""Query an archive with C-FIND and retrieve the matches with C-GET or C-MOVE (Study Root).
+
+find() is a generator yielding each match as its pending response arrives, so a caller can show matches
+while the archive is still searching, and sends a C-CANCEL when asked to stop.  Retrieved instances
+arrive over the same association with C-GET (and are written to a spool directory), or with C-MOVE are
+sent by the archive to a storage SCP, usually our own receiver (see storage_scp).
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from pydicom import Dataset
+from pynetdicom import (
+    AE,
+    ALL_TRANSFER_SYNTAXES,
+    StoragePresentationContexts,
+    build_role,
+    evt,
+)
+from pynetdicom.sop_class import (
+    StudyRootQueryRetrieveInformationModelFind,
+    StudyRootQueryRetrieveInformationModelGet,
+    StudyRootQueryRetrieveInformationModelMove,
+)
+
+from dcmqtreepy.atomic_save import atomic_write
+from dcmqtreepy.storage_scp import (
+    DEFAULT_AE_TITLE,
+    STATUS_OUT_OF_RESOURCES,
+    STATUS_SUCCESS,
+    spool_file_name,
+)
+from dcmqtreepy.storage_scu import MAX_PRESENTATION_CONTEXTS, Destination
+
+logger = logging.getLogger(__name__)
+
+# the levels of the Study Root information model, top down
+QUERY_LEVELS = ["STUDY", "SERIES", "IMAGE"]
+
+# keys returned at each level, with the unique key of the level first
+RETURN_KEYS = {
+    "STUDY": [
+        "StudyInstanceUID",
+        "PatientID",
+        "PatientName",
+        "StudyDate",
+        "StudyTime",
+        "AccessionNumber",
+        "StudyID",
+        "StudyDescription",
+        "ModalitiesInStudy",
+    ],
+    "SERIES": ["SeriesInstanceUID", "StudyInstanceUID", "PatientID", "Modality", "SeriesNumber", "SeriesDescription"],
+    "IMAGE": ["SOPInstanceUID", "SeriesInstanceUID", "StudyInstanceUID", "PatientID", "SOPClassUID", "InstanceNumber"],
+}
+
+STATUS_PENDING = {0xFF00, 0xFF01}
+STATUS_CANCEL = 0xFE00
+# some sub-operations failed or had warnings (PS3.4 C.4.2.1.5)
+STATUS_SUBOPERATIONS_WARNING = 0xB000
+
+
+class QueryError(Exception):
+    """The archive could not be reached, or refused the request."""
+
+
+def build_query(level: str, filters: Optional[dict] = None) -> Dataset:
+    """A C-FIND identifier at level, returning the usual keys for the level, matching filters (keyword: value)."""
+    if level not in RETURN_KEYS:
+        raise ValueError(f"{level} is not a query level, use one of {', '.join(QUERY_LEVELS)}")
+    query = Dataset()
+    query.QueryRetrieveLevel = level
+    for keyword in RETURN_KEYS[level]:
+        setattr(query, keyword, "")
+    for keyword, value in (filters or {}).items():
+        if value not in (None, ""):
+            setattr(query, keyword, value)
+    return query
+
+
+def retrieve_identifier(match: Dataset, level: str) -> Dataset:
+    """The C-GET/C-MOVE identifier for match: the unique keys of level and the levels above it (PS3.4 C.4.2.2.1)."""
+    levels = QUERY_LEVELS[: QUERY_LEVELS.index(level) + 1]
+    identifier = Dataset()
+    identifier.QueryRetrieveLevel = level
+    for query_level in levels:
+        keyword = RETURN_KEYS[query_level][0]
+        setattr(identifier, keyword, match.get(keyword, ""))
+    return identifier
+
+
+def _associate(ae: AE, node: Destination, **kwargs):
+    assoc = ae.associate(node.host, node.port, ae_title=node.ae_title, **kwargs)
+    if not assoc.is_established:
+        raise QueryError(f"No association with {node}")
+    return assoc
+
+
+def find(
+    node: Destination,
+    query: Dataset,
+    calling_ae_title: str = DEFAULT_AE_TITLE,
+    cancelled: Optional[threading.Event] = None,
+) -> Iterator[Dataset]:
+    """Yield the matches for query from node as they arrive.
+
+    Setting cancelled sends a C-CANCEL; matches arriving after that are dropped.  Raises QueryError if the
+    association can't be established or the query fails.
+    """
+    ae = AE(ae_title=calling_ae_title)
+    ae.add_requested_context(StudyRootQueryRetrieveInformationModelFind)
+    assoc = _associate(ae, node)
+    try:
+        cancel_sent = False
+        for status, identifier in assoc.send_c_find(query, StudyRootQueryRetrieveInformationModelFind):
+            if "Status" not in status:
+                raise QueryError(f"{node} stopped responding to the query")
+            if status.Status not in STATUS_PENDING:
+                if status.Status not in (STATUS_SUCCESS, STATUS_CANCEL):
+                    raise QueryError(f"{node} failed the query with status 0x{status.Status:04X}")
+                break
+            if cancelled is not None and cancelled.is_set():
+                if not cancel_sent:
+                    assoc.send_c_cancel(1, query_model=StudyRootQueryRetrieveInformationModelFind)
+                    cancel_sent = True
+                continue
+            if identifier is not None:
+                yield identifier
+    finally:
+        if assoc.is_established:
+            assoc.release()
+
+
+@dataclass
+class RetrieveSummary:
+    """The outcome of a C-GET or C-MOVE: counts from the final response and, for C-GET, the files received."""
+
+    completed: int = 0
+    failed: int = 0
+    warning: int = 0
+    paths: List[Path] = field(default_factory=list)
+    error: Optional[str] = None
+
+    def describe(self) -> str:
+        text = f"Retrieved {self.completed} instances"
+        if self.failed or self.warning:
+            text += f", {self.failed} failed, {self.warning} with warnings"
+        return text + (f" ({self.error})" if self.error else "")
+
+
+def _count(status: Dataset, keyword: str) -> int:
+    value = status.get(keyword)
+    return int(value) if value not in (None, "") else 0
+
+
+def _read_responses(
+    responses: Iterable,
+    summary: RetrieveSummary,
+    on_progress: Optional[Callable[[int, int], None]],
+    cancel: Callable[[], None],
+    cancelled: Optional[threading.Event],
+) -> None:
+    cancel_sent = False
+    for status, _ in responses:
+        if "Status" not in status:
+            summary.error = "the archive stopped responding"
+            return
+        summary.completed = _count(status, "NumberOfCompletedSuboperations") or summary.completed
+        summary.failed = _count(status, "NumberOfFailedSuboperations") or summary.failed
+        summary.warning = _count(status, "NumberOfWarningSuboperations") or summary.warning
+        if status.Status in STATUS_PENDING:
+            if on_progress is not None:
+                done = summary.completed + summary.failed + summary.warning
+                on_progress(done, done + _count(status, "NumberOfRemainingSuboperations"))
+            if cancelled is not None and cancelled.is_set() and not cancel_sent:
+                cancel()
+                cancel_sent = True
+            continue
+        if status.Status == STATUS_CANCEL:
+            summary.error = "cancelled"
+        elif status.Status not in (STATUS_SUCCESS, STATUS_SUBOPERATIONS_WARNING):
+            summary.error = f"status 0x{status.Status:04X}"
+
+
+def storage_contexts(sop_class_uids: Optional[Iterable[str]] = None) -> list:
+    """(SOP Class UID, transfer syntaxes) to accept over a C-GET association.
+
+    With the SOP Classes known (e.g. from an IMAGE level query) just those are negotiated, in any transfer
+    syntax; otherwise the common storage SOP Classes, uncompressed.  One context is left for the C-GET.
+    """
+    if sop_class_uids:
+        uids = sorted(set(sop_class_uids))[: MAX_PRESENTATION_CONTEXTS - 1]
+        return [(uid, ALL_TRANSFER_SYNTAXES) for uid in uids]
+    return [
+        (context.abstract_syntax, context.transfer_syntax)
+        for context in StoragePresentationContexts[: MAX_PRESENTATION_CONTEXTS - 1]
+    ]
+
+
+def get(
+    node: Destination,
+    identifiers: List[Dataset],
+    spool_dir: Path | str,
+    calling_ae_title: str = DEFAULT_AE_TITLE,
+    sop_class_uids: Optional[Iterable[str]] = None,
+    on_file: Optional[Callable[[Path], None]] = None,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> RetrieveSummary:
+    """Retrieve identifiers from node with C-GET, writing the instances to spool_dir.
+
+    on_file is called with the path of each instance as it is written, on_progress with the number of
+    instances done and the total as the archive reports them.
+    """
+    spool_dir = Path(spool_dir)
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    summary = RetrieveSummary()
+
+    def handle_store(event) -> int:
+        path = spool_dir / spool_file_name(event.request.AffectedSOPInstanceUID)
+        try:
+            with atomic_write(path) as partial:
+                partial.write(event.encoded_dataset())
+        except OSError as write_exc:
+            logger.error(f"Unable to write retrieved instance to {path}: {write_exc}")
+            return STATUS_OUT_OF_RESOURCES
+        summary.paths.append(path)
+        if on_file is not None:
+            on_file(path)
+        return STATUS_SUCCESS
+
+    ae = AE(ae_title=calling_ae_title)
+    ae.add_requested_context(StudyRootQueryRetrieveInformationModelGet)
+    roles = []
+    for sop_class_uid, transfer_syntaxes in storage_contexts(sop_class_uids):
+        ae.add_requested_context(sop_class_uid, transfer_syntaxes)
+        roles.append(build_role(sop_class_uid, scp_role=True))
+    assoc = _associate(ae, node, ext_neg=roles, evt_handlers=[(evt.EVT_C_STORE, handle_store)])
+    try:
+        for identifier in identifiers:
+            if cancelled is not None and cancelled.is_set():
+                summary.error = "cancelled"
+                break
+            _read_responses(
+                assoc.send_c_get(identifier, StudyRootQueryRetrieveInformationModelGet),
+                summary,
+                on_progress,
+                lambda: assoc.send_c_cancel(1, query_model=StudyRootQueryRetrieveInformationModelGet),
+                cancelled,
+            )
+    finally:
+        if assoc.is_established:
+            assoc.release()
+    # the archive's counts are per request, the files are what actually arrived
+    summary.completed = len(summary.paths)
+    return summary
+
+
+def move(
+    node: Destination,
+    identifiers: List[Dataset],
+    move_destination: str,
+    calling_ae_title: str = DEFAULT_AE_TITLE,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> RetrieveSummary:
+    """Ask node to send identifiers to the AE titled move_destination with C-MOVE.
+
+    The archive must know move_destination's address; when it is our own receiver, the instances arrive in
+    the file list through it.
+    """
+    ae = AE(ae_title=calling_ae_title)
+    ae.add_requested_context(StudyRootQueryRetrieveInformationModelMove)
+    assoc = _associate(ae, node)
+    total = RetrieveSummary()
+    try:
+        for identifier in identifiers:
+            if cancelled is not None and cancelled.is_set():
+                total.error = "cancelled"
+                break
+            summary = RetrieveSummary()
+            _read_responses(
+                assoc.send_c_move(identifier, move_destination, StudyRootQueryRetrieveInformationModelMove),
+                summary,
+                on_progress,
+                lambda: assoc.send_c_cancel(1, query_model=StudyRootQueryRetrieveInformationModelMove),
+                cancelled,
+            )
+            total.completed += summary.completed
+            total.failed += summary.failed
+            total.warning += summary.warning
+            total.error = summary.error or total.error
+    finally:
+        if assoc.is_established:
+            assoc.release()
+    return total
@@ -0,0 +1,108 @@
+"""Write many files concurrently with bounded parallelism.
+
+Each job knows how to write one destination.  Jobs run on a thread pool, results are yielded as each one
+completes (so a caller can report progress), and one job failing doesn't stop the others.
+"""
+
+import logging
+import shutil
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional
+
+from dcmqtreepy.atomic_save import ProgressFile, atomic_write
+from dcmqtreepy.bounded_pool import run_bounded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_WORKERS = 4
+
+
+def _ignore_progress(bytes_written: int) -> None:
+    pass
+
+
+@dataclass
+class SaveJob:
+    """Write destination by calling save(progress), where progress takes the number of bytes written so far."""
+
+    destination: Path
+    save: Callable[[Callable[[int], None]], None]
+
+
+@dataclass
+class SaveResult:
+    destination: Path
+    bytes_written: int = 0
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+
+@dataclass
+class SaveSummary:
+    """Totals for a run of save jobs."""
+
+    results: List[SaveResult] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def failures(self) -> List[SaveResult]:
+        return [result for result in self.results if result.error is not None]
+
+    @property
+    def bytes_written(self) -> int:
+        return sum(result.bytes_written for result in self.results if result.error is None)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_written / self.elapsed_seconds if self.elapsed_seconds > 0 else 0.0
+
+    def describe(self) -> str:
+        saved = len(self.results) - len(self.failures)
+        megabytes = self.bytes_written / (1024 * 1024)
+        text = f"Saved {saved} of {len(self.results)} files, {megabytes:.1f} MB in {self.elapsed_seconds:.1f} s"
+        return text + f" ({self.bytes_per_second / (1024 * 1024):.1f} MB/s)"
+
+
+def copy_job(source: Path, destination: Path) -> SaveJob:
+    """A job copying source, unchanged, to destination."""
+
+    def save(progress: Callable[[int], None]) -> None:
+        with atomic_write(destination) as partial, open(source, "rb") as source_file:
+            shutil.copyfileobj(source_file, ProgressFile(partial, progress))
+
+    return SaveJob(destination, save)
+
+
+def run_job(job: SaveJob) -> SaveResult:
+    start = time.perf_counter()
+    try:
+        job.save(_ignore_progress)
+        bytes_written = Path(job.destination).stat().st_size
+    except Exception as save_exc:
+        logger.error(f"Saving {job.destination} failed: {save_exc}")
+        return SaveResult(destination=job.destination, seconds=time.perf_counter() - start, error=str(save_exc))
+    return SaveResult(destination=job.destination, bytes_written=bytes_written, seconds=time.perf_counter() - start)
+
+
+def run_save_jobs(jobs: Iterable[SaveJob], max_workers: int = DEFAULT_MAX_WORKERS) -> Iterator[SaveResult]:
+    """Run jobs with at most max_workers at a time, yielding each result as its job completes."""
+    yield from run_bounded(run_job, jobs, max_workers)
+
+
+def save_all(
+    jobs: List[SaveJob],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    on_result: Optional[Callable[[SaveResult, int, int], None]] = None,
+) -> SaveSummary:
+    """Run jobs, calling on_result(result, done, total) as each completes, and return the totals."""
+    summary = SaveSummary()
+    start = time.perf_counter()
+    for result in run_save_jobs(jobs, max_workers):
+        summary.results.append(result)
+        if on_result is not None:
+            on_result(result, len(summary.results), len(jobs))
+    summary.elapsed_seconds = time.perf_counter() - start
+    logger.info(summary.describe())
+    return summary
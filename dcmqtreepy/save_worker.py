@@ -0,0 +1,86 @@
+"""Run saves on a thread pool so that writing large files doesn't freeze the window."""
+
+import logging
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from pydicom import Dataset
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from dcmqtreepy.save_queue import DEFAULT_MAX_WORKERS, SaveJob, SaveResult, save_all
+
+logger = logging.getLogger(__name__)
+
+
+class SaveSignals(QObject):
+    # path, percent complete
+    progress = Signal(str, int)
+    finished = Signal(str)
+    # path, error message
+    failed = Signal(str, str)
+
+
+class SaveWorker(QRunnable):
+    """Call save(progress) on a pool thread, reporting progress against total_bytes and the outcome as signals.
+
+    save is passed a callable taking the number of bytes written so far.  The remaining attributes are for
+    the window that queues the save: queue_path identifies the saves that must run one after another,
+    file_dataset is what the source file holds once this save is done and on_saved, if set, is called (on
+    the window's thread) when it has finished.  edited_path, edits (original, modified) and tree_generation
+    record the edits saved, which are kept as unsaved edits again if the save fails.
+    """
+
+    def __init__(self, path: Path, save: Callable[[Callable[[int], None]], None], total_bytes: Optional[int] = None):
+        super().__init__()
+        self.path = path
+        self.save = save
+        self.total_bytes = total_bytes
+        self.signals = SaveSignals()
+        self.queue_path = path
+        self.file_dataset: Optional[Dataset] = None
+        self.on_saved: Optional[Callable[[], None]] = None
+        self.edited_path: Optional[str] = None
+        self.edits: Optional[Tuple[Dataset, Dataset]] = None
+        self.tree_generation = 0
+        # the window keeps the worker until it has finished, which may be after the pool is done with it
+        self.setAutoDelete(False)
+
+    def report_progress(self, bytes_written: int) -> None:
+        if self.total_bytes:
+            self.signals.progress.emit(str(self.path), min(99, bytes_written * 100 // self.total_bytes))
+
+    def run(self):
+        try:
+            self.save(self.report_progress)
+        except Exception as save_exc:
+            logger.error(f"Saving {self.path} failed: {save_exc}", exc_info=True)
+            self.signals.failed.emit(str(self.path), str(save_exc))
+            return
+        self.signals.finished.emit(str(self.path))
+
+
+class BatchSaveSignals(QObject):
+    # destination, error message ("" when saved), percent of the files done
+    file_done = Signal(str, str, int)
+    # summary of the whole batch
+    finished = Signal(str)
+
+
+class BatchSaveWorker(QRunnable):
+    """Run a list of save jobs (see save_queue) on a pool thread, reporting each file and the totals as signals."""
+
+    def __init__(self, jobs: List[SaveJob], max_workers: int = DEFAULT_MAX_WORKERS):
+        super().__init__()
+        self.jobs = jobs
+        self.max_workers = max_workers
+        self.signals = BatchSaveSignals()
+        self.setAutoDelete(False)
+
+    def report_result(self, result: SaveResult, done: int, total: int) -> None:
+        self.signals.file_done.emit(str(result.destination), result.error or "", done * 100 // total)
+
+    def run(self):
+        summary = save_all(self.jobs, self.max_workers, on_result=self.report_result)
+        self.signals.finished.emit(summary.describe())
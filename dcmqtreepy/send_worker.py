@@ -0,0 +1,58 @@
+"""Send instances with C-STORE on a thread pool, reporting the status of each as signals."""
+
+import logging
+import threading
+from pathlib import Path
+from typing import List
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QObject, QRunnable, Signal
+
+from dcmqtreepy.storage_scu import Destination, SendItem, SendResult, send_items
+
+logger = logging.getLogger(__name__)
+
+
+class SendSignals(QObject):
+    # label, sent, description
+    instance_done = Signal(str, bool, str)
+    # summary of the whole send
+    finished = Signal(str)
+
+
+class SendWorker(QRunnable):
+    """Send sources (items, or paths of files to send) to destination, on a pool thread.
+
+    Files are read on the pool thread.  cancel() stops sending after the instances in progress.
+    """
+
+    def __init__(self, destination: Destination, sources: List[SendItem | Path]):
+        super().__init__()
+        self.destination = destination
+        self.sources = sources
+        self.signals = SendSignals()
+        self.cancelled = threading.Event()
+        self.setAutoDelete(False)
+
+    def cancel(self) -> None:
+        self.cancelled.set()
+
+    def report_result(self, result: SendResult) -> None:
+        self.signals.instance_done.emit(result.label, result.ok, result.describe())
+
+    def run(self):
+        items = []
+        unread = 0
+        for source in self.sources:
+            if isinstance(source, SendItem):
+                items.append(source)
+                continue
+            try:
+                items.append(SendItem.from_path(source))
+            except Exception as read_exc:
+                logger.error(f"Unable to read {source} to send it: {read_exc}")
+                self.signals.instance_done.emit(str(source), False, f"{source}: not read, {read_exc}")
+                unread += 1
+        results = send_items(self.destination, items, on_result=self.report_result, cancelled=self.cancelled)
+        sent = sum(1 for result in results if result.ok)
+        self.signals.finished.emit(f"Sent {sent} of {len(results) + unread} to {self.destination}")
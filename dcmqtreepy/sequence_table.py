@@ -0,0 +1,138 @@
+"""A sequence as a table: a row per item, a column per element, for sorting and editing many items at once.
+
+The table is built in one pass over the items and kept by column, so sorting a column or setting it in
+thousands of rows doesn't touch the datasets.  Elements of nested sequences can be flattened into columns of
+their own (e.g. the Referenced Dose Reference Sequence of each control point), up to a given depth.  Edited
+cells are written back into the items with apply().
+"""
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from pydicom import Dataset, Sequence
+from pydicom.multival import MultiValue
+from pydicom.valuerep import VR
+
+from dcmqtreepy.batch_edit import cast_text_to_vr_value
+from dcmqtreepy.dataset_paths import NodePath, resolve_path
+from dcmqtreepy.memory_accounting import BINARY_VRS, is_deferred
+
+# a cell with no element in its item
+MISSING = None
+
+
+@dataclass(frozen=True)
+class Column:
+    """An element found in the items, by its path within an item (see dataset_paths)."""
+
+    path: NodePath
+    vr: str
+    name: str
+
+    @property
+    def editable(self) -> bool:
+        return self.vr != VR.SQ
+
+
+def format_value(value: Any) -> str:
+    """The text of a cell, multiple values separated by backslash as in the batch edits."""
+    if value is MISSING:
+        return ""
+    if isinstance(value, (list, MultiValue)):
+        return "\\".join(str(item) for item in value)
+    return str(value)
+
+
+def _sort_key(value: Any) -> Tuple[int, Any]:
+    # numbers before text, missing cells last
+    if value is MISSING or value == "":
+        return (2, "")
+    if isinstance(value, (list, MultiValue)):
+        value = value[0] if len(value) else ""
+    try:
+        return (0, float(value))
+    except (TypeError, ValueError):
+        return (1, str(value))
+
+
+class SequenceTable:
+    def __init__(self, sequence: Sequence | List[Dataset], flatten_depth: int = 0):
+        self.items: List[Dataset] = list(sequence)
+        self.flatten_depth = flatten_depth
+        self.columns: List[Column] = []
+        self.values: Dict[NodePath, List[Any]] = {}
+        # (row, column path) of the cells edited since the table was built
+        self.edited: Set[Tuple[int, NodePath]] = set()
+        self._build()
+
+    def _build(self) -> None:
+        for row, item in enumerate(self.items):
+            self._add_item(row, item, (), (), self.flatten_depth)
+            for values in self.values.values():
+                if len(values) <= row:
+                    values.append(MISSING)
+
+    def _add_item(self, row: int, ds: Dataset, prefix: NodePath, name_prefix: Tuple[str, ...], depth: int) -> None:
+        for tag in ds.keys():
+            if is_deferred(ds, tag):
+                continue
+            elem = ds[tag]
+            if elem.VR in BINARY_VRS:
+                continue
+            path = prefix + (elem.tag,)
+            if elem.VR == VR.SQ and depth > 0:
+                for index, nested in enumerate(elem.value):
+                    self._add_item(row, nested, path + (index,), name_prefix + (f"{elem.name}[{index + 1}]",), depth - 1)
+                continue
+            if path not in self.values:
+                self.columns.append(Column(path, elem.VR, " > ".join(name_prefix + (elem.name,))))
+                self.values[path] = [MISSING] * row
+            self.values[path].append(len(elem.value) if elem.VR == VR.SQ else elem.value)
+
+    @property
+    def row_count(self) -> int:
+        return len(self.items)
+
+    def column_index(self, path: NodePath) -> int:
+        return next(index for index, column in enumerate(self.columns) if column.path == path)
+
+    def text(self, row: int, column: int) -> str:
+        return format_value(self.values[self.columns[column].path][row])
+
+    def sorted_rows(self, column: int, descending: bool = False) -> List[int]:
+        """Rows in the order of the values in column (a stable sort, numbers compared as numbers)."""
+        values = self.values[self.columns[column].path]
+        return sorted(range(self.row_count), key=lambda row: _sort_key(values[row]), reverse=descending)
+
+    def set_text(self, rows: Iterable[int], column: int, text: str) -> None:
+        """Set the cells of column in rows to text, converted to the column's VR; raises ValueError if it can't be."""
+        target = self.columns[column]
+        if not target.editable:
+            raise ValueError(f"{target.name} is a sequence, flatten it to edit its elements")
+        value = cast_text_to_vr_value(text, target.vr)
+        if value is not None and target.vr in (VR.DS, VR.IS):
+            # kept as text by cast_text_to_vr_value, checked here rather than when saved
+            number = float if target.vr == VR.DS else int
+            for part in text.split("\\"):
+                number(part)
+        values = self.values[target.path]
+        for row in rows:
+            values[row] = value
+            self.edited.add((row, target.path))
+
+    def apply(self) -> int:
+        """Write the edited cells into the items, adding elements missing from an item; returns how many."""
+        vrs = {column.path: column.vr for column in self.columns}
+        written = 0
+        for row, path in self.edited:
+            parent: Optional[Dataset] = resolve_path(self.items[row], path[:-1])
+            if parent is None:  # the nested item doesn't exist in this row
+                continue
+            value = self.values[path][row]
+            if path[-1] in parent:
+                parent[path[-1]].value = value
+            else:
+                parent.add_new(path[-1], vrs[path], value)
+            written += 1
+        self.edited.clear()
+        return written
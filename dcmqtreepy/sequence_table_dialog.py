@@ -0,0 +1,170 @@
+"""A dialog showing a sequence as a sortable, editable table (see sequence_table)."""
+
+import logging
+from typing import Dict, List
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtWidgets import (
+    QAbstractItemView,
+    QDialog,
+    QDialogButtonBox,
+    QHBoxLayout,
+    QInputDialog,
+    QLabel,
+    QPushButton,
+    QSpinBox,
+    QTableView,
+    QVBoxLayout,
+)
+
+from dcmqtreepy.sequence_table import SequenceTable
+
+logger = logging.getLogger(__name__)
+
+
+class SequenceTableModel(QAbstractTableModel):
+    """The rows of a SequenceTable, in the order of the last sort."""
+
+    def __init__(self, table: SequenceTable, parent=None):
+        super().__init__(parent)
+        self.table = table
+        self.order: List[int] = list(range(table.row_count))
+
+    def set_table(self, table: SequenceTable):
+        self.beginResetModel()
+        self.table = table
+        self.order = list(range(table.row_count))
+        self.endResetModel()
+
+    def item_row(self, index: QModelIndex) -> int:
+        """The item (row of the table) shown at index."""
+        return self.order[index.row()]
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self.table.row_count
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.table.columns)
+
+    def headerData(self, section: int, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Vertical:
+            # the item number, which stays with the row when sorted
+            return str(self.order[section] + 1) if role == Qt.ItemDataRole.DisplayRole else None
+        column = self.table.columns[section]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return column.name
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return f"{column.name} ({column.vr})"
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.EditRole):
+            return None
+        return self.table.text(self.item_row(index), index.column())
+
+    def flags(self, index: QModelIndex):
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if self.table.columns[index.column()].editable:
+            flags |= Qt.ItemFlag.ItemIsEditable
+        return flags
+
+    def setData(self, index: QModelIndex, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if role != Qt.ItemDataRole.EditRole or not index.isValid():
+            return False
+        return self.set_cells([index], str(value))
+
+    def set_cells(self, indexes: List[QModelIndex], text: str) -> bool:
+        """Set the cells at indexes to text; False (and nothing set) if text isn't valid for every column."""
+        rows_by_column: Dict[int, List[int]] = {}
+        for index in indexes:
+            rows_by_column.setdefault(index.column(), []).append(self.item_row(index))
+        try:
+            for column, rows in rows_by_column.items():
+                self.table.set_text(rows, column, text)
+        except ValueError as value_exc:
+            logger.warning(f"Unable to set {text!r}: {value_exc}")
+            return False
+        for index in indexes:
+            self.dataChanged.emit(index, index)
+        return True
+
+    def sort(self, column: int, order=Qt.SortOrder.AscendingOrder):
+        self.layoutAboutToBeChanged.emit()
+        self.order = self.table.sorted_rows(column, descending=order == Qt.SortOrder.DescendingOrder)
+        self.layoutChanged.emit()
+
+
+class SequenceTableDialog(QDialog):
+    """Edit the items of a sequence as the rows of a table.
+
+    The edits are written into the items (part of the caller's dataset) when the dialog is accepted;
+    edit_count tells how many cells were written.
+    """
+
+    def __init__(self, title: str, table: SequenceTable, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.edit_count = 0
+        self.model = SequenceTableModel(table, self)
+        self.view = QTableView()
+        self.view.setModel(self.model)
+        self.view.setSortingEnabled(True)
+        self.view.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.view.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+
+        self.flatten_spin = QSpinBox()
+        self.flatten_spin.setRange(0, 5)
+        self.flatten_spin.setValue(table.flatten_depth)
+        self.flatten_spin.setPrefix("Flatten nested sequences: ")
+        self.flatten_spin.valueChanged.connect(self.handle_flatten_changed)
+        self.set_button = QPushButton("Set Selected Cells...")
+        self.set_button.clicked.connect(self.on_set_selected)
+        self.status_label = QLabel()
+        controls = QHBoxLayout()
+        controls.addWidget(self.flatten_spin)
+        controls.addStretch()
+        controls.addWidget(self.set_button)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        layout = QVBoxLayout(self)
+        layout.addLayout(controls)
+        layout.addWidget(self.view)
+        layout.addWidget(self.status_label)
+        layout.addWidget(buttons)
+        self.resize(1000, 700)
+        self.update_status()
+
+    @property
+    def table(self) -> SequenceTable:
+        return self.model.table
+
+    def update_status(self):
+        self.status_label.setText(
+            f"{self.table.row_count} items, {len(self.table.columns)} columns, {len(self.table.edited)} cells edited"
+        )
+
+    def handle_flatten_changed(self, depth: int):
+        # the edits so far go into the items before the table is rebuilt from them
+        self.edit_count += self.table.apply()
+        self.model.set_table(SequenceTable(self.table.items, flatten_depth=depth))
+        self.update_status()
+
+    def on_set_selected(self):
+        indexes = self.view.selectionModel().selectedIndexes()
+        if not indexes:
+            self.status_label.setText("Select the cells to set")
+            return
+        text, ok = QInputDialog.getText(self, "Set Selected Cells", "Value (multiple values separated by \\):")
+        if not ok:
+            return
+        if not self.model.set_cells(indexes, text):
+            self.status_label.setText(f"{text!r} is not a valid value for all the selected columns")
+            return
+        self.update_status()
+
+    def accept(self):
+        self.edit_count += self.table.apply()
+        super().accept()
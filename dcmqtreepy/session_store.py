@@ -0,0 +1,330 @@
+"""Process wide store of the datasets opened by the sessions of a shared (server mode) viewer.
+
+Each session's datasets are accounted against a per-session budget and all sessions together against a
+global budget.  When a budget is exceeded the least recently used datasets are evicted to a spool
+directory on disk (idle sessions first) and transparently read back, with large values deferred, the
+next time they are needed.  Datasets pinned by a session (for the length of a script run editing them) are
+not evicted by any session.
+
+The store's lock is only held for its bookkeeping: reading a dataset back, writing it out on eviction or
+replacing its bytes is done holding just that dataset's io_lock, so a session parsing or evicting a large
+object never holds up the other sessions (or the admin page).
+"""
+
+import logging
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pydicom import Dataset, dcmread, dcmwrite
+
+from dcmqtreepy.memory_accounting import estimate_dataset_bytes
+
+logger = logging.getLogger(__name__)
+
+# values larger than this are left on disk until they are accessed
+DEFAULT_DEFER_SIZE = "256 KB"
+
+
+@dataclass
+class StoredDataset:
+    """A dataset held by the store on behalf of one session."""
+
+    path: Path
+    dataset: Optional[Dataset] = None
+    size_bytes: int = 0
+    parse_seconds: float = 0.0
+    last_access: float = field(default_factory=time.monotonic)
+    evictions: int = 0
+    # runs using the dataset, which is not evicted while any are
+    pins: int = 0
+    # being written to the spool by evict
+    evicting: bool = False
+    # held while the dataset is read, written or replaced, and the store's lock is not
+    io_lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def in_memory(self) -> bool:
+        return self.dataset is not None
+
+
+@dataclass
+class SessionUsage:
+    """Summary of one session's use of the store, for reporting."""
+
+    session_id: str
+    memory_bytes: int
+    datasets_in_memory: int
+    datasets_on_disk: int
+    evictions: int
+    total_parse_seconds: float
+    last_parse_seconds: float
+    idle_seconds: float
+
+
+class SessionDatasetStore:
+    def __init__(
+        self,
+        spool_dir: Path,
+        global_budget_bytes: int,
+        session_budget_bytes: int,
+        defer_size: int | str | None = DEFAULT_DEFER_SIZE,
+        max_idle_seconds: float | None = None,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.global_budget_bytes = global_budget_bytes
+        self.session_budget_bytes = session_budget_bytes
+        self.defer_size = defer_size
+        self.max_idle_seconds = max_idle_seconds
+        self._sessions: Dict[str, Dict[str, StoredDataset]] = {}
+        self._session_last_access: Dict[str, float] = {}
+        self._last_parse_seconds: Dict[str, float] = {}
+        self._lock = threading.RLock()
+
+    def session_dir(self, session_id: str) -> Path:
+        return self.spool_dir / session_id
+
+    def add_file(self, session_id: str, key: str, data: bytes) -> Path:
+        """Spool the bytes of an uploaded file for session_id under key; the file is parsed on first get."""
+        path = self.session_dir(session_id) / f"{key}.dcm"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        with self._lock:
+            self._sessions.setdefault(session_id, {})[key] = StoredDataset(path=path)
+            self._touch(session_id)
+        self.expire_idle_sessions()
+        return path
+
+    def session_file(self, session_id: str, name: str) -> Path:
+        """A file of the session's own, e.g. the results of a batch, in its spool directory (removed with the session)."""
+        path = self.session_dir(session_id) / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self._touch(session_id)
+        return path
+
+    def has(self, session_id: str, key: str) -> bool:
+        with self._lock:
+            return key in self._sessions.get(session_id, {})
+
+    def spooled_path(self, session_id: str, key: str) -> Path:
+        """The file holding the last saved (or evicted) bytes for key."""
+        with self._lock:
+            return self._sessions[session_id][key].path
+
+    def get(self, session_id: str, key: str) -> Dataset:
+        """Return the dataset for key, reading it back from the spool if it is not in memory."""
+        with self._lock:
+            stored = self._sessions[session_id][key]
+            # so no other session evicts it before it is returned
+            stored.pins += 1
+        try:
+            with stored.io_lock:
+                if not stored.in_memory:
+                    start = time.perf_counter()
+                    dataset = dcmread(stored.path, force=True, defer_size=self.defer_size)
+                    parse_seconds = time.perf_counter() - start
+                    size_bytes = estimate_dataset_bytes(dataset)
+                    with self._lock:
+                        stored.dataset = dataset
+                        stored.parse_seconds += parse_seconds
+                        self._last_parse_seconds[session_id] = parse_seconds
+                        stored.size_bytes = size_bytes
+                    logger.debug(f"Session {session_id} loaded {stored.path.name} ({size_bytes} bytes)")
+                dataset = stored.dataset
+            with self._lock:
+                stored.last_access = time.monotonic()
+                self._touch(session_id)
+            self.enforce_budgets(session_id, protected=stored)
+        finally:
+            with self._lock:
+                stored.pins -= 1
+        return dataset
+
+    def pin(self, session_id: str, key: str) -> None:
+        """Keep the dataset for key in memory until unpinned, e.g. while a script run is editing it."""
+        with self._lock:
+            self._sessions[session_id][key].pins += 1
+
+    def unpin(self, session_id: str, key: str) -> None:
+        with self._lock:
+            stored = self._sessions.get(session_id, {}).get(key)
+            if stored is not None and stored.pins > 0:
+                stored.pins -= 1
+
+    @contextmanager
+    def pinned(self, session_id: str, key: str) -> Iterator[Dataset]:
+        """The dataset for key, kept in memory until the block ends."""
+        self.pin(session_id, key)
+        try:
+            yield self.get(session_id, key)
+        finally:
+            self.unpin(session_id, key)
+
+    def replace(self, session_id: str, key: str, data: bytes) -> None:
+        """Replace the spooled bytes for key, e.g. after the session saved its edits.
+
+        The in-memory dataset may still defer values to the old file, so it is dropped and the next get
+        parses the new bytes.
+        """
+        with self._lock:
+            stored = self._sessions[session_id][key]
+        with stored.io_lock:
+            with self._lock:
+                stored.dataset = None
+                stored.size_bytes = 0
+            stored.path.write_bytes(data)
+
+    def update_size(self, session_id: str, key: str) -> None:
+        """Re-estimate the memory held by key after its dataset was edited."""
+        with self._lock:
+            stored = self._sessions[session_id][key]
+            dataset = stored.dataset
+        if dataset is not None:
+            size_bytes = estimate_dataset_bytes(dataset)
+            with self._lock:
+                if stored.dataset is dataset:
+                    stored.size_bytes = size_bytes
+        self.enforce_budgets(session_id, protected=stored)
+
+    def evict(self, session_id: str, key: str) -> bool:
+        """Write the dataset for key to the spool and drop it from memory, unless it is (or gets) pinned.
+
+        Returns whether it was evicted.
+        """
+        with self._lock:
+            stored = self._sessions.get(session_id, {}).get(key)
+            if stored is None:
+                return False
+            stored.evicting = True
+        try:
+            with stored.io_lock:
+                with self._lock:
+                    dataset = stored.dataset
+                    if dataset is None or stored.pins:
+                        return False
+                # deferred values are still read from stored.path, so write next to it and swap
+                evicted_path = stored.path.with_suffix(".evicted")
+                try:
+                    dcmwrite(evicted_path, dataset, write_like_original=True)
+                except OSError as evict_exc:
+                    # e.g. the session was discarded meanwhile
+                    logger.warning(f"Unable to evict {stored.path.name} of session {session_id}: {evict_exc}")
+                    return False
+                with self._lock:
+                    if stored.pins:
+                        # taken into use again while it was written
+                        evicted_path.unlink(missing_ok=True)
+                        return False
+                    stored.dataset = None
+                    evicted_path.replace(stored.path)
+                    stored.size_bytes = 0
+                    stored.evictions += 1
+            logger.info(f"Evicted {stored.path.name} of session {session_id} to disk")
+            return True
+        finally:
+            with self._lock:
+                stored.evicting = False
+
+    def discard_session(self, session_id: str) -> None:
+        """Forget a session, removing its datasets from memory and its spool directory from disk."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._session_last_access.pop(session_id, None)
+            self._last_parse_seconds.pop(session_id, None)
+        shutil.rmtree(self.session_dir(session_id), ignore_errors=True)
+
+    def expire_idle_sessions(self) -> None:
+        if self.max_idle_seconds is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            idle = [
+                session_id
+                for session_id, last_access in self._session_last_access.items()
+                if now - last_access > self.max_idle_seconds
+            ]
+        for session_id in idle:
+            logger.info(f"Discarding idle session {session_id}")
+            self.discard_session(session_id)
+
+    def session_bytes(self, session_id: str) -> int:
+        """Memory held by the session's datasets, not counting those being evicted."""
+        with self._lock:
+            return sum(
+                stored.size_bytes
+                for stored in self._sessions.get(session_id, {}).values()
+                if stored.in_memory and not stored.evicting
+            )
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self.session_bytes(session_id) for session_id in self._sessions)
+
+    def enforce_budgets(self, session_id: str, protected: Optional[StoredDataset] = None) -> None:
+        """Evict least recently used datasets until the session and global budgets are met.
+
+        The session's own datasets are evicted to meet its budget; to meet the global budget the datasets of
+        the sessions that have been idle longest go first.  protected (the dataset in use) and pinned datasets
+        are never evicted.  Each victim is chosen holding the store's lock and written out without it.
+        """
+        # taken into use, or failing to be written, since they were chosen
+        kept: List[Tuple[str, str]] = []
+        while True:
+            with self._lock:
+                victim = self._next_victim(session_id, protected, kept)
+            if victim is None:
+                break
+            if not self.evict(*victim):
+                kept.append(victim)
+        if self.total_bytes() > self.global_budget_bytes:
+            logger.warning(f"Memory budget exceeded by the dataset in use by session {session_id}")
+
+    def _next_victim(
+        self, session_id: str, protected: Optional[StoredDataset], kept: List[Tuple[str, str]]
+    ) -> Optional[Tuple[str, str]]:
+        """The session and key of the dataset to evict next to meet the budgets (not one of kept), marked as being evicted."""
+        victim = None
+        own = [key for key in self._eviction_candidates([session_id], protected) if (session_id, key) not in kept]
+        if own and self.session_bytes(session_id) > self.session_budget_bytes:
+            victim = (session_id, own[0])
+        elif self.total_bytes() > self.global_budget_bytes:
+            idle_first = sorted(self._sessions, key=lambda other: (other == session_id, self._session_last_access[other]))
+            candidates = [(other, key) for other in idle_first for key in self._eviction_candidates([other], protected)]
+            victim = next((candidate for candidate in candidates if candidate not in kept), None)
+        if victim is not None:
+            self._sessions[victim[0]][victim[1]].evicting = True
+        return victim
+
+    def usage(self) -> List[SessionUsage]:
+        now = time.monotonic()
+        with self._lock:
+            return [
+                SessionUsage(
+                    session_id=session_id,
+                    memory_bytes=self.session_bytes(session_id),
+                    datasets_in_memory=sum(stored.in_memory for stored in datasets.values()),
+                    datasets_on_disk=sum(not stored.in_memory for stored in datasets.values()),
+                    evictions=sum(stored.evictions for stored in datasets.values()),
+                    total_parse_seconds=sum(stored.parse_seconds for stored in datasets.values()),
+                    last_parse_seconds=self._last_parse_seconds.get(session_id, 0.0),
+                    idle_seconds=now - self._session_last_access[session_id],
+                )
+                for session_id, datasets in self._sessions.items()
+            ]
+
+    def _eviction_candidates(self, session_ids: List[str], protected: Optional[StoredDataset]) -> List[str]:
+        """Keys of the in-memory datasets of session_ids, least recently used first."""
+        candidates = []
+        for session_id in session_ids:
+            for key, stored in self._sessions.get(session_id, {}).items():
+                if stored.in_memory and stored is not protected and not stored.pins and not stored.evicting:
+                    candidates.append((stored.last_access, key))
+        return [key for _, key in sorted(candidates)]
+
+    def _touch(self, session_id: str) -> None:
+        self._session_last_access[session_id] = time.monotonic()
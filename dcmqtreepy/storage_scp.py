@@ -0,0 +1,113 @@
+"""Receive DICOM instances pushed to us (C-STORE SCP) into a spool directory.
+
+Each association is handled on its own pynetdicom thread, which writes the received instance to the spool
+directory as it was encoded on the wire and puts its path on a bounded queue.  The window drains the queue
+on a timer.  When the window falls behind, the queue fills and the store handlers wait for room, which
+holds up the sender's next C-STORE rather than letting received paths pile up in memory.
+"""
+
+import logging
+import queue
+import re
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from pynetdicom import AE, ALL_TRANSFER_SYNTAXES, AllStoragePresentationContexts, evt
+from pynetdicom.sop_class import Verification
+
+from dcmqtreepy.atomic_save import atomic_write
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AE_TITLE = "DCMQTREEPY"
+DEFAULT_PORT = 11112
+DEFAULT_QUEUE_SIZE = 256
+# how long a store handler waits for room on the queue before refusing the instance
+QUEUE_TIMEOUT_SECONDS = 60.0
+
+STATUS_SUCCESS = 0x0000
+STATUS_OUT_OF_RESOURCES = 0xA700
+
+_UID_PATTERN = re.compile(r"^[0-9.]{1,64}$")
+
+
+def spool_file_name(sop_instance_uid: str) -> str:
+    """File name for a received instance, its SOP Instance UID when that is safe to use as a name."""
+    uid = str(sop_instance_uid).strip("\x00 ")
+    if _UID_PATTERN.match(uid) and uid.strip("."):
+        return f"{uid}.dcm"
+    return f"{uuid.uuid4().hex}.dcm"
+
+
+class StorageReceiver:
+    """A Storage SCP writing received instances to spool_dir, with their paths queued for the caller.
+
+    Call start() to listen on port and stop() to shut down.  received_paths() returns what has arrived
+    since it was last called, without waiting.
+    """
+
+    def __init__(
+        self,
+        spool_dir: Path | str,
+        port: int = DEFAULT_PORT,
+        ae_title: str = DEFAULT_AE_TITLE,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        queue_timeout: float = QUEUE_TIMEOUT_SECONDS,
+    ):
+        self.spool_dir = Path(spool_dir)
+        self.port = port
+        self.ae_title = ae_title
+        self.queue_timeout = queue_timeout
+        self.received: "queue.Queue[Path]" = queue.Queue(maxsize=queue_size)
+        self.server = None
+
+        self.ae = AE(ae_title=ae_title)
+        for context in AllStoragePresentationContexts:
+            self.ae.add_supported_context(context.abstract_syntax, ALL_TRANSFER_SYNTAXES)
+        self.ae.add_supported_context(Verification)
+
+    @property
+    def is_running(self) -> bool:
+        return self.server is not None
+
+    def start(self) -> None:
+        if self.server is not None:
+            return
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        self.server = self.ae.start_server(("", self.port), block=False, evt_handlers=[(evt.EVT_C_STORE, self.handle_store)])
+        logger.info(f"Receiving DICOM as {self.ae_title} on port {self.port} into {self.spool_dir}")
+
+    def stop(self) -> None:
+        if self.server is None:
+            return
+        self.server.shutdown()
+        self.server = None
+        logger.info(f"Stopped receiving DICOM on port {self.port}")
+
+    def handle_store(self, event) -> int:
+        """Write the instance to the spool directory, then wait for room on the queue for its path."""
+        path = self.spool_dir / spool_file_name(event.request.AffectedSOPInstanceUID)
+        try:
+            with atomic_write(path) as partial:
+                partial.write(event.encoded_dataset())
+        except OSError as write_exc:
+            logger.error(f"Unable to write received instance to {path}: {write_exc}")
+            return STATUS_OUT_OF_RESOURCES
+        try:
+            self.received.put(path, timeout=self.queue_timeout)
+        except queue.Full:
+            logger.error(f"Received instances are not being taken up, refusing {path.name}")
+            path.unlink(missing_ok=True)
+            return STATUS_OUT_OF_RESOURCES
+        return STATUS_SUCCESS
+
+    def received_paths(self, max_paths: Optional[int] = None) -> List[Path]:
+        """Paths of the instances received since the last call (at most max_paths of them)."""
+        paths = []
+        while max_paths is None or len(paths) < max_paths:
+            try:
+                paths.append(self.received.get_nowait())
+            except queue.Empty:
+                break
+        return paths
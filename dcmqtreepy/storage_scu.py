@@ -0,0 +1,306 @@
+"""Send files, or edited datasets that haven't been saved, to another AE with C-STORE.
+
+The instances for a destination are sent over a few associations running in parallel, each association
+reused for every instance it sends.  Only the presentation contexts the instances need are proposed: one
+per SOP Class and transfer syntax, with the uncompressed little endian syntaxes offered as alternatives
+for uncompressed data.  The status of every instance is reported as it is sent.
+
+Destinations are named in a TOML file (see load_destinations), or given as AE@host:port.
+"""
+
+import argparse
+import logging
+import math
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+import platformdirs
+import tomli
+from pydicom import Dataset, dcmread
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import (
+    ExplicitVRBigEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+)
+from pynetdicom import AE
+from pynetdicom.presentation import build_context
+
+from dcmqtreepy.element_offsets import transfer_syntax_encoding
+from dcmqtreepy.storage_scp import DEFAULT_AE_TITLE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ASSOCIATIONS = 4
+# an association can negotiate at most 128 presentation contexts (PS3.8 9.3.2.2)
+MAX_PRESENTATION_CONTEXTS = 128
+UNCOMPRESSED_TRANSFER_SYNTAXES = [ExplicitVRLittleEndian, ImplicitVRLittleEndian]
+
+# statuses other than these are failures (PS3.4 B.2.3)
+STATUS_SUCCESS = 0x0000
+WARNING_STATUSES = {0xB000, 0xB006, 0xB007}
+
+_ADDRESS_PATTERN = re.compile(r"^(?P<ae_title>[^@]{1,16})@(?P<host>[^:]+):(?P<port>\d+)$")
+
+
+def destinations_path() -> Path:
+    return Path(platformdirs.user_config_dir("dcmQTreePy")) / "dicom_nodes.toml"
+
+
+@dataclass(frozen=True)
+class Destination:
+    ae_title: str
+    host: str
+    port: int
+    name: str = ""
+
+    def __str__(self) -> str:
+        address = f"{self.ae_title}@{self.host}:{self.port}"
+        return f"{self.name} ({address})" if self.name else address
+
+
+def load_destinations(path: Optional[Path] = None) -> Dict[str, Destination]:
+    """The destinations named in path, a TOML file with a table per destination, e.g.
+
+    [nodes.planning]
+    ae_title = "TPS"
+    host = "10.0.0.5"
+    port = 104
+
+    A missing file has no destinations.
+    """
+    path = destinations_path() if path is None else Path(path)
+    if not path.exists():
+        return {}
+    with open(path, "rb") as toml_file:
+        config = tomli.load(toml_file)
+    destinations = {}
+    for name, node in config.get("nodes", {}).items():
+        try:
+            destinations[name] = Destination(node["ae_title"], node["host"], int(node["port"]), name)
+        except (KeyError, TypeError, ValueError) as node_exc:
+            logger.error(f"Ignoring DICOM node {name} in {path}, it needs ae_title, host and port: {node_exc}")
+    return destinations
+
+
+def parse_destination(text: str, destinations: Optional[Dict[str, Destination]] = None) -> Destination:
+    """The destination named text, or given by text as AE@host:port."""
+    if destinations and text in destinations:
+        return destinations[text]
+    match = _ADDRESS_PATTERN.match(text.strip())
+    if match is None:
+        raise ValueError(f"{text} is neither a configured DICOM node nor AE@host:port")
+    return Destination(match["ae_title"], match["host"], int(match["port"]))
+
+
+@dataclass
+class SendItem:
+    """An instance to send: a file, or a dataset in memory (label says what it is in reports)."""
+
+    label: str
+    path: Optional[Path] = None
+    dataset: Optional[Dataset] = None
+    sop_class_uid: str = ""
+    sop_instance_uid: str = ""
+    transfer_syntax_uid: str = ""
+
+    @classmethod
+    def from_path(cls, path: Path | str) -> "SendItem":
+        """An item for the file at path, reading just enough of it to negotiate a presentation context."""
+        path = Path(path)
+        header = dcmread(path, stop_before_pixels=True, specific_tags=["SOPClassUID", "SOPInstanceUID"])
+        transfer_syntax_uid = header.file_meta.get("TransferSyntaxUID", "") if hasattr(header, "file_meta") else ""
+        if not transfer_syntax_uid:
+            transfer_syntax_uid = ImplicitVRLittleEndian if header.is_implicit_VR else ExplicitVRLittleEndian
+        return cls(
+            label=str(path),
+            path=path,
+            sop_class_uid=header.get("SOPClassUID", ""),
+            sop_instance_uid=header.get("SOPInstanceUID", ""),
+            transfer_syntax_uid=transfer_syntax_uid,
+        )
+
+    @classmethod
+    def from_dataset(cls, dataset: Dataset, label: str, transfer_syntax_uid: Optional[str] = None) -> "SendItem":
+        """An item for dataset, to be sent in transfer_syntax_uid (by default its own, or explicit VR little endian).
+
+        dataset is given file meta information with the transfer syntax if it doesn't have any.
+        """
+        file_meta = getattr(dataset, "file_meta", None)
+        if transfer_syntax_uid is None:
+            transfer_syntax_uid = (file_meta.get("TransferSyntaxUID") if file_meta else None) or ExplicitVRLittleEndian
+        if file_meta is None or file_meta.get("TransferSyntaxUID") != transfer_syntax_uid:
+            dataset.file_meta = FileMetaDataset(file_meta or FileMetaDataset())
+            dataset.file_meta.TransferSyntaxUID = transfer_syntax_uid
+        dataset.is_implicit_VR, dataset.is_little_endian = transfer_syntax_encoding(transfer_syntax_uid)
+        return cls(
+            label=label,
+            dataset=dataset,
+            sop_class_uid=dataset.get("SOPClassUID", ""),
+            sop_instance_uid=dataset.get("SOPInstanceUID", ""),
+            transfer_syntax_uid=transfer_syntax_uid,
+        )
+
+    @property
+    def context_key(self) -> Tuple[str, str]:
+        return str(self.sop_class_uid), str(self.transfer_syntax_uid)
+
+
+@dataclass
+class SendResult:
+    label: str
+    sop_instance_uid: str
+    status: Optional[int] = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and (self.status == STATUS_SUCCESS or self.status in WARNING_STATUSES)
+
+    def describe(self) -> str:
+        if self.error is not None:
+            return f"{self.label}: failed, {self.error}"
+        outcome = "sent" if self.status == STATUS_SUCCESS else ("sent with warning" if self.ok else "refused")
+        return f"{self.label}: {outcome} (status 0x{self.status:04X})"
+
+
+def transfer_syntaxes_for(transfer_syntax_uid: str) -> List[str]:
+    """Transfer syntaxes to propose for data encoded in transfer_syntax_uid."""
+    if transfer_syntax_uid in UNCOMPRESSED_TRANSFER_SYNTAXES or transfer_syntax_uid == ExplicitVRBigEndian:
+        return [transfer_syntax_uid] + [uid for uid in UNCOMPRESSED_TRANSFER_SYNTAXES if uid != transfer_syntax_uid]
+    return [transfer_syntax_uid]
+
+
+def presentation_contexts(items: List[SendItem]) -> list:
+    """The presentation contexts needed to send items, one per SOP Class and transfer syntax."""
+    keys = sorted({item.context_key for item in items})
+    return [build_context(sop_class_uid, transfer_syntaxes_for(uid)) for sop_class_uid, uid in keys]
+
+
+def context_batches(items: List[SendItem], max_contexts: int = MAX_PRESENTATION_CONTEXTS) -> Iterator[List[SendItem]]:
+    """Split items into runs, each needing no more than max_contexts presentation contexts."""
+    batch: List[SendItem] = []
+    keys: Set[Tuple[str, str]] = set()
+    for item in sorted(items, key=lambda item: item.context_key):
+        if item.context_key not in keys and len(keys) == max_contexts:
+            yield batch
+            batch, keys = [], set()
+        batch.append(item)
+        keys.add(item.context_key)
+    if batch:
+        yield batch
+
+
+def send_over_association(
+    destination: Destination,
+    items: List[SendItem],
+    calling_ae_title: str = DEFAULT_AE_TITLE,
+    on_result: Optional[Callable[[SendResult], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> List[SendResult]:
+    """Send items to destination over one association, which proposes only the contexts they need."""
+    ae = AE(ae_title=calling_ae_title)
+    ae.requested_contexts = presentation_contexts(items)
+    results = []
+
+    def report(result: SendResult) -> None:
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+
+    assoc = ae.associate(destination.host, destination.port, ae_title=destination.ae_title)
+    if not assoc.is_established:
+        for item in items:
+            report(SendResult(item.label, item.sop_instance_uid, error=f"no association with {destination}"))
+        return results
+    try:
+        for item in items:
+            if cancelled is not None and cancelled.is_set():
+                report(SendResult(item.label, item.sop_instance_uid, error="cancelled"))
+                continue
+            if not assoc.is_established:
+                report(SendResult(item.label, item.sop_instance_uid, error="association closed by the destination"))
+                continue
+            try:
+                response = assoc.send_c_store(item.dataset if item.dataset is not None else item.path)
+            except (ValueError, OSError, AttributeError) as send_exc:
+                report(SendResult(item.label, item.sop_instance_uid, error=str(send_exc)))
+                continue
+            if "Status" in response:
+                report(SendResult(item.label, item.sop_instance_uid, status=response.Status))
+            else:
+                report(SendResult(item.label, item.sop_instance_uid, error="no response from the destination"))
+    finally:
+        if assoc.is_established:
+            assoc.release()
+    return results
+
+
+def send_items(
+    destination: Destination,
+    items: List[SendItem],
+    max_associations: int = DEFAULT_MAX_ASSOCIATIONS,
+    calling_ae_title: str = DEFAULT_AE_TITLE,
+    on_result: Optional[Callable[[SendResult], None]] = None,
+    cancelled: Optional[threading.Event] = None,
+) -> List[SendResult]:
+    """Send items to destination over up to max_associations associations at once.
+
+    on_result is called, from the thread of the association, with the status of each instance as it is
+    sent.  Setting cancelled stops sending after the instances in progress.
+    """
+    # each association gets a run of the instances sorted by SOP Class, so it needs few presentation contexts
+    items = sorted(items, key=lambda item: item.context_key)
+    share_size = max(1, math.ceil(len(items) / max_associations))
+    shares = []
+    for start in range(0, len(items), share_size):
+        end = start + share_size
+        shares.extend(context_batches(items[start:end]))
+    results: List[SendResult] = []
+    if not shares:
+        return results
+    with ThreadPoolExecutor(max_workers=min(max_associations, len(shares))) as executor:
+        futures = [
+            executor.submit(send_over_association, destination, share, calling_ae_title, on_result, cancelled)
+            for share in shares
+        ]
+        for future in futures:
+            results.extend(future.result())
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Send DICOM files to another AE with C-STORE")
+    parser.add_argument("destination", help="name of a node in the nodes file, or AE@host:port")
+    parser.add_argument("files", nargs="+", type=Path, help="files to send")
+    parser.add_argument("--nodes", type=Path, default=None, help=f"nodes file (default {destinations_path()})")
+    parser.add_argument("--associations", type=int, default=DEFAULT_MAX_ASSOCIATIONS, help="associations in parallel")
+    parser.add_argument("--calling-ae", default=DEFAULT_AE_TITLE, help="our AE title")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+
+    try:
+        destination = parse_destination(args.destination, load_destinations(args.nodes))
+    except (ValueError, tomli.TOMLDecodeError) as destination_exc:
+        parser.error(str(destination_exc))
+    items = []
+    for path in args.files:
+        try:
+            items.append(SendItem.from_path(path))
+        except Exception as read_exc:
+            print(f"{path}: not read, {read_exc}")
+    results = send_items(
+        destination, items, max(1, args.associations), args.calling_ae, on_result=lambda result: print(result.describe())
+    )
+    sent = sum(1 for result in results if result.ok)
+    print(f"Sent {sent} of {len(args.files)} to {destination}")
+    return 0 if sent == len(args.files) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,9 +3,16 @@
 import json
 import os
 import re
+import socket
 import tempfile
 
 import pytest
+from pydicom import Dataset
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, generate_uid
+from pynetdicom.sop_class import RTPlanStorage
+
+from dcmqtreepy.storage_scp import StorageReceiver
 
 
 @pytest.fixture
@@ -156,3 +163,44 @@ def assert_valid_vm_format():
         assert valid_format, f"VM '{vm}' for tag {hex(tag)} in {vendor or 'dictionary'} has invalid format"
 
     return _assert_valid_vm_format
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def rt_plan():
+    """Fixture returning a function that makes a small RT Plan with file meta information."""
+
+    def _rt_plan(station_name: str) -> Dataset:
+        ds = Dataset()
+        ds.SOPClassUID = RTPlanStorage
+        ds.SOPInstanceUID = generate_uid()
+        ds.PatientName = "Test^Patient"
+        ds.StationName = station_name
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_implicit_VR = False
+        ds.is_little_endian = True
+        return ds
+
+    return _rt_plan
+
+
+@pytest.fixture
+def receiver_factory(tmp_path):
+    """Fixture returning a function that starts a storage receiver on a free local port, stopped after the test."""
+    receivers = []
+
+    def _receiver_factory(**kwargs) -> StorageReceiver:
+        receiver = StorageReceiver(tmp_path / "spool", port=free_port(), **kwargs)
+        receiver.start()
+        receivers.append(receiver)
+        return receiver
+
+    yield _receiver_factory
+    for receiver in receivers:
+        receiver.stop()
@@ -0,0 +1,71 @@
+"""Unit tests for atomic_save.py"""
+
+import os
+import stat
+import threading
+
+import pytest
+
+from dcmqtreepy.atomic_save import ProgressFile, atomic_write, path_lock
+
+
+def test_atomic_write_replaces_file_and_keeps_mode(tmp_path):
+    """Test that the new content replaces the file, with the old file's permissions and no leftovers."""
+    path = tmp_path / "target.dcm"
+    path.write_bytes(b"old")
+    os.chmod(path, 0o640)
+    with atomic_write(path) as partial:
+        partial.write(b"new content")
+        assert path.read_bytes() == b"old"
+    assert path.read_bytes() == b"new content"
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+    assert [child.name for child in tmp_path.iterdir()] == ["target.dcm"]
+
+
+def test_atomic_write_failure_keeps_original(tmp_path):
+    """Test that an error part way through leaves the original file untouched."""
+    path = tmp_path / "target.dcm"
+    path.write_bytes(b"old")
+    with pytest.raises(OSError):
+        with atomic_write(path) as partial:
+            partial.write(b"half written")
+            raise OSError("No space left on device")
+    assert path.read_bytes() == b"old"
+    assert [child.name for child in tmp_path.iterdir()] == ["target.dcm"]
+
+
+def test_writes_to_one_path_are_serialized(tmp_path):
+    """Test that a second writer of the same path waits for the first to finish."""
+    path = tmp_path / "target.dcm"
+    order = []
+    first_started = threading.Event()
+
+    def second_writer():
+        first_started.wait()
+        with atomic_write(path) as partial:
+            order.append("second")
+            partial.write(b"second")
+
+    thread = threading.Thread(target=second_writer)
+    thread.start()
+    with atomic_write(path) as partial:
+        first_started.set()
+        thread.join(timeout=0.2)
+        order.append("first")
+        partial.write(b"first")
+    thread.join()
+    assert order == ["first", "second"]
+    assert path.read_bytes() == b"second"
+    assert path_lock(path) is path_lock(tmp_path / "." / "target.dcm")
+
+
+def test_progress_file_reports_bytes_written(tmp_path, monkeypatch):
+    """Test that progress is reported as data is written."""
+    monkeypatch.setattr("dcmqtreepy.atomic_save.PROGRESS_INTERVAL_BYTES", 10)
+    reports = []
+    with open(tmp_path / "out", "wb") as out:
+        wrapped = ProgressFile(out, reports.append)
+        for _ in range(5):
+            wrapped.write(b"x" * 6)
+        assert wrapped.tell() == 30
+    assert reports == [12, 24]
@@ -0,0 +1,130 @@
+"""Unit tests for batch_edit.py"""
+
+import zipfile
+from io import BytesIO
+
+import pytest
+from pydicom import Dataset, datadict, dcmread, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian
+
+from dcmqtreepy.batch_edit import (
+    AddPrivateElement,
+    ArchiveSizeError,
+    ChangeTransferSyntax,
+    DeleteElement,
+    SetElement,
+    apply_batch,
+    cast_text_to_vr_value,
+    unique_name,
+    write_results_zip,
+)
+from dcmqtreepy.new_privates import new_private_dictionaries
+
+
+def encoded_file(station_name: str = "STATION") -> bytes:
+    ds = Dataset()
+    ds.StationName = station_name
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.481.8"
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    buffer = BytesIO()
+    dcmwrite(buffer, ds, write_like_original=False)
+    return buffer.getvalue()
+
+
+def sources(count: int):
+    return [(f"file_{index}.dcm", lambda index=index: encoded_file(f"STATION{index}")) for index in range(count)]
+
+
+def test_cast_text_to_vr_value():
+    """Test converting text to numeric and multi-valued values."""
+    assert cast_text_to_vr_value("3", "US") == 3
+    assert cast_text_to_vr_value("1.5\\2.5", "FL") == [1.5, 2.5]
+    assert cast_text_to_vr_value("ABC", "SH") == "ABC"
+    assert cast_text_to_vr_value("", "FL") is None
+
+
+def test_set_and_delete_element():
+    """Test setting, adding and deleting top level elements."""
+    ds = Dataset()
+    ds.StationName = "OLD"
+    SetElement(0x00081010, "NEW").apply(ds)
+    SetElement(0x00080080, "Hospital").apply(ds)
+    assert ds.StationName == "NEW"
+    assert ds.InstitutionName == "Hospital"
+    DeleteElement(0x00081010).apply(ds)
+    assert "StationName" not in ds
+
+
+def test_add_private_element_uses_registered_dictionary():
+    """Test that the VR of a private element comes from the registered private dictionary."""
+    datadict.add_private_dict_entries("IMPAC", new_private_dictionaries["IMPAC"])
+    ds = Dataset()
+    AddPrivateElement(0x300B, "IMPAC", 0x02, "12.5").apply(ds)
+    block = ds.private_block(0x300B, "IMPAC")
+    assert block[0x02].VR == "FL"
+    assert block[0x02].value == 12.5
+
+
+def test_change_transfer_syntax():
+    """Test re-encoding with another uncompressed transfer syntax."""
+    result = next(apply_batch(sources(1), [ChangeTransferSyntax(ImplicitVRLittleEndian)]))
+    ds = dcmread(BytesIO(result.data))
+    assert ds.file_meta.TransferSyntaxUID == ImplicitVRLittleEndian
+    assert ds.is_implicit_VR
+
+
+def test_change_to_compressed_transfer_syntax_is_refused():
+    with pytest.raises(ValueError):
+        ChangeTransferSyntax("1.2.840.10008.1.2.4.50").apply(Dataset())
+
+
+def test_apply_batch_reports_every_file():
+    """Test that every source produces a result, errors included."""
+    failing = [("broken.dcm", lambda: (_ for _ in ()).throw(OSError("unreadable")))]
+    results = list(apply_batch(sources(10) + failing, [SetElement(0x00081010, "BATCH")], max_workers=3))
+    assert len(results) == 11
+    errors = [result for result in results if result.error is not None]
+    assert [result.name for result in errors] == ["broken.dcm"]
+    for result in results:
+        if result.error is None:
+            assert dcmread(BytesIO(result.data)).StationName == "BATCH"
+
+
+def test_write_results_zip_streams_results_and_errors():
+    """Test that results are written into one archive, with failures listed in errors.txt."""
+    failing = [("broken.dcm", lambda: (_ for _ in ()).throw(OSError("unreadable")))]
+    archive = BytesIO()
+    results = list(write_results_zip(apply_batch(sources(3) + failing, [DeleteElement(0x00081010)]), archive))
+    assert len(results) == 4
+    with zipfile.ZipFile(archive) as zipped:
+        names = set(zipped.namelist())
+        assert {"file_0.dcm", "file_1.dcm", "file_2.dcm", "errors.txt"} == names
+        assert "broken.dcm" in zipped.read("errors.txt").decode()
+        assert "StationName" not in dcmread(BytesIO(zipped.read("file_0.dcm")))
+
+
+def test_write_results_zip_stops_at_max_bytes():
+    """Test that the archive stops growing once it is larger than allowed, keeping the files written so far."""
+    archive = BytesIO()
+    results = []
+    with pytest.raises(ArchiveSizeError):
+        for result in write_results_zip(apply_batch(sources(6), [DeleteElement(0x00081010)]), archive, max_bytes=1):
+            results.append(result)
+    assert results == []
+    with zipfile.ZipFile(archive) as zipped:
+        assert len(zipped.namelist()) == 1
+
+
+def test_unique_name():
+    names_used = set()
+    assert unique_name("a.dcm", names_used) == "a.dcm"
+    assert unique_name("a.dcm", names_used) == "a_1.dcm"
+    assert unique_name("noext", names_used) == "noext"
+    assert unique_name("noext", names_used) == "noext_1"
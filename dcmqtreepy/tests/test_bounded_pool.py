@@ -0,0 +1,26 @@
+"""Unit tests for bounded_pool.py"""
+
+import threading
+
+from dcmqtreepy.bounded_pool import run_bounded
+
+
+def test_items_are_taken_only_as_results_are_yielded():
+    """Test that every item's result is yielded, with no more than max_in_flight items taken ahead of them."""
+    taken = []
+    lock = threading.Lock()
+
+    def items():
+        for number in range(20):
+            with lock:
+                taken.append(number)
+            yield number
+
+    yielded = 0
+    results = []
+    for result in run_bounded(lambda number: number * 2, items(), max_workers=2, max_in_flight=3):
+        yielded += 1
+        with lock:
+            assert len(taken) - yielded <= 3
+        results.append(result)
+    assert sorted(results) == [number * 2 for number in range(20)]
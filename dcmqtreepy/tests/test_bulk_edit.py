@@ -0,0 +1,117 @@
+"""Unit tests for bulk_edit.py"""
+
+import copy
+
+import pytest
+from pydicom import Dataset
+
+from dcmqtreepy.bulk_edit import (
+    BulkEdit,
+    BulkEditError,
+    format_element_path,
+    parse_element_path,
+)
+
+
+@pytest.fixture
+def ion_plan():
+    """Return an ion plan with two beams of three control points, the second beam's last lacking a Gantry Angle."""
+    ds = Dataset()
+    ds.IonBeamSequence = []
+    for beam_number in (1, 2):
+        beam = Dataset()
+        beam.BeamNumber = beam_number
+        beam.BeamName = f"Beam {beam_number}"
+        beam.IonControlPointSequence = []
+        for index in range(3):
+            control_point = Dataset()
+            control_point.ControlPointIndex = index
+            if not (beam_number == 2 and index == 2):
+                control_point.GantryAngle = 90.0 * beam_number
+            control_point.IsocenterPosition = [0.0, 10.0, 20.0]
+            beam.IonControlPointSequence.append(control_point)
+        ds.IonBeamSequence.append(beam)
+    return ds
+
+
+def test_parse_element_path():
+    """Test that keywords, hex tags, private elements and item indices are parsed, and bad paths rejected."""
+    segments = parse_element_path("IonBeamSequence[*].IonControlPointSequence[1:].GantryAngle")
+    assert [segment.tag for segment in segments] == [0x300A03A2, 0x300A03A8, 0x300A011E]
+    assert segments[1].index == slice(1, None)
+    assert format_element_path(segments) == "IonBeamSequence[*].IonControlPointSequence[1:].GantryAngle"
+    private = parse_element_path("300A03A2[0].(300B,IMPAC,92)")[-1]
+    assert (private.group, private.private_creator, private.offset) == (0x300B, "IMPAC", 0x92)
+    for bad_path in ("IonBeamSequence.GantryAngle", "IonBeamSequence[*].GantryAngle[0]", "NotAKeyword", "(3008,X,10)"):
+        with pytest.raises(BulkEditError):
+            parse_element_path(bad_path)
+
+
+def test_expression_is_applied_to_every_match(ion_plan):
+    """Test that one expression edits every control point that has the element, keeping the VR's type."""
+    assert BulkEdit("IonBeamSequence[*].IonControlPointSequence[*].GantryAngle", "(x + 270) % 360").apply(ion_plan) == 5
+    angles = [cp.get("GantryAngle") for beam in ion_plan.IonBeamSequence for cp in beam.IonControlPointSequence]
+    assert angles == [0.0, 0.0, 0.0, 90.0, 90.0, None]
+    assert BulkEdit("IonBeamSequence[1].IonControlPointSequence[*].IsocenterPosition", "x * 2").apply(ion_plan) == 3
+    assert list(ion_plan.IonBeamSequence[1].IonControlPointSequence[2].IsocenterPosition) == [0.0, 20.0, 40.0]
+    assert list(ion_plan.IonBeamSequence[0].IonControlPointSequence[2].IsocenterPosition) == [0.0, 10.0, 20.0]
+    BulkEdit("IonBeamSequence[*].BeamName", "x + ' (copy)'").apply(ion_plan)
+    assert ion_plan.IonBeamSequence[1].BeamName == "Beam 2 (copy)"
+
+
+def test_create_adds_missing_elements(ion_plan):
+    """Test that create adds the element, public or private, to items lacking it."""
+    assert BulkEdit("IonBeamSequence[-1].IonControlPointSequence[*].GantryAngle", "45", create=True).apply(ion_plan) == 3
+    assert ion_plan.IonBeamSequence[1].IonControlPointSequence[2].GantryAngle == 45.0
+    BulkEdit("IonBeamSequence[*].(300B,IMPAC,02)", "1.5", create=True).apply(ion_plan)
+    block = ion_plan.IonBeamSequence[0].private_block(0x300B, "IMPAC")
+    assert block[0x02].VR == "FL"
+    assert block[0x02].value == 1.5
+
+
+def test_failed_create_adds_no_private_blocks(ion_plan):
+    """Test that a private element whose value fails its VR leaves no new Private Creator behind."""
+    before = copy.deepcopy(ion_plan)
+    with pytest.raises(BulkEditError):
+        BulkEdit("IonBeamSequence[*].(300B,IMPAC,02)", "'not a number'", create=True).apply(ion_plan)
+    assert ion_plan == before
+    assert all(0x300B0010 not in beam for beam in ion_plan.IonBeamSequence)
+
+
+def test_unsafe_expressions_are_rejected():
+    """Test that names, attributes and calls other than the math functions are refused before editing."""
+    for expression in ("__import__('os')", "x.real", "y + 1", "x +", "[x]"):
+        with pytest.raises(BulkEditError):
+            BulkEdit("GantryAngle", expression)
+    assert BulkEdit("GantryAngle", "round(max(x, 0) * 1.5, 1)").expression
+
+
+def test_empty_values_are_kept_and_failed_edits_change_nothing(ion_plan):
+    """Test that empty (Type 2) values are left by expressions of x, and a value that can't be cast sets none."""
+    control_points = ion_plan.IonBeamSequence[0].IonControlPointSequence
+    control_points[1].GantryAngle = None
+    assert BulkEdit("IonBeamSequence[0].IonControlPointSequence[*].GantryAngle", "x + 1").apply(ion_plan) == 2
+    assert [cp.GantryAngle for cp in control_points] == [91.0, None, 91.0]
+    with pytest.raises(BulkEditError):
+        BulkEdit("IonBeamSequence[0].IonControlPointSequence[*].GantryAngle", "x * 1e400").apply(ion_plan)
+    with pytest.raises(BulkEditError):
+        BulkEdit("IonBeamSequence[*].BeamNumber", "x * 2**40").apply(ion_plan)
+    assert [cp.GantryAngle for cp in control_points] == [91.0, None, 91.0]
+    assert [beam.BeamNumber for beam in ion_plan.IonBeamSequence] == [1, 2]
+    assert BulkEdit("IonBeamSequence[0].IonControlPointSequence[*].GantryAngle", "0").apply(ion_plan) == 3
+    assert [cp.GantryAngle for cp in control_points] == [0.0, 0.0, 0.0]
+
+
+def test_powers_are_bounded_and_strings_only_joined():
+    """Test that large powers and string repetition or formatting are refused, and not computed."""
+    ds = Dataset()
+    ds.GantryAngle = 3.0
+    ds.BeamName = "Beam"
+    for path, expression in (("GantryAngle", "9**9**9**9"), ("GantryAngle", "x ** 2000"), ("BeamName", "x * 10**9")):
+        with pytest.raises(BulkEditError):
+            BulkEdit(path, expression).apply(ds)
+    with pytest.raises(BulkEditError):
+        BulkEdit("BeamName", "'%s' % x").apply(ds)
+    assert BulkEdit("GantryAngle", "x ** 2 + 2 ** -1").apply(ds) == 1
+    assert ds.GantryAngle == 9.5
+    assert ds.BeamName == "Beam"
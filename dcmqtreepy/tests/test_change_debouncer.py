@@ -0,0 +1,48 @@
+"""Unit tests for change_debouncer.py"""
+
+import pytest
+
+from dcmqtreepy.change_debouncer import ChangeDebouncer
+
+
+@pytest.fixture
+def clock():
+    """Return a clock, a list holding the time it tells, that tests move on."""
+    now = [100.0]
+
+    def _clock() -> float:
+        return now[0]
+
+    _clock.now = now
+    return _clock
+
+
+def test_files_are_reported_once_written(clock):
+    """Test that a new file is reported only after its size and time stay the same for the settle time."""
+    debouncer = ChangeDebouncer(settle_seconds=2, clock=clock)
+    debouncer.start({"/drop/old.dcm": (10, 1)})
+    assert not debouncer.observe({"/drop/old.dcm": (10, 1), "/drop/new.dcm": (100, 1)})
+    assert debouncer.next_settle_in() == 2
+    clock.now[0] += 1.5
+    # still growing, so it has to settle again
+    assert not debouncer.observe({"/drop/old.dcm": (10, 1), "/drop/new.dcm": (200, 2)})
+    clock.now[0] += 1.5
+    assert not debouncer.observe({"/drop/old.dcm": (10, 1), "/drop/new.dcm": (200, 2)})
+    assert debouncer.next_settle_in() == pytest.approx(0.5)
+    clock.now[0] += 0.5
+    changes = debouncer.observe({"/drop/old.dcm": (10, 1), "/drop/new.dcm": (200, 2)})
+    assert (changes.changed, changes.removed) == (["/drop/new.dcm"], [])
+    assert debouncer.next_settle_in() is None
+    assert not debouncer.observe({"/drop/old.dcm": (10, 1), "/drop/new.dcm": (200, 2)})
+
+
+def test_changed_and_removed_files_are_reported(clock):
+    """Test that files rewritten are reported once settled, files gone straight away, and short lived files not at all."""
+    debouncer = ChangeDebouncer(settle_seconds=1, clock=clock)
+    debouncer.start({"/drop/a.dcm": (10, 1), "/drop/b.dcm": (10, 1)})
+    changes = debouncer.observe({"/drop/a.dcm": (10, 5), "/drop/partial.tmp": (1, 1)})
+    assert (changes.changed, changes.removed) == ([], ["/drop/b.dcm"])
+    clock.now[0] += 1
+    changes = debouncer.observe({"/drop/a.dcm": (10, 5)})
+    assert (changes.changed, changes.removed) == (["/drop/a.dcm"], [])
+    assert debouncer.next_settle_in() is None
@@ -0,0 +1,88 @@
+"""Unit tests for dataset_cache.py"""
+
+import os
+
+import pytest
+from pydicom import Dataset, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy.dataset_cache import DatasetCache
+from dcmqtreepy.memory_accounting import (
+    TREE_ITEM_BYTES,
+    estimate_tree_bytes,
+    format_bytes,
+    is_deferred,
+)
+
+KILOBYTE = 1024
+
+
+@pytest.fixture
+def write_file(tmp_path):
+    """Return a function writing a DICOM file with pixel_bytes of (fake) Pixel Data."""
+
+    def _write_file(name: str, pixel_bytes: int, patient_name: str = "Test^Patient"):
+        ds = Dataset()
+        ds.PatientName = patient_name
+        ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+        ds.SOPInstanceUID = "1.2.3.4"
+        ds.add_new(0x7FE00010, "OB", b"\x00" * pixel_bytes)
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        path = tmp_path / name
+        dcmwrite(path, ds, write_like_original=False)
+        return path
+
+    return _write_file
+
+
+def test_read_reuses_dataset_until_file_changes(write_file):
+    """Test that a file is read once, and read again after it is changed on disk."""
+    path = write_file("one.dcm", KILOBYTE)
+    cache = DatasetCache(cap_bytes=1024 * KILOBYTE)
+    ds = cache.read(path)
+    assert cache.read(path) is ds
+    write_file("one.dcm", 2 * KILOBYTE, patient_name="Changed^Name")
+    os.utime(path, ns=(0, 0))
+    changed = cache.read(path)
+    assert changed is not ds
+    assert str(changed.PatientName) == "Changed^Name"
+    assert cache.size_of(path) > 2 * KILOBYTE
+
+
+def test_enforce_evicts_least_recently_read_unprotected(write_file):
+    """Test that the oldest datasets are evicted first and protected ones are kept."""
+    paths = [write_file(f"{index}.dcm", 40 * KILOBYTE) for index in range(3)]
+    cache = DatasetCache(cap_bytes=100 * KILOBYTE)
+    for path in paths:
+        cache.read(path)
+    evicted = cache.enforce(other_bytes=30 * KILOBYTE, protected=[paths[0]])
+    assert evicted == [str(paths[1]), str(paths[2])]
+    assert cache.paths() == [str(paths[0])]
+    assert not cache.deferring
+
+
+def test_over_cap_defers_large_values_until_memory_drops(write_file):
+    """Test that when eviction isn't enough, later reads defer large values, until memory is well under the cap."""
+    large, small = write_file("large.dcm", 40 * KILOBYTE), write_file("small.dcm", 40 * KILOBYTE)
+    cache = DatasetCache(cap_bytes=50 * KILOBYTE, defer_size=KILOBYTE)
+    cache.read(large)
+    cache.enforce(other_bytes=20 * KILOBYTE, protected=[large])
+    assert cache.deferring
+    assert is_deferred(cache.read(small), 0x7FE00010)
+    cache.discard(large)
+    cache.enforce()
+    assert not cache.deferring
+
+
+def test_estimate_tree_bytes_skips_binary_values():
+    """Test that the tree estimate counts an item per element and sequence item, but not binary values."""
+    ds = Dataset()
+    ds.StudyDescription = "A" * 60
+    ds.add_new(0x7FE00010, "OB", b"\x00" * 100 * KILOBYTE)
+    ds.ReferencedSeriesSequence = [Dataset(), Dataset()]
+    assert estimate_tree_bytes(ds) == 5 * TREE_ITEM_BYTES + 2 * 60
+    assert format_bytes(3 * KILOBYTE * KILOBYTE // 2) == "1.5 MB"
@@ -0,0 +1,68 @@
+"""Unit tests for dataset_paths.py"""
+
+import pytest
+from pydicom import Dataset
+
+from dcmqtreepy.dataset_paths import (
+    build_node_index,
+    is_item_path,
+    parse_path_key,
+    path_key,
+    resolve_path,
+)
+
+
+@pytest.fixture
+def nested_dataset():
+    """Return a dataset with a two level sequence hierarchy."""
+    ds = Dataset()
+    ds.PatientName = "Test^Patient"
+    beams = []
+    for beam_number in range(1, 4):
+        beam = Dataset()
+        beam.BeamNumber = beam_number
+        control_points = []
+        for index in range(2):
+            control_point = Dataset()
+            control_point.ControlPointIndex = index
+            control_points.append(control_point)
+        beam.ControlPointSequence = control_points
+        beams.append(beam)
+    ds.BeamSequence = beams
+    return ds
+
+
+def test_path_key_round_trip():
+    """Test that path keys can be parsed back to the original path."""
+    path = (0x300A00B0, 3, 0x300A0111)
+    assert path_key(path) == "300a00b0.3.300a0111"
+    assert parse_path_key(path_key(path)) == path
+    assert parse_path_key("") == ()
+
+
+def test_is_item_path():
+    """Test distinguishing element paths from item paths."""
+    assert is_item_path(())
+    assert not is_item_path((0x300A00B0,))
+    assert is_item_path((0x300A00B0, 0))
+
+
+def test_build_node_index(nested_dataset):
+    """Test that only sequences and items are indexed, each at its path."""
+    index = build_node_index(nested_dataset)
+
+    # root + beam sequence + 3 beams + 3 control point sequences + 6 control points
+    assert len(index) == 14
+    assert index[()] is nested_dataset
+    assert index[(0x300A00B0,)] is nested_dataset["BeamSequence"]
+    assert index[(0x300A00B0, 1)] is nested_dataset.BeamSequence[1]
+    assert index[(0x300A00B0, 2, 0x300A0111, 1)] is nested_dataset.BeamSequence[2].ControlPointSequence[1]
+    assert (0x00100010,) not in index
+
+
+def test_resolve_path(nested_dataset):
+    """Test walking to a node without an index."""
+    node = resolve_path(nested_dataset, (0x300A00B0, 0, 0x300A0111, 1))
+    assert node.ControlPointIndex == 1
+    assert resolve_path(nested_dataset, (0x300A00B0, 7)) is None
+    assert resolve_path(nested_dataset, (0x300A00B1,)) is None
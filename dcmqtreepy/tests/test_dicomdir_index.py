@@ -0,0 +1,58 @@
+"""Unit tests for dicomdir_index.py"""
+
+import warnings
+from pathlib import Path
+
+import pytest
+from pydicom import dcmread
+from pydicom.data import get_testdata_file
+
+from dcmqtreepy.dicomdir_index import DicomDirIndex, is_dicomdir
+
+
+@pytest.fixture
+def dicomdir_path() -> Path:
+    """Return the path of pydicom's test DICOMDIR, whose files are in the folders beside it."""
+    return Path(get_testdata_file("DICOMDIR"))
+
+
+def test_dicomdir_records_are_linked_and_files_listed(dicomdir_path):
+    """Test that the records form the patient / study / series hierarchy, and the files come with their headers."""
+    dicomdir = DicomDirIndex(dicomdir_path)
+    assert [dicomdir.records[offset].record_type for offset in dicomdir.roots] == ["PATIENT", "PATIENT"]
+    records = dicomdir.header_records()
+    assert len(records) == 31
+    assert all(Path(path).is_file() for path in records)
+    first = next(iter(records.values()))
+    assert first.path == str(dicomdir_path.parent / "77654033" / "CR1" / "6154")
+    assert (first.patient_name, first.modality, first.series_number, first.instance_number) == (
+        "Doe^Archibald",
+        "CR",
+        1,
+        1,
+    )
+    assert (first.size, first.mtime_ns) == (0, 0)
+    header = dcmread(first.path, stop_before_pixels=True)
+    assert (first.sop_class_uid, first.sop_instance_uid) == (header.SOPClassUID, header.SOPInstanceUID)
+    assert (first.study_instance_uid, first.series_instance_uid) == (header.StudyInstanceUID, header.SeriesInstanceUID)
+    record = dicomdir.record_for_instance(first.sop_instance_uid)
+    assert [ancestor.record_type for ancestor in dicomdir.ancestors(record)] == ["PATIENT", "STUDY", "SERIES"]
+    assert dicomdir.record_for_instance("1.2.3") is None
+    assert is_dicomdir(Path("/media/cdrom/dicomdir")) and not is_dicomdir(dicomdir_path.parent / "77654033")
+
+
+def test_records_are_linked_in_order_when_offsets_are_wrong(dicomdir_path, tmp_path):
+    """Test that records whose offsets don't match the file are linked by their types, in order."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        ds = dcmread(dicomdir_path)
+    ds.OffsetOfTheFirstDirectoryRecordOfTheRootDirectoryEntity = 1
+    ds.save_as(tmp_path / "DICOMDIR")
+    expected = DicomDirIndex(dicomdir_path).header_records()
+    records = DicomDirIndex(tmp_path / "DICOMDIR").header_records()
+    assert [Path(path).relative_to(tmp_path) for path in records] == [
+        Path(path).relative_to(dicomdir_path.parent) for path in expected
+    ]
+    assert [record.series_instance_uid for record in records.values()] == [
+        record.series_instance_uid for record in expected.values()
+    ]
@@ -0,0 +1,112 @@
+"""Unit tests for element_offsets.py"""
+
+from io import BytesIO
+
+import pytest
+from pydicom import Dataset, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.encaps import encapsulate
+from pydicom.uid import (
+    ExplicitVRBigEndian,
+    ExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    JPEGBaseline8Bit,
+)
+
+from dcmqtreepy.element_offsets import (
+    index_element_locations,
+    read_dataset_start,
+    scan_top_level_elements,
+    transfer_syntax_encoding,
+)
+
+
+def encoded(ds: Dataset, transfer_syntax_uid: str) -> bytes:
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = transfer_syntax_uid
+    ds.is_implicit_VR, ds.is_little_endian = transfer_syntax_encoding(transfer_syntax_uid)
+    buffer = BytesIO()
+    dcmwrite(buffer, ds, write_like_original=False)
+    return buffer.getvalue()
+
+
+def dataset_with_sequence(undefined_length: bool) -> Dataset:
+    ds = Dataset()
+    ds.PatientName = "Test^Patient"
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.481.8"
+    ds.SOPInstanceUID = "1.2.3.4"
+    beam = Dataset()
+    beam.BeamNumber = 1
+    control_point = Dataset()
+    control_point.GantryAngle = 90
+    beam.IonControlPointSequence = [control_point]
+    ds.IonBeamSequence = [beam]
+    ds.StationName = "AFTER"
+    if undefined_length:
+        ds["IonBeamSequence"].is_undefined_length = True
+        beam.is_undefined_length_sequence_item = True
+        beam["IonControlPointSequence"].is_undefined_length = True
+        control_point.is_undefined_length_sequence_item = True
+    return ds
+
+
+@pytest.mark.parametrize("transfer_syntax_uid", [ExplicitVRLittleEndian, ImplicitVRLittleEndian, ExplicitVRBigEndian])
+@pytest.mark.parametrize("undefined_length", [False, True])
+def test_scan_finds_contiguous_ranges(transfer_syntax_uid, undefined_length):
+    """Test that the top level ranges tile the data set, whatever the encoding and sequence lengths."""
+    data = encoded(dataset_with_sequence(undefined_length), transfer_syntax_uid)
+    fp = BytesIO(data)
+    start, found_uid = read_dataset_start(fp)
+    assert found_uid == transfer_syntax_uid
+    ranges = scan_top_level_elements(fp, *transfer_syntax_encoding(transfer_syntax_uid))
+    assert list(ranges) == [0x00080016, 0x00080018, 0x00081010, 0x00100010, 0x300A03A2]
+    offsets = sorted(ranges.values())
+    assert offsets[0][0] == start
+    assert offsets[-1][1] == len(data)
+    assert all(previous[1] == following[0] for previous, following in zip(offsets, offsets[1:]))
+    station_start, station_end = ranges[0x00081010]
+    assert b"AFTER" in data[station_start:station_end]
+
+
+def test_scan_skips_encapsulated_pixel_data():
+    """Test that encapsulated pixel data is walked fragment by fragment to its delimiter."""
+    ds = dataset_with_sequence(undefined_length=False)
+    ds.PixelData = encapsulate([b"\xff\xd8frame one\xff\xd9", b"\xff\xd8frame two\xff\xd9"])
+    ds["PixelData"].VR = "OB"
+    ds["PixelData"].is_undefined_length = True
+    ds.add_new(0xFFFCFFFC, "OB", b"\x00" * 4)  # trailing padding after the pixel data
+    data = encoded(ds, JPEGBaseline8Bit)
+    fp = BytesIO(data)
+    read_dataset_start(fp)
+    ranges = scan_top_level_elements(fp, False, True)
+    pixel_start, pixel_end = ranges[0x7FE00010]
+    delimiter_start = pixel_end - 8
+    assert data[delimiter_start:pixel_end] == b"\xfe\xff\xdd\xe0\x00\x00\x00\x00"
+    assert ranges[0xFFFCFFFC] == (pixel_end, len(data))
+
+
+def test_read_dataset_start_without_file_meta():
+    """Test that a bare data set (no preamble, no file meta) starts at offset 0."""
+    ds = dataset_with_sequence(undefined_length=False)
+    ds.is_implicit_VR = True
+    ds.is_little_endian = True
+    buffer = BytesIO()
+    dcmwrite(buffer, ds, write_like_original=True)
+    buffer.seek(0)
+    assert read_dataset_start(buffer) == (0, None)
+
+
+@pytest.mark.parametrize("transfer_syntax_uid", [ExplicitVRLittleEndian, ImplicitVRLittleEndian])
+@pytest.mark.parametrize("undefined_length", [False, True])
+def test_index_element_locations_records_nested_elements(transfer_syntax_uid, undefined_length):
+    """Test that nested elements are indexed by node path, flagged when inside undefined length values."""
+    data = encoded(dataset_with_sequence(undefined_length), transfer_syntax_uid)
+    fp = BytesIO(data)
+    read_dataset_start(fp)
+    locations = index_element_locations(fp, *transfer_syntax_encoding(transfer_syntax_uid))
+    gantry_angle = locations[(0x300A03A2, 0, 0x300A03A8, 0, 0x300A011E)]
+    value_start = gantry_angle.header.value_offset
+    value_end = value_start + gantry_angle.header.length
+    assert data[value_start:value_end] == b"90.0"
+    assert gantry_angle.in_undefined_length == undefined_length
+    assert not locations[(0x00081010,)].in_undefined_length
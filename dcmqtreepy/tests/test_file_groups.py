@@ -0,0 +1,72 @@
+"""Unit tests for file_groups.py"""
+
+from dcmqtreepy.file_groups import (
+    NOT_DICOM_LABEL,
+    PATIENT,
+    PENDING_LABEL,
+    SERIES,
+    STUDY,
+    file_order,
+    group_levels,
+    search_text,
+)
+from dcmqtreepy.header_index import HeaderRecord
+
+
+def make_record(path: str = "/data/ct/1.dcm", **values) -> HeaderRecord:
+    header = dict(
+        patient_id="12345",
+        patient_name="Doe^Jane",
+        study_instance_uid="1.2.3",
+        study_date="20240102",
+        study_description="Head and Neck",
+        series_instance_uid="1.2.3.4",
+        series_number=3,
+        series_description="Planning CT",
+        modality="CT",
+        instance_number=1,
+    )
+    header.update(values)
+    return HeaderRecord(path, 100, 1, **header)
+
+
+def test_files_are_grouped_by_patient_study_and_series():
+    """Test that a DICOM file's groups come from its header, and unread or non DICOM files get a group of their own."""
+    levels = group_levels(make_record())
+    assert [level.kind for level in levels] == [PATIENT, STUDY, SERIES]
+    assert [level.label for level in levels] == ["Doe^Jane (12345)", "20240102 Head and Neck", "CT Series 3 Planning CT"]
+    assert [level.key for level in group_levels(make_record(patient_name="Doe^John"))][1:] == [
+        level.key for level in levels[1:]
+    ]
+    bare = group_levels(make_record(patient_id=None, patient_name=None, study_date=None, study_description=None))
+    assert [level.label for level in bare[:2]] == ["No Patient Name (no Patient ID)", "Study 1.2.3"]
+    assert [level.label for level in group_levels(None)] == [PENDING_LABEL]
+    not_dicom = HeaderRecord("/data/notes.txt", 1, 1, is_dicom=False)
+    assert [level.label for level in group_levels(not_dicom)] == [NOT_DICOM_LABEL]
+
+
+def test_group_order_puts_patients_first_and_series_by_number():
+    """Test that patients sort by name ahead of unread and non DICOM files, and series by number, unnumbered last."""
+    patients = [group_levels(make_record(patient_name=name))[0] for name in ("zed^al", "Adams^Bo")]
+    unread = group_levels(None)[0]
+    not_dicom = group_levels(HeaderRecord("/data/notes.txt", 1, 1, is_dicom=False))[0]
+    ordered = sorted(patients + [not_dicom, unread], key=lambda level: level.order)
+    assert [level.label for level in ordered] == ["Adams^Bo (12345)", "zed^al (12345)", PENDING_LABEL, NOT_DICOM_LABEL]
+    series = [group_levels(make_record(series_number=number))[2] for number in (None, 10, 2)]
+    assert [level.label for level in sorted(series, key=lambda level: level.order)] == [
+        "CT Series 2 Planning CT",
+        "CT Series 10 Planning CT",
+        "CT Planning CT",
+    ]
+
+
+def test_file_order_and_search_text():
+    """Test that files keep the order added until sorted by a header column, and are found by their header values."""
+    first = make_record("/data/b.dcm", instance_number=2)
+    second = make_record("/data/a.dcm", instance_number=1)
+    assert file_order(first, None, first.path, 0) < file_order(second, None, second.path, 1)
+    assert file_order(second, "instance_number", second.path, 1) < file_order(first, "instance_number", first.path, 0)
+    assert file_order(None, "instance_number", "/data/c.dcm", 2) > file_order(first, "instance_number", first.path, 0)
+    text = search_text(first, first.path)
+    assert "Doe^Jane" in text and "Planning CT" in text and "/data/b.dcm" in text
+    assert search_text(None, "/data/c.dcm") == "/data/c.dcm"
@@ -0,0 +1,162 @@
+"""Unit tests for file_navigator.py"""
+
+import os
+
+import pytest
+
+# pylint: disable=no-name-in-module
+from PySide6.QtCore import QModelIndex, QtMsgType, qInstallMessageHandler
+from PySide6.QtGui import QGuiApplication
+from PySide6.QtTest import QAbstractItemModelTester
+
+from dcmqtreepy import file_navigator
+from dcmqtreepy.file_groups import FILE, PENDING_LABEL
+from dcmqtreepy.file_navigator import FileFilterModel, FileNavigatorModel
+from dcmqtreepy.header_index import HeaderRecord
+
+
+@pytest.fixture(scope="module")
+def app():
+    """The application Qt needs for fonts in the model's data."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return QGuiApplication.instance() or QGuiApplication([])
+
+
+@pytest.fixture
+def model_tester(app, monkeypatch):
+    """Fixture returning a function that puts a model under QAbstractItemModelTester; the test fails on its warnings."""
+    # a few children at a time, so groups are partly loaded
+    monkeypatch.setattr(file_navigator, "FETCH_BATCH", 3)
+    warnings = []
+
+    def handler(mode, context, message):
+        if mode != QtMsgType.QtDebugMsg:
+            warnings.append(message)
+
+    previous = qInstallMessageHandler(handler)
+    testers = []
+
+    def _model_tester(model):
+        testers.append(QAbstractItemModelTester(model, QAbstractItemModelTester.FailureReportingMode.Warning))
+        return model
+
+    yield _model_tester
+    qInstallMessageHandler(previous)
+    assert not warnings
+
+
+def make_record(path: str, series: str = "1.2.3.4", instance_number: int = 1, **values) -> HeaderRecord:
+    header = dict(
+        patient_id="12345",
+        patient_name="Doe^Jane",
+        study_instance_uid="1.2.3",
+        study_date="20240102",
+        study_description="Head and Neck",
+        series_instance_uid=series,
+        series_number=int(series.rsplit(".", 1)[-1]),
+        series_description="Planning CT",
+        modality="CT",
+        instance_number=instance_number,
+    )
+    header.update(values)
+    return HeaderRecord(path, 100, 1, **header)
+
+
+def shown_labels(model, parent: QModelIndex = QModelIndex()) -> list:
+    return [model.index(row, 0, parent).data() for row in range(model.rowCount(parent))]
+
+
+def test_files_regroup_as_their_records_arrive(model_tester):
+    """Test that adding, regrouping and removing files, in partly loaded groups, keeps the model consistent."""
+    model = model_tester(FileNavigatorModel())
+    paths = [f"/data/ct/{number:02}.dcm" for number in range(12)]
+    assert len(model.add_paths(paths[:5])) == 5
+    assert model.add_paths(paths[:2]) == []
+    pending = model.index(0, 0)
+    assert pending.data() == PENDING_LABEL
+    # the files past the first FETCH_BATCH are added unseen, and fetched by the tester as a view would
+    assert model.rowCount(pending) == 5 and not model.canFetchMore(pending)
+    model.add_paths(paths[5:])
+    assert model.rowCount(pending) == 8 and model.canFetchMore(pending)
+    assert model.index(0, 1).data() == "12"
+
+    # files leave the partly loaded group, and fill groups past what is shown of them
+    model.set_records(
+        [
+            make_record(path, series="1.2.3.4" if number % 2 else "1.2.3.5", instance_number=number)
+            for number, path in enumerate(paths)
+        ]
+    )
+    patient = model.index(0, 0)
+    assert shown_labels(model) == ["Doe^Jane (12345)"]
+    study = model.index(0, 0, patient)
+    assert shown_labels(model, study) == ["CT Series 4 Planning CT", "CT Series 5 Planning CT"]
+    assert model.index(0, 1, study).data() == "6"
+
+    # a record that changes nothing, then a file that moves patient
+    model.set_records([make_record(paths[1], instance_number=1), make_record(paths[11], patient_name="Roe^Ann")])
+    assert shown_labels(model) == ["Doe^Jane (12345)", "Roe^Ann (12345)"]
+    assert model.index(0, 1).data() == "11"
+    index = model.index_for_node(model.node_for_path(paths[10]))
+    assert index.data() == "10.dcm" and model.node(index).kind == FILE
+
+    for path in paths[:11]:
+        model.remove(path)
+    assert shown_labels(model) == ["Roe^Ann (12345)"]
+    model.remove(paths[11])
+    assert model.rowCount() == 0 and model.root.file_count == 0
+
+
+def test_groups_show_their_children_a_batch_at_a_time(model_tester):
+    """Test that a group shows FETCH_BATCH children at a time, and the tester finds the partly loaded model consistent."""
+    # put under the tester afterwards, as it fetches every child it checks
+    model = FileNavigatorModel()
+    paths = [f"/data/ct/{number}.dcm" for number in range(7)]
+    model.add_paths(paths, {path: make_record(path, instance_number=number) for number, path in enumerate(paths)})
+    model.remove(paths[5])
+    series = model.index(0, 0, model.index(0, 0, model.index(0, 0)))
+    assert shown_labels(model, series) == ["0.dcm", "1.dcm", "2.dcm"]
+    assert model.canFetchMore(series)
+    model.fetchMore(series)
+    assert shown_labels(model, series) == ["0.dcm", "1.dcm", "2.dcm", "3.dcm", "4.dcm", "6.dcm"]
+    model.add_paths(["/data/ct/7.dcm"], {"/data/ct/7.dcm": make_record("/data/ct/7.dcm", instance_number=7)})
+    assert model.rowCount(series) == 6 and model.canFetchMore(series)
+    model_tester(model)
+    assert model.rowCount(series) == 7
+
+
+def test_sorting_keeps_the_files_shown(model_tester):
+    """Test that resorting the files of a partly loaded group keeps the model consistent."""
+    model = model_tester(FileNavigatorModel())
+    paths = [f"/data/ct/{number}.dcm" for number in range(6)]
+    model.add_paths(paths, {path: make_record(path, instance_number=6 - number) for number, path in enumerate(paths)})
+    series = model.index_for_node(model.node_for_path(paths[0])).parent()
+    assert shown_labels(model, series) == ["0.dcm", "1.dcm", "2.dcm", "3.dcm", "4.dcm", "5.dcm"]
+    model.sort_files("instance_number")
+    assert shown_labels(model, series) == ["5.dcm", "4.dcm", "3.dcm", "2.dcm", "1.dcm", "0.dcm"]
+    model.sort_files(None)
+    assert shown_labels(model, series) == ["0.dcm", "1.dcm", "2.dcm", "3.dcm", "4.dcm", "5.dcm"]
+
+
+def test_filtering_finds_files_not_yet_shown(model_tester):
+    """Test that the filter finds files beyond those loaded, and that files come and go while filtering."""
+    model = model_tester(FileNavigatorModel())
+    proxy = FileFilterModel()
+    proxy.setSourceModel(model)
+    model_tester(proxy)
+    paths = [f"/data/ct/{number}.dcm" for number in range(7)]
+    model.add_paths(paths, {path: make_record(path, instance_number=number) for number, path in enumerate(paths)})
+    proxy.set_filter_text("6.dcm")
+    assert model.show_all
+    patient = proxy.index(0, 0)
+    series = proxy.index(0, 0, proxy.index(0, 0, patient))
+    assert shown_labels(proxy, series) == ["6.dcm"]
+    model.add_paths(["/data/mr/16.dcm", "/data/mr/7.dcm"])
+    model.set_records([make_record("/data/mr/16.dcm", series="1.2.3.9")])
+    assert proxy.rowCount() == 1
+    model.remove(paths[6])
+    assert proxy.rowCount() == 1
+    assert proxy.node(proxy.index(0, 0)).label == "Doe^Jane (12345)"
+    proxy.set_filter_text("")
+    assert not model.show_all
+    assert shown_labels(proxy) == ["Doe^Jane (12345)", PENDING_LABEL]
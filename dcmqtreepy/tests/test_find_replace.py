@@ -0,0 +1,111 @@
+"""Unit tests for find_replace.py"""
+
+from pathlib import Path
+
+import pytest
+from pydicom import Dataset, datadict, dcmread, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy.find_replace import (
+    PRIVATE_CREATORS,
+    Replacement,
+    find_replace,
+    format_report,
+    private_offsets,
+    register_private_dictionaries,
+    replace_in_dataset,
+)
+
+CREATOR = "ACME FIND REPLACE 1.0"
+
+
+@pytest.fixture(autouse=True)
+def acme_private_dictionary():
+    """Register a private dictionary with a text element."""
+    datadict.add_private_dict_entries(CREATOR, {0x00411001: ("LO", "1", "Site Code", "")})
+
+
+@pytest.fixture
+def make_file():
+    """Return a function writing a file with a station name, a private site code and a sequence item."""
+
+    def _make_file(path: Path, station_name: str) -> Path:
+        ds = Dataset()
+        ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.481.8"
+        ds.SOPInstanceUID = f"1.2.3.{len(station_name)}"
+        ds.StationName = station_name
+        ds.InstitutionName = "Old Hospital"
+        block = ds.private_block(0x0041, CREATOR, create=True)
+        block.add_new(0x01, "LO", "SITE-A")
+        item = Dataset()
+        item.StationName = station_name
+        ds.IonBeamSequence = [item]
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        dcmwrite(path, ds, write_like_original=False)
+        return path
+
+    return _make_file
+
+
+def test_replace_in_dataset_searches_sequences_and_private_elements():
+    """Test that values are replaced in sequence items and private elements are found by creator and name."""
+    ds = Dataset()
+    ds.OperatorsName = ["Smith^Jon", "Jones^Ann"]
+    ds.private_block(0x0041, CREATOR, create=True).add_new(0x01, "LO", "SITE-A")
+    item = Dataset()
+    item.OperatorsName = "Smith^Jon"
+    ds.IonBeamSequence = [item]
+    changes = replace_in_dataset(ds, Replacement("OperatorsName", "Jon$", "John"))
+    assert [change.location for change in changes] == ["Operators' Name", "Ion Beam Sequence[1] > Operators' Name"]
+    assert list(ds.OperatorsName) == ["Smith^John", "Jones^Ann"]
+    assert item.OperatorsName == "Smith^John"
+    replace_in_dataset(ds, Replacement(f"{CREATOR}:sitecode", "SITE-A", "SITE-B", regex=False))
+    assert ds.private_block(0x0041, CREATOR)[0x01].value == "SITE-B"
+    assert private_offsets(CREATOR, "01") == [(0x0041, 0x01)]
+    with pytest.raises(ValueError):
+        replace_in_dataset(ds, Replacement(f"{CREATOR}:No Such Element", "a", "b"))
+
+
+def test_private_creator_typos_are_corrected():
+    """Test that PrivateCreator targets the creator elements, whole values only if asked."""
+    ds = Dataset()
+    ds.private_block(0x0041, "ACME FIND REPLACE 1.O", create=True).add_new(0x01, "LO", "SITE-A")
+    changes = replace_in_dataset(ds, Replacement(PRIVATE_CREATORS, "1.O", "1.0", regex=False, whole_value=True))
+    assert changes == []
+    replace_in_dataset(ds, Replacement(PRIVATE_CREATORS, r"1\.O", "1.0"))
+    assert ds.private_block(0x0041, CREATOR)[0x01].value == "SITE-A"
+
+
+def test_dry_run_reports_and_apply_writes(tmp_path, make_file):
+    """Test that a dry run leaves the files alone, and applying rewrites only the files that change."""
+    first = make_file(tmp_path / "first.dcm", "CT1")
+    make_file(tmp_path / "second.dcm", "CT10")
+    (tmp_path / "notes.txt").write_text("not DICOM")
+    replacement = Replacement("StationName", "CT1", "LINAC1", whole_value=True)
+    results = list(find_replace([tmp_path], [replacement], dry_run=True, max_workers=2))
+    assert len(results) == 3
+    report = format_report(results, dry_run=True)
+    assert "Station Name: 'CT1' -> 'LINAC1'" in report
+    assert "notes.txt: Not a DICOM file" in report
+    assert report.endswith("3 files searched, would change 1, 1 not read or written")
+    assert dcmread(first).StationName == "CT1"
+    results = list(find_replace([tmp_path], [replacement], dry_run=False, max_workers=2))
+    assert [Path(result.path).name for result in results if result.written] == ["first.dcm"]
+    written = dcmread(first)
+    assert written.StationName == "LINAC1"
+    assert written.IonBeamSequence[0].StationName == "LINAC1"
+    assert written.private_block(0x0041, CREATOR)[0x01].value == "SITE-A"
+    assert dcmread(tmp_path / "second.dcm").StationName == "CT10"
+    # the workers know the creator only from the dictionaries registered here
+    list(find_replace([first], [Replacement(f"{CREATOR}:Site Code", "-A", "-B")], dry_run=False, max_workers=1))
+    assert dcmread(first).private_block(0x0041, CREATOR)[0x01].value == "SITE-B"
+
+
+def test_register_private_dictionaries_adds_missing_creators():
+    """Test that a worker's registration adds the creators and entries it is given."""
+    register_private_dictionaries({"ACME WORKER 2.0": {"0043xx05": ("SH", "1", "Worker Entry", "")}})
+    assert private_offsets("ACME WORKER 2.0", "Worker Entry") == [(0x0043, 0x05)]
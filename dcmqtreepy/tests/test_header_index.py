@@ -0,0 +1,108 @@
+"""Unit tests for header_index.py"""
+
+import os
+import threading
+from pathlib import Path
+
+import pytest
+from pydicom import Dataset, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy.header_index import HeaderIndex, has_dicom_magic, sort_key
+
+
+@pytest.fixture
+def make_file():
+    """Return a function writing a small RT Plan (without pixel data) with the given instance number."""
+
+    def _make_file(path: Path, instance_number: int, patient_name: str = "Doe^Jane") -> Path:
+        ds = Dataset()
+        ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.481.5"
+        ds.SOPInstanceUID = f"1.2.3.{instance_number}"
+        ds.PatientName = patient_name
+        ds.PatientID = "12345"
+        ds.StudyInstanceUID = "1.2.3"
+        ds.Modality = "RTPLAN"
+        ds.InstanceNumber = instance_number
+        ds.RTPlanLabel = f"Plan {instance_number}"
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        dcmwrite(path, ds, write_like_original=False)
+        return path
+
+    return _make_file
+
+
+def test_folder_is_indexed_recursively(tmp_path, make_file):
+    """Test that DICOM files in subfolders are indexed with their header, and other files marked as not DICOM."""
+    make_file(tmp_path / "data" / "a.dcm", 2)
+    make_file(tmp_path / "data" / "nested" / "no_extension", 1)
+    (tmp_path / "data" / "readme.txt").write_text("not DICOM")
+    index = HeaderIndex(tmp_path / "index.sqlite")
+    update = index.update_folder(tmp_path / "data")
+    assert (update.read, update.unchanged, update.removed) == (3, 0, 0)
+    records = {Path(record.path).name: record for record in update.records}
+    assert not records["readme.txt"].is_dicom
+    assert records["no_extension"].instance_number == 1
+    assert records["a.dcm"].patient_name == "Doe^Jane"
+    assert records["a.dcm"].rt_plan_label == "Plan 2"
+    assert records["a.dcm"].sop_class_name == "RT Plan Storage"
+    assert {record.path for record in HeaderIndex(tmp_path / "index.sqlite").records(folder=tmp_path / "data")} == {
+        record.path for record in update.records
+    }
+
+
+def test_reindexing_reads_only_changed_files(tmp_path, make_file):
+    """Test that a second update reads (and reports) new and changed files only, and forgets deleted ones."""
+    folder = tmp_path / "files"
+    first = make_file(folder / "first.dcm", 1)
+    second = make_file(folder / "second.dcm", 2)
+    index = HeaderIndex(tmp_path / "index.sqlite")
+    index.update_folder(folder)
+    make_file(first, 10)
+    stat = os.stat(first)
+    os.utime(first, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    second.unlink()
+    make_file(folder / "third.dcm", 3)
+    reported = []
+    update = index.update_folder(folder, on_records=reported.extend)
+    assert (update.read, update.unchanged, update.removed) == (2, 0, 1)
+    assert sorted(record.instance_number for record in update.records) == [3, 10]
+    assert sorted(record.path for record in reported) == sorted(record.path for record in update.records)
+    update = index.update_files([first, second])
+    assert (update.read, update.unchanged, update.removed) == (0, 1, 1)
+
+
+def test_sort_key_puts_missing_values_last(tmp_path, make_file):
+    """Test that files sort by a column as numbers or text, then by path, with unindexed files last."""
+    folder = tmp_path / "files"
+    make_file(folder / "b.dcm", 10, "Zed^Al")
+    make_file(folder / "a.dcm", 9, "adams^bo")
+    records = {record.path: record for record in HeaderIndex(tmp_path / "index.sqlite").update_folder(folder).records}
+    paths = list(records) + [str(folder / "unindexed.dcm")]
+    by_number = sorted(paths, key=lambda path: sort_key(records.get(path), "instance_number", path))
+    assert [Path(path).name for path in by_number] == ["a.dcm", "b.dcm", "unindexed.dcm"]
+    by_patient = sorted(paths, key=lambda path: sort_key(records.get(path), "patient_name", path))
+    assert [Path(path).name for path in by_patient] == ["a.dcm", "b.dcm", "unindexed.dcm"]
+
+
+def test_dicom_is_recognised_by_its_magic_and_cancelling_forgets_nothing(tmp_path, make_file):
+    """Test that files are DICOM by the "DICM" after their preamble, and that a cancelled update removes no records."""
+    folder = tmp_path / "files"
+    plan = make_file(folder / "plan.txt", 1)
+    (folder / "fake.dcm").write_bytes(b"\0" * 128 + b"DICX" + b"\0" * 64)
+    (folder / "short.dcm").write_bytes(b"DICM")
+    assert has_dicom_magic(plan)
+    assert not any(has_dicom_magic(folder / name) for name in ("fake.dcm", "short.dcm", "missing.dcm"))
+    index = HeaderIndex(tmp_path / "index.sqlite")
+    update = index.update_folder(folder)
+    assert [Path(record.path).name for record in update.records if record.is_dicom] == ["plan.txt"]
+    cancelled = threading.Event()
+    cancelled.set()
+    update = index.update_folder(folder, cancelled=cancelled)
+    assert update.cancelled and update.removed == 0
+    assert len(index.records(folder=folder)) == 3
@@ -0,0 +1,148 @@
+"""Unit tests for in_place_patch.py"""
+
+import copy
+import threading
+
+import pytest
+from pydicom import Dataset, datadict, dcmread, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy import in_place_patch
+from dcmqtreepy.atomic_save import path_lock
+from dcmqtreepy.in_place_patch import (
+    BACKUP_SUFFIX,
+    changed_elements,
+    journal_path,
+    patch_in_place,
+    plan_patches,
+    recover_interrupted_patch,
+)
+from dcmqtreepy.new_privates import new_private_dictionaries
+
+PIXEL_BYTES = 256 * 1024
+
+
+@pytest.fixture
+def source(tmp_path):
+    datadict.add_private_dict_entries("IMPAC", new_private_dictionaries["IMPAC"])
+    ds = Dataset()
+    ds.StudyDate = "20240101"
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.481.8"
+    ds.SOPInstanceUID = "1.2.3.4"
+    beam = Dataset()
+    beam.BeamNumber = 1
+    beam.private_block(0x300B, "IMPAC", create=True).add_new(0x02, "FL", 12.5)
+    ds.IonBeamSequence = [beam]
+    undefined = Dataset()
+    undefined.BeamNumber = 2
+    ds.BeamSequence = [undefined]
+    ds["BeamSequence"].is_undefined_length = True
+    ds.add_new(0x7FE00010, "OB", b"\x01" * PIXEL_BYTES)
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    path = tmp_path / "plan.dcm"
+    dcmwrite(path, ds, write_like_original=False)
+    return path
+
+
+def test_same_length_edits_are_patched_in_place(source):
+    """Test that a DA, a UI and a nested private FL are patched without changing anything else."""
+    original = dcmread(source)
+    modified = copy.deepcopy(original)
+    modified.StudyDate = "20241231"
+    modified.SOPInstanceUID = "1.2.3.5"
+    modified.IonBeamSequence[0].private_block(0x300B, "IMPAC")[0x02].value = -3.0
+    before = source.read_bytes()
+
+    assert patch_in_place(source, original, modified, backup=True)
+
+    after = source.read_bytes()
+    assert len(after) == len(before)
+    assert sum(old != new for old, new in zip(before, after)) <= 4 + 1 + 4
+    saved = dcmread(source)
+    assert saved.StudyDate == "20241231"
+    assert saved.SOPInstanceUID == "1.2.3.5"
+    assert saved.IonBeamSequence[0].private_block(0x300B, "IMPAC")[0x02].value == -3.0
+    assert (source.parent / (source.name + BACKUP_SUFFIX)).read_bytes() == before
+    assert not journal_path(source).exists()
+
+
+def test_interrupted_patch_is_undone_from_the_journal(source, monkeypatch):
+    """Test that only the patched ranges are journalled, and that a patch cut short is rolled back with them."""
+    original = dcmread(source)
+    modified = copy.deepcopy(original)
+    modified.StudyDate = "20241231"
+    modified.SOPInstanceUID = "1.2.3.5"
+    before = source.read_bytes()
+    write_patches = in_place_patch.write_patches
+
+    def crash_after_first_patch(fileobj, patches):
+        write_patches(fileobj, patches[:1])
+        fileobj.flush()
+        raise OSError("power cut")
+
+    monkeypatch.setattr(in_place_patch, "write_patches", crash_after_first_patch)
+    with pytest.raises(OSError):
+        patch_in_place(source, original, modified)
+    assert source.read_bytes() != before
+    assert journal_path(source).stat().st_size < 100
+    assert not (source.parent / (source.name + BACKUP_SUFFIX)).exists()
+    monkeypatch.setattr(in_place_patch, "write_patches", write_patches)
+
+    assert recover_interrupted_patch(source)
+    assert source.read_bytes() == before
+    assert not journal_path(source).exists()
+    assert not recover_interrupted_patch(source)
+
+
+def test_copy_on_write_and_save_as(source, tmp_path):
+    """Test that copy on write leaves no backup and that a patched copy can go to another file."""
+    original = dcmread(source)
+    modified = copy.deepcopy(original)
+    modified.StudyDate = "19991231"
+    assert patch_in_place(source, original, modified, backup=False, copy_on_write=True)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["plan.dcm"]
+
+    other = tmp_path / "copy.dcm"
+    modified.StudyDate = "20000101"
+    assert patch_in_place(source, dcmread(source), modified, destination_path=other)
+    assert dcmread(other).StudyDate == "20000101"
+    assert dcmread(source).StudyDate == "19991231"
+
+
+def test_patching_waits_for_other_writes_to_the_file(source):
+    """Test that the values are located only once a write holding the file's lock is done."""
+    original = dcmread(source)
+    modified = copy.deepcopy(original)
+    modified.StudyDate = "20241231"
+    patched = []
+    thread = threading.Thread(target=lambda: patched.append(patch_in_place(source, original, modified, backup=False)))
+    with path_lock(source):
+        thread.start()
+        thread.join(timeout=0.2)
+        assert thread.is_alive()
+    thread.join()
+    assert patched == [True]
+    assert dcmread(source).StudyDate == "20241231"
+
+
+def test_edits_that_can_not_be_patched(source):
+    """Test that length changes, structure changes and undefined length sequences are left to a full save."""
+    original = dcmread(source)
+
+    longer = copy.deepcopy(original)
+    longer.SOPInstanceUID = "1.2.3.4.5.6"
+    assert plan_patches(source, original, longer) is None
+
+    added = copy.deepcopy(original)
+    added.StationName = "NEW"
+    assert changed_elements(original, added) is None
+
+    inside_undefined = copy.deepcopy(original)
+    inside_undefined.BeamSequence[0].BeamNumber = 3
+    before = source.read_bytes()
+    assert not patch_in_place(source, original, inside_undefined)
+    assert source.read_bytes() == before
@@ -0,0 +1,94 @@
+"""Unit tests for instrumentation.py"""
+
+import json
+import threading
+
+import pytest
+
+from dcmqtreepy import instrumentation
+from dcmqtreepy.instrumentation import (
+    add_listener,
+    clear_trace,
+    last_operation,
+    remove_listener,
+    set_enabled,
+    span,
+    write_chrome_trace,
+)
+
+
+@pytest.fixture
+def timings():
+    """Timing enabled with a listener collecting the operations, all turned off again afterwards."""
+    collected = []
+    add_listener(collected.append)
+    set_enabled(True, tracing=True)
+    yield collected
+    set_enabled(False, tracing=False)
+    remove_listener(collected.append)
+    clear_trace()
+
+
+def test_disabled_spans_do_nothing():
+    """Test that while disabled every span is the same do-nothing context manager and nothing is reported."""
+    collected = []
+    add_listener(collected.append)
+    try:
+        assert span("dcmread") is span("populate tree")
+        with span("open"):
+            with span("dcmread"):
+                pass
+        assert collected == []
+        assert instrumentation.trace_event_count() == 0
+    finally:
+        remove_listener(collected.append)
+
+
+def test_operation_breakdown_sums_child_spans(timings):
+    """Test that the outermost span reports its time and the total time of each kind of child span."""
+    with span("open", file="plan.dcm"):
+        with span("dcmread"):
+            pass
+        for _ in range(3):
+            with span("populate tree"):
+                with span("nested detail"):
+                    pass
+    assert len(timings) == 1
+    timing = timings[0]
+    assert timing.name == "open"
+    assert list(timing.children) == ["dcmread", "populate tree"]
+    assert timing.seconds >= sum(timing.children.values())
+    assert last_operation() is timing
+    assert timing.describe().startswith("open: ")
+
+
+def test_operations_on_other_threads_are_separate(timings):
+    """Test that spans on another thread form their own operation rather than nesting in this thread's."""
+    with span("save"):
+        thread = threading.Thread(target=lambda: span("write").__enter__().__exit__(None, None, None))
+        thread.start()
+        thread.join()
+    assert [timing.name for timing in timings] == ["write", "save"]
+
+
+def test_chrome_trace_export(timings, tmp_path):
+    """Test that the recorded spans are written as complete (X) trace events with their arguments."""
+    with span("open", file="plan.dcm"):
+        with span("dcmread"):
+            pass
+    path = tmp_path / "trace.json"
+    assert write_chrome_trace(path) == 2
+    events = json.loads(path.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == ["dcmread", "open"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in events)
+    assert events[1]["args"] == {"file": "plan.dcm"}
+
+
+def test_failing_operation_is_still_timed(timings):
+    """Test that a span left by an exception is closed and reported."""
+    with pytest.raises(ValueError):
+        with span("open"):
+            with span("dcmread"):
+                raise ValueError("not DICOM")
+    assert [timing.name for timing in timings] == ["open"]
+    assert "dcmread" in timings[0].children
@@ -0,0 +1,99 @@
+"""Unit tests for numeric_array.py"""
+
+from io import BytesIO
+
+import numpy as np
+import pytest
+from pydicom import Dataset, dcmread, dcmwrite
+from pydicom.dataelem import RawDataElement
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy.memory_accounting import stored_item
+from dcmqtreepy.numeric_array import (
+    ArrayValue,
+    apply_operation,
+    element_array,
+    encode_array,
+    is_large_array,
+    value_count,
+    values_per_row,
+)
+
+CONTOUR_DATA = 0x30060050
+SCAN_SPOT_POSITION_MAP = 0x300A0394
+
+
+@pytest.fixture
+def written():
+    """Return a function writing ds and reading it back, leaving its values unconverted."""
+
+    def _written(ds: Dataset) -> Dataset:
+        ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.481.8"
+        ds.SOPInstanceUID = "1.2.3.4"
+        ds.file_meta = FileMetaDataset()
+        ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+        ds.is_little_endian = True
+        ds.is_implicit_VR = False
+        buffer = BytesIO()
+        dcmwrite(buffer, ds, write_like_original=False)
+        buffer.seek(0)
+        return dcmread(buffer)
+
+    return _written
+
+
+def test_binary_values_are_viewed_without_copying(written):
+    """Test that FL values read from a file are a read-only view of the bytes as read."""
+    source = Dataset()
+    source.ScanSpotPositionMap = [float(value) for value in range(600)]
+    ds = written(source)
+    assert value_count(ds, SCAN_SPOT_POSITION_MAP) == 600
+    assert is_large_array(ds, SCAN_SPOT_POSITION_MAP)
+    array = element_array(ds, SCAN_SPOT_POSITION_MAP)
+    assert isinstance(stored_item(ds, SCAN_SPOT_POSITION_MAP), RawDataElement)
+    assert not array.flags.writeable
+    assert np.shares_memory(array, np.frombuffer(stored_item(ds, SCAN_SPOT_POSITION_MAP).value, dtype="<f4"))
+    assert array[599] == 599.0
+    assert encode_array(array, "FL") == stored_item(ds, SCAN_SPOT_POSITION_MAP).value
+
+
+def test_ds_values_round_trip(written):
+    """Test that DS text is parsed into floats and formatted back within the 16 characters allowed."""
+    source = Dataset()
+    source.ContourData = [1.5, -2.25, 100.0] * 100
+    ds = written(source)
+    array = element_array(ds, CONTOUR_DATA)
+    assert array.dtype == np.float64
+    assert list(array[:3]) == [1.5, -2.25, 100.0]
+    encoded = encode_array(np.array([-1.234567891234e-100, 2.0]), "DS")
+    assert len(encoded) % 2 == 0
+    assert all(len(value.strip()) <= 16 for value in encoded.decode().split("\\"))
+
+
+def test_operations_on_one_column_keep_the_type():
+    """Test that an operation on the z column leaves x and y alone and integers stay integers."""
+    points = np.array([1.0, 2.0, 3.0, 4.0, 5.0, 6.0], dtype=np.float32)
+    shifted = apply_operation(points, "Offset", 10.0, column=2, width=3)
+    assert shifted.dtype == np.float32
+    assert list(shifted) == [1.0, 2.0, 13.0, 4.0, 5.0, 16.0]
+    counts = apply_operation(np.array([100, 200], dtype=np.uint16), "Scale", 1000.0)
+    assert counts.dtype == np.uint16
+    assert list(counts) == [65535, 65535]
+    with pytest.raises(ValueError):
+        apply_operation(points, "Scale", 2.0, column=0, width=4)
+
+
+def test_array_value_keeps_original_until_replaced(written):
+    """Test that an unchanged value is saved as read, and an edited one is encoded from the array."""
+    source = Dataset()
+    source.ScanSpotPositionMap = [float(value) for value in range(600)]
+    ds = written(source)
+    array_value = ArrayValue.from_dataset(ds, SCAN_SPOT_POSITION_MAP)
+    assert array_value.element(SCAN_SPOT_POSITION_MAP) == stored_item(ds, SCAN_SPOT_POSITION_MAP)
+    array_value.replace(apply_operation(array_value.array, "Scale", 2.0))
+    saved = Dataset()
+    saved[SCAN_SPOT_POSITION_MAP] = array_value.element(SCAN_SPOT_POSITION_MAP)
+    assert saved.ScanSpotPositionMap[599] == 1198.0
+    assert values_per_row(CONTOUR_DATA) == 3
+    assert values_per_row(SCAN_SPOT_POSITION_MAP) == 1
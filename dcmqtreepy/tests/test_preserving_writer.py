@@ -0,0 +1,104 @@
+"""Unit tests for preserving_writer.py"""
+
+import copy
+from io import BytesIO
+
+from pydicom import Dataset, dcmread, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.encaps import encapsulate
+from pydicom.uid import (
+    DeflatedExplicitVRLittleEndian,
+    ImplicitVRLittleEndian,
+    JPEGBaseline8Bit,
+)
+
+from dcmqtreepy.element_offsets import transfer_syntax_encoding
+from dcmqtreepy.preserving_writer import (
+    can_preserve_encoding,
+    write_preserving_encoding,
+)
+
+FRAGMENTS = [b"\xff\xd8" + bytes(range(256)) * 64 + b"\xff\xd9", b"\xff\xd8second frame\xff\xd9"]
+
+
+def write_source(path, transfer_syntax_uid: str = JPEGBaseline8Bit) -> Dataset:
+    ds = Dataset()
+    ds.PatientName = "Test^Patient"
+    ds.StationName = "STATION"
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.7"
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.PixelData = encapsulate(FRAGMENTS)
+    ds["PixelData"].VR = "OB"
+    ds["PixelData"].is_undefined_length = True
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = transfer_syntax_uid
+    ds.file_meta.MediaStorageSOPClassUID = ds.SOPClassUID
+    ds.file_meta.MediaStorageSOPInstanceUID = ds.SOPInstanceUID
+    ds.is_implicit_VR, ds.is_little_endian = transfer_syntax_encoding(transfer_syntax_uid)
+    dcmwrite(path, ds, write_like_original=False)
+    return dcmread(path, force=True)
+
+
+def copy_of(original: Dataset) -> Dataset:
+    """A rebuilt dataset, as the editor produces on save: new elements, but the original's pixel data element."""
+    modified = Dataset()
+    for elem in original:
+        modified.add(elem if elem.tag == 0x7FE00010 else copy.deepcopy(elem))
+    return modified
+
+
+def test_edit_keeps_transfer_syntax_and_encapsulated_pixels(tmp_path):
+    """Test that a one-tag edit keeps the compressed transfer syntax and the pixel data bytes."""
+    source = tmp_path / "source.dcm"
+    original = write_source(source)
+    modified = copy_of(original)
+    modified.StationName = "EDITED"
+    del modified.PatientName
+    modified.InstitutionName = "Hospital"
+    destination = tmp_path / "saved.dcm"
+
+    write_preserving_encoding(source, original, modified, destination)
+
+    saved = dcmread(destination)
+    assert saved.file_meta.TransferSyntaxUID == JPEGBaseline8Bit
+    assert saved.StationName == "EDITED"
+    assert saved.InstitutionName == "Hospital"
+    assert "PatientName" not in saved
+    assert saved.PixelData == original.PixelData
+
+
+def test_unchanged_dataset_is_copied_byte_for_byte(tmp_path):
+    """Test that saving without edits reproduces the original file."""
+    source = tmp_path / "source.dcm"
+    original = write_source(source, ImplicitVRLittleEndian)
+    destination = tmp_path / "saved.dcm"
+    write_preserving_encoding(source, original, copy_of(original), destination)
+    assert destination.read_bytes() == source.read_bytes()
+
+
+def test_save_over_source(tmp_path):
+    """Test that the source file can be the destination, with no partial file left behind."""
+    source = tmp_path / "source.dcm"
+    original = write_source(source)
+    modified = copy_of(original)
+    modified.StationName = "OVERWRITTEN"
+    write_preserving_encoding(source, original, modified, source)
+    assert dcmread(source).StationName == "OVERWRITTEN"
+    assert [path.name for path in tmp_path.iterdir()] == ["source.dcm"]
+
+
+def test_deflated_source_can_not_be_preserved(tmp_path):
+    """Test that a deflated source is reported as not usable for a raw copy."""
+    ds = Dataset()
+    ds.PatientName = "Test^Patient"
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.7"
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = DeflatedExplicitVRLittleEndian
+    ds.is_implicit_VR = False
+    ds.is_little_endian = True
+    source = tmp_path / "deflated.dcm"
+    buffer = BytesIO()
+    dcmwrite(buffer, ds, write_like_original=False)
+    source.write_bytes(buffer.getvalue())
+    assert not can_preserve_encoding(source, dcmread(source))
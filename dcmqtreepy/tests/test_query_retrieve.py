@@ -0,0 +1,182 @@
+"""Unit tests for query_retrieve.py"""
+
+import threading
+import time
+
+import pytest
+from pydicom import dcmread
+from pydicom.uid import generate_uid
+from pynetdicom import AE, StoragePresentationContexts, evt
+from pynetdicom.sop_class import (
+    StudyRootQueryRetrieveInformationModelFind,
+    StudyRootQueryRetrieveInformationModelGet,
+    StudyRootQueryRetrieveInformationModelMove,
+)
+
+from dcmqtreepy.query_retrieve import (
+    QueryError,
+    build_query,
+    find,
+    get,
+    move,
+    retrieve_identifier,
+)
+from dcmqtreepy.storage_scu import Destination
+from dcmqtreepy.tests.conftest import free_port
+
+
+class ArchiveStandIn:
+    """A Study Root Q/R SCP holding a list of instances, every C-FIND matching all of them."""
+
+    def __init__(self, instances, move_destinations=None):
+        self.instances = instances
+        self.move_destinations = move_destinations or {}
+        self.release_after_first = threading.Event()
+        self.hold_after_first = False
+        self.saw_cancel = False
+        self.ae = AE(ae_title="ARCHIVE")
+        self.ae.add_supported_context(StudyRootQueryRetrieveInformationModelFind)
+        self.ae.add_supported_context(StudyRootQueryRetrieveInformationModelGet)
+        self.ae.add_supported_context(StudyRootQueryRetrieveInformationModelMove)
+        for context in StoragePresentationContexts:
+            self.ae.add_requested_context(context.abstract_syntax)
+            self.ae.add_supported_context(context.abstract_syntax, scu_role=True, scp_role=True)
+        self.port = free_port()
+        handlers = [
+            (evt.EVT_C_FIND, self.handle_find),
+            (evt.EVT_C_GET, self.handle_get),
+            (evt.EVT_C_MOVE, self.handle_move),
+        ]
+        self.server = self.ae.start_server(("127.0.0.1", self.port), block=False, evt_handlers=handlers)
+        self.node = Destination("ARCHIVE", "127.0.0.1", self.port)
+
+    def handle_find(self, event):
+        level = event.identifier.QueryRetrieveLevel
+        for index, instance in enumerate(self.instances):
+            if event.is_cancelled:
+                self.saw_cancel = True
+                yield 0xFE00, None
+                return
+            match = retrieve_identifier(instance, level)
+            match.PatientID = instance.PatientID
+            yield 0xFF00, match
+            if self.hold_after_first:
+                # long enough for a C-CANCEL sent in response to this match to arrive
+                self.release_after_first.wait(timeout=5)
+                time.sleep(0.1)
+        yield 0x0000, None
+
+    def matching(self, identifier):
+        keyword = {"STUDY": "StudyInstanceUID", "SERIES": "SeriesInstanceUID", "IMAGE": "SOPInstanceUID"}[
+            identifier.QueryRetrieveLevel
+        ]
+        return [instance for instance in self.instances if instance.get(keyword) == identifier.get(keyword)]
+
+    def handle_get(self, event):
+        matches = self.matching(event.identifier)
+        yield len(matches)
+        for instance in matches:
+            yield 0xFF00, instance
+
+    def handle_move(self, event):
+        if event.move_destination not in self.move_destinations:
+            yield None, None
+            return
+        yield ("127.0.0.1", self.move_destinations[event.move_destination])
+        matches = self.matching(event.identifier)
+        yield len(matches)
+        for instance in matches:
+            yield 0xFF00, instance
+
+    def stop(self):
+        self.release_after_first.set()
+        self.server.shutdown()
+
+
+@pytest.fixture
+def study(rt_plan):
+    """Three plans in one study, one series."""
+    study_uid, series_uid = generate_uid(), generate_uid()
+    instances = []
+    for index in range(3):
+        plan = rt_plan(f"PLAN{index}")
+        plan.PatientID = "PID1"
+        plan.StudyInstanceUID = study_uid
+        plan.SeriesInstanceUID = series_uid
+        instances.append(plan)
+    return instances
+
+
+@pytest.fixture
+def archive_factory():
+    archives = []
+
+    def _archive_factory(instances, **kwargs) -> ArchiveStandIn:
+        archive = ArchiveStandIn(instances, **kwargs)
+        archives.append(archive)
+        return archive
+
+    yield _archive_factory
+    for archive in archives:
+        archive.stop()
+
+
+def test_matches_are_yielded_before_the_query_completes(archive_factory, study):
+    """Test that the first match arrives while the archive is still holding back the rest."""
+    archive = archive_factory(study)
+    archive.hold_after_first = True
+    matches = find(archive.node, build_query("IMAGE", {"PatientID": "PID1"}))
+    first = next(matches)
+    assert first.SOPInstanceUID == study[0].SOPInstanceUID
+    archive.release_after_first.set()
+    assert [match.SOPInstanceUID for match in matches] == [instance.SOPInstanceUID for instance in study[1:]]
+
+
+def test_cancel_sends_c_cancel(archive_factory, study):
+    """Test that setting cancelled stops the matches and tells the archive."""
+    archive = archive_factory(study)
+    archive.hold_after_first = True
+    cancelled = threading.Event()
+    matches = find(archive.node, build_query("IMAGE"), cancelled=cancelled)
+    next(matches)
+    cancelled.set()
+    archive.release_after_first.set()
+    assert list(matches) == []
+    assert archive.saw_cancel
+
+
+def test_get_writes_instances_to_spool(archive_factory, study, tmp_path):
+    """Test that C-GET of a series writes each instance to the spool directory as it arrives."""
+    archive = archive_factory(study)
+    arrived = []
+    identifier = retrieve_identifier(study[0], "SERIES")
+    summary = get(archive.node, [identifier], tmp_path / "spool", on_file=arrived.append)
+    assert summary.completed == 3 and summary.error is None
+    assert sorted(str(dcmread(path).StationName) for path in arrived) == ["PLAN0", "PLAN1", "PLAN2"]
+
+
+def test_move_sends_to_our_receiver(archive_factory, receiver_factory, study):
+    """Test that C-MOVE to our AE title delivers the instances to the storage receiver."""
+    receiver = receiver_factory()
+    archive = archive_factory(study, move_destinations={receiver.ae_title: receiver.port})
+    identifier = retrieve_identifier(study[1], "IMAGE")
+    summary = move(archive.node, [identifier], receiver.ae_title)
+    assert summary.completed == 1 and summary.error is None
+    assert [path.name for path in receiver.received_paths()] == [f"{study[1].SOPInstanceUID}.dcm"]
+
+
+def test_unreachable_archive_raises():
+    """Test that a query to an archive that isn't there raises QueryError."""
+    with pytest.raises(QueryError):
+        list(find(Destination("NOBODY", "127.0.0.1", 1), build_query("STUDY")))
+
+
+def test_retrieve_identifier_has_unique_keys_down_to_level(study):
+    """Test that a retrieve identifier holds only the unique keys of the level and those above."""
+    identifier = retrieve_identifier(study[0], "SERIES")
+    assert identifier.QueryRetrieveLevel == "SERIES"
+    assert set(identifier.keys()) == {
+        identifier["QueryRetrieveLevel"].tag,
+        identifier["StudyInstanceUID"].tag,
+        identifier["SeriesInstanceUID"].tag,
+    }
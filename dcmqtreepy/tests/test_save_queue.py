@@ -0,0 +1,69 @@
+"""Unit tests for save_queue.py"""
+
+import threading
+import time
+
+from dcmqtreepy.save_queue import SaveJob, copy_job, save_all
+
+
+def writer(path, data: bytes, delay: float = 0.0, active=None, peak=None):
+    def save(progress):
+        if active is not None:
+            with active["lock"]:
+                active["count"] += 1
+                peak.append(active["count"])
+        time.sleep(delay)
+        path.write_bytes(data)
+        if active is not None:
+            with active["lock"]:
+                active["count"] -= 1
+
+    return save
+
+
+def test_save_all_reports_each_file_and_throughput(tmp_path):
+    """Test that every job is reported, with bytes written and a throughput."""
+    jobs = [SaveJob(tmp_path / f"{index}.dcm", writer(tmp_path / f"{index}.dcm", b"x" * 1000)) for index in range(6)]
+    reported = []
+    summary = save_all(jobs, max_workers=3, on_result=lambda result, done, total: reported.append((done, total)))
+    assert sorted(reported) == [(done, 6) for done in range(1, 7)]
+    assert summary.bytes_written == 6000
+    assert summary.failures == []
+    assert summary.bytes_per_second > 0
+    assert "Saved 6 of 6 files" in summary.describe()
+
+
+def test_parallelism_is_bounded(tmp_path):
+    """Test that no more than max_workers jobs run at once."""
+    active = {"count": 0, "lock": threading.Lock()}
+    peak = []
+    jobs = [
+        SaveJob(tmp_path / f"{index}.dcm", writer(tmp_path / f"{index}.dcm", b"x", 0.02, active, peak)) for index in range(8)
+    ]
+    save_all(jobs, max_workers=2)
+    assert max(peak) == 2
+
+
+def test_failed_job_does_not_stop_the_others(tmp_path):
+    """Test that a failing job is reported with its error while the rest are saved."""
+
+    def failing(progress):
+        raise OSError("No space left on device")
+
+    jobs = [SaveJob(tmp_path / "bad.dcm", failing)] + [
+        SaveJob(tmp_path / f"{index}.dcm", writer(tmp_path / f"{index}.dcm", b"x")) for index in range(3)
+    ]
+    summary = save_all(jobs)
+    assert [result.destination.name for result in summary.failures] == ["bad.dcm"]
+    assert summary.failures[0].error == "No space left on device"
+    assert summary.bytes_written == 3
+
+
+def test_copy_job_copies_unchanged(tmp_path):
+    """Test that a copy job writes the source as it is, alongside other jobs."""
+    source = tmp_path / "source.dcm"
+    source.write_bytes(b"DICM" * 100)
+    (tmp_path / "out").mkdir()
+    summary = save_all([copy_job(source, tmp_path / "out" / "source.dcm")])
+    assert (tmp_path / "out" / "source.dcm").read_bytes() == source.read_bytes()
+    assert summary.bytes_written == 400
@@ -0,0 +1,66 @@
+"""Unit tests for sequence_table.py"""
+
+import pytest
+from pydicom import Dataset, Sequence
+
+from dcmqtreepy.sequence_table import SequenceTable
+
+GANTRY_ANGLE = 0x300A011E
+REFERENCED_DOSE_REFERENCE_SEQUENCE = 0x300C0050
+CUMULATIVE_DOSE_REFERENCE_COEFFICIENT = 0x300A010C
+
+
+@pytest.fixture
+def control_points():
+    """Return a Control Point Sequence whose first item has elements the others don't."""
+    sequence = Sequence()
+    for index in range(4):
+        control_point = Dataset()
+        control_point.ControlPointIndex = index
+        if index == 0:
+            control_point.NominalBeamEnergy = 150.0
+            control_point.GantryAngle = 90.0
+        else:
+            control_point.GantryAngle = [270.0, 180.0, 0.0][index - 1]
+        reference = Dataset()
+        reference.CumulativeDoseReferenceCoefficient = index / 3
+        control_point.ReferencedDoseReferenceSequence = [reference]
+        sequence.append(control_point)
+    return sequence
+
+
+def test_columns_are_the_union_of_the_items(control_points):
+    """Test that every element found is a column, with cells of items lacking it left empty."""
+    table = SequenceTable(control_points)
+    assert table.row_count == 4
+    assert [column.name for column in table.columns] == [
+        "Control Point Index",
+        "Nominal Beam Energy",
+        "Gantry Angle",
+        "Referenced Dose Reference Sequence",
+    ]
+    assert [table.text(row, 1) for row in range(4)] == ["150.0", "", "", ""]
+    assert table.text(0, 3) == "1"
+    assert not table.columns[3].editable
+
+
+def test_sorted_rows_compares_numbers(control_points):
+    """Test that sorting orders rows by value as numbers, with empty cells last."""
+    table = SequenceTable(control_points)
+    assert table.sorted_rows(table.column_index((GANTRY_ANGLE,))) == [3, 0, 2, 1]
+    assert table.sorted_rows(1) == [0, 1, 2, 3]
+
+
+def test_flattened_edits_are_written_back(control_points):
+    """Test that editing a flattened nested column and adding a missing element change the items."""
+    table = SequenceTable(control_points, flatten_depth=1)
+    coefficient = table.column_index((REFERENCED_DOSE_REFERENCE_SEQUENCE, 0, CUMULATIVE_DOSE_REFERENCE_COEFFICIENT))
+    assert table.columns[coefficient].name.endswith("[1] > Cumulative Dose Reference Coefficient")
+    table.set_text(range(4), coefficient, "0.5")
+    table.set_text([2], 1, "160")
+    with pytest.raises(ValueError):
+        table.set_text([0], table.column_index((GANTRY_ANGLE,)), "not a number")
+    assert table.apply() == 5
+    assert [cp.ReferencedDoseReferenceSequence[0].CumulativeDoseReferenceCoefficient for cp in control_points] == [0.5] * 4
+    assert control_points[2].NominalBeamEnergy == 160.0
+    assert "NominalBeamEnergy" not in control_points[1]
@@ -0,0 +1,159 @@
+"""Unit tests for session_store.py and memory_accounting.py"""
+
+import threading
+from io import BytesIO
+
+import pytest
+from pydicom import Dataset, dcmread, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy import session_store
+from dcmqtreepy.memory_accounting import (
+    ELEMENT_OVERHEAD_BYTES,
+    estimate_dataset_bytes,
+    is_deferred,
+)
+from dcmqtreepy.session_store import SessionDatasetStore
+
+KILOBYTE = 1024
+
+
+def encoded_dataset(pixel_bytes: int, patient_name: str = "Test^Patient") -> bytes:
+    """Return the bytes of a DICOM file with pixel_bytes of (fake) Pixel Data."""
+    ds = Dataset()
+    ds.PatientName = patient_name
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.add_new(0x7FE00010, "OB", b"\x00" * pixel_bytes)
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    buffer = BytesIO()
+    dcmwrite(buffer, ds, write_like_original=False)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionDatasetStore(
+        spool_dir=tmp_path, global_budget_bytes=100 * KILOBYTE, session_budget_bytes=60 * KILOBYTE, defer_size=KILOBYTE
+    )
+
+
+def test_estimate_dataset_bytes_counts_values():
+    """Test that large values dominate the estimate."""
+    ds = dcmread(BytesIO(encoded_dataset(50 * KILOBYTE)))
+    estimate = estimate_dataset_bytes(ds)
+    assert 50 * KILOBYTE < estimate < 50 * KILOBYTE + 40 * ELEMENT_OVERHEAD_BYTES
+
+
+def test_estimate_does_not_load_deferred_values(tmp_path):
+    """Test that deferred values are reported as deferred and not counted or loaded."""
+    path = tmp_path / "deferred.dcm"
+    path.write_bytes(encoded_dataset(50 * KILOBYTE))
+    ds = dcmread(path, defer_size=KILOBYTE)
+    assert is_deferred(ds, 0x7FE00010)
+    assert estimate_dataset_bytes(ds) < 10 * KILOBYTE
+    assert is_deferred(ds, 0x7FE00010)
+    assert not is_deferred(ds, 0x00100010)
+
+
+def test_get_parses_spooled_file_with_deferred_pixels(store):
+    """Test that datasets are parsed from the spool with large values deferred."""
+    store.add_file("session-a", "one", encoded_dataset(50 * KILOBYTE))
+    ds = store.get("session-a", "one")
+    assert str(ds.PatientName) == "Test^Patient"
+    assert is_deferred(ds, 0x7FE00010)
+    assert len(ds.PixelData) == 50 * KILOBYTE
+
+
+def test_session_budget_evicts_own_least_recently_used(store):
+    """Test that exceeding the session budget evicts that session's older datasets."""
+    store.add_file("session-a", "one", encoded_dataset(40 * KILOBYTE))
+    store.add_file("session-a", "two", encoded_dataset(40 * KILOBYTE))
+    store.get("session-a", "one").PixelData  # load the pixels of the first dataset
+    store.update_size("session-a", "one")
+    store.get("session-a", "two").PixelData
+    store.update_size("session-a", "two")
+
+    usage = {row.session_id: row for row in store.usage()}["session-a"]
+    assert usage.datasets_in_memory == 1
+    assert usage.evictions == 1
+    assert store.session_bytes("session-a") <= store.session_budget_bytes
+
+
+def test_global_budget_evicts_idle_sessions_first(store):
+    """Test that the global budget is met by evicting the longest idle session."""
+    for session_id in ("session-a", "session-b", "session-c"):
+        store.add_file(session_id, "one", encoded_dataset(40 * KILOBYTE, patient_name=session_id))
+        store.get(session_id, "one").PixelData
+        store.update_size(session_id, "one")
+
+    usage = {row.session_id: row for row in store.usage()}
+    assert usage["session-a"].datasets_in_memory == 0
+    assert usage["session-c"].datasets_in_memory == 1
+    assert store.total_bytes() <= store.global_budget_bytes
+
+
+def test_pinned_datasets_are_not_evicted_for_other_sessions(store):
+    """Test that a dataset pinned by a session's run stays in memory, with its edits, while others exceed the budget."""
+    store.add_file("session-a", "one", encoded_dataset(40 * KILOBYTE))
+    with store.pinned("session-a", "one") as dataset:
+        dataset.PixelData
+        dataset.PatientName = "Edited^Name"
+        store.update_size("session-a", "one")
+        for session_id in ("session-b", "session-c"):
+            store.add_file(session_id, "one", encoded_dataset(40 * KILOBYTE))
+            store.get(session_id, "one").PixelData
+            store.update_size(session_id, "one")
+        assert store.get("session-a", "one") is dataset
+        usage = {row.session_id: row for row in store.usage()}
+        assert usage["session-a"].evictions == 0
+        assert usage["session-b"].datasets_in_memory == 0
+    assert str(store.get("session-a", "one").PatientName) == "Edited^Name"
+
+
+def test_evicted_edits_survive_reload(store):
+    """Test that edits to an evicted dataset are written to the spool and read back."""
+    store.add_file("session-a", "one", encoded_dataset(10 * KILOBYTE))
+    store.get("session-a", "one").PatientName = "Edited^Name"
+    store.evict("session-a", "one")
+    assert str(store.get("session-a", "one").PatientName) == "Edited^Name"
+
+
+def test_eviction_writes_without_holding_up_other_sessions(store, monkeypatch):
+    """Test that while one dataset is written out, other sessions can read theirs and usage can be reported."""
+    store.add_file("session-a", "one", encoded_dataset(10 * KILOBYTE))
+    store.add_file("session-b", "one", encoded_dataset(10 * KILOBYTE))
+    store.get("session-a", "one").PatientName = "Edited^Name"
+    writing = threading.Event()
+    release = threading.Event()
+
+    def slow_dcmwrite(*args, **kwargs):
+        writing.set()
+        assert release.wait(5)
+        dcmwrite(*args, **kwargs)
+
+    monkeypatch.setattr(session_store, "dcmwrite", slow_dcmwrite)
+    evicting = threading.Thread(target=store.evict, args=("session-a", "one"))
+    evicting.start()
+    try:
+        assert writing.wait(5)
+        assert str(store.get("session-b", "one").PatientName) == "Test^Patient"
+        assert {row.session_id for row in store.usage()} == {"session-a", "session-b"}
+    finally:
+        release.set()
+        evicting.join(5)
+    assert store.usage()[0].evictions == 1
+    assert str(store.get("session-a", "one").PatientName) == "Edited^Name"
+
+
+def test_discard_session_removes_spool(store, tmp_path):
+    """Test that discarding a session forgets its datasets and removes its files."""
+    store.add_file("session-a", "one", encoded_dataset(10 * KILOBYTE))
+    store.session_file("session-a", "batch.zip").write_bytes(b"PK")
+    store.discard_session("session-a")
+    assert not store.has("session-a", "one")
+    assert not (tmp_path / "session-a").exists()
@@ -0,0 +1,53 @@
+"""Unit tests for storage_scp.py"""
+
+from pydicom import dcmread
+from pydicom.uid import ExplicitVRLittleEndian
+from pynetdicom import AE
+from pynetdicom.sop_class import RTPlanStorage
+
+from dcmqtreepy.storage_scp import (
+    STATUS_OUT_OF_RESOURCES,
+    STATUS_SUCCESS,
+    StorageReceiver,
+    spool_file_name,
+)
+
+
+def send(receiver: StorageReceiver, datasets) -> list:
+    ae = AE()
+    ae.add_requested_context(RTPlanStorage, ExplicitVRLittleEndian)
+    assoc = ae.associate("127.0.0.1", receiver.port, ae_title=receiver.ae_title)
+    assert assoc.is_established
+    statuses = [assoc.send_c_store(ds).Status for ds in datasets]
+    assoc.release()
+    return statuses
+
+
+def test_received_instances_are_spooled_and_queued(receiver_factory, rt_plan):
+    """Test that pushed instances are written to the spool directory and their paths queued."""
+    receiver = receiver_factory()
+    datasets = [rt_plan(f"STATION{index}") for index in range(5)]
+    assert send(receiver, datasets) == [STATUS_SUCCESS] * 5
+    paths = receiver.received_paths()
+    assert [path.name for path in paths] == [f"{ds.SOPInstanceUID}.dcm" for ds in datasets]
+    assert dcmread(paths[2]).StationName == "STATION2"
+    assert dcmread(paths[2]).file_meta.TransferSyntaxUID == ExplicitVRLittleEndian
+    assert receiver.received_paths() == []
+
+
+def test_full_queue_refuses_instances(receiver_factory, rt_plan):
+    """Test that the sender is refused, and nothing is left behind, when received paths are not taken up."""
+    receiver = receiver_factory(queue_size=1, queue_timeout=0.1)
+    datasets = [rt_plan("FIRST"), rt_plan("SECOND")]
+    assert send(receiver, datasets) == [STATUS_SUCCESS, STATUS_OUT_OF_RESOURCES]
+    assert [path.name for path in receiver.received_paths()] == [f"{datasets[0].SOPInstanceUID}.dcm"]
+    assert sorted(path.name for path in receiver.spool_dir.iterdir()) == [f"{datasets[0].SOPInstanceUID}.dcm"]
+
+
+def test_spool_file_name_rejects_unsafe_uids():
+    """Test that a UID which isn't safe to use as a file name gets a generated name."""
+    assert spool_file_name("1.2.840.1234") == "1.2.840.1234.dcm"
+    assert spool_file_name("1.2.3\x00") == "1.2.3.dcm"
+    assert spool_file_name("../../etc/passwd").endswith(".dcm")
+    assert "/" not in spool_file_name("../../etc/passwd")
+    assert spool_file_name("..") != "...dcm"
@@ -0,0 +1,94 @@
+"""Unit tests for storage_scu.py"""
+
+import pytest
+from pydicom import dcmread, dcmwrite
+from pydicom.uid import ExplicitVRLittleEndian, ImplicitVRLittleEndian, RLELossless
+from pynetdicom import evt
+from pynetdicom.sop_class import CTImageStorage, RTPlanStorage
+
+from dcmqtreepy.storage_scu import (
+    Destination,
+    SendItem,
+    context_batches,
+    load_destinations,
+    main,
+    parse_destination,
+    presentation_contexts,
+    send_items,
+)
+
+
+def destination_of(receiver) -> Destination:
+    return Destination(receiver.ae_title, "127.0.0.1", receiver.port)
+
+
+def count_associations(receiver) -> list:
+    established = []
+    receiver.server.bind(evt.EVT_ESTABLISHED, lambda event: established.append(event.assoc))
+    return established
+
+
+def test_send_reuses_associations_and_reports_each_instance(receiver_factory, rt_plan, tmp_path):
+    """Test that files and in-memory datasets are sent over no more associations than asked for."""
+    receiver = receiver_factory()
+    established = count_associations(receiver)
+    items = []
+    for index in range(6):
+        path = tmp_path / f"{index}.dcm"
+        dcmwrite(path, rt_plan(f"FILE{index}"), write_like_original=False)
+        items.append(SendItem.from_path(path))
+    edited = rt_plan("EDITED")
+    del edited.file_meta
+    items.append(SendItem.from_dataset(edited, "edited plan"))
+    reported = []
+    results = send_items(destination_of(receiver), items, max_associations=2, on_result=reported.append)
+    assert len(established) == 2
+    assert all(result.ok for result in results)
+    assert sorted(result.label for result in reported) == sorted(item.label for item in items)
+    received = {dcmread(path).StationName for path in receiver.received_paths()}
+    assert received == {f"FILE{index}" for index in range(6)} | {"EDITED"}
+
+
+def test_only_needed_contexts_are_proposed(tmp_path):
+    """Test that one context is proposed per SOP Class and transfer syntax, with fallbacks for uncompressed data."""
+    plan = SendItem("plan", sop_class_uid=RTPlanStorage, transfer_syntax_uid=ImplicitVRLittleEndian)
+    other_plan = SendItem("other plan", sop_class_uid=RTPlanStorage, transfer_syntax_uid=ImplicitVRLittleEndian)
+    ct = SendItem("ct", sop_class_uid=CTImageStorage, transfer_syntax_uid=RLELossless)
+    contexts = presentation_contexts([plan, other_plan, ct])
+    assert [(context.abstract_syntax, context.transfer_syntax) for context in contexts] == [
+        (CTImageStorage, [RLELossless]),
+        (RTPlanStorage, [ImplicitVRLittleEndian, ExplicitVRLittleEndian]),
+    ]
+    batches = list(context_batches([plan, other_plan, ct], max_contexts=1))
+    assert [[item.label for item in batch] for batch in batches] == [["ct"], ["plan", "other plan"]]
+
+
+def test_refused_association_is_reported_per_instance(rt_plan):
+    """Test that every instance is reported as failed when the destination can't be reached."""
+    item = SendItem.from_dataset(rt_plan("PLAN"), "plan")
+    results = send_items(Destination("NOBODY", "127.0.0.1", 1), [item])
+    assert [(result.label, result.ok) for result in results] == [("plan", False)]
+    assert "no association" in results[0].error
+
+
+def test_destinations_from_toml(tmp_path):
+    """Test that named destinations are read from the nodes file and addresses are parsed."""
+    nodes = tmp_path / "dicom_nodes.toml"
+    nodes.write_text('[nodes.planning]\nae_title = "TPS"\nhost = "10.0.0.5"\nport = 104\n\n[nodes.broken]\nhost = "x"\n')
+    destinations = load_destinations(nodes)
+    assert destinations == {"planning": Destination("TPS", "10.0.0.5", 104, "planning")}
+    assert parse_destination("planning", destinations).ae_title == "TPS"
+    assert parse_destination("PACS@pacs.local:11112") == Destination("PACS", "pacs.local", 11112)
+    with pytest.raises(ValueError):
+        parse_destination("nowhere", destinations)
+
+
+def test_command_line_send(receiver_factory, rt_plan, tmp_path, capsys):
+    """Test that the command line sends files and prints the status of each."""
+    receiver = receiver_factory()
+    path = tmp_path / "plan.dcm"
+    dcmwrite(path, rt_plan("CLI"), write_like_original=False)
+    assert main([f"{receiver.ae_title}@127.0.0.1:{receiver.port}", str(path)]) == 0
+    output = capsys.readouterr().out
+    assert f"{path}: sent (status 0x0000)" in output
+    assert "Sent 1 of 1" in output
@@ -0,0 +1,87 @@
+"""Unit tests for viewer_handoff.py"""
+
+import copy
+
+import pytest
+from pydicom import Dataset, dcmread, dcmwrite
+from pydicom.dataset import FileMetaDataset
+from pydicom.uid import ExplicitVRLittleEndian
+
+from dcmqtreepy.viewer_handoff import (
+    hand_off,
+    needs_scratch_file,
+    scratch_path,
+    write_scratch_file,
+)
+
+
+class FileHandler:
+    """A viewer handler that, like the pinned dcm-mini-viewer's, can only load files."""
+
+    def __init__(self):
+        self.dataset = None
+        self.loaded = []
+
+    def load_file(self, file_path: str):
+        self.loaded.append(file_path)
+        self.dataset = dcmread(file_path)
+
+
+class DatasetHandler(FileHandler):
+    def load_dataset(self, dataset: Dataset):
+        self.dataset = dataset
+
+
+@pytest.fixture
+def image(tmp_path):
+    ds = Dataset()
+    ds.PatientName = "Doe^Jane"
+    ds.WindowCenter = 40
+    ds.SOPClassUID = "1.2.840.10008.5.1.4.1.1.2"
+    ds.SOPInstanceUID = "1.2.3.4"
+    ds.add_new(0x7FE00010, "OB", b"\x01\x02" * 64)
+    ds.file_meta = FileMetaDataset()
+    ds.file_meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds.is_little_endian = True
+    ds.is_implicit_VR = False
+    path = tmp_path / "ct.dcm"
+    dcmwrite(path, ds, write_like_original=False)
+    return path
+
+
+def test_edited_dataset_reaches_a_viewer_loading_files(image, tmp_path):
+    """Test that the viewer is shown the edits, through a scratch file, and unedited files are loaded as they are."""
+    original = dcmread(image)
+    handler = FileHandler()
+    assert not needs_scratch_file(handler, False)
+    assert hand_off(handler, original, image) == image
+    assert handler.loaded == [str(image)]
+
+    edited = copy.deepcopy(original)
+    edited.WindowCenter = 400
+    assert needs_scratch_file(handler, True)
+    scratch_file = write_scratch_file(edited, image, tmp_path)
+    assert hand_off(handler, edited, image, scratch_file) == scratch_file
+    assert scratch_file.parent == tmp_path
+    assert scratch_file.name.endswith("ct.dcm")
+    assert handler.dataset.WindowCenter == 400
+    assert handler.dataset.PixelData == original.PixelData
+    assert dcmread(image).WindowCenter == 40
+
+
+def test_files_with_the_same_name_get_their_own_scratch_files(tmp_path):
+    """Test that the edits of files named alike in different folders don't overwrite each other."""
+    first = scratch_path(tmp_path, tmp_path / "a" / "ct.dcm")
+    assert first == scratch_path(tmp_path, tmp_path / "a" / "ct.dcm")
+    assert first != scratch_path(tmp_path, tmp_path / "b" / "ct.dcm")
+
+
+def test_dataset_is_handed_over_when_the_viewer_takes_one(image, tmp_path):
+    """Test that a viewer taking datasets is given the edited dataset itself, with nothing read or written."""
+    edited = dcmread(image)
+    edited.WindowCenter = 400
+    handler = DatasetHandler()
+    assert not needs_scratch_file(handler, True)
+    assert hand_off(handler, edited, image) is None
+    assert handler.dataset is edited
+    assert handler.loaded == []
@@ -0,0 +1,53 @@
+"""Hand the dataset shown in the tree, with its edits, to the image viewer (dcm-mini-viewer).
+
+A viewer handler that can take a dataset (load_dataset) is given it directly, so nothing is read again.
+The viewer this project depends on can only load a file (load_file): an unedited file is loaded from where
+it was read, and an edited one is first written to a scratch file (write_scratch_file, on a pool thread),
+which the viewer then reads, parsing its own copy.  The scratch folder should be private to the user (see
+tempfile.mkdtemp), as the edited files may hold patient data.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+
+from pydicom import Dataset, dcmwrite
+
+from dcmqtreepy.atomic_save import atomic_write
+
+logger = logging.getLogger(__name__)
+
+
+def needs_scratch_file(handler, edited: bool) -> bool:
+    """Whether the edits must be written to a scratch file for handler to load them."""
+    return edited and not hasattr(handler, "load_dataset")
+
+
+def scratch_path(scratch_dir: Path, file_path: Path | str) -> Path:
+    """The scratch file for the edits of file_path, kept apart from those of files with the same name elsewhere."""
+    file_path = Path(file_path)
+    digest = hashlib.sha1(str(file_path.resolve()).encode()).hexdigest()[:12]
+    # ending with the file's name, for the viewer's title and status bar
+    return Path(scratch_dir) / f"{digest}-{file_path.name}"
+
+
+def write_scratch_file(dataset: Dataset, file_path: Path | str, scratch_dir: Path) -> Path:
+    """Write dataset (file_path with edits) to its scratch file, which is returned.  May be called on any thread."""
+    path = scratch_path(scratch_dir, file_path)
+    with atomic_write(path) as partial:
+        dcmwrite(partial, dataset, write_like_original=False)
+    logger.debug(f"Wrote the edits of {Path(file_path).name} to {path} for the viewer")
+    return path
+
+
+def hand_off(handler, dataset: Dataset, file_path: Path | str, scratch_file: Path | None = None) -> Path | None:
+    """Load dataset (read from file_path) into the viewer's handler, from scratch_file if it holds edits.
+
+    Returns the file the viewer loaded, None if it was given the dataset itself.
+    """
+    if hasattr(handler, "load_dataset"):
+        handler.load_dataset(dataset)
+        return None
+    path = Path(scratch_file if scratch_file is not None else file_path)
+    handler.load_file(str(path))
+    return path
@@ -1,19 +1,49 @@
+import atexit
+import hashlib
 import logging
 import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from io import BytesIO
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, Iterator, List, Optional, Union
 
 import pydicom
 import streamlit as st
-from pydicom import DataElement, Dataset, Sequence
+from pydicom import DataElement, Dataset, Sequence, _private_dict
 from pydicom.valuerep import VR
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from streamlit.runtime.uploaded_file_manager import UploadedFile
+
+from dcmqtreepy.batch_edit import (
+    UNCOMPRESSED_TRANSFER_SYNTAXES,
+    AddPrivateElement,
+    ArchiveSizeError,
+    ChangeTransferSyntax,
+    DeleteElement,
+    SetElement,
+    apply_batch,
+    write_results_zip,
+)
+from dcmqtreepy.bulk_edit import BulkEdit
+from dcmqtreepy.dataset_paths import NodePath, build_node_index, path_key, resolve_path
+from dcmqtreepy.memory_accounting import is_deferred, stored_item
+from dcmqtreepy.session_store import SessionDatasetStore
+
+# Server mode is for shared deployments: datasets live in a process wide store with memory budgets
+# instead of in each session's state.  Configure with environment variables, e.g.
+# DCMQTREEPY_SERVER_MODE=1 DCMQTREEPY_GLOBAL_BUDGET_MB=4096 streamlit run streamlit_dicom_viewer.py
+SERVER_MODE = os.environ.get("DCMQTREEPY_SERVER_MODE", "0").lower() not in ("", "0", "false", "no")
 
 
 def make_state_key(key_type: str, path: str) -> str:
     """
     Create a flat state key for any UI element.
-    key_type: Type of state (e.g., 'expanded', 'selected', 'value')
-    path: Path in DICOM hierarchy (e.g., '00080020_item_1')
+    key_type: Type of state (e.g., 'value', 'modified')
+    path: Path in DICOM hierarchy (e.g., '300a00b0.3.300a0111', see dataset_paths.path_key)
     """
     return f"state_{key_type}_{path}"
 
@@ -32,6 +62,22 @@ def set_state(key_type: str, path: str, value: any):
     st.session_state[key] = value
 
 
+@st.cache_resource
+def get_session_store() -> SessionDatasetStore:
+    """The dataset store shared by all sessions of this server process."""
+    megabyte = 1024 * 1024
+    return SessionDatasetStore(
+        spool_dir=Path(os.environ.get("DCMQTREEPY_SPOOL_DIR", Path(tempfile.gettempdir()) / "dcmqtreepy-spool")),
+        global_budget_bytes=int(os.environ.get("DCMQTREEPY_GLOBAL_BUDGET_MB", "2048")) * megabyte,
+        session_budget_bytes=int(os.environ.get("DCMQTREEPY_SESSION_BUDGET_MB", "512")) * megabyte,
+        max_idle_seconds=float(os.environ.get("DCMQTREEPY_SESSION_IDLE_SECONDS", "3600")),
+    )
+
+
+def get_session_id() -> str:
+    return get_script_run_ctx().session_id
+
+
 def format_tag(tag) -> str:
     """Format DICOM tag as 8-character hex string."""
     return f"{tag:08x}"
@@ -64,13 +110,120 @@ def format_dicom_element(elem: DataElement) -> Optional[Dict]:
     return {"tag": format_tag(elem.tag), "name": elem.name, "value": value, "vr": str(elem.VR), "keyword": elem.keyword}
 
 
-def display_sequence(elem: DataElement, path: str, level: int = 0) -> None:
+def format_deferred_element(dataset: Dataset, tag: int) -> Dict:
+    """Format an element whose value has not been read from disk, without reading it."""
+    raw = stored_item(dataset, tag)
+    try:
+        name = pydicom.datadict.dictionary_description(tag)
+        vr = raw.VR or pydicom.datadict.dictionary_VR(tag)
+    except KeyError:
+        name, vr = "Unknown", raw.VR or "UN"
+    return {"tag": format_tag(tag), "name": name, "value": f"(not loaded, {raw.length} bytes)", "vr": str(vr), "keyword": ""}
+
+
+def get_node_index(dataset: Dataset) -> Dict[NodePath, Union[Dataset, DataElement]]:
+    """
+    Get the path -> node index for dataset, building it only when the dataset changes.
+    Rebuilding also evicts expansion and selection state that refers to paths that no longer exist.
+    """
+    cached = st.session_state.get("node_index")
+    if cached is not None and cached[0] is dataset:
+        return cached[1]
+    index = build_node_index(dataset)
+    st.session_state["node_index"] = (dataset, index)
+    prune_view_state(index)
+    return index
+
+
+def invalidate_node_index() -> None:
+    """Force the node index to be rebuilt, e.g. after elements or items were added."""
+    st.session_state.pop("node_index", None)
+
+
+def prune_view_state(index: Dict[NodePath, Union[Dataset, DataElement]]) -> None:
+    """Drop expansion and selection state for paths that are not in index."""
+    expanded = st.session_state.get("expanded_paths", set())
+    st.session_state["expanded_paths"] = {path for path in expanded if path in index}
+    if st.session_state.get("selected_path") not in index:
+        st.session_state["selected_path"] = None
+
+
+def is_expanded(path: NodePath) -> bool:
+    return path in st.session_state.get("expanded_paths", set())
+
+
+def toggle_expanded(path: NodePath) -> None:
+    expanded = st.session_state.setdefault("expanded_paths", set())
+    expanded.symmetric_difference_update({path})
+
+
+def select_path(path: NodePath) -> None:
+    """Select path and rerun the whole app, so highlights in other fragments and the add element panel follow."""
+    st.session_state["selected_path"] = path
+    st.rerun(scope="app")
+
+
+def get_current_dataset() -> Optional[Dataset]:
+    """The dataset of the file selected for viewing, also when only a fragment is rerunning."""
+    digest = st.session_state.get("current_digest")
+    if digest is None or digest not in st.session_state.get("uploads", {}):
+        return None
+    return get_upload_dataset(digest)
+
+
+@contextmanager
+def current_dataset_in_use() -> Iterator[Optional[Dataset]]:
+    """
+    The current dataset for a fragment rerun or a callback, which run outside main.  In server mode it is
+    pinned in the session store until the block ends, so that no session's budget evicts it while it is edited.
+    """
+    digest = st.session_state.get("current_digest")
+    if not SERVER_MODE or digest is None or digest not in st.session_state.get("uploads", {}):
+        yield get_current_dataset()
+        return
+    with get_session_store().pinned(get_session_id(), digest) as dataset:
+        yield dataset
+
+
+def log_fragment_time(kind: str, path: NodePath, start: float) -> None:
+    logging.info(f"{kind} fragment {path_key(path) or 'root'} rendered in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+@st.fragment
+def sequence_fragment(path: NodePath, level: int = 0) -> None:
+    """
+    A sequence as an independently rerunnable fragment: expanding or collapsing one of its items
+    only recomputes this sequence.
+    """
+    start = time.perf_counter()
+    with current_dataset_in_use() as dataset:
+        elem = resolve_path(dataset, path) if dataset is not None else None
+        if isinstance(elem, DataElement):
+            display_sequence(elem, path, level)
+    log_fragment_time("Sequence", path, start)
+
+
+@st.fragment
+def dataset_fragment(path: NodePath = (), level: int = 0) -> None:
+    """
+    The elements of the root dataset or of one sequence item as an independently rerunnable fragment:
+    editing one of its values only recomputes this block.
+    """
+    start = time.perf_counter()
+    with current_dataset_in_use() as dataset:
+        node = resolve_path(dataset, path) if dataset is not None else None
+        if isinstance(node, Dataset):
+            display_dataset(node, path, level)
+    log_fragment_time("Dataset", path, start)
+
+
+def display_sequence(elem: DataElement, path: NodePath, level: int = 0) -> None:
     """
     Display a DICOM sequence with expandable items.
-    Uses flat state management for expansion and selection.
+    Expansion is tracked as a set of paths and selection as a single path.
     """
-    is_expanded = get_state("expanded", path, False)
-    is_selected = get_state("selected", path, False)
+    selected_path = st.session_state.get("selected_path")
+    key = path_key(path)
 
     # Sequence header with indent and visual container
     with st.container():
@@ -91,28 +244,24 @@ def display_sequence(elem: DataElement, path: str, level: int = 0) -> None:
         col1, col2 = st.columns([8, 2])
 
         with col1:
-            if st.button(
-                f"{'  ' * level}{'▼' if is_expanded else '▶'} {elem.name} (Sequence)",
-                key=f"btn_{path}",
+            st.button(
+                f"{'  ' * level}{'▼' if is_expanded(path) else '▶'} {elem.name} (Sequence)",
+                key=f"btn_{key}",
                 use_container_width=True,
-                type="primary" if is_selected else "secondary",
-            ):
-                set_state("expanded", path, not is_expanded)
+                type="primary" if path == selected_path else "secondary",
+                on_click=toggle_expanded,
+                args=(path,),
+            )
 
         with col2:
-            if st.button("Select", key=f"sel_{path}"):
-                # Clear all other selections
-                for key in st.session_state:
-                    if key.startswith("state_selected_"):
-                        st.session_state[key] = False
-                set_state("selected", path, True)
+            if st.button("Select", key=f"sel_{key}"):
+                select_path(path)
 
         # Display sequence items if expanded
-        if is_expanded:
+        if is_expanded(path):
             for idx, item in enumerate(elem.value):
-                item_path = f"{path}_item_{idx}"
-                item_expanded = get_state("expanded", item_path, False)
-                item_selected = get_state("selected", item_path, False)
+                item_path = path + (idx,)
+                item_key = path_key(item_path)
 
                 # Add visual container for items with increased indent
                 st.markdown(
@@ -133,66 +282,54 @@ def display_sequence(elem: DataElement, path: str, level: int = 0) -> None:
                 item_col1, item_col2 = st.columns([8, 2])
 
                 with item_col1:
-                    if st.button(
-                        f"{'  ' * (level + 1)}{'▼' if item_expanded else '▶'} Item {idx + 1}",
-                        key=f"btn_{item_path}",
+                    st.button(
+                        f"{'  ' * (level + 1)}{'▼' if is_expanded(item_path) else '▶'} Item {idx + 1}",
+                        key=f"btn_{item_key}",
                         use_container_width=True,
-                        type="primary" if item_selected else "secondary",
-                    ):
-                        set_state("expanded", item_path, not item_expanded)
+                        type="primary" if item_path == selected_path else "secondary",
+                        on_click=toggle_expanded,
+                        args=(item_path,),
+                    )
 
                 with item_col2:
-                    if st.button("Select", key=f"sel_{item_path}"):
-                        # Clear all other selections
-                        for key in st.session_state:
-                            if key.startswith("state_selected_"):
-                                st.session_state[key] = False
-                        set_state("selected", item_path, True)
+                    if st.button("Select", key=f"sel_{item_key}"):
+                        select_path(item_path)
 
                 # Display item contents if expanded
-                if item_expanded:
-                    display_dataset(item, item_path, level + 2)
+                if is_expanded(item_path):
+                    dataset_fragment(item_path, level + 2)
 
 
 def get_selected_dataset() -> Optional[Union[Dataset, DataElement]]:
     """Get currently selected dataset or sequence item."""
-    selected_path = None
+    dataset = get_current_dataset()
+    selected_path = st.session_state.get("selected_path")
+    if dataset is None or selected_path is None:
+        return dataset
+    return get_node_index(dataset).get(selected_path, dataset)
 
-    # Find the selected path
-    for key in st.session_state:
-        if key.startswith("state_selected_") and st.session_state[key]:
-            selected_path = key.replace("state_selected_", "")
-            break
 
-    if not selected_path or not st.session_state.get("current_dataset"):
-        return st.session_state.get("current_dataset")
+def update_value(path: NodePath, value_key: str) -> None:
+    """Apply an edited value to its element; runs before the enclosing fragment reruns."""
+    error_key = make_state_key("error", path_key(path))
+    try:
+        with current_dataset_in_use() as dataset:
+            resolve_path(dataset, path).value = st.session_state[value_key]
+        set_state("modified", "", True)
+        st.session_state.pop(error_key, None)
+    except Exception as e:
+        st.session_state[error_key] = str(e)
 
-    # Navigate to selected dataset
-    current = st.session_state["current_dataset"]
-    path_parts = selected_path.split("_")
 
-    try:
-        for i in range(0, len(path_parts), 3):
-            if i + 2 < len(path_parts) and path_parts[i + 1] == "item":
-                tag = int(path_parts[i], 16)
-                idx = int(path_parts[i + 2])
-                current = current[tag].value[idx]
-            elif i < len(path_parts):
-                tag = int(path_parts[i], 16)
-                current = current[tag]
-    except Exception:
-        return st.session_state.get("current_dataset")
-
-    return current
-
-
-def display_dataset(dataset: Dataset, path: str = "", level: int = 0) -> None:
-    """Display DICOM dataset with editable fields."""
-    for elem in dataset:
-        current_path = f"{path}_{format_tag(elem.tag)}" if path else format_tag(elem.tag)
-
-        if elem.VR != VR.SQ:
-            elem_data = format_dicom_element(elem)
+def display_dataset(dataset: Dataset, path: NodePath = (), level: int = 0) -> None:
+    """Display DICOM dataset with editable fields. Deferred values (server mode) are shown but not loaded."""
+    for tag in dataset.keys():
+        current_path = path + (tag,)
+        deferred = is_deferred(dataset, tag)
+        elem = None if deferred else dataset[tag]
+
+        if deferred or elem.VR != VR.SQ:
+            elem_data = format_deferred_element(dataset, tag) if deferred else format_dicom_element(elem)
             if elem_data:
                 # Container for the entire row
                 st.markdown(
@@ -239,17 +376,21 @@ def display_dataset(dataset: Dataset, path: str = "", level: int = 0) -> None:
                         unsafe_allow_html=True,
                     )
                 with col3:
-                    if elem.VR not in [VR.OB, VR.OW, VR.OB_OW, VR.OD, VR.OF]:
-                        value_key = make_state_key("value", current_path)
-                        new_value = st.text_input(
-                            f"Value_{current_path}", value=elem_data["value"], key=value_key, label_visibility="collapsed"
+                    if deferred:
+                        st.caption(elem_data["value"])
+                    elif elem.VR not in [VR.OB, VR.OW, VR.OB_OW, VR.OD, VR.OF]:
+                        value_key = make_state_key("value", path_key(current_path))
+                        st.text_input(
+                            f"Value_{value_key}",
+                            value=elem_data["value"],
+                            key=value_key,
+                            label_visibility="collapsed",
+                            on_change=update_value,
+                            args=(current_path, value_key),
                         )
-                        if new_value != elem_data["value"]:
-                            try:
-                                elem.value = new_value
-                                set_state("modified", "", True)
-                            except Exception as e:
-                                st.error(f"Error updating value: {str(e)}")
+                        error = st.session_state.get(make_state_key("error", path_key(current_path)))
+                        if error:
+                            st.error(f"Error updating value: {error}")
                 with col4:
                     st.markdown(
                         f"""
@@ -263,7 +404,7 @@ def display_dataset(dataset: Dataset, path: str = "", level: int = 0) -> None:
                         unsafe_allow_html=True,
                     )
         else:
-            display_sequence(elem, current_path, level)
+            sequence_fragment(current_path, level)
 
 
 def add_element_to_sequence(sequence: DataElement, tag: int, vr: str, value: str) -> None:
@@ -279,17 +420,13 @@ def add_element_ui():
     st.subheader("Add DICOM Element")
 
     # Get selected location and display context
-    selected_path = None
+    selected_path = st.session_state.get("selected_path")
+    selected_node = get_selected_dataset() if selected_path else None
     selected_type = None
-
-    for key in st.session_state:
-        if key.startswith("state_selected_") and st.session_state[key]:
-            selected_path = key.replace("state_selected_", "")
-            if "_item_" in selected_path:
-                selected_type = "item"
-            else:
-                selected_type = "sequence"
-            break
+    if isinstance(selected_node, Dataset):
+        selected_type = "item"
+    elif isinstance(selected_node, DataElement):
+        selected_type = "sequence"
 
     # Show appropriate context message
     if selected_type == "sequence":
@@ -347,27 +484,13 @@ def add_element_ui():
             new_element = DataElement(tag, vr, value)
 
             if selected_type == "sequence":
-                # Navigate to the selected sequence
-                current = st.session_state["current_dataset"]
-                path_parts = selected_path.split("_")
-                for i in range(0, len(path_parts), 3):
-                    if i < len(path_parts):
-                        current = current[int(path_parts[i], 16)]
                 # Add new sequence item with element
-                add_element_to_sequence(current, tag, vr, value)
+                add_element_to_sequence(selected_node, tag, vr, value)
                 st.success("Added new sequence item with element")
 
             elif selected_type == "item":
-                # Navigate to the selected item
-                current = st.session_state["current_dataset"]
-                path_parts = selected_path.split("_")
-                for i in range(0, len(path_parts), 3):
-                    if i + 2 < len(path_parts) and path_parts[i + 1] == "item":
-                        seq_tag = int(path_parts[i], 16)
-                        item_idx = int(path_parts[i + 2])
-                        current = current[seq_tag].value[item_idx]
                 # Add element to existing item
-                current.add(new_element)
+                selected_node.add(new_element)
                 st.success("Added element to sequence item")
 
             else:
@@ -375,31 +498,233 @@ def add_element_ui():
                 if vr == "SQ":
                     # Creating a new empty sequence
                     new_element.value = []
-                st.session_state["current_dataset"].add(new_element)
+                get_current_dataset().add(new_element)
                 st.success("Added element to root dataset")
 
             set_state("modified", "", True)
+            invalidate_node_index()
 
         except Exception as e:
             st.error(f"Error adding element: {str(e)}")
-        except Exception as e:
-            st.error(f"Error adding element: {str(e)}")
 
 
-def save_dataset(dataset: Dataset, filepath: str) -> None:
-    """Save DICOM dataset to file."""
+def encode_dataset(dataset: Dataset) -> BytesIO:
+    """Encode a DICOM dataset as a DICOM file in an in-memory stream."""
+    dataset.ensure_file_meta()
+    dataset.is_implicit_VR = False
+    dataset.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
+    buffer = BytesIO()
+    pydicom.dcmwrite(buffer, dataset, write_like_original=False)
+    buffer.seek(0)
+    return buffer
+
+
+def save_dataset(dataset: Dataset, digest: str, file_name: str) -> None:
+    """Save DICOM dataset into the session's copy of the upload and offer it for download."""
     try:
-        dataset.ensure_file_meta()
-        dataset.is_implicit_VR = False
-        dataset.file_meta.TransferSyntaxUID = "1.2.840.10008.1.2.1"
-        pydicom.dcmwrite(filepath, dataset, write_like_original=False)
+        data = encode_dataset(dataset).getvalue()
+        if SERVER_MODE:
+            get_session_store().replace(get_session_id(), digest, data)
+        else:
+            st.session_state["uploads"][digest]["data"] = data
+        st.session_state["download"] = {"digest": digest, "file_name": file_name, "data": data}
         set_state("modified", "", False)
-        st.success(f"Successfully saved to {filepath}")
+        st.success(f"Saved {file_name}, use the download button to keep a copy")
     except Exception as e:
         st.error(f"Error saving file: {str(e)}")
 
 
+def register_uploads(uploaded_files: List[UploadedFile]) -> None:
+    """
+    Keep uploaded files as in-memory buffers, deduplicated by the SHA-256 of their content.
+    Each upload is hashed once; the uploader's file_id is remembered so reruns don't hash again.
+    In server mode the bytes are handed to the session store, which spools them to disk.
+    """
+    uploads = st.session_state.setdefault("uploads", {})
+    digests_by_file_id = st.session_state.setdefault("upload_digests", {})
+    for uploaded_file in uploaded_files:
+        if uploaded_file.file_id in digests_by_file_id:
+            continue
+        data = uploaded_file.getvalue()
+        digest = hashlib.sha256(data).hexdigest()
+        digests_by_file_id[uploaded_file.file_id] = digest
+        if digest not in uploads:
+            uploads[digest] = {"name": uploaded_file.name, "data": data, "dataset": None}
+            if SERVER_MODE:
+                get_session_store().add_file(get_session_id(), digest, data)
+                uploads[digest]["data"] = None
+
+
+def forget_expired_uploads() -> None:
+    """In server mode, drop uploads whose spooled copy was discarded because the session sat idle."""
+    store = get_session_store()
+    uploads = st.session_state.get("uploads", {})
+    for digest in [digest for digest in uploads if not store.has(get_session_id(), digest)]:
+        st.warning(f"{uploads[digest]['name']} was discarded after the session was idle, please upload it again")
+        del uploads[digest]
+    st.session_state["upload_digests"] = {
+        file_id: digest for file_id, digest in st.session_state.get("upload_digests", {}).items() if digest in uploads
+    }
+
+
+def get_upload_dataset(digest: str) -> Dataset:
+    """Parse an upload directly from its buffer, once. In server mode the session store owns the dataset."""
+    if SERVER_MODE:
+        return get_session_store().get(get_session_id(), digest)
+    upload = st.session_state["uploads"][digest]
+    if upload["dataset"] is None:
+        upload["dataset"] = pydicom.dcmread(BytesIO(upload["data"]), force=True)
+    return upload["dataset"]
+
+
+def release_dataset_references(digest: str) -> None:
+    """
+    In server mode, drop this session's references to its dataset at the end of each run, and unpin it, so
+    the store can actually free the memory when it evicts the dataset.
+    """
+    get_session_store().unpin(get_session_id(), digest)
+    if get_state("modified", "", False):
+        get_session_store().update_size(get_session_id(), digest)
+    st.session_state.pop("node_index", None)
+
+
+def upload_reader(digest: str) -> Callable[[], bytes]:
+    """A callable returning the saved bytes of an upload; safe to call from a worker thread."""
+    if SERVER_MODE:
+        path = get_session_store().spooled_path(get_session_id(), digest)
+        return path.read_bytes
+    data = st.session_state["uploads"][digest]["data"]
+    return lambda: data
+
+
+@st.cache_resource
+def get_batch_dir() -> Path:
+    """A folder private to this process for the batch results of the sessions (outside server mode)."""
+    path = Path(tempfile.mkdtemp(prefix="dcmqtreepy-batch-"))
+    atexit.register(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def new_batch_archive() -> Path:
+    """The file for this session's batch results, in its spool directory in server mode so it goes with the session."""
+    drop_batch_archive()
+    if SERVER_MODE:
+        return get_session_store().session_file(get_session_id(), "batch.zip")
+    return get_batch_dir() / f"{get_session_id()}-batch.zip"
+
+
+def drop_batch_archive() -> None:
+    archive_path = st.session_state.pop("batch_archive", None)
+    if archive_path is not None:
+        archive_path.unlink(missing_ok=True)
+
+
+def batch_panel(uploads: Dict) -> None:
+    """Apply one edit to every uploaded file on a thread pool and offer the results as one zip."""
+    with st.expander(f"Batch operations on all {len(uploads)} uploaded files"):
+        operation = st.selectbox(
+            "Operation",
+            ["Set element", "Delete element", "Add private element", "Bulk edit sequence items", "Change transfer syntax"],
+            key="batch_op",
+        )
+        try:
+            if operation in ("Set element", "Delete element"):
+                col1, col2 = st.columns(2)
+                with col1:
+                    group = st.text_input("Group (hex)", "0008", key="batch_group")
+                with col2:
+                    element = st.text_input("Element (hex)", "1010", key="batch_element")
+                tag = int(group + element, 16)
+                if operation == "Set element":
+                    value = st.text_input("Value (separate multiple values with \\)", key="batch_value")
+                    edit = SetElement(tag, value)
+                else:
+                    edit = DeleteElement(tag)
+            elif operation == "Add private element":
+                creator = st.selectbox("Private creator", sorted(_private_dict.private_dictionaries), key="batch_creator")
+                col1, col2 = st.columns(2)
+                with col1:
+                    group = st.text_input("Group (hex)", "300b", key="batch_private_group")
+                with col2:
+                    offset = st.text_input("Element offset in block (hex)", "02", key="batch_private_offset")
+                value = st.text_input("Value (separate multiple values with \\)", key="batch_private_value")
+                edit = AddPrivateElement(int(group, 16), creator, int(offset, 16), value)
+            elif operation == "Bulk edit sequence items":
+                path = st.text_input(
+                    "Element path", "IonBeamSequence[*].IonControlPointSequence[*].GantryAngle", key="batch_bulk_path"
+                )
+                expression = st.text_input("New value from the current value x", "x", key="batch_bulk_expression")
+                edit = BulkEdit(path, expression)
+            else:
+                transfer_syntax = st.selectbox(
+                    "Transfer syntax",
+                    list(UNCOMPRESSED_TRANSFER_SYNTAXES),
+                    format_func=lambda uid: uid.name,
+                    key="batch_transfer_syntax",
+                )
+                edit = ChangeTransferSyntax(transfer_syntax)
+        except ValueError as e:
+            st.error(f"Invalid batch operation: {e}")
+            return
+
+        if st.button("Apply to all uploaded files", key="batch_apply"):
+            sources = [(uploads[digest]["name"], upload_reader(digest)) for digest in uploads]
+            progress = st.progress(0.0, text="Starting batch")
+            # the archive is streamed to disk, and in server mode held to the session's budget
+            archive_path = new_batch_archive()
+            max_bytes = get_session_store().session_budget_bytes if SERVER_MODE else None
+            start = time.perf_counter()
+            failures = []
+            try:
+                with open(archive_path, "wb") as archive:
+                    results = write_results_zip(apply_batch(sources, [edit]), archive, max_bytes)
+                    for done, result in enumerate(results, start=1):
+                        if result.error is not None:
+                            failures.append(f"{result.name}: {result.error}")
+                        progress.progress(done / len(sources), text=f"{done} of {len(sources)} files ({result.name})")
+            except (ArchiveSizeError, OSError) as e:
+                archive_path.unlink(missing_ok=True)
+                st.error(f"Batch stopped: {e}")
+            else:
+                st.session_state["batch_archive"] = archive_path
+            logging.info(f"Batch {operation} of {len(sources)} files took {time.perf_counter() - start:.2f} s")
+            for failure in failures:
+                st.error(failure)
+
+        archive_path = st.session_state.get("batch_archive")
+        if archive_path is not None and not archive_path.exists():
+            # discarded with the session after it sat idle
+            drop_batch_archive()
+        elif archive_path is not None:
+            # read from disk only when the user downloads it
+            st.download_button(
+                "Download batch results (zip)", data=archive_path.read_bytes, file_name="batch.zip", mime="application/zip"
+            )
+
+
+def admin_page() -> None:
+    """Per-session memory use and parse times of the server mode session store."""
+    st.title("DICOM Viewer Sessions")
+    store = get_session_store()
+    megabyte = 1024 * 1024
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Memory in use (MB)", f"{store.total_bytes() / megabyte:.1f}")
+    col2.metric("Global budget (MB)", f"{store.global_budget_bytes / megabyte:.0f}")
+    col3.metric("Session budget (MB)", f"{store.session_budget_bytes / megabyte:.0f}")
+    rows = []
+    for usage in store.usage():
+        row = asdict(usage)
+        row["memory_mb"] = round(row.pop("memory_bytes") / megabyte, 2)
+        rows.append(row)
+    st.dataframe(rows, use_container_width=True)
+
+
 def main():
+    if SERVER_MODE and st.query_params.get("page") == "admin":
+        admin_page()
+        return
+
+    run_start = time.perf_counter()
     st.title("DICOM Viewer")
 
     # Load private dictionaries
@@ -407,49 +732,66 @@ def main():
 
     # File upload handling
     uploaded_files = st.file_uploader("Choose DICOM file(s)", accept_multiple_files=True, type=["dcm"])
-
-    # Track loaded files
-    if "loaded_files" not in st.session_state:
-        st.session_state["loaded_files"] = []
-
     if uploaded_files:
-        for uploaded_file in uploaded_files:
-            if uploaded_file.name not in st.session_state["loaded_files"]:
-                st.session_state["loaded_files"].append(uploaded_file.name)
-                with open(uploaded_file.name, "wb") as f:
-                    f.write(uploaded_file.getbuffer())
+        register_uploads(uploaded_files)
+    if SERVER_MODE:
+        forget_expired_uploads()
+    uploads = st.session_state.get("uploads", {})
 
     # File selection and display
-    if st.session_state["loaded_files"]:
-        selected_file = st.selectbox("Select file to view", st.session_state["loaded_files"])
+    if uploads:
+        selected_digest = st.selectbox(
+            "Select file to view",
+            list(uploads),
+            format_func=lambda digest: f"{uploads[digest]['name']} ({digest[:8]})",
+        )
 
-        if selected_file:
+        if selected_digest:
             if get_state("modified", "", False) and not st.warning("You have unsaved changes. Do you want to continue?"):
                 return
 
-
+            upload = uploads[selected_digest]
+            if SERVER_MODE:
+                # kept in memory for the whole run, however the other sessions' runs use the store meanwhile
+                get_session_store().pin(get_session_id(), selected_digest)
             try:
-                dataset = pydicom.dcmread(selected_file, force=True)
-                st.session_state["current_dataset"] = dataset
+                dataset = get_upload_dataset(selected_digest)
+                st.session_state["current_digest"] = selected_digest
+                get_node_index(dataset)
 
                 st.subheader("DICOM Elements")
-                display_dataset(dataset)
+                dataset_fragment()
 
                 # Save options
                 col1, col2 = st.columns(2)
                 with col1:
                     if st.button("Save"):
-                        save_dataset(dataset, selected_file)
+                        save_dataset(dataset, selected_digest, upload["name"])
                 with col2:
-                    save_as = st.text_input("Save as:", selected_file + "_new")
+                    save_as = st.text_input("Save as:", upload["name"] + "_new")
                     if st.button("Save As"):
-                        save_dataset(dataset, save_as)
+                        save_dataset(dataset, selected_digest, save_as)
+
+                download = st.session_state.get("download")
+                if download is not None and download["digest"] == selected_digest:
+                    st.download_button(
+                        f"Download {download['file_name']}",
+                        data=download["data"],
+                        file_name=download["file_name"],
+                        mime="application/dicom",
+                    )
 
                 # Add element section
                 add_element_ui()
 
+                batch_panel(uploads)
+
             except Exception as e:
                 st.error(f"Error reading file: {str(e)}")
+            finally:
+                if SERVER_MODE:
+                    release_dataset_references(selected_digest)
+                logging.info(f"Full run rendered in {(time.perf_counter() - run_start) * 1000:.1f} ms")
 
 
 if __name__ == "__main__":